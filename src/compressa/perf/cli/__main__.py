@@ -7,13 +7,22 @@ from compressa.perf.cli.tools import (
     report_experiment,
     list_experiments,
     run_experiments_from_yaml,
+    run_replay,
+    run_batch_sweep,
     run_continuous_stress_test,
+    report_percentiles,
+    compare_experiments,
+    compact_database,
+    ingest_measurement_log,
+    export_experiments_to_files,
+    import_experiments_from_files,
     DEFAULT_DB_PATH,
 )
 from compressa.perf.db.setup import (
     stop_db_writer,
     get_db_writer,
 )
+from compressa.perf.experiment.routing import ROUTING_STRATEGIES
 
 
 def handle_stop_signals(signum, frame):
@@ -41,7 +50,31 @@ def run_experiment_args(args):
         generate_prompts=args.generate_prompts,
         num_prompts=args.num_prompts,
         prompt_length=args.prompt_length,
-        max_tokens=args.max_tokens
+        max_tokens=args.max_tokens,
+        adaptive=args.adaptive,
+        precision_targets=args.target_precision,
+        min_tasks=args.min_tasks,
+        check_every=args.check_every,
+        measurement_log=args.measurement_log,
+        metrics_port=args.metrics_port,
+        live=args.live,
+        max_attempts=args.max_attempts,
+        retry_backoff_sec=args.retry_backoff,
+        retry_max_backoff_sec=args.retry_max_backoff,
+        retry_budget=args.retry_budget,
+        connect_timeout=args.connect_timeout,
+        ttft_timeout=args.ttft_timeout,
+        idle_timeout=args.idle_timeout,
+        request_timeout=args.request_timeout,
+        routing=args.routing,
+        endpoint_weights=args.endpoint_weights,
+        server_metrics_url=args.server_metrics_url,
+        server_metrics=args.server_metrics,
+        sample_interval=args.sample_interval,
+        sample_gpu_info=args.sample_gpu_info,
+        count_tokens=args.count_tokens,
+        tokenizer=args.tokenizer,
+        chars_per_token=args.chars_per_token,
     )
 
 
@@ -53,6 +86,32 @@ def report_experiment_args(args):
     )
 
 
+def report_percentiles_args(args):
+    report_percentiles(
+        experiment_refs=args.experiment_refs,
+        db=args.db,
+        metrics=args.metric,
+        quantiles=args.quantiles,
+        cdf_file=args.cdf_file,
+    )
+
+
+def compare_experiments_args(args):
+    passed = compare_experiments(
+        experiment_a=args.experiment_a,
+        experiment_b=args.experiment_b,
+        db=args.db,
+        output_format=args.format,
+        output_file=args.output,
+        n_boot=args.n_boot,
+        confidence=args.confidence,
+        seed=args.seed,
+        fail_on_regression=args.fail_on_regression,
+    )
+    if not passed:
+        sys.exit(1)
+
+
 def list_experiments_args(args):
     list_experiments(
         db=args.db,
@@ -62,6 +121,8 @@ def list_experiments_args(args):
         param_filters=args.param_filter,
         recompute=args.recompute,
         csv_file=args.csv_file,
+        force=args.force,
+        workers=args.workers,
     )
 
 
@@ -91,6 +152,127 @@ def run_continuous_stress_test_args(args):
         prompt_length=args.prompt_length,
         max_tokens=args.max_tokens,
         report_freq_min=args.report_freq_min,
+        retention_hours=args.retention_hours,
+        rollup_interval_sec=args.rollup_interval_sec,
+        measurement_log=args.measurement_log,
+        metrics_port=args.metrics_port,
+        live=args.live,
+        max_attempts=args.max_attempts,
+        retry_backoff_sec=args.retry_backoff,
+        retry_max_backoff_sec=args.retry_max_backoff,
+        retry_budget=args.retry_budget,
+        connect_timeout=args.connect_timeout,
+        ttft_timeout=args.ttft_timeout,
+        idle_timeout=args.idle_timeout,
+        request_timeout=args.request_timeout,
+        routing=args.routing,
+        endpoint_weights=args.endpoint_weights,
+        server_metrics_url=args.server_metrics_url,
+        server_metrics=args.server_metrics,
+        sample_interval=args.sample_interval,
+        sample_gpu_info=args.sample_gpu_info,
+        count_tokens=args.count_tokens,
+        tokenizer=args.tokenizer,
+        chars_per_token=args.chars_per_token,
+    )
+
+
+def run_replay_args(args):
+    run_replay(
+        trace_file=args.trace_file,
+        db=args.db,
+        api_key=args.api_key,
+        openai_url=args.openai_url,
+        model_name=args.model_name,
+        experiment_name=args.experiment_name,
+        description=args.description,
+        speedup=args.speedup,
+        start_sec=args.start,
+        end_sec=args.end,
+        max_tokens=args.max_tokens,
+        force_output_length=args.force_output_length,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed,
+        measurement_log=args.measurement_log,
+        connect_timeout=args.connect_timeout,
+        ttft_timeout=args.ttft_timeout,
+        idle_timeout=args.idle_timeout,
+        request_timeout=args.request_timeout,
+        routing=args.routing,
+        endpoint_weights=args.endpoint_weights,
+        server_metrics_url=args.server_metrics_url,
+        server_metrics=args.server_metrics,
+        sample_interval=args.sample_interval,
+        count_tokens=args.count_tokens,
+        tokenizer=args.tokenizer,
+        chars_per_token=args.chars_per_token,
+    )
+
+
+def run_batch_sweep_args(args):
+    run_batch_sweep(
+        db=args.db,
+        api_key=args.api_key,
+        openai_url=args.openai_url,
+        model_name=args.model_name,
+        experiment_name=args.experiment_name,
+        description=args.description,
+        api=args.api,
+        batch_sizes=args.batch_sizes,
+        concurrencies=args.num_runners,
+        num_tasks=args.num_tasks,
+        documents_file=args.documents_file,
+        num_documents=args.num_documents,
+        document_length=args.document_length,
+        query_length=args.query_length,
+        seed=args.seed,
+        max_attempts=args.max_attempts,
+        retry_backoff_sec=args.retry_backoff,
+        retry_max_backoff_sec=args.retry_max_backoff,
+        retry_budget=args.retry_budget,
+        connect_timeout=args.connect_timeout,
+        request_timeout=args.request_timeout,
+        routing=args.routing,
+        endpoint_weights=args.endpoint_weights,
+        server_metrics_url=args.server_metrics_url,
+        server_metrics=args.server_metrics,
+        sample_interval=args.sample_interval,
+    )
+
+
+def ingest_measurement_log_args(args):
+    ingest_measurement_log(
+        directory=args.directory,
+        db=args.db,
+        include_open=args.include_open,
+    )
+
+
+def export_experiments_args(args):
+    export_experiments_to_files(
+        output_dir=args.output_dir,
+        db=args.db,
+        experiment_ids=args.experiment_id,
+        file_format=args.format,
+        chunk_size=args.chunk_size,
+    )
+
+
+def import_experiments_args(args):
+    import_experiments_from_files(
+        input_dirs=args.input_dirs,
+        db=args.db,
+        chunk_size=args.chunk_size,
+    )
+
+
+def compact_database_args(args):
+    compact_database(
+        db=args.db,
+        retention_hours=args.retention_hours,
+        experiment_ids=args.experiment_id,
+        rollup_interval_sec=args.rollup_interval_sec,
+        vacuum=args.vacuum,
     )
 
 def main():
@@ -154,7 +336,11 @@ Examples:
         help="Path to the SQLite database",
     )
     parser_run.add_argument(
-        "--openai_url", type=str, required=True, help="OpenAI-compatible API URL"
+        "--openai_url",
+        type=str,
+        nargs="+",
+        required=True,
+        help="OpenAI-compatible API URL; several URLs spread the requests over replicas",
     )
     parser_run.add_argument(
         "--serv_api_url", type=str, help="Compressa Platform API URL"
@@ -198,6 +384,134 @@ Examples:
     parser_run.add_argument(
         "--max_tokens", type=int, default=1000, help="Maximum number of tokens for the model to generate"
     )
+    parser_run.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Stop as soon as the precision targets are met (--num_tasks becomes the cap)",
+    )
+    parser_run.add_argument(
+        "--target_precision",
+        type=str,
+        action="append",
+        help="Relative CI half-width target METRIC_STAT=VALUE, e.g. ttft_p95=0.05 "
+             "(METRIC: ttft, latency, tpot; STAT: mean, p50, p90, p95, p99). "
+             "Can be repeated, default is ttft_p95=0.05",
+    )
+    parser_run.add_argument(
+        "--min_tasks", type=int, default=100, help="Minimum number of requests in adaptive mode"
+    )
+    parser_run.add_argument(
+        "--check_every", type=int, default=50, help="Check precision every N completed requests in adaptive mode"
+    )
+    parser_run.add_argument(
+        "--measurement_log",
+        type=str,
+        default=None,
+        help="Directory for append-only measurement segment files (for very high request rates)",
+    )
+    parser_run.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve live client-side metrics in the Prometheus/OpenMetrics format on this port",
+    )
+    parser_run.add_argument(
+        "--live",
+        action="store_true",
+        help="Show a live dashboard with rolling rates and percentiles instead of the progress output",
+    )
+    parser_run.add_argument(
+        "--max-attempts",
+        type=int,
+        default=1,
+        help="Send a failed request up to this many times in total (rate limits, 5xx, timeouts, connection errors)",
+    )
+    parser_run.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=0.5,
+        help="Initial backoff in seconds before a retry; doubles per attempt, with full jitter",
+    )
+    parser_run.add_argument(
+        "--retry-max-backoff",
+        type=float,
+        default=30.0,
+        help="Maximum wait in seconds before a retry, also caps the server's Retry-After",
+    )
+    parser_run.add_argument(
+        "--retry-budget",
+        type=float,
+        default=None,
+        help="Maximum retries per second across all runners",
+    )
+    parser_run.add_argument(
+        "--connect-timeout", type=float, default=None, help="Seconds to establish a connection"
+    )
+    parser_run.add_argument(
+        "--ttft-timeout", type=float, default=None, help="Abort a request that has not streamed its first token after this many seconds"
+    )
+    parser_run.add_argument(
+        "--idle-timeout", type=float, default=None, help="Abort a stream that sends no token for this many seconds"
+    )
+    parser_run.add_argument(
+        "--request-timeout", type=float, default=None, help="Abort a request that takes longer than this many seconds in total"
+    )
+    parser_run.add_argument(
+        "--routing",
+        type=str,
+        choices=ROUTING_STRATEGIES,
+        default="round_robin",
+        help="How requests are spread over several --openai_url endpoints",
+    )
+    parser_run.add_argument(
+        "--endpoint-weights",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Relative share of the requests of each endpoint, with --routing weighted",
+    )
+    parser_run.add_argument(
+        "--server-metrics-url",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Prometheus /metrics URL of the inference server to sample during the run",
+    )
+    parser_run.add_argument(
+        "--server-metrics",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Names of the server metrics to sample; defaults to vLLM, TGI and SGLang queue and KV cache gauges",
+    )
+    parser_run.add_argument(
+        "--sample-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between samples of the server and client metrics",
+    )
+    parser_run.add_argument(
+        "--sample-gpu-info",
+        action="store_true",
+        help="Also sample the GPU info of the Compressa Platform API (--serv_api_url) during the run",
+    )
+    parser_run.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="Count tokens on the client when the server returns no usage (chars-per-token estimate calibrated on responses with usage)",
+    )
+    parser_run.add_argument(
+        "--tokenizer",
+        type=str,
+        default=None,
+        help="Hugging Face tokenizer (name in the local cache or a directory) to count tokens on the client; implies --count-tokens",
+    )
+    parser_run.add_argument(
+        "--chars-per-token",
+        type=float,
+        default=None,
+        help="Fixed characters per token to estimate tokens on the client; implies --count-tokens",
+    )
     parser_run.set_defaults(func=run_experiment_args)
 
     parser_report = subparsers.add_parser(
@@ -220,6 +534,84 @@ Examples:
     )
     parser_report.set_defaults(func=report_experiment_args)
 
+    parser_percentiles = subparsers.add_parser(
+        "percentiles",
+        help="Percentiles and CDF from stored histograms, merged across experiments",
+    )
+    parser_percentiles.add_argument(
+        "experiment_refs",
+        nargs="+",
+        help="Experiment IDs, or PATH:ID for experiments stored in other databases",
+    )
+    parser_percentiles.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_percentiles.add_argument(
+        "--metric",
+        type=str,
+        action="append",
+        help="Metric to show (TTFT, LATENCY, TPOT). Can be repeated, default is all",
+    )
+    parser_percentiles.add_argument(
+        "--quantiles",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Percentiles to compute (default: 50 90 95 99)",
+    )
+    parser_percentiles.add_argument(
+        "--cdf-file",
+        type=str,
+        default=None,
+        help="Path to the CSV file to save CDF points",
+    )
+    parser_percentiles.set_defaults(func=report_percentiles_args)
+
+    parser_compare = subparsers.add_parser(
+        "compare",
+        help="Compare two experiments with bootstrap confidence intervals",
+    )
+    parser_compare.add_argument(
+        "experiment_a", type=int, help="ID of the baseline experiment (A)"
+    )
+    parser_compare.add_argument(
+        "experiment_b", type=int, help="ID of the experiment to compare against the baseline (B)"
+    )
+    parser_compare.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_compare.add_argument(
+        "--format",
+        type=str,
+        choices=["table", "json"],
+        default="table",
+        help="Output format",
+    )
+    parser_compare.add_argument(
+        "--output", type=str, default=None, help="Path to the file to save the comparison"
+    )
+    parser_compare.add_argument(
+        "--n-boot", type=int, default=2000, help="Number of bootstrap samples"
+    )
+    parser_compare.add_argument(
+        "--confidence", type=float, default=0.95, help="Confidence level of the intervals"
+    )
+    parser_compare.add_argument(
+        "--seed", type=int, default=42, help="Random seed for resampling"
+    )
+    parser_compare.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with code 1 if B has a significant regression (for CI gating)",
+    )
+    parser_compare.set_defaults(func=compare_experiments_args)
+
     parser_list = subparsers.add_parser(
         "list",
         help="List all experiments",
@@ -254,7 +646,18 @@ Examples:
     parser_list.add_argument(
         "--recompute",
         action="store_true",
-        help="Recompute metrics before listing experiments"
+        help="Recompute metrics of experiments whose measurements changed before listing"
+    )
+    parser_list.add_argument(
+        "--force",
+        action="store_true",
+        help="With --recompute, recompute the metrics of all experiments"
+    )
+    parser_list.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes used by --recompute (default: number of CPUs)"
     )
     parser_list.add_argument(
         "--csv-file",
@@ -297,7 +700,11 @@ Examples:
         help="Path to the SQLite database",
     )
     parser_stress.add_argument(
-        "--openai_url", type=str, required=True, help="OpenAI-compatible API URL"
+        "--openai_url",
+        type=str,
+        nargs="+",
+        required=True,
+        help="OpenAI-compatible API URL; several URLs spread the requests over replicas",
     )
     parser_stress.add_argument(
         "--serv_api_url", type=str, help="Compressa Platform API URL"
@@ -341,9 +748,465 @@ Examples:
     parser_stress.add_argument(
         "--report_freq_min", type=float, default=1, help="Frequency (minutes) to compute windowed metrics"
     )
+    parser_stress.add_argument(
+        "--retention_hours",
+        type=float,
+        default=None,
+        help="Keep raw measurements for this many hours, then roll them up into per-minute aggregates",
+    )
+    parser_stress.add_argument(
+        "--rollup_interval_sec", type=float, default=60, help="Rollup bucket size in seconds"
+    )
+    parser_stress.add_argument(
+        "--measurement_log",
+        type=str,
+        default=None,
+        help="Directory for append-only measurement segment files (for very high request rates)",
+    )
+    parser_stress.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve live client-side metrics in the Prometheus/OpenMetrics format on this port",
+    )
+    parser_stress.add_argument(
+        "--live",
+        action="store_true",
+        help="Show a live dashboard with rolling rates and percentiles instead of the progress output",
+    )
+    parser_stress.add_argument(
+        "--max-attempts",
+        type=int,
+        default=1,
+        help="Send a failed request up to this many times in total (rate limits, 5xx, timeouts, connection errors)",
+    )
+    parser_stress.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=0.5,
+        help="Initial backoff in seconds before a retry; doubles per attempt, with full jitter",
+    )
+    parser_stress.add_argument(
+        "--retry-max-backoff",
+        type=float,
+        default=30.0,
+        help="Maximum wait in seconds before a retry, also caps the server's Retry-After",
+    )
+    parser_stress.add_argument(
+        "--retry-budget",
+        type=float,
+        default=None,
+        help="Maximum retries per second across all runners",
+    )
+    parser_stress.add_argument(
+        "--connect-timeout", type=float, default=None, help="Seconds to establish a connection"
+    )
+    parser_stress.add_argument(
+        "--ttft-timeout", type=float, default=None, help="Abort a request that has not streamed its first token after this many seconds"
+    )
+    parser_stress.add_argument(
+        "--idle-timeout", type=float, default=None, help="Abort a stream that sends no token for this many seconds"
+    )
+    parser_stress.add_argument(
+        "--request-timeout", type=float, default=None, help="Abort a request that takes longer than this many seconds in total"
+    )
+    parser_stress.add_argument(
+        "--routing",
+        type=str,
+        choices=ROUTING_STRATEGIES,
+        default="round_robin",
+        help="How requests are spread over several --openai_url endpoints",
+    )
+    parser_stress.add_argument(
+        "--endpoint-weights",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Relative share of the requests of each endpoint, with --routing weighted",
+    )
 
+    parser_stress.add_argument(
+        "--server-metrics-url",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Prometheus /metrics URL of the inference server to sample during the run",
+    )
+    parser_stress.add_argument(
+        "--server-metrics",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Names of the server metrics to sample; defaults to vLLM, TGI and SGLang queue and KV cache gauges",
+    )
+    parser_stress.add_argument(
+        "--sample-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between samples of the server and client metrics",
+    )
+    parser_stress.add_argument(
+        "--sample-gpu-info",
+        action="store_true",
+        help="Also sample the GPU info of the Compressa Platform API (--serv_api_url) during the run",
+    )
+    parser_stress.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="Count tokens on the client when the server returns no usage (chars-per-token estimate calibrated on responses with usage)",
+    )
+    parser_stress.add_argument(
+        "--tokenizer",
+        type=str,
+        default=None,
+        help="Hugging Face tokenizer (name in the local cache or a directory) to count tokens on the client; implies --count-tokens",
+    )
+    parser_stress.add_argument(
+        "--chars-per-token",
+        type=float,
+        default=None,
+        help="Fixed characters per token to estimate tokens on the client; implies --count-tokens",
+    )
     parser_stress.set_defaults(func=run_continuous_stress_test_args)
 
+    parser_replay = subparsers.add_parser(
+        "replay",
+        help="Replay a production trace at its recorded arrival times (open loop)",
+    )
+    parser_replay.add_argument(
+        "trace_file",
+        help="JSONL trace: one request per line with timestamp, prompt or prompt_length, and output_length",
+    )
+    parser_replay.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_replay.add_argument(
+        "--openai_url",
+        type=str,
+        nargs="+",
+        required=True,
+        help="OpenAI-compatible API URL; several URLs spread the requests over replicas",
+    )
+    parser_replay.add_argument(
+        "--api_key", type=str, required=True, help="API key"
+    )
+    parser_replay.add_argument(
+        "--model_name", type=str, required=True, help="Model name"
+    )
+    parser_replay.add_argument(
+        "--experiment_name", type=str, required=True, help="Name of the experiment"
+    )
+    parser_replay.add_argument(
+        "--description", type=str, help="Description of the experiment"
+    )
+    parser_replay.add_argument(
+        "--speedup", type=float, default=1.0, help="Replay the trace this many times faster"
+    )
+    parser_replay.add_argument(
+        "--start", type=float, default=None, help="Replay from this many seconds into the trace"
+    )
+    parser_replay.add_argument(
+        "--end", type=float, default=None, help="Stop at this many seconds into the trace"
+    )
+    parser_replay.add_argument(
+        "--max_tokens", type=int, default=1000, help="Maximum tokens of requests without a recorded output length"
+    )
+    parser_replay.add_argument(
+        "--force-output-length",
+        action="store_true",
+        help="Ask the server to generate exactly the recorded output length (min_tokens, ignore_eos)",
+    )
+    parser_replay.add_argument(
+        "--max-concurrency", type=int, default=1000, help="Maximum requests in flight"
+    )
+    parser_replay.add_argument(
+        "--seed", type=int, default=42, help="Seed of the prompts generated for requests without one"
+    )
+    parser_replay.add_argument(
+        "--measurement_log",
+        type=str,
+        default=None,
+        help="Directory for append-only measurement segment files (for very high request rates)",
+    )
+    parser_replay.add_argument(
+        "--connect-timeout", type=float, default=None, help="Seconds to establish a connection"
+    )
+    parser_replay.add_argument(
+        "--ttft-timeout", type=float, default=None, help="Abort a request that has not streamed its first token after this many seconds"
+    )
+    parser_replay.add_argument(
+        "--idle-timeout", type=float, default=None, help="Abort a stream that sends no token for this many seconds"
+    )
+    parser_replay.add_argument(
+        "--request-timeout", type=float, default=None, help="Abort a request that takes longer than this many seconds in total"
+    )
+    parser_replay.add_argument(
+        "--routing",
+        type=str,
+        choices=ROUTING_STRATEGIES,
+        default="round_robin",
+        help="How requests are spread over several --openai_url endpoints",
+    )
+    parser_replay.add_argument(
+        "--endpoint-weights",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Relative share of the requests of each endpoint, with --routing weighted",
+    )
+    parser_replay.add_argument(
+        "--server-metrics-url",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Prometheus /metrics URL of the inference server to sample during the run",
+    )
+    parser_replay.add_argument(
+        "--server-metrics",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Names of the server metrics to sample; defaults to vLLM, TGI and SGLang queue and KV cache gauges",
+    )
+    parser_replay.add_argument(
+        "--sample-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between samples of the server and client metrics",
+    )
+    parser_replay.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="Count tokens on the client when the server returns no usage (chars-per-token estimate calibrated on responses with usage)",
+    )
+    parser_replay.add_argument(
+        "--tokenizer",
+        type=str,
+        default=None,
+        help="Hugging Face tokenizer (name in the local cache or a directory) to count tokens on the client; implies --count-tokens",
+    )
+    parser_replay.add_argument(
+        "--chars-per-token",
+        type=float,
+        default=None,
+        help="Fixed characters per token to estimate tokens on the client; implies --count-tokens",
+    )
+    parser_replay.set_defaults(func=run_replay_args)
+
+    parser_embed = subparsers.add_parser(
+        "embed",
+        help="Benchmark an embeddings or rerank endpoint over batch sizes and concurrencies",
+    )
+    parser_embed.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_embed.add_argument(
+        "--openai_url",
+        type=str,
+        nargs="+",
+        required=True,
+        help="OpenAI-compatible API URL; several URLs spread the requests over replicas",
+    )
+    parser_embed.add_argument(
+        "--api_key", type=str, required=True, help="API key"
+    )
+    parser_embed.add_argument(
+        "--model_name", type=str, required=True, help="Model name"
+    )
+    parser_embed.add_argument(
+        "--experiment_name", type=str, required=True, help="Name of the experiments"
+    )
+    parser_embed.add_argument(
+        "--description", type=str, help="Description of the experiments"
+    )
+    parser_embed.add_argument(
+        "--api", type=str, choices=["embeddings", "rerank"], default="embeddings", help="Endpoint to benchmark"
+    )
+    parser_embed.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1], help="Documents per request; one experiment per size"
+    )
+    parser_embed.add_argument(
+        "--num_runners", type=int, nargs="+", default=[10], help="Concurrent runners; one experiment per value"
+    )
+    parser_embed.add_argument(
+        "--num_tasks", type=int, default=100, help="Number of requests per experiment"
+    )
+    parser_embed.add_argument(
+        "--documents_file", type=str, help="File with one document per line; documents are generated otherwise"
+    )
+    parser_embed.add_argument(
+        "--num_documents", type=int, default=1000, help="Number of documents to generate"
+    )
+    parser_embed.add_argument(
+        "--document_length", type=int, default=500, help="Length of each document in characters"
+    )
+    parser_embed.add_argument(
+        "--query_length", type=int, default=100, help="Length of the rerank query in characters"
+    )
+    parser_embed.add_argument(
+        "--seed", type=int, default=42, help="Random seed"
+    )
+    parser_embed.add_argument(
+        "--max-attempts", type=int, default=1, help="Attempts per request, retrying throttled and transient failures"
+    )
+    parser_embed.add_argument(
+        "--retry-backoff", type=float, default=0.5, help="Initial retry backoff in seconds"
+    )
+    parser_embed.add_argument(
+        "--retry-max-backoff", type=float, default=30.0, help="Maximum retry backoff in seconds"
+    )
+    parser_embed.add_argument(
+        "--retry-budget", type=float, default=None, help="Maximum retries per second across all runners"
+    )
+    parser_embed.add_argument(
+        "--connect-timeout", type=float, default=None, help="Seconds to establish a connection"
+    )
+    parser_embed.add_argument(
+        "--request-timeout", type=float, default=None, help="Abort a request that takes longer than this many seconds in total"
+    )
+    parser_embed.add_argument(
+        "--routing",
+        type=str,
+        choices=ROUTING_STRATEGIES,
+        default="round_robin",
+        help="How requests are spread over several --openai_url endpoints",
+    )
+    parser_embed.add_argument(
+        "--endpoint-weights",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Relative share of the requests of each endpoint, with --routing weighted",
+    )
+    parser_embed.add_argument(
+        "--server-metrics-url",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Prometheus /metrics URL of the inference server to sample during the run",
+    )
+    parser_embed.add_argument(
+        "--server-metrics",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Names of the server metrics to sample; defaults to vLLM, TGI and SGLang queue and KV cache gauges",
+    )
+    parser_embed.add_argument(
+        "--sample-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between samples of the server and client metrics",
+    )
+    parser_embed.set_defaults(func=run_batch_sweep_args)
+
+    parser_compact = subparsers.add_parser(
+        "compact",
+        help="Roll up and prune old raw measurements of long-running experiments",
+    )
+    parser_compact.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_compact.add_argument(
+        "--retention_hours",
+        type=float,
+        default=24,
+        help="Keep raw measurements of the last N hours",
+    )
+    parser_compact.add_argument(
+        "--experiment_id",
+        type=int,
+        action="append",
+        help="Experiment to compact (default: all stress experiments)",
+    )
+    parser_compact.add_argument(
+        "--rollup_interval_sec", type=float, default=60, help="Rollup bucket size in seconds"
+    )
+    parser_compact.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="Rewrite the database file to reclaim space (slow on large databases)",
+    )
+    parser_compact.set_defaults(func=compact_database_args)
+
+    parser_ingest = subparsers.add_parser(
+        "ingest",
+        help="Load measurement segment files into the database",
+    )
+    parser_ingest.add_argument(
+        "directory", type=str, help="Directory with measurement segment files"
+    )
+    parser_ingest.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_ingest.add_argument(
+        "--include-open",
+        action="store_true",
+        help="Also load segments left open by a crashed run (never while a run is writing to them)",
+    )
+    parser_ingest.set_defaults(func=ingest_measurement_log_args)
+
+    parser_export = subparsers.add_parser(
+        "export",
+        help="Export experiments with raw measurements to Parquet or Arrow files",
+    )
+    parser_export.add_argument(
+        "output_dir", type=str, help="Directory to write one file per table to"
+    )
+    parser_export.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_export.add_argument(
+        "--experiment_id",
+        type=int,
+        action="append",
+        help="Experiment to export (default: all experiments)",
+    )
+    parser_export.add_argument(
+        "--format",
+        type=str,
+        choices=["parquet", "arrow"],
+        default="parquet",
+        help="File format",
+    )
+    parser_export.add_argument(
+        "--chunk-size", type=int, default=100_000, help="Rows per written batch"
+    )
+    parser_export.set_defaults(func=export_experiments_args)
+
+    parser_import = subparsers.add_parser(
+        "import",
+        help="Import experiments exported with `export` (e.g. from several hosts) into one database",
+    )
+    parser_import.add_argument(
+        "input_dirs", type=str, nargs="+", help="Directories written by `export`"
+    )
+    parser_import.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="Path to the SQLite database",
+    )
+    parser_import.add_argument(
+        "--chunk-size", type=int, default=100_000, help="Rows per read batch"
+    )
+    parser_import.set_defaults(func=import_experiments_args)
+
     def default_function(args):
         parser.print_help()
 
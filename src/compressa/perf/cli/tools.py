@@ -1,43 +1,96 @@
 import sqlite3
 from tabulate import tabulate
-from typing import List
+from typing import Dict, List, Union
 import time
-import requests
 import uuid
-import pandas as pd
 import os
-from compressa.perf.experiment.inference import ExperimentRunner
+import json
+import math
+import re
+# Runners, pandas, reportlab, openai, httpx and requests are imported by the
+# commands that use them, so that `list` and `report` start quickly
 from compressa.perf.experiment.analysis import Analyzer
-from compressa.perf.data.models import Experiment
+from compressa.perf.experiment.adaptive import build_adaptive_stopping
+from compressa.perf.experiment.recompute import recompute_metrics
+from compressa.perf.experiment.retry import build_retry_policy
+from compressa.perf.experiment.tokens import build_token_counter
+from compressa.perf.experiment.routing import EndpointRouter, build_router
+from compressa.perf.experiment.workloads import WorkloadClass, WorkloadMix
+from compressa.perf.experiment.comparison import (
+    load_experiment_samples,
+    compare_samples,
+    DEFAULT_N_BOOT,
+    DEFAULT_CONFIDENCE,
+)
+from compressa.perf.data.models import Experiment, Parameter
 from compressa.perf.db.operations import (
+    insert_parameter,
+    fetch_measurement_frame,
+    fetch_samples,
+    fetch_window_metrics,
     fetch_metrics_by_experiment,
     fetch_parameters_by_experiment,
     fetch_experiment_by_id,
     fetch_all_experiments,
-    clear_metrics_by_experiment,
+    fetch_merged_histograms,
+    fetch_group_metrics_by_experiment,
+    summarize_window_metrics,
+)
+from compressa.perf.data.histogram import LogHistogram, merge_histograms
+from compressa.perf.db.retention import (
+    RetentionPolicy,
+    apply_retention,
+    continuous_experiment_ids,
+    database_size,
+    summarize_rollups,
+    vacuum_database,
+    DEFAULT_ROLLUP_INTERVAL_SEC,
 )
 from compressa.perf.db.db_inserts import direct_insert_experiment as insert_experiment
+from compressa.perf.db.segments import SegmentWriter, ingest_segments
+from compressa.perf.monitoring.dashboard import LiveDashboard, RecentRequests
+from compressa.perf.monitoring.prometheus import LiveMetrics, MetricsServer
+from compressa.perf.monitoring.client_metrics import (
+    ClientMonitor,
+    client_bound_reasons,
+    CLIENT_SOURCE,
+    DEFAULT_SAMPLE_INTERVAL_SEC,
+)
 from compressa.perf.db.setup import (
     create_tables,
+    migrate_tables,
     start_db_writer,
     stop_db_writer,
     get_db_writer,
+    TABLE_NAMES,
 )
-from compressa.perf.cli.pdf_tools import report_to_pdf
 import datetime
 import sys
 import random
 import string
-from compressa.perf.experiment.config import (
-    load_yaml_configs,
-)
-
-from compressa.perf.experiment.continuous_stress import ContinuousStressTestRunner
 
 from compressa.utils import get_logger
 
 
 DEFAULT_DB_PATH = "compressa-perf-db.sqlite"
+DEFAULT_QUANTILES = [50, 90, 95, 99]
+# Metrics shown per endpoint in experiment reports
+GROUP_REPORT_METRICS = [
+    "TTFT",
+    "TTFT_95",
+    "LATENCY",
+    "LATENCY_95",
+    "TPOT",
+    "RPS",
+    "THROUGHPUT",
+    "FAILED_REQUESTS",
+]
+# Metrics shown instead for groups with their own metrics, e.g. rate fits per concurrency bucket
+GROUP_BY_REPORT_METRICS = {
+    "concurrency": ["PREFILL_RATE", "DECODE_RATE", "FIXED_OVERHEAD"],
+}
+# Windows the run is split into to align server samples, unless it has stress test windows
+REPORT_SAMPLE_WINDOWS = 20
 
 logger = get_logger(__name__)
 
@@ -55,15 +108,24 @@ def format_value(value, precision=4):
         return str(value)
 
 
+# Windowed metrics and parameters stored by older versions of the stress test
+LEGACY_WINDOW_KEY = re.compile(r"_window_\d+$")
+
+
+def _is_legacy_window_key(key: str) -> bool:
+    return LEGACY_WINDOW_KEY.search(key) is not None
+
+
 def ensure_db_initialized(conn):
-    try:
-        # Check if the Experiments table exists
-        conn.execute("SELECT 1 FROM Experiments LIMIT 1")
-    except sqlite3.OperationalError:
-        # If the table doesn't exist, create the tables
+    # Databases created by older versions may lack some of the tables
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    if not set(TABLE_NAMES) <= existing:
         print("Database not initialized. Creating tables...")
         create_tables(conn)
-        print("Tables created successfully.")
+    else:
+        migrate_tables(conn)
 
 
 def generate_random_text(
@@ -97,9 +159,36 @@ def generate_prompts_list(
     return prompts
 
 def read_prompts_from_file(file_path, prompt_length):
+    import pandas as pd
+
     df = pd.read_csv(file_path, header=None)
     return df[0].map(lambda x: x[:prompt_length]).tolist()
 
+def build_workload_mix(workloads: List[WorkloadClass], seed: int = 42) -> WorkloadMix:
+    """
+    Loads or generates the prompts of each workload class, with lengths
+    drawn from the length distribution of the class.
+    """
+    choise_generator = random.Random(seed)
+    prompts = {}
+    for workload in workloads:
+        lengths = workload.prompt_lengths(workload.num_prompts, choise_generator)
+        if workload.prompts_file:
+            source = read_prompts_from_file(workload.prompts_file, max(lengths))
+            prompts[workload.name] = [
+                source[i % len(source)][:length] for i, length in enumerate(lengths)
+            ]
+        else:
+            prompts[workload.name] = [
+                f"{i} {generate_random_text(max(length - len(str(i)) - 1, 1), choise_generator)}"
+                for i, length in enumerate(lengths)
+            ]
+        logger.info(
+            f"Workload class {workload.name}: {len(prompts[workload.name])} prompts, "
+            f"weight {workload.weight:g}, max tokens {workload.max_tokens}"
+        )
+    return WorkloadMix(workloads, prompts)
+
 
 def wait_writer(db_writer, max_timeout=None, timeout=10.0):
     start = time.time()
@@ -116,6 +205,9 @@ def wait_writer(db_writer, max_timeout=None, timeout=10.0):
 
 
 def save_report(parameters, _result: dict, model_params: dict, hw_params: dict, report_path: str, report_mode: str) -> str:
+    import pandas as pd
+    from compressa.perf.cli.pdf_tools import report_to_pdf
+
     if not os.path.exists("results"):
         os.makedirs("results")
     result = {k: round(v, 3) for k, v in zip(_result.keys(), _result.values())}
@@ -146,6 +238,8 @@ def save_report(parameters, _result: dict, model_params: dict, hw_params: dict,
     return report_path
 
 def get_model_info(url: str) -> dict:
+    import requests
+
     result = {}
     r = requests.get(f"{url}models")
     if r.status_code != 200:
@@ -158,6 +252,8 @@ def get_model_info(url: str) -> dict:
     return result
 
 def get_hw_info(url: str) -> dict:
+    import requests
+
     if not url:
         logger.warning(f"No Compressa Platform API provided... Trying defaut API...")
         url = "http://localhost:5100/v1/"
@@ -177,10 +273,87 @@ def get_hw_info(url: str) -> dict:
     data = r.json()
     return data
 
+def endpoint_router(
+    openai_url: Union[str, List[str]],
+    routing: str = "round_robin",
+    endpoint_weights: List[float] = None,
+) -> EndpointRouter:
+    """Router over one or several OpenAI-compatible endpoint URLs."""
+    urls = [openai_url] if isinstance(openai_url, str) else list(openai_url)
+    return build_router(urls, routing, endpoint_weights)
+
+def start_server_sampling(
+    experiment_id: int,
+    server_metrics_url: Union[str, List[str]] = None,
+    gpu_info_url: str = None,
+    server_metrics: List[str] = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SEC,
+):
+    """
+    Starts polling the servers' Prometheus metrics and the platform GPU info
+    during the experiment, storing the sampler settings as parameters.
+    Returns a function stopping it.
+    """
+    if not server_metrics_url and not gpu_info_url:
+        return lambda: None
+    from compressa.perf.monitoring.server_metrics import ServerMetricsSampler
+
+    if isinstance(server_metrics_url, str):
+        server_metrics_url = [server_metrics_url]
+    sampler = ServerMetricsSampler(
+        metrics_urls=server_metrics_url or [],
+        gpu_info_url=gpu_info_url,
+        interval_sec=sample_interval,
+        metric_names=server_metrics,
+    )
+    for key, value in sampler.parameters().items():
+        insert_parameter(Parameter(id=None, experiment_id=experiment_id, key=key, value=value))
+    return sampler.start(experiment_id).stop
+
+def start_client_monitoring(experiment_id: int, sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SEC):
+    """Starts sampling the load generator process. Returns a function stopping it."""
+    return ClientMonitor(sample_interval).start(experiment_id).stop
+
+def sampled_gpu_info_url(serv_api_url: str, sample_gpu_info: bool) -> str:
+    if not sample_gpu_info:
+        return None
+    if not serv_api_url:
+        raise ValueError("Sampling GPU info needs the Compressa Platform API URL (--serv_api_url)")
+    return f"{serv_api_url}gpu_info"
+
+def start_live_monitoring(db_writer, metrics_port: int = None, live: bool = False, title: str = ""):
+    """
+    Starts the `--metrics-port` endpoint and the `--live` dashboard.
+    Returns the request listeners feeding them and a function stopping them.
+    """
+    if not metrics_port and not live:
+        return None, lambda: None
+    metrics = LiveMetrics()
+    metrics.add_gauge(
+        "db_writer_queue_depth",
+        "Items waiting in the DB writer queue.",
+        db_writer.queue.qsize,
+    )
+    listeners = [metrics]
+    stops = []
+    if metrics_port:
+        stops.append(MetricsServer(metrics, metrics_port).start().stop)
+    if live:
+        recent = RecentRequests()
+        listeners.append(recent)
+        stops.append(LiveDashboard(metrics, recent, title=title).start().stop)
+
+    def stop():
+        for stop_one in stops:
+            stop_one()
+
+    return listeners, stop
+
+
 def run_experiment(
     db: str = DEFAULT_DB_PATH,
     api_key: str = None,
-    openai_url: str = None,
+    openai_url: Union[str, List[str]] = None,
     serv_api_url: str = None,
     model_name: str = None,
     experiment_name: str = None,
@@ -195,9 +368,46 @@ def run_experiment(
     prompt_length: int = 100,
     max_tokens: int = 1000,
     seed: int = 42,
+    adaptive: bool = False,
+    precision_targets: List[str] = None,
+    min_tasks: int = 100,
+    check_every: int = 50,
+    measurement_log: str = None,
+    metrics_port: int = None,
+    live: bool = False,
+    max_attempts: int = 1,
+    retry_backoff_sec: float = 0.5,
+    retry_max_backoff_sec: float = 30.0,
+    retry_budget: float = None,
+    connect_timeout: float = None,
+    ttft_timeout: float = None,
+    idle_timeout: float = None,
+    request_timeout: float = None,
+    routing: str = "round_robin",
+    endpoint_weights: List[float] = None,
+    workloads: List[WorkloadClass] = None,
+    server_metrics_url: Union[str, List[str]] = None,
+    server_metrics: List[str] = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SEC,
+    sample_gpu_info: bool = False,
+    count_tokens: bool = False,
+    tokenizer: str = None,
+    chars_per_token: float = None,
 ):
     if not api_key:
         raise ValueError("OPENAI_API_KEY is not set")
+    from compressa.perf.experiment.deadlines import RequestDeadlines
+    from compressa.perf.experiment.inference import ExperimentRunner
+
+    router = endpoint_router(openai_url, routing, endpoint_weights)
+    adaptive_stopping = None
+    if adaptive:
+        adaptive_stopping = build_adaptive_stopping(
+            precision_targets=precision_targets,
+            min_tasks=min_tasks,
+            check_every=check_every,
+            seed=seed,
+        )
     if not report_mode:
         report_mode = "pdf"
         logger.warning(f"Default report mode - .pdf")
@@ -211,12 +421,22 @@ def run_experiment(
         create_tables(conn)
         start_db_writer(db)
         db_writer = get_db_writer()
+        listeners, stop_monitoring = start_live_monitoring(
+            db_writer, metrics_port, live, title=f"compressa-perf measure: {experiment_name}"
+        )
 
         experiment_runner = ExperimentRunner(
             api_key=api_key,
-            openai_url=openai_url,
+            openai_url=router.urls[0],
             model_name=model_name,
             num_runners=num_runners,
+            listeners=listeners,
+            retry_policy=build_retry_policy(
+                max_attempts, retry_backoff_sec, retry_max_backoff_sec, retry_budget
+            ),
+            deadlines=RequestDeadlines(connect_timeout, ttft_timeout, idle_timeout, request_timeout),
+            router=router,
+            token_counter=build_token_counter(count_tokens, tokenizer, chars_per_token),
         )
 
         experiment = Experiment(
@@ -227,8 +447,20 @@ def run_experiment(
         )
         experiment.id = insert_experiment(conn, experiment)
         print(f"Experiment created: {experiment}")
+        stop_client_monitoring = start_client_monitoring(experiment.id, sample_interval)
+        stop_sampling = start_server_sampling(
+            experiment.id,
+            server_metrics_url,
+            sampled_gpu_info_url(serv_api_url, sample_gpu_info),
+            server_metrics,
+            sample_interval,
+        )
 
-        if generate_prompts:
+        workload_mix = None
+        if workloads:
+            workload_mix = build_workload_mix(workloads, seed)
+            prompts = []
+        elif generate_prompts:
             prompts = generate_prompts_list(num_prompts, prompt_length, seed)
         else:
             prompts = read_prompts_from_file(prompts_file, prompt_length)
@@ -241,9 +473,19 @@ def run_experiment(
             num_tasks=num_tasks,
             max_tokens=max_tokens,
             seed=seed,
+            adaptive=adaptive_stopping,
+            measurement_log=SegmentWriter(measurement_log) if measurement_log else None,
+            show_progress=not live,
+            workloads=workload_mix,
         )
 
+        stop_sampling()
+        stop_client_monitoring()
+        stop_monitoring()
         wait_writer(db_writer)
+        if measurement_log:
+            ingested = ingest_segments(conn, measurement_log)
+            logger.info(f"Ingested {ingested} measurements from {measurement_log}")
         
         analyzer = Analyzer(conn)
         metrics, _io_stats = analyzer.compute_metrics(experiment.id)
@@ -252,11 +494,21 @@ def run_experiment(
             "NUM_TASKS": num_tasks,
             "MAX_TOKENS": max_tokens,
         }
+        if workload_mix is not None:
+            del _parameters["MAX_TOKENS"]
+            _parameters["WORKLOADS"] = ", ".join(
+                f"{w.name} ({w.weight:g})" for w in workload_mix.classes
+            )
+        if adaptive_stopping is not None:
+            # The same keys as stored with the experiment
+            _parameters.update(
+                {k.upper(): v for k, v in adaptive_stopping.parameters(num_tasks).items()}
+            )
         io_stats = {k.upper(): round(v, 2) for k, v in zip(_io_stats.keys(), _io_stats.values())}
         parameters = {**_parameters, **io_stats}
         hw_info = get_hw_info(serv_api_url)
-        hw_info["OPENAI_URL"] = openai_url
-        model_info = get_model_info(openai_url)
+        hw_info["OPENAI_URL"] = ", ".join(router.urls)
+        model_info = get_model_info(router.urls[0])
         saved_report = save_report(parameters, metrics, model_info, hw_info, report_file, report_mode)
         db_writer.wait_for_write()
         
@@ -271,6 +523,246 @@ def run_experiment(
     stop_db_writer()
 
 
+def run_replay(
+    trace_file: str,
+    db: str = DEFAULT_DB_PATH,
+    api_key: str = None,
+    openai_url: Union[str, List[str]] = None,
+    model_name: str = None,
+    experiment_name: str = None,
+    description: str = None,
+    speedup: float = 1.0,
+    start_sec: float = None,
+    end_sec: float = None,
+    max_tokens: int = 1000,
+    force_output_length: bool = False,
+    max_concurrency: int = 1000,
+    seed: int = 42,
+    measurement_log: str = None,
+    connect_timeout: float = None,
+    ttft_timeout: float = None,
+    idle_timeout: float = None,
+    request_timeout: float = None,
+    routing: str = "round_robin",
+    endpoint_weights: List[float] = None,
+    server_metrics_url: Union[str, List[str]] = None,
+    server_metrics: List[str] = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SEC,
+    count_tokens: bool = False,
+    tokenizer: str = None,
+    chars_per_token: float = None,
+):
+    """
+    Replays a production trace open loop: requests are sent at their recorded
+    offsets divided by `speedup`, with their recorded output length as
+    `max_tokens`. Prompts missing from the trace are generated with the
+    recorded length.
+    """
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not set")
+    from compressa.perf.experiment.deadlines import RequestDeadlines
+    from compressa.perf.experiment.inference import InferenceRunner
+    from compressa.perf.experiment.replay import TraceReplayer, TraceRequest, load_trace
+
+    router = endpoint_router(openai_url, routing, endpoint_weights)
+    trace = load_trace(trace_file, max_tokens, start_sec, end_sec)
+    if not trace:
+        raise ValueError(f"No requests found in {trace_file} for the given time window")
+    duration = trace[-1].offset / speedup
+    logger.info(
+        f"Replaying {len(trace)} requests over {duration:.1f}s "
+        f"({len(trace) / max(duration, 1e-9):.1f} RPS on average)"
+    )
+    choise_generator = random.Random(seed)
+
+    def prompt_for(request: TraceRequest) -> str:
+        if request.prompt is not None:
+            return request.prompt
+        return generate_random_text(request.prompt_length, choise_generator)
+
+    with sqlite3.connect(db) as conn:
+        create_tables(conn)
+        start_db_writer(db)
+        db_writer = get_db_writer()
+        experiment = Experiment(
+            id=None,
+            experiment_name=experiment_name,
+            experiment_date=datetime.datetime.now(),
+            description=description,
+        )
+        experiment.id = insert_experiment(conn, experiment)
+        print(f"Experiment created: {experiment}")
+
+        deadlines = RequestDeadlines(connect_timeout, ttft_timeout, idle_timeout, request_timeout)
+        token_counter = build_token_counter(count_tokens, tokenizer, chars_per_token)
+        runner = InferenceRunner(
+            api_key=api_key,
+            openai_url=router.urls[0],
+            model_name=model_name,
+            deadlines=deadlines,
+            router=router,
+            force_output_length=force_output_length,
+            max_connections=max_concurrency,
+            token_counter=token_counter,
+        )
+        replayer = TraceReplayer(runner, max_concurrency=max_concurrency, speedup=speedup)
+        stop_client_monitoring = start_client_monitoring(experiment.id, sample_interval)
+        stop_sampling = start_server_sampling(
+            experiment.id, server_metrics_url, None, server_metrics, sample_interval
+        )
+        replayer.replay(
+            experiment.id,
+            trace,
+            prompt_for,
+            measurement_log=SegmentWriter(measurement_log) if measurement_log else None,
+        )
+        stop_sampling()
+        stop_client_monitoring()
+        replayer.store_parameters(experiment.id, {
+            "trace_file": trace_file,
+            "num_tasks": str(len(trace)),
+            "model_name": model_name,
+            "openai_url": router.urls[0],
+            **({"trace_start_sec": str(start_sec)} if start_sec is not None else {}),
+            **({"trace_end_sec": str(end_sec)} if end_sec is not None else {}),
+            **({"force_output_length": "True"} if force_output_length else {}),
+            **deadlines.parameters(),
+            **(router.parameters() if len(router.urls) > 1 else {}),
+            **(token_counter.parameters() if token_counter is not None else {}),
+        })
+        logger.info(
+            f"Dispatch lag: p99 {replayer.parameters()['dispatch_lag_p99_ms']} ms, "
+            f"max {replayer.parameters()['dispatch_lag_max_ms']} ms"
+        )
+
+        wait_writer(db_writer)
+        if measurement_log:
+            ingested = ingest_segments(conn, measurement_log)
+            logger.info(f"Ingested {ingested} measurements from {measurement_log}")
+        Analyzer(conn).compute_metrics(experiment.id)
+        db_writer.wait_for_write()
+
+    report_experiment(experiment_id=experiment.id, db=db, recompute=False)
+    stop_db_writer()
+    return experiment.id
+
+
+def run_batch_sweep(
+    db: str = DEFAULT_DB_PATH,
+    api_key: str = None,
+    openai_url: Union[str, List[str]] = None,
+    model_name: str = None,
+    experiment_name: str = None,
+    description: str = None,
+    api: str = "embeddings",
+    batch_sizes: List[int] = None,
+    concurrencies: List[int] = None,
+    num_tasks: int = 100,
+    documents_file: str = None,
+    num_documents: int = 1000,
+    document_length: int = 500,
+    query_length: int = 100,
+    seed: int = 42,
+    max_attempts: int = 1,
+    retry_backoff_sec: float = 0.5,
+    retry_max_backoff_sec: float = 30.0,
+    retry_budget: float = None,
+    connect_timeout: float = None,
+    request_timeout: float = None,
+    routing: str = "round_robin",
+    endpoint_weights: List[float] = None,
+    server_metrics_url: Union[str, List[str]] = None,
+    server_metrics: List[str] = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SEC,
+):
+    """
+    Benchmarks an embeddings or rerank endpoint: runs one experiment per
+    combination of batch size and number of concurrent runners, then prints
+    them ranked by documents per second. Returns the experiment ids.
+    """
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not set")
+    from compressa.perf.experiment.batch_inference import BATCH_RUNNERS, BatchExperimentRunner
+    from compressa.perf.experiment.deadlines import RequestDeadlines
+
+    if api not in BATCH_RUNNERS:
+        raise ValueError(f"Unknown api '{api}', expected one of {sorted(BATCH_RUNNERS)}")
+    batch_sizes = batch_sizes or [1]
+    concurrencies = concurrencies or [10]
+    if documents_file:
+        documents = read_prompts_from_file(documents_file, document_length)
+    else:
+        documents = generate_prompts_list(num_documents, document_length, seed)
+    query = generate_random_text(query_length, random.Random(seed)) if api == "rerank" else None
+
+    results = []
+    with sqlite3.connect(db) as conn:
+        create_tables(conn)
+        start_db_writer(db)
+        db_writer = get_db_writer()
+        for batch_size in batch_sizes:
+            for num_runners in concurrencies:
+                runner = BATCH_RUNNERS[api](
+                    api_key=api_key,
+                    openai_url=None,
+                    model_name=model_name,
+                    retry_policy=build_retry_policy(
+                        max_attempts, retry_backoff_sec, retry_max_backoff_sec, retry_budget
+                    ),
+                    deadlines=RequestDeadlines(connect_timeout, total_sec=request_timeout),
+                    router=endpoint_router(openai_url, routing, endpoint_weights),
+                    max_connections=max(num_runners, 1),
+                )
+                experiment_runner = BatchExperimentRunner(runner, num_runners)
+                experiment = Experiment(
+                    id=None,
+                    experiment_name=f"{experiment_name} (batch {batch_size}, {num_runners} runners)",
+                    experiment_date=datetime.datetime.now(),
+                    description=description,
+                )
+                experiment.id = insert_experiment(conn, experiment)
+                stop_client_monitoring = start_client_monitoring(experiment.id, sample_interval)
+                stop_sampling = start_server_sampling(
+                    experiment.id, server_metrics_url, None, server_metrics, sample_interval
+                )
+                experiment_runner.run_experiment(
+                    experiment.id,
+                    documents,
+                    num_tasks=num_tasks,
+                    batch_size=batch_size,
+                    query=query,
+                    seed=seed,
+                )
+                stop_sampling()
+                stop_client_monitoring()
+                experiment_runner.store_experiment_parameters(
+                    experiment.id, num_tasks, batch_size, {"document_length": str(document_length)}
+                )
+                wait_writer(db_writer)
+                try:
+                    metrics, _ = Analyzer(conn).compute_metrics(experiment.id)
+                except ValueError as e:
+                    logger.error(f"No metrics for batch size {batch_size}, {num_runners} runners: {e}")
+                    metrics = {}
+                results.append((experiment.id, batch_size, num_runners, metrics))
+        db_writer.wait_for_write()
+
+    columns = ["DOCS_PER_SECOND", "THROUGHPUT_INPUT_TOKENS", "LATENCY", "LATENCY_95", "LATENCY_PER_DOC", "FAILED_REQUESTS"]
+    results.sort(key=lambda r: r[3].get("DOCS_PER_SECOND", 0.0), reverse=True)
+    print(f"\n{api} sweep, ranked by documents per second:")
+    print(tabulate(
+        [
+            [experiment_id, batch_size, num_runners, *(format_value(m.get(c, "")) for c in columns)]
+            for experiment_id, batch_size, num_runners, m in results
+        ],
+        headers=["Experiment", "BATCH_SIZE", "RUNNERS", *columns],
+        tablefmt="fancy_grid",
+        numalign="decimal",
+    ))
+    stop_db_writer()
+    return [r[0] for r in results]
+
+
 def report_experiment(
     experiment_id: int,
     db: str = DEFAULT_DB_PATH,
@@ -285,13 +777,16 @@ def report_experiment(
             logger.error(f"Error: Experiment with ID {experiment_id} not found.")
             sys.exit(1)
 
-        analyzer = Analyzer(conn)
-        
         if recompute:
-            clear_metrics_by_experiment(conn, experiment_id)
-            analyzer.compute_metrics(experiment_id)
+            recompute_metrics(db, [experiment_id], force=True)
         parameters = fetch_parameters_by_experiment(conn, experiment_id)
         metrics = fetch_metrics_by_experiment(conn, experiment_id)
+        legacy_windows = {
+            LEGACY_WINDOW_KEY.search(m.metric_name).group()
+            for m in metrics if _is_legacy_window_key(m.metric_name)
+        }
+        parameters = [p for p in parameters if not _is_legacy_window_key(p.key)]
+        metrics = [m for m in metrics if not _is_legacy_window_key(m.metric_name)]
         
         print(f"\nExperiment Details:")
         print(f"ID: {experiment.id}")
@@ -318,10 +813,390 @@ def report_experiment(
             tablefmt="fancy_grid", 
             numalign="decimal",
         ))
+
+        window_summary = summarize_window_metrics(conn, experiment_id)
+        if window_summary:
+            _print_window_summary(window_summary)
+        elif legacy_windows:
+            print(f"\n{len(legacy_windows)} windows stored as windowed metrics (legacy format) are not shown.")
+
+        group_metrics = fetch_group_metrics_by_experiment(conn, experiment_id)
+        if group_metrics:
+            _print_group_metrics(group_metrics)
+
+        histograms = fetch_merged_histograms(conn, [experiment_id])
+        if histograms:
+            print("\nPercentiles (from histograms):")
+            _print_histogram_percentiles(histograms, DEFAULT_QUANTILES)
+
+        rollup_summary = summarize_rollups(conn, experiment_id)
+        if rollup_summary:
+            _print_rollup_summary(rollup_summary)
+
+        samples = fetch_samples(conn, experiment_id)
+        if any(s.source == CLIENT_SOURCE for s in samples):
+            _print_client_samples(samples)
+        if any(s.source != CLIENT_SOURCE for s in samples):
+            _print_server_samples(conn, experiment_id, samples)
         db_writer.wait_for_write()
         stop_db_writer()
 
 
+def _print_group_metrics(group_metrics):
+    by_group = {}
+    for m in group_metrics:
+        by_group.setdefault(m.group_by, {}).setdefault(m.group_value, {})[m.metric_name] = m.metric_value
+    for group_by, groups in by_group.items():
+        print(f"\nMetrics by {group_by}:")
+        names = GROUP_BY_REPORT_METRICS.get(group_by, GROUP_REPORT_METRICS)
+        table = [
+            [value, *(format_value(metrics.get(name, "")) for name in names)]
+            for value, metrics in groups.items()
+        ]
+        print(tabulate(
+            table,
+            headers=[group_by.upper(), *names],
+            tablefmt="fancy_grid",
+            numalign="decimal",
+        ))
+
+
+def _print_client_samples(samples):
+    """Summary of the load generator samples, and whether it limited the run."""
+    by_name = {}
+    for s in samples:
+        if s.source == CLIENT_SOURCE:
+            by_name.setdefault(s.name, []).append(s.value)
+    print(f"\nClient (load generator), {len(next(iter(by_name.values())))} samples:")
+    print(tabulate(
+        [
+            [name, format_value(sum(values) / len(values)), format_value(max(values))]
+            for name, values in by_name.items()
+        ],
+        headers=["Metric", "Mean", "Max"],
+        tablefmt="fancy_grid",
+        numalign="decimal",
+    ))
+    reasons = client_bound_reasons(samples)
+    if reasons:
+        print(f"WARNING: client-bound run ({'; '.join(reasons)}). "
+              "TTFT and latency include delays of the load generator, not only of the server.")
+
+
+def _print_server_samples(conn, experiment_id: int, samples):
+    """
+    Sampled server metrics per client window, and their correlation with
+    TTFT. Client samples are shown alongside, as a cross-check.
+    """
+    import pandas as pd
+    from compressa.perf.monitoring.server_metrics import align_samples, correlate, even_windows
+
+    frame = fetch_measurement_frame(conn, experiment_id)
+    windows = [(w.window_start, w.window_end) for w in fetch_window_metrics(conn, experiment_id)]
+    if not windows:
+        windows = even_windows(frame, REPORT_SAMPLE_WINDOWS)
+    if not windows:
+        return
+    aligned = align_samples(frame, samples, windows)
+    origin = aligned["window_start"].iloc[0]
+    series = list(aligned.columns[5:])
+    print(f"\nSampled metrics by window ({len(samples)} samples):")
+    print(tabulate(
+        [
+            [
+                f"+{row.window_start - origin:.1f}s",
+                row.requests,
+                *(format_value(value) if not pd.isna(value) else "" for value in row.iloc[3:]),
+            ]
+            for _, row in aligned.iterrows()
+        ],
+        headers=["Window", "Requests", "TTFT", "TTFT_95", *series],
+        tablefmt="fancy_grid",
+        numalign="decimal",
+    ))
+    correlations = correlate(aligned)
+    if correlations:
+        print("\nCorrelation of window TTFT_95 with sampled metrics:")
+        print(tabulate(
+            [[label, f"{r:+.2f}"] for label, r in sorted(correlations.items(), key=lambda c: -abs(c[1]))],
+            headers=["Metric", "Pearson r"],
+            tablefmt="fancy_grid",
+            stralign="right",
+        ))
+
+
+def _print_window_summary(summary: Dict[str, float]):
+    start = datetime.datetime.fromtimestamp(summary["first_window_start"])
+    end = datetime.datetime.fromtimestamp(summary["last_window_end"])
+    print(f"\nWindows: {summary['num_windows']} from {start:%Y-%m-%d %H:%M:%S} to {end:%Y-%m-%d %H:%M:%S}, "
+          f"{summary['num_requests']} requests, {summary['failed_requests']} failed")
+    table = [
+        [
+            name.upper(),
+            format_value(summary[f"min_{name}"]),
+            format_value(summary[f"avg_{name}"]),
+            format_value(summary[f"max_{name}"]),
+        ]
+        for name in ["ttft", "ttft_95", "latency", "latency_95", "rps", "throughput"]
+    ]
+    print(tabulate(
+        table,
+        headers=["Window Metric", "Min", "Avg", "Max"],
+        tablefmt="fancy_grid",
+        numalign="decimal",
+    ))
+
+
+def _print_rollup_summary(summary: Dict):
+    start = datetime.datetime.fromtimestamp(summary["first_bucket_start"])
+    end = datetime.datetime.fromtimestamp(summary["last_bucket_end"])
+    print(f"\nRolled-up measurements: {summary['num_requests']} requests "
+          f"({summary['failed_requests']} failed) in {summary['num_rollups']} rollups "
+          f"from {start:%Y-%m-%d %H:%M:%S} to {end:%Y-%m-%d %H:%M:%S}")
+    _print_histogram_percentiles(
+        {"TTFT": summary["ttft"], "LATENCY": summary["latency"]},
+        DEFAULT_QUANTILES,
+    )
+
+
+def _print_histogram_percentiles(
+    histograms: Dict[str, LogHistogram],
+    quantiles: List[float],
+):
+    table = []
+    for name, hist in histograms.items():
+        values = hist.quantiles([q / 100 for q in quantiles])
+        table.append([name, hist.count, format_value(hist.mean)] + [format_value(v) for v in values])
+    print(tabulate(
+        table,
+        headers=["Metric", "Count", "Mean"] + [f"P{q:g}" for q in quantiles],
+        tablefmt="fancy_grid",
+        numalign="decimal",
+    ))
+
+
+def _parse_experiment_ref(ref: str, db: str):
+    """
+    Experiment reference is either `ID` (looked up in `db`)
+    or `PATH:ID` for an experiment stored in another database.
+    """
+    path, _, experiment_id = ref.rpartition(":")
+    return (path or db), int(experiment_id)
+
+
+def report_percentiles(
+    experiment_refs: List[str],
+    db: str = DEFAULT_DB_PATH,
+    metrics: List[str] = None,
+    quantiles: List[float] = None,
+    cdf_file: str = None,
+):
+    """
+    Merge the stored histograms of the given experiments (possibly from
+    several databases) and print percentiles without touching raw measurements.
+    """
+    quantiles = quantiles or DEFAULT_QUANTILES
+    refs_by_db: Dict[str, List[int]] = {}
+    for ref in experiment_refs:
+        path, experiment_id = _parse_experiment_ref(ref, db)
+        refs_by_db.setdefault(path, []).append(experiment_id)
+
+    per_metric: Dict[str, List[LogHistogram]] = {}
+    for path, experiment_ids in refs_by_db.items():
+        with sqlite3.connect(path) as conn:
+            ensure_db_initialized(conn)
+            for name, hist in fetch_merged_histograms(conn, experiment_ids).items():
+                per_metric.setdefault(name, []).append(hist)
+
+    histograms = {
+        name: merge_histograms(hists)
+        for name, hists in per_metric.items()
+        if not metrics or name in metrics
+    }
+    if not histograms:
+        print("No histograms found for the given experiments. Try `report --recompute` first.")
+        return
+
+    print(f"\nPercentiles for experiments: {', '.join(experiment_refs)}")
+    _print_histogram_percentiles(histograms, quantiles)
+
+    if cdf_file is not None:
+        import pandas as pd
+
+        frames = []
+        for name, hist in histograms.items():
+            values, fractions = hist.cdf()
+            frames.append(pd.DataFrame({"metric": name, "value": values, "cdf": fractions}))
+        pd.concat(frames).to_csv(cdf_file, index=False)
+        logger.info(f"CDF saved to {cdf_file}")
+
+
+def compare_experiments(
+    experiment_a: int,
+    experiment_b: int,
+    db: str = DEFAULT_DB_PATH,
+    output_format: str = "table",
+    output_file: str = None,
+    n_boot: int = DEFAULT_N_BOOT,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = 42,
+    fail_on_regression: bool = False,
+):
+    """
+    Compares experiment B against experiment A with bootstrap confidence
+    intervals. Returns False if `fail_on_regression` is set and B has a
+    significant regression.
+    """
+    with sqlite3.connect(db) as conn:
+        ensure_db_initialized(conn)
+        for experiment_id in (experiment_a, experiment_b):
+            if not fetch_experiment_by_id(conn, experiment_id):
+                logger.error(f"Error: Experiment with ID {experiment_id} not found.")
+                sys.exit(1)
+        samples_a = load_experiment_samples(conn, experiment_a)
+        samples_b = load_experiment_samples(conn, experiment_b)
+
+    rows = compare_samples(samples_a, samples_b, n_boot=n_boot, confidence=confidence, seed=seed)
+
+    if output_format == "json":
+        def _clean(value):
+            return None if isinstance(value, float) and math.isnan(value) else value
+
+        result = {
+            "experiment_a": experiment_a,
+            "experiment_b": experiment_b,
+            "n_a": samples_a.size,
+            "n_b": samples_b.size,
+            "confidence": confidence,
+            "n_boot": n_boot,
+            "comparisons": [
+                {k: _clean(v) for k, v in row.to_dict().items()} for row in rows
+            ],
+        }
+        text = json.dumps(result, indent=2)
+    else:
+        pct = int(round(confidence * 100))
+        table = [
+            [
+                row.metric,
+                row.stat,
+                f"{format_value(row.value_a)} [{format_value(row.ci_a_low)}, {format_value(row.ci_a_high)}]",
+                f"{format_value(row.value_b)} [{format_value(row.ci_b_low)}, {format_value(row.ci_b_high)}]",
+                f"{row.rel_diff * 100:+.2f}% [{row.rel_diff_low * 100:+.2f}%, {row.rel_diff_high * 100:+.2f}%]",
+                f"{row.p_value:.4f}",
+                ("REGRESSION" if row.regression else "yes") if row.significant else "no",
+            ]
+            for row in rows
+        ]
+        text = (
+            f"\nExperiment {experiment_a} (A, {samples_a.size} requests) vs "
+            f"{experiment_b} (B, {samples_b.size} requests), {pct}% CI, {n_boot} bootstrap samples\n"
+            + tabulate(
+                table,
+                headers=["Metric", "Stat", "A", "B", "B vs A", "p-value", "Significant"],
+                tablefmt="fancy_grid",
+            )
+        )
+
+    if output_file:
+        with open(output_file, "w") as f:
+            f.write(text)
+        logger.info(f"Comparison saved to {output_file}")
+    print(text)
+
+    if fail_on_regression and any(row.regression for row in rows):
+        return False
+    return True
+
+
+def compact_database(
+    db: str = DEFAULT_DB_PATH,
+    retention_hours: float = 24.0,
+    experiment_ids: List[int] = None,
+    rollup_interval_sec: float = DEFAULT_ROLLUP_INTERVAL_SEC,
+    vacuum: bool = False,
+):
+    """
+    Rolls up raw measurements older than `retention_hours` into per-interval
+    rollups and deletes them. Defaults to all continuous (stress) experiments.
+    """
+    size_before = database_size(db)
+    policy = RetentionPolicy(
+        raw_retention_hours=retention_hours,
+        rollup_interval_sec=rollup_interval_sec,
+    )
+    with sqlite3.connect(db) as conn:
+        ensure_db_initialized(conn)
+        if not experiment_ids:
+            experiment_ids = continuous_experiment_ids(conn)
+        if not experiment_ids:
+            print("No continuous experiments to compact.")
+        table = []
+        for experiment_id in experiment_ids:
+            result = apply_retention(conn, experiment_id, policy)
+            table.append([experiment_id, result.pruned_rows, result.rollups_written])
+        if table:
+            print(tabulate(
+                table,
+                headers=["Experiment ID", "Pruned Measurements", "Rollups Written"],
+                tablefmt="fancy_grid",
+            ))
+        if vacuum:
+            vacuum_database(conn)
+    conn.close()
+    print(f"Database size: {size_before / 2**20:.1f} MiB -> {database_size(db) / 2**20:.1f} MiB")
+
+
+def ingest_measurement_log(
+    directory: str,
+    db: str = DEFAULT_DB_PATH,
+    include_open: bool = False,
+):
+    """
+    Bulk-loads measurement segment files into the database. Segments left
+    open by a crashed run are only loaded with `include_open`.
+    """
+    with sqlite3.connect(db) as conn:
+        ensure_db_initialized(conn)
+        ingested = ingest_segments(conn, directory, include_open=include_open)
+    print(f"Ingested {ingested} measurements from {directory}")
+
+
+def export_experiments_to_files(
+    output_dir: str,
+    db: str = DEFAULT_DB_PATH,
+    experiment_ids: List[int] = None,
+    file_format: str = "parquet",
+    chunk_size: int = 100_000,
+):
+    from compressa.perf.db.arrow_io import export_experiments
+
+    with sqlite3.connect(db) as conn:
+        ensure_db_initialized(conn)
+        counts = export_experiments(conn, output_dir, experiment_ids, file_format, chunk_size)
+    print(tabulate(
+        list(counts.items()),
+        headers=["Table", "Rows"],
+        tablefmt="fancy_grid",
+    ))
+    print(f"Exported to {output_dir}")
+
+
+def import_experiments_from_files(
+    input_dirs: List[str],
+    db: str = DEFAULT_DB_PATH,
+    chunk_size: int = 100_000,
+):
+    from compressa.perf.db.arrow_io import import_experiments
+
+    with sqlite3.connect(db) as conn:
+        create_tables(conn)
+        for input_dir in input_dirs:
+            id_map = import_experiments(conn, input_dir, chunk_size)
+            for old_id, new_id in id_map.items():
+                print(f"{input_dir}: experiment {old_id} imported as {new_id}")
+
+
 def list_experiments(
     db: str = DEFAULT_DB_PATH,
     show_parameters: bool = False,
@@ -330,33 +1205,40 @@ def list_experiments(
     param_filters: str = None,
     recompute: bool = False,
     csv_file: str = None,
+    force: bool = False,
+    workers: int = None,
 ):
     with sqlite3.connect(db) as conn:
         ensure_db_initialized(conn)
 
         experiments = fetch_all_experiments(conn)
         if recompute:
-            start_db_writer(db)
-            analyzer = Analyzer(conn)
-            for exp in experiments:
-                try:
-                    clear_metrics_by_experiment(conn, exp.id)
-                    analyzer.compute_metrics(exp.id)
-                except Exception as e:
-                    logger.error(f"Error computing metrics for experiment {exp.id}: {e}")
-                finally:
-                    logger.info(f"Metrics computed for experiment {exp.id}")
+            result = recompute_metrics(
+                db,
+                [exp.id for exp in experiments],
+                force=force,
+                max_workers=workers,
+            )
+            logger.info(
+                f"Metrics recomputed for {len(result.computed)} experiments, "
+                f"{len(result.skipped)} up to date, {len(result.failed)} failed, "
+                f"{len(result.partial)} partial (rolled up)"
+            )
         
         if name_filter:
             experiments = [exp for exp in experiments if name_filter in exp.experiment_name]
         
         if param_filters:
+            from compressa.perf.db.queries import parameters_table
+
+            parameters = parameters_table(conn, [exp.id for exp in experiments])
             for param_filter in param_filters:
                 param_key, _, param_value_substring = param_filter.partition('=')
-                experiments = [exp for exp in experiments if any(
-                    p.key == param_key and param_value_substring in format_value(p.value)
-                    for p in fetch_parameters_by_experiment(conn, exp.id)
-                )]
+                experiments = [
+                    exp for exp in experiments
+                    if param_key in parameters.get(exp.id, {})
+                    and param_value_substring in format_value(parameters[exp.id][param_key])
+                ]
 
         if not experiments:
             print("No experiments found in the database.")
@@ -388,6 +1270,24 @@ def _print_experiments_cli(
 
     if show_parameters:
         headers.extend(["Parameters"])
+    if show_metrics:
+        headers.extend(["Metrics"])
+
+    from compressa.perf.db.queries import (
+        measurement_summary,
+        metrics_table,
+        parameters_table,
+        window_summary_table,
+    )
+
+    # One query per table for all listed experiments
+    experiment_ids = [exp.id for exp in experiments]
+    if show_parameters:
+        parameters_by_experiment = parameters_table(conn, experiment_ids)
+    if show_metrics:
+        metrics_by_experiment = metrics_table(conn, experiment_ids)
+        windows_by_experiment = window_summary_table(conn, experiment_ids)
+        requests_by_experiment = measurement_summary(conn, experiment_ids)
 
     desciptiont_length = 20 if show_parameters or show_metrics else 50
     for exp in experiments:
@@ -399,17 +1299,40 @@ def _print_experiments_cli(
         ]
 
         if show_parameters:
-            parameters = fetch_parameters_by_experiment(conn, exp.id)
+            parameters = {
+                key: value for key, value in parameters_by_experiment.get(exp.id, {}).items()
+                if not _is_legacy_window_key(key)
+            }
             param_str = "\n".join([
-                f"{p.key}: {format_value(p.value, precision=2)[:10] + '...' if len(format_value(p.value, precision=2)) > 10 else format_value(p.value, precision=2)}" 
-                for p in parameters
+                f"{key}: {format_value(value, precision=2)[:10] + '...' if len(format_value(value, precision=2)) > 10 else format_value(value, precision=2)}" 
+                for key, value in parameters.items()
             ])
             row.append(param_str)
 
         if show_metrics:
-            metrics = fetch_metrics_by_experiment(conn, exp.id)
-            metrics_str = "\n".join([f"{m.metric_name}: {format_value(m.metric_value)}" for m in metrics])
-            row.append(metrics_str)
+            metrics = {}
+            if exp.id in metrics_by_experiment.index:
+                metrics = metrics_by_experiment.loc[exp.id].dropna()
+            metrics_str = "\n".join([
+                f"{name}: {format_value(value)}" for name, value in metrics.items()
+                if not _is_legacy_window_key(name)
+            ])
+            if not len(metrics) and exp.id in requests_by_experiment.index:
+                requests = requests_by_experiment.loc[exp.id]
+                metrics_str += (
+                    f"\nrequests: {int(requests['num_requests'])}"
+                    f"\nfailed: {int(requests['failed_requests'])}"
+                )
+            if exp.id in windows_by_experiment.index:
+                window_summary = windows_by_experiment.loc[exp.id]
+                metrics_str += (
+                    f"\nwindows: {int(window_summary['num_windows'])}"
+                    f"\nwindow TTFT: {format_value(window_summary['min_ttft'])}"
+                    f"..{format_value(window_summary['max_ttft'])}"
+                    f"\nwindow RPS: {format_value(window_summary['min_rps'])}"
+                    f"..{format_value(window_summary['max_rps'])}"
+                )
+            row.append(metrics_str.strip())
 
         table_data.append(row)
 
@@ -421,9 +1344,23 @@ def _export_experiments_csv(
     conn: sqlite3.Connection,
     csv_file: str,
 ):
+    import pandas as pd
+    from compressa.perf.db.queries import (
+        measurement_summary,
+        metrics_table,
+        parameters_table,
+        window_summary_table,
+    )
+
     table_data = []
     metric_columns = set()
 
+    experiment_ids = [exp.id for exp in experiments]
+    parameters_by_experiment = parameters_table(conn, experiment_ids)
+    metrics_by_experiment = metrics_table(conn, experiment_ids)
+    windows_by_experiment = window_summary_table(conn, experiment_ids)
+    requests_by_experiment = measurement_summary(conn, experiment_ids)
+
     for exp in experiments:
         item = {}
         item["id"] = exp.id
@@ -432,20 +1369,31 @@ def _export_experiments_csv(
         item["description"] = exp.description
         item["parameters"] = {}
 
-        parameters = fetch_parameters_by_experiment(conn, exp.id)
-        for p in parameters:
-            item["parameters"][p.key] = format_value(p.value, precision=2)
-
-        metrics = fetch_metrics_by_experiment(conn, exp.id)
-        for m in metrics:
-            metric_column = f"M_{m.metric_name}"
-            item[metric_column] = format_value(m.metric_value)
-            metric_columns.add(metric_column)
+        for key, value in parameters_by_experiment.get(exp.id, {}).items():
+            if not _is_legacy_window_key(key):
+                item["parameters"][key] = format_value(value, precision=2)
+
+        if exp.id in requests_by_experiment.index:
+            item["num_requests"] = int(requests_by_experiment.loc[exp.id, "num_requests"])
+            item["failed_requests"] = int(requests_by_experiment.loc[exp.id, "failed_requests"])
+        if exp.id in windows_by_experiment.index:
+            item["num_windows"] = int(windows_by_experiment.loc[exp.id, "num_windows"])
+        if exp.id in metrics_by_experiment.index:
+            for name, value in metrics_by_experiment.loc[exp.id].dropna().items():
+                if _is_legacy_window_key(name):
+                    continue
+                metric_column = f"M_{name}"
+                item[metric_column] = format_value(value)
+                metric_columns.add(metric_column)
 
         table_data.append(item)
 
     df = pd.DataFrame(table_data)
-    df = df.reindex(columns=["id", "name", "date", "description", "parameters"] + list(metric_columns), fill_value=None)
+    df = df.reindex(
+        columns=["id", "name", "date", "description", "parameters", "num_requests", "failed_requests", "num_windows"]
+        + list(metric_columns),
+        fill_value=None,
+    )
     df.to_csv(csv_file, index=False)
 
 def run_experiments_from_yaml(
@@ -456,6 +1404,8 @@ def run_experiments_from_yaml(
     # if not api_key:
     #     raise ValueError("OPENAI_API_KEY is not set")
 
+    from compressa.perf.experiment.config import load_yaml_configs
+
     configs = load_yaml_configs(yaml_file)
     experiment_ids = []
     for config in configs:
@@ -477,6 +1427,24 @@ def run_experiments_from_yaml(
             prompt_length=config.prompt_length,
             max_tokens=config.max_tokens,
             seed=config.seed,
+            adaptive=config.adaptive,
+            precision_targets=config.precision_targets,
+            min_tasks=config.min_tasks,
+            check_every=config.check_every,
+            max_attempts=config.max_attempts,
+            retry_backoff_sec=config.retry_backoff_sec,
+            retry_max_backoff_sec=config.retry_max_backoff_sec,
+            retry_budget=config.retry_budget,
+            connect_timeout=config.connect_timeout,
+            ttft_timeout=config.ttft_timeout,
+            idle_timeout=config.idle_timeout,
+            request_timeout=config.request_timeout,
+            routing=config.routing,
+            endpoint_weights=config.endpoint_weights,
+            workloads=config.workloads,
+            count_tokens=config.count_tokens,
+            tokenizer=config.tokenizer,
+            chars_per_token=config.chars_per_token,
         )
         experiment_ids.append(experiment_id)
 
@@ -495,7 +1463,7 @@ def run_experiments_from_yaml(
 def run_continuous_stress_test(
     db: str,
     api_key: str,
-    openai_url: str,
+    openai_url: Union[str, List[str]],
     model_name: str,
     experiment_name: str,
     description: str,
@@ -506,6 +1474,31 @@ def run_continuous_stress_test(
     prompt_length: int,
     max_tokens: int,
     report_freq_min: float,
+    serv_api_url: str = None,
+    report_file: str = None,
+    report_mode: str = None,
+    retention_hours: float = None,
+    rollup_interval_sec: float = DEFAULT_ROLLUP_INTERVAL_SEC,
+    measurement_log: str = None,
+    metrics_port: int = None,
+    live: bool = False,
+    max_attempts: int = 1,
+    retry_backoff_sec: float = 0.5,
+    retry_max_backoff_sec: float = 30.0,
+    retry_budget: float = None,
+    connect_timeout: float = None,
+    ttft_timeout: float = None,
+    idle_timeout: float = None,
+    request_timeout: float = None,
+    routing: str = "round_robin",
+    endpoint_weights: List[float] = None,
+    server_metrics_url: Union[str, List[str]] = None,
+    server_metrics: List[str] = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL_SEC,
+    sample_gpu_info: bool = False,
+    count_tokens: bool = False,
+    tokenizer: str = None,
+    chars_per_token: float = None,
 ):
     """
     Creates an Experiment, loads or generates prompts, and starts
@@ -513,11 +1506,18 @@ def run_continuous_stress_test(
     """
     if not api_key:
         raise ValueError("OPENAI_API_KEY is not set")
+    from compressa.perf.experiment.continuous_stress import ContinuousStressTestRunner
+    from compressa.perf.experiment.deadlines import RequestDeadlines
+
+    router = endpoint_router(openai_url, routing, endpoint_weights)
 
     with sqlite3.connect(db) as conn:
         create_tables(conn)
         start_db_writer(db)
         db_writer = get_db_writer()
+        listeners, stop_monitoring = start_live_monitoring(
+            db_writer, metrics_port, live, title=f"compressa-perf stress: {experiment_name}"
+        )
         experiment = Experiment(
             id=None,
             experiment_name=experiment_name,
@@ -526,6 +1526,14 @@ def run_continuous_stress_test(
         )
         experiment.id = insert_experiment(conn, experiment)
         print(f"Continuous Stress Experiment created: {experiment}")
+        stop_client_monitoring = start_client_monitoring(experiment.id, sample_interval)
+        stop_sampling = start_server_sampling(
+            experiment.id,
+            server_metrics_url,
+            sampled_gpu_info_url(serv_api_url, sample_gpu_info),
+            server_metrics,
+            sample_interval,
+        )
 
         if generate_prompts:
             prompts = generate_prompts_list(num_prompts, prompt_length)
@@ -539,15 +1547,33 @@ def run_continuous_stress_test(
         runner = ContinuousStressTestRunner(
             db_path=db,
             api_key=api_key,
-            openai_url=openai_url,
+            openai_url=router.urls[0],
             model_name=model_name,
             experiment_id=experiment.id,
             prompts=prompts,
             num_runners=num_runners,
             max_tokens=max_tokens,
             report_freq_min=report_freq_min,
+            retention=(
+                RetentionPolicy(retention_hours, rollup_interval_sec)
+                if retention_hours is not None else None
+            ),
+            measurement_log=SegmentWriter(measurement_log) if measurement_log else None,
+            listeners=listeners,
+            retry_policy=build_retry_policy(
+                max_attempts, retry_backoff_sec, retry_max_backoff_sec, retry_budget
+            ),
+            deadlines=RequestDeadlines(connect_timeout, ttft_timeout, idle_timeout, request_timeout),
+            router=router,
+            token_counter=build_token_counter(count_tokens, tokenizer, chars_per_token),
         )
         runner.start_test()
+        stop_sampling()
+        stop_client_monitoring()
+        stop_monitoring()
+        if runner.measurement_log is not None:
+            runner.measurement_log.close()
+            ingest_segments(conn, measurement_log)
 
         db_writer.wait_for_write()
         stop_db_writer()
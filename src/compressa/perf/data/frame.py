@@ -0,0 +1,257 @@
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from compressa.perf.data.models import ErrorClass, ErrorPhase, Measurement, Status, TokenSource
+
+STATUSES = list(Status)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+SUCCESS_CODE = STATUS_CODES[Status.SUCCESS]
+FAILED_CODE = STATUS_CODES[Status.FAILED]
+RETRIED_CODE = STATUS_CODES[Status.RETRIED]
+
+# Code 0 stands for "not set"
+ERROR_CLASSES = [None] + list(ErrorClass)
+ERROR_CLASS_CODES = {error_class: code for code, error_class in enumerate(ERROR_CLASSES)}
+ERROR_PHASES = [None] + list(ErrorPhase)
+ERROR_PHASE_CODES = {phase: code for code, phase in enumerate(ERROR_PHASES)}
+TOKEN_SOURCES = [None] + list(TokenSource)
+TOKEN_SOURCE_CODES = {source: code for code, source in enumerate(TOKEN_SOURCES)}
+
+FRAME_COLUMNS = (
+    ("id", np.int64),
+    ("experiment_id", np.int64),
+    ("n_input", np.int64),
+    ("n_output", np.int64),
+    ("ttft", np.float64),
+    ("start_time", np.float64),
+    ("end_time", np.float64),
+    ("status", np.uint8),
+    ("intended_start_time", np.float64),
+    ("error_class", np.uint8),
+    ("http_status", np.int64),
+    ("error_phase", np.uint8),
+    ("attempt", np.int64),
+    ("request_start_time", np.float64),
+    ("throttled_time", np.float64),
+    # Strings (or None) in an object array
+    ("endpoint", object),
+    ("workload_class", object),
+    ("batch_size", np.int64),
+    ("token_source", np.uint8),
+    ("send_interval", np.float64),
+)
+
+
+def _encode_enum(values: Sequence[Optional[str]], codes: dict) -> np.ndarray:
+    values = np.asarray(values, dtype=object)
+    encoded = np.zeros(values.size, dtype=np.uint8)
+    for member, code in codes.items():
+        if member is not None:
+            encoded[values == member.value] = code
+    return encoded
+
+
+def encode_statuses(values: Sequence[str]) -> np.ndarray:
+    """Status strings as stored in the DB -> uint8 codes."""
+    return _encode_enum(values, STATUS_CODES)
+
+
+# Columns stored as enum values in the DB and as uint8 codes in a frame
+_ENUM_CODES = {
+    "status": STATUS_CODES,
+    "error_class": ERROR_CLASS_CODES,
+    "error_phase": ERROR_PHASE_CODES,
+    "token_source": TOKEN_SOURCE_CODES,
+}
+
+
+class MeasurementFrame:
+    """
+    Measurements stored column-wise in NumPy arrays, in the column order of
+    the Measurements table. Status is a uint8 code (index into `STATUSES`)
+    and a missing intended start time is NaN. Error class, phase and token
+    source are codes into `ERROR_CLASSES` / `ERROR_PHASES` / `TOKEN_SOURCES`,
+    and a missing HTTP status or batch size is 0.
+    A missing request start time (single-attempt requests) or send interval
+    (open-loop runs) is NaN.
+    Iterating yields `Measurement` objects, so a frame can be passed wherever
+    a list of them is expected.
+    """
+
+    __slots__ = tuple(name for name, _ in FRAME_COLUMNS)
+
+    def __init__(self, **columns: np.ndarray):
+        for name, dtype in FRAME_COLUMNS:
+            setattr(self, name, np.asarray(columns[name], dtype=dtype))
+
+    @classmethod
+    def empty(cls) -> "MeasurementFrame":
+        return cls(**{name: np.zeros(0, dtype=dtype) for name, dtype in FRAME_COLUMNS})
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple]) -> "MeasurementFrame":
+        """Rows as selected with MEASUREMENT_COLUMNS."""
+        if not rows:
+            return cls.empty()
+        columns = list(zip(*rows))
+        data = {}
+        for (name, dtype), values in zip(FRAME_COLUMNS, columns):
+            if name in _ENUM_CODES:
+                data[name] = _encode_enum(values, _ENUM_CODES[name])
+            elif name == "id":
+                data[name] = np.array([-1 if v is None else v for v in values], dtype=dtype)
+            elif name in ("http_status", "throttled_time", "batch_size"):
+                data[name] = np.array([0 if v is None else v for v in values], dtype=dtype)
+            elif name == "attempt":
+                data[name] = np.array([1 if v is None else v for v in values], dtype=dtype)
+            elif dtype is object:
+                data[name] = np.empty(len(values), dtype=object)
+                data[name][:] = values
+            else:
+                # None becomes NaN for float columns
+                data[name] = np.array(values, dtype=dtype)
+        return cls(**data)
+
+    @classmethod
+    def from_cursor(cls, cursor, chunk_size: int = 100_000) -> "MeasurementFrame":
+        """Builds a frame from an executed cursor without holding all rows at once."""
+        frames = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            frames.append(cls.from_rows(rows))
+        return cls.concat(frames)
+
+    @classmethod
+    def from_measurements(cls, measurements: Iterable[Measurement]) -> "MeasurementFrame":
+        return cls.from_rows([
+            (
+                m.id, m.experiment_id, m.n_input, m.n_output, m.ttft,
+                m.start_time, m.end_time, m.status.value, m.intended_start_time,
+                m.error_class.value if m.error_class else None,
+                m.http_status,
+                m.error_phase.value if m.error_phase else None,
+                m.attempt, m.request_start_time, m.throttled_time, m.endpoint,
+                m.workload_class, m.batch_size,
+                m.token_source.value if m.token_source else None,
+                m.send_interval,
+            )
+            for m in measurements
+        ])
+
+    @classmethod
+    def concat(cls, frames: List["MeasurementFrame"]) -> "MeasurementFrame":
+        if not frames:
+            return cls.empty()
+        if len(frames) == 1:
+            return frames[0]
+        return cls(**{
+            name: np.concatenate([getattr(f, name) for f in frames])
+            for name, _ in FRAME_COLUMNS
+        })
+
+    def __len__(self) -> int:
+        return self.status.size
+
+    def __getitem__(self, index) -> "MeasurementFrame":
+        """Row selection by boolean mask, index array or slice."""
+        return MeasurementFrame(**{name: getattr(self, name)[index] for name, _ in FRAME_COLUMNS})
+
+    def __iter__(self) -> Iterator[Measurement]:
+        return iter(self.to_measurements())
+
+    @property
+    def success(self) -> np.ndarray:
+        return self.status == SUCCESS_CODE
+
+    @property
+    def failed(self) -> np.ndarray:
+        return self.status == FAILED_CODE
+
+    @property
+    def retried(self) -> np.ndarray:
+        return self.status == RETRIED_CODE
+
+    @property
+    def latency(self) -> np.ndarray:
+        return self.end_time - self.start_time
+
+    @property
+    def latency_with_retries(self) -> np.ndarray:
+        """End time minus the start of the first attempt of the request."""
+        request_start = np.where(np.isnan(self.request_start_time), self.start_time, self.request_start_time)
+        return self.end_time - request_start
+
+    def requests(self) -> "MeasurementFrame":
+        """Final attempts only, i.e. one row per request."""
+        return self[~self.retried]
+
+    def successes(self) -> "MeasurementFrame":
+        return self[self.success]
+
+    def to_measurements(self) -> List[Measurement]:
+        intended = self.intended_start_time
+        request_start_times = self.request_start_time
+        return [
+            Measurement(
+                id=None if row_id < 0 else row_id,
+                experiment_id=experiment_id,
+                n_input=n_input,
+                n_output=n_output,
+                ttft=ttft,
+                start_time=start_time,
+                end_time=end_time,
+                status=STATUSES[status],
+                intended_start_time=None if np.isnan(intended_start) else intended_start,
+                error_class=ERROR_CLASSES[error_class],
+                http_status=http_status or None,
+                error_phase=ERROR_PHASES[error_phase],
+                attempt=attempt,
+                request_start_time=None if np.isnan(request_start) else request_start,
+                throttled_time=throttled_time,
+                endpoint=endpoint,
+                workload_class=workload_class,
+                batch_size=batch_size or None,
+                token_source=TOKEN_SOURCES[token_source],
+                send_interval=None if np.isnan(send_interval) else send_interval,
+            )
+            for (
+                row_id, experiment_id, n_input, n_output, ttft, start_time, end_time,
+                status, intended_start, error_class, http_status, error_phase,
+                attempt, request_start, throttled_time, endpoint, workload_class,
+                batch_size, token_source, send_interval,
+            ) in zip(
+                self.id.tolist(),
+                self.experiment_id.tolist(),
+                self.n_input.tolist(),
+                self.n_output.tolist(),
+                self.ttft.tolist(),
+                self.start_time.tolist(),
+                self.end_time.tolist(),
+                self.status.tolist(),
+                intended.tolist(),
+                self.error_class.tolist(),
+                self.http_status.tolist(),
+                self.error_phase.tolist(),
+                self.attempt.tolist(),
+                request_start_times.tolist(),
+                self.throttled_time.tolist(),
+                self.endpoint.tolist(),
+                self.workload_class.tolist(),
+                self.batch_size.tolist(),
+                self.token_source.tolist(),
+                self.send_interval.tolist(),
+            )
+        ]
+
+
+def as_frame(
+    measurements: Optional[Union[MeasurementFrame, Iterable[Measurement]]],
+) -> MeasurementFrame:
+    if isinstance(measurements, MeasurementFrame):
+        return measurements
+    if measurements is None:
+        return MeasurementFrame.empty()
+    return MeasurementFrame.from_measurements(measurements)
@@ -0,0 +1,217 @@
+import math
+import struct
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+HISTOGRAM_MAGIC = b"CPH1"
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Values at or below this (in seconds) are counted in the zero bucket.
+DEFAULT_MIN_VALUE = 1e-6
+
+# magic, relative_accuracy, min_value, count, zero_count, total, min, max, offset, n_buckets
+_HEADER = struct.Struct("<4sddqqdddqI")
+
+
+class LogHistogram:
+    """
+    Mergeable log-bucketed histogram (HdrHistogram / DDSketch style).
+
+    Bucket boundaries grow geometrically, so every quantile is reproduced
+    within `relative_accuracy` of the exact value regardless of scale.
+    Histograms built with the same accuracy are merged by adding counts,
+    which makes them suitable for combining runs and databases.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        min_value: float = DEFAULT_MIN_VALUE,
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = 0
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket_index(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def _bucket_value(self, indexes: np.ndarray) -> np.ndarray:
+        # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+        return 2.0 * np.power(self.gamma, indexes) / (self.gamma + 1.0)
+
+    def _ensure_range(self, lo: int, hi: int):
+        if self._counts.size == 0:
+            self._offset = lo
+            self._counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            return
+        cur_lo = self._offset
+        cur_hi = self._offset + self._counts.size - 1
+        new_lo = min(lo, cur_lo)
+        new_hi = max(hi, cur_hi)
+        if new_lo == cur_lo and new_hi == cur_hi:
+            return
+        counts = np.zeros(new_hi - new_lo + 1, dtype=np.int64)
+        counts[cur_lo - new_lo:cur_lo - new_lo + self._counts.size] = self._counts
+        self._offset = new_lo
+        self._counts = counts
+
+    def record(self, value: float):
+        self.record_many([value])
+
+    def record_many(self, values: Iterable[float]):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > self.min_value]
+        self.zero_count += int(values.size - positive.size)
+        if positive.size == 0:
+            return
+        indexes = self._bucket_index(positive)
+        lo, hi = int(indexes.min()), int(indexes.max())
+        self._ensure_range(lo, hi)
+        self._counts += np.bincount(
+            indexes - self._offset,
+            minlength=self._counts.size,
+        )
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        """Add counts of `other` into this histogram in place."""
+        if not math.isclose(self.relative_accuracy, other.relative_accuracy):
+            raise ValueError("Cannot merge histograms with different relative accuracy")
+        if other.count == 0:
+            return self
+        if other._counts.size:
+            self._ensure_range(other._offset, other._offset + other._counts.size - 1)
+            start = other._offset - self._offset
+            self._counts[start:start + other._counts.size] += other._counts
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Approximate quantiles for `qs` in [0, 1]."""
+        qs = np.asarray(list(qs), dtype=np.float64)
+        if self.count == 0:
+            return [0.0] * qs.size
+        ranks = qs * (self.count - 1)
+        cumulative = self.zero_count + np.cumsum(self._counts)
+        positions = np.searchsorted(cumulative, ranks, side="right")
+        values = self._bucket_value(self._offset + np.minimum(positions, max(self._counts.size - 1, 0)))
+        values = np.where(ranks < self.zero_count, 0.0, values)
+        # Clamp to the observed range so extreme quantiles stay exact
+        values = np.clip(values, self.min, self.max)
+        return values.tolist()
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def cdf(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (values, cumulative_fraction) pairs for plotting a CDF.
+        """
+        if self.count == 0:
+            return np.zeros(0), np.zeros(0)
+        nonzero = np.nonzero(self._counts)[0]
+        values = np.minimum(self._bucket_value(self._offset + nonzero), self.max)
+        fractions = (self.zero_count + np.cumsum(self._counts)[nonzero]) / self.count
+        if self.zero_count:
+            values = np.concatenate([[0.0], values])
+            fractions = np.concatenate([[self.zero_count / self.count], fractions])
+        return values, fractions
+
+    def to_bytes(self) -> bytes:
+        nonzero = np.nonzero(self._counts)[0]
+        counts = self._counts
+        offset = self._offset
+        if nonzero.size:
+            counts = counts[nonzero[0]:nonzero[-1] + 1]
+            offset += int(nonzero[0])
+        else:
+            counts = counts[:0]
+        header = _HEADER.pack(
+            HISTOGRAM_MAGIC,
+            self.relative_accuracy,
+            self.min_value,
+            self.count,
+            self.zero_count,
+            self.total,
+            self.min,
+            self.max,
+            offset,
+            counts.size,
+        )
+        return header + zlib.compress(counts.astype("<i8").tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LogHistogram":
+        (
+            magic,
+            relative_accuracy,
+            min_value,
+            count,
+            zero_count,
+            total,
+            min_,
+            max_,
+            offset,
+            n_buckets,
+        ) = _HEADER.unpack_from(data)
+        if magic != HISTOGRAM_MAGIC:
+            raise ValueError("Unknown histogram format")
+        hist = cls(relative_accuracy=relative_accuracy, min_value=min_value)
+        counts = np.frombuffer(zlib.decompress(data[_HEADER.size:]), dtype="<i8")
+        if counts.size != n_buckets:
+            raise ValueError("Corrupted histogram payload")
+        hist._offset = offset
+        hist._counts = counts.astype(np.int64)
+        hist.zero_count = zero_count
+        hist.count = count
+        hist.total = total
+        hist.min = min_
+        hist.max = max_
+        return hist
+
+    @classmethod
+    def from_values(
+        cls,
+        values: Iterable[float],
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    ) -> "LogHistogram":
+        hist = cls(relative_accuracy=relative_accuracy)
+        hist.record_many(values)
+        return hist
+
+
+def merge_histograms(histograms: Iterable[LogHistogram]) -> Optional[LogHistogram]:
+    """Merge several histograms into a new one. Returns None for an empty input."""
+    merged = None
+    for hist in histograms:
+        if merged is None:
+            merged = LogHistogram(hist.relative_accuracy, hist.min_value)
+        merged.merge(hist)
+    return merged
@@ -4,6 +4,8 @@ from enum import Enum
 import datetime
 import textwrap
 
+from compressa.perf.data.histogram import LogHistogram
+
 
 class MetricName(Enum):
     # Time To First Token
@@ -55,6 +57,57 @@ class MetricName(Enum):
     # Failed requests per hour
     FAILED_REQUESTS_PER_HOUR = "FAILED_REQUESTS_PER_HOUR"
 
+    # The 95th percentile TTFT corrected for coordinated omission:
+    # measured from the intended start time, including the requests
+    # that should have been sent while a runner was blocked
+    TTFT_95_CORRECTED = "TTFT_95_CORRECTED"
+
+    # The 95th percentile latency corrected for coordinated omission
+    LATENCY_95_CORRECTED = "LATENCY_95_CORRECTED"
+
+    # Number of requests that should have been sent during stalls
+    OMITTED_REQUESTS = "OMITTED_REQUESTS"
+
+    # Effective prefill speed (input tokens per second per request), from the
+    # per-concurrency-bucket regression of TTFT on the number of input tokens
+    PREFILL_RATE = "PREFILL_RATE"
+
+    # Effective decode speed (output tokens per second per request), from the
+    # regression of (LATENCY - TTFT) on the number of output tokens
+    DECODE_RATE = "DECODE_RATE"
+
+    # TTFT intercept at the lowest observed concurrency: network + scheduling overhead
+    FIXED_OVERHEAD = "FIXED_OVERHEAD"
+
+    # Mean TTFT above the unloaded prefill model (FIXED_OVERHEAD + n_input / rate
+    # at the lowest concurrency): time spent waiting in the server queue
+    QUEUEING_DELAY = "QUEUEING_DELAY"
+
+    # Mean time from sending a failed request until it failed
+    TIME_TO_FAILURE = "TIME_TO_FAILURE"
+
+    # The 95th percentile time to failure
+    TIME_TO_FAILURE_95 = "TIME_TO_FAILURE_95"
+
+    # Failed attempts that were retried
+    RETRIES = "RETRIES"
+
+    # Total time spent waiting before retries (backoff and Retry-After)
+    THROTTLED_TIME = "THROTTLED_TIME"
+
+    # Latency of successful requests from the start of their first attempt,
+    # including failed attempts and waits before retries
+    LATENCY_WITH_RETRIES = "LATENCY_WITH_RETRIES"
+
+    # The 95th percentile retry-inclusive latency
+    LATENCY_WITH_RETRIES_95 = "LATENCY_WITH_RETRIES_95"
+
+    # Documents embedded or reranked per second by successful batch requests
+    DOCS_PER_SECOND = "DOCS_PER_SECOND"
+
+    # Mean latency of a batch request divided by its number of documents
+    LATENCY_PER_DOC = "LATENCY_PER_DOC"
+
 
 @dataclass
 class Experiment:
@@ -118,9 +171,202 @@ class Parameter:
         )
 
 
+@dataclass
+class MetricHistogram:
+    id: int
+    experiment_id: int
+    metric_name: str
+    histogram_data: bytes
+    timestamp: datetime.datetime
+
+    def to_histogram(self) -> LogHistogram:
+        return LogHistogram.from_bytes(self.histogram_data)
+
+    def __str__(self):
+        return textwrap.dedent(
+            f"""
+        MetricHistogram(
+            id={self.id},
+            experiment_id={self.experiment_id},
+            metric_name={self.metric_name},
+            size={len(self.histogram_data)},
+            timestamp={self.timestamp},
+        )
+        """
+        )
+
+
+@dataclass
+class GroupMetric:
+    """A metric computed on the measurements of one group, e.g. one endpoint."""
+    id: int
+    experiment_id: int
+    group_by: str
+    group_value: str
+    metric_name: str
+    metric_value: float
+    timestamp: datetime.datetime
+
+    def __str__(self):
+        return textwrap.dedent(
+            f"""
+        GroupMetric(
+            id={self.id},
+            experiment_id={self.experiment_id},
+            group_by={self.group_by},
+            group_value={self.group_value},
+            metric_name={self.metric_name},
+            metric_value={self.metric_value},
+            timestamp={self.timestamp},
+        )
+        """
+        )
+
+
+@dataclass
+class WindowMetrics:
+    """Metrics of one time window of a continuous stress test."""
+    id: int
+    experiment_id: int
+    window_index: int
+    window_start: float
+    window_end: float
+    num_requests: int
+    failed_requests: int
+    ttft: float
+    ttft_95: float
+    ttft_95_corrected: float
+    latency: float
+    latency_95: float
+    latency_95_corrected: float
+    tpot: float
+    throughput: float
+    throughput_input_tokens: float
+    throughput_output_tokens: float
+    rps: float
+    avg_n_input: float
+    avg_n_output: float
+    timestamp: datetime.datetime
+
+    def __str__(self):
+        return textwrap.dedent(
+            f"""
+        WindowMetrics(
+            id={self.id},
+            experiment_id={self.experiment_id},
+            window_index={self.window_index},
+            window_start={self.window_start},
+            window_end={self.window_end},
+            num_requests={self.num_requests},
+            failed_requests={self.failed_requests},
+            ttft={self.ttft},
+            latency={self.latency},
+            rps={self.rps},
+            timestamp={self.timestamp},
+        )
+        """
+        )
+
+
+@dataclass
+class Sample:
+    """
+    One value of a time series sampled during an experiment, e.g. the number
+    of requests waiting on the server, scraped from its `/metrics` endpoint.
+    `timestamp` is in seconds since the epoch, like measurement times.
+    """
+    id: int
+    experiment_id: int
+    timestamp: float
+    source: str
+    name: str
+    value: float
+
+    def __str__(self):
+        return textwrap.dedent(
+            f"""
+        Sample(
+            id={self.id},
+            experiment_id={self.experiment_id},
+            timestamp={self.timestamp},
+            source={self.source},
+            name={self.name},
+            value={self.value},
+        )
+        """
+        )
+
+
+@dataclass
+class MeasurementRollup:
+    """Aggregate of the raw measurements that finished within one time bucket."""
+    id: int
+    experiment_id: int
+    bucket_start: float
+    bucket_seconds: float
+    num_requests: int
+    failed_requests: int
+    sum_ttft: float
+    sum_latency: float
+    max_ttft: float
+    max_latency: float
+    sum_n_input: int
+    sum_n_output: int
+    ttft_histogram: bytes
+    latency_histogram: bytes
+
+    def __str__(self):
+        return textwrap.dedent(
+            f"""
+        MeasurementRollup(
+            id={self.id},
+            experiment_id={self.experiment_id},
+            bucket_start={self.bucket_start},
+            bucket_seconds={self.bucket_seconds},
+            num_requests={self.num_requests},
+            failed_requests={self.failed_requests},
+        )
+        """
+        )
+
+
 class Status(Enum):
     SUCCESS = "success"
     FAILED = "failed"
+    # A failed attempt that was followed by another attempt of the same request
+    RETRIED = "retried"
+
+
+class ErrorClass(Enum):
+    # HTTP 429
+    RATE_LIMITED = "rate_limited"
+    # HTTP 5xx
+    SERVER_ERROR = "server_error"
+    # Other HTTP 4xx
+    CLIENT_ERROR = "client_error"
+    # Connect, read or write timeout
+    TIMEOUT = "timeout"
+    # Connection refused, reset or closed mid-response
+    CONNECTION = "connection"
+    # The stream ended without a usable first token
+    EMPTY_RESPONSE = "empty_response"
+    OTHER = "other"
+
+
+class ErrorPhase(Enum):
+    # Before the response headers were received
+    CONNECT = "connect"
+    # After the response started, before the first token
+    PRE_FIRST_TOKEN = "pre_first_token"
+    # After the first token
+    MID_STREAM = "mid_stream"
+
+
+class TokenSource(Enum):
+    # Usage reported by the server
+    SERVER = "server"
+    # Counted by the load generator, with a tokenizer or a chars-per-token estimate
+    CLIENT = "client"
 
 @dataclass
 class Measurement:
@@ -132,6 +378,29 @@ class Measurement:
     start_time: float
     end_time: float
     status: Status = Status.SUCCESS
+    # When the request should have been sent had the previous request on the
+    # same runner not stalled (coordinated omission tracking)
+    intended_start_time: Optional[float] = None
+    # Why and when a failed request failed; HTTP status if the server answered
+    error_class: Optional[ErrorClass] = None
+    http_status: Optional[int] = None
+    error_phase: Optional[ErrorPhase] = None
+    # Attempt number of the request, the start of its first attempt and the
+    # time waited before retries up to this attempt
+    attempt: int = 1
+    request_start_time: Optional[float] = None
+    throttled_time: float = 0.0
+    # URL of the endpoint the request was sent to
+    endpoint: Optional[str] = None
+    # Name of the workload class the request was drawn from, if any
+    workload_class: Optional[str] = None
+    # Documents in an embeddings or rerank request, None for chat completions
+    batch_size: Optional[int] = None
+    # Where n_input and n_output come from; None if unknown
+    token_source: Optional[TokenSource] = None
+    # Expected time between sends of the runner in a closed-loop run (its
+    # mean latency so far); None for open-loop runs, which send on a schedule
+    send_interval: Optional[float] = None
 
     def __str__(self):
         return textwrap.dedent(
@@ -144,7 +413,19 @@ class Measurement:
             ttft={self.ttft},
             start_time={self.start_time},
             end_time={self.end_time},
-            status={self.status}
+            status={self.status},
+            intended_start_time={self.intended_start_time},
+            error_class={self.error_class},
+            http_status={self.http_status},
+            error_phase={self.error_phase},
+            attempt={self.attempt},
+            request_start_time={self.request_start_time},
+            throttled_time={self.throttled_time},
+            endpoint={self.endpoint},
+            workload_class={self.workload_class},
+            batch_size={self.batch_size},
+            token_source={self.token_source},
+            send_interval={self.send_interval}
         )
         """
         )
@@ -158,6 +439,14 @@ class Measurement:
         ttft: float,
         start_time: float,
         end_time: float,
+        intended_start_time: Optional[float] = None,
+        error_class: Optional[ErrorClass] = None,
+        http_status: Optional[int] = None,
+        error_phase: Optional[ErrorPhase] = None,
+        endpoint: Optional[str] = None,
+        workload_class: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        token_source: Optional[TokenSource] = None,
     ):
         return cls(
             id=None,
@@ -168,4 +457,12 @@ class Measurement:
             start_time=start_time,
             end_time=end_time,
             status=Status.FAILED,
+            intended_start_time=intended_start_time,
+            error_class=error_class,
+            http_status=http_status,
+            error_phase=error_phase,
+            endpoint=endpoint,
+            workload_class=workload_class,
+            batch_size=batch_size,
+            token_source=token_source,
         )
\ No newline at end of file
@@ -0,0 +1,286 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from compressa.utils import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = get_logger(__name__)
+
+FILE_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Exported tables and their column types. Experiments must come first:
+# importing remaps experiment ids of all other tables.
+TABLE_COLUMNS = {
+    "Experiments": (
+        ("id", "int64"),
+        ("experiment_name", "string"),
+        ("experiment_date", "timestamp"),
+        ("description", "string"),
+    ),
+    "Parameters": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("key", "string"),
+        ("value", "string"),
+    ),
+    "Metrics": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("metric_name", "string"),
+        ("metric_value", "float64"),
+        ("timestamp", "timestamp"),
+    ),
+    "Measurements": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("n_input", "int64"),
+        ("n_output", "int64"),
+        ("ttft", "float64"),
+        ("start_time", "float64"),
+        ("end_time", "float64"),
+        ("status", "string"),
+        ("intended_start_time", "float64"),
+        ("error_class", "string"),
+        ("http_status", "int64"),
+        ("error_phase", "string"),
+        ("attempt", "int64"),
+        ("request_start_time", "float64"),
+        ("throttled_time", "float64"),
+        ("endpoint", "string"),
+        ("workload_class", "string"),
+        ("batch_size", "int64"),
+        ("token_source", "string"),
+        ("send_interval", "float64"),
+    ),
+    "Histograms": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("metric_name", "string"),
+        ("histogram_data", "binary"),
+        ("timestamp", "timestamp"),
+    ),
+    "GroupMetrics": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("group_by", "string"),
+        ("group_value", "string"),
+        ("metric_name", "string"),
+        ("metric_value", "float64"),
+        ("timestamp", "timestamp"),
+    ),
+    "WindowMetrics": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("window_index", "int64"),
+        ("window_start", "float64"),
+        ("window_end", "float64"),
+        ("num_requests", "int64"),
+        ("failed_requests", "int64"),
+        ("ttft", "float64"),
+        ("ttft_95", "float64"),
+        ("ttft_95_corrected", "float64"),
+        ("latency", "float64"),
+        ("latency_95", "float64"),
+        ("latency_95_corrected", "float64"),
+        ("tpot", "float64"),
+        ("throughput", "float64"),
+        ("throughput_input_tokens", "float64"),
+        ("throughput_output_tokens", "float64"),
+        ("rps", "float64"),
+        ("avg_n_input", "float64"),
+        ("avg_n_output", "float64"),
+        ("timestamp", "timestamp"),
+    ),
+    "Samples": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("timestamp", "float64"),
+        ("source", "string"),
+        ("name", "string"),
+        ("value", "float64"),
+    ),
+    "MeasurementRollups": (
+        ("id", "int64"),
+        ("experiment_id", "int64"),
+        ("bucket_start", "float64"),
+        ("bucket_seconds", "float64"),
+        ("num_requests", "int64"),
+        ("failed_requests", "int64"),
+        ("sum_ttft", "float64"),
+        ("sum_latency", "float64"),
+        ("max_ttft", "float64"),
+        ("max_latency", "float64"),
+        ("sum_n_input", "int64"),
+        ("sum_n_output", "int64"),
+        ("ttft_histogram", "binary"),
+        ("latency_histogram", "binary"),
+    ),
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Export and import need pyarrow: pip install compressa-perf[parquet]")
+
+
+def _arrow_type(name: str):
+    return {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "binary": pa.binary(),
+        "timestamp": pa.timestamp("us"),
+    }[name]
+
+
+def _schema(table: str):
+    return pa.schema([(column, _arrow_type(kind)) for column, kind in TABLE_COLUMNS[table]])
+
+
+def _parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _open_writer(path: str, schema, file_format: str):
+    if file_format == "parquet":
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    return pa.ipc.new_file(path, schema)
+
+
+def _iter_batches(path: str, chunk_size: int) -> Iterator:
+    if path.endswith(FILE_FORMATS["parquet"]):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def export_experiments(
+    conn: sqlite3.Connection,
+    output_dir: str,
+    experiment_ids: Optional[List[int]] = None,
+    file_format: str = "parquet",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """
+    Writes one typed Parquet or Arrow IPC file per table to `output_dir`,
+    streaming rows in chunks of `chunk_size`. Returns row counts per table.
+    """
+    _require_pyarrow()
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown format {file_format}, expected one of {list(FILE_FORMATS)}")
+    if experiment_ids is None:
+        experiment_ids = [row[0] for row in conn.execute("SELECT id FROM Experiments ORDER BY id")]
+    os.makedirs(output_dir, exist_ok=True)
+
+    placeholders = ", ".join("?" * len(experiment_ids))
+    counts = {}
+    for table, columns in TABLE_COLUMNS.items():
+        schema = _schema(table)
+        names = [column for column, _ in columns]
+        timestamps = [i for i, (_, kind) in enumerate(columns) if kind == "timestamp"]
+        key = "id" if table == "Experiments" else "experiment_id"
+        cur = conn.execute(
+            f"SELECT {', '.join(names)} FROM {table} WHERE {key} IN ({placeholders}) ORDER BY id",
+            experiment_ids,
+        )
+        path = os.path.join(output_dir, table + FILE_FORMATS[file_format])
+        writer = _open_writer(path, schema, file_format)
+        counts[table] = 0
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                values = [list(col) for col in zip(*rows)]
+                for i in timestamps:
+                    values[i] = [_parse_timestamp(v) for v in values[i]]
+                writer.write_batch(pa.record_batch(values, schema=schema))
+                counts[table] += len(rows)
+        finally:
+            writer.close()
+    return counts
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _find_table_file(input_dir: str, table: str) -> Optional[str]:
+    for extension in FILE_FORMATS.values():
+        path = os.path.join(input_dir, table + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def import_experiments(
+    conn: sqlite3.Connection,
+    input_dir: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[int, int]:
+    """
+    Loads an export made by `export_experiments` into `conn` in one
+    transaction. Experiments get new ids, so exports from several hosts can
+    be merged into one database. Returns the mapping old id -> new id.
+    """
+    _require_pyarrow()
+    experiments_path = _find_table_file(input_dir, "Experiments")
+    if experiments_path is None:
+        raise FileNotFoundError(f"No exported experiments found in {input_dir}")
+
+    id_map: Dict[int, int] = {}
+    with conn:
+        for batch in _iter_batches(experiments_path, chunk_size):
+            for row in batch.to_pylist():
+                cur = conn.execute(
+                    "INSERT INTO Experiments (experiment_name, experiment_date, description) VALUES (?, ?, ?)",
+                    (row["experiment_name"], row["experiment_date"], row["description"]),
+                )
+                id_map[row["id"]] = cur.lastrowid
+        old_ids = np.array(sorted(id_map), dtype=np.int64)
+        new_ids = np.array([id_map[i] for i in old_ids], dtype=np.int64)
+
+        for table in list(TABLE_COLUMNS)[1:]:
+            path = _find_table_file(input_dir, table)
+            if path is None:
+                continue
+            existing = set(_table_columns(conn, table))
+            for batch in _iter_batches(path, chunk_size):
+                names = [n for n in batch.schema.names if n != "id" and n in existing]
+                if not batch.num_rows:
+                    continue
+                experiment_id = batch.column("experiment_id").to_numpy()
+                index = np.searchsorted(old_ids, experiment_id)
+                index = np.minimum(index, max(len(old_ids) - 1, 0))
+                if not len(old_ids) or np.any(old_ids[index] != experiment_id):
+                    raise ValueError(f"{path} references experiments missing from the export")
+                values = [
+                    new_ids[index].tolist() if name == "experiment_id"
+                    else batch.column(name).to_pylist()
+                    for name in names
+                ]
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                    zip(*values),
+                )
+        conn.executemany(
+            "INSERT INTO Parameters (experiment_id, key, value) VALUES (?, ?, ?)",
+            [(new, "import_source", f"{os.path.abspath(input_dir)}:{old}") for old, new in id_map.items()],
+        )
+    logger.info(f"Imported {len(id_map)} experiments from {input_dir}")
+    return id_map
@@ -2,8 +2,12 @@ import sqlite3
 from compressa.perf.data.models import (
     Experiment,
     Metric,
+    GroupMetric,
     Parameter,
     Measurement,
+    MetricHistogram,
+    WindowMetrics,
+    Sample,
 )
 from datetime import datetime
 
@@ -45,11 +49,33 @@ def direct_insert_metric(conn: sqlite3.Connection, metric: Metric) -> int:
         )
     return cur.lastrowid
 
+def direct_insert_group_metric(conn: sqlite3.Connection, metric: GroupMetric) -> int:
+    sql = """
+    INSERT INTO GroupMetrics (experiment_id, group_by, group_value, metric_name, metric_value, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """
+    with conn:
+        cur = conn.execute(
+            sql,
+            (
+                metric.experiment_id,
+                metric.group_by,
+                metric.group_value,
+                metric.metric_name,
+                metric.metric_value,
+                metric.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+    return cur.lastrowid
+
 def direct_insert_measurement(conn: sqlite3.Connection, measurement: Measurement) -> int:
     sql = """
     INSERT INTO Measurements (
-      experiment_id, n_input, n_output, ttft, start_time, end_time, status
-    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+      experiment_id, n_input, n_output, ttft, start_time, end_time, status,
+      intended_start_time, error_class, http_status, error_phase,
+      attempt, request_start_time, throttled_time, endpoint, workload_class, batch_size,
+      token_source, send_interval
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """
     with conn:
         cur = conn.execute(
@@ -62,6 +88,86 @@ def direct_insert_measurement(conn: sqlite3.Connection, measurement: Measurement
                 measurement.start_time,
                 measurement.end_time,
                 measurement.status.value,
+                measurement.intended_start_time,
+                measurement.error_class.value if measurement.error_class else None,
+                measurement.http_status,
+                measurement.error_phase.value if measurement.error_phase else None,
+                measurement.attempt,
+                measurement.request_start_time,
+                measurement.throttled_time,
+                measurement.endpoint,
+                measurement.workload_class,
+                measurement.batch_size,
+                measurement.token_source.value if measurement.token_source else None,
+                measurement.send_interval,
             )
         )
     return cur.lastrowid
+
+def direct_insert_histogram(conn: sqlite3.Connection, histogram: MetricHistogram) -> int:
+    sql = """
+    INSERT INTO Histograms (experiment_id, metric_name, histogram_data, timestamp)
+    VALUES (?, ?, ?, ?)
+    """
+    with conn:
+        cur = conn.execute(
+            sql,
+            (
+                histogram.experiment_id,
+                histogram.metric_name,
+                sqlite3.Binary(histogram.histogram_data),
+                histogram.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+    return cur.lastrowid
+
+def direct_insert_sample(conn: sqlite3.Connection, sample: Sample) -> int:
+    sql = """
+    INSERT INTO Samples (experiment_id, timestamp, source, name, value)
+    VALUES (?, ?, ?, ?, ?)
+    """
+    with conn:
+        cur = conn.execute(
+            sql,
+            (sample.experiment_id, sample.timestamp, sample.source, sample.name, sample.value),
+        )
+    return cur.lastrowid
+
+def direct_insert_window_metrics(conn: sqlite3.Connection, window: WindowMetrics) -> int:
+    sql = """
+    INSERT INTO WindowMetrics (
+      experiment_id, window_index, window_start, window_end,
+      num_requests, failed_requests,
+      ttft, ttft_95, ttft_95_corrected,
+      latency, latency_95, latency_95_corrected,
+      tpot, throughput, throughput_input_tokens, throughput_output_tokens, rps,
+      avg_n_input, avg_n_output, timestamp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    with conn:
+        cur = conn.execute(
+            sql,
+            (
+                window.experiment_id,
+                window.window_index,
+                window.window_start,
+                window.window_end,
+                window.num_requests,
+                window.failed_requests,
+                window.ttft,
+                window.ttft_95,
+                window.ttft_95_corrected,
+                window.latency,
+                window.latency_95,
+                window.latency_95_corrected,
+                window.tpot,
+                window.throughput,
+                window.throughput_input_tokens,
+                window.throughput_output_tokens,
+                window.rps,
+                window.avg_n_input,
+                window.avg_n_output,
+                window.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+    return cur.lastrowid
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import datetime
 from datetime import datetime
 
@@ -7,11 +7,20 @@ from compressa.perf.db.setup import get_db_writer
 from compressa.perf.data.models import (
     Experiment,
     Metric,
+    GroupMetric,
     Parameter,
     MetricName,
     Measurement,
+    MetricHistogram,
+    WindowMetrics,
+    Sample,
     Status,
+    ErrorClass,
+    ErrorPhase,
+    TokenSource,
 )
+from compressa.perf.data.histogram import LogHistogram, merge_histograms
+from compressa.perf.data.frame import MeasurementFrame
 
 
 def insert_parameter(parameter: Parameter) -> int:
@@ -32,6 +41,14 @@ def insert_metric(metric: Metric) -> int:
     return -1
 
 
+def insert_group_metric(metric: GroupMetric) -> int:
+    db_writer = get_db_writer()
+    if db_writer is None:
+        raise ValueError("DB writer is not initialized")
+    db_writer.push_group_metric(metric)
+    return -1
+
+
 def insert_measurement(measurement: Measurement) -> int:
     db_writer = get_db_writer()
     if db_writer is None:
@@ -41,6 +58,30 @@ def insert_measurement(measurement: Measurement) -> int:
     return -1
 
 
+def insert_histogram(histogram: MetricHistogram) -> int:
+    db_writer = get_db_writer()
+    if db_writer is None:
+        raise ValueError("DB writer is not initialized")
+    db_writer.push_histogram(histogram)
+    return -1
+
+
+def insert_window_metrics(window: WindowMetrics) -> int:
+    db_writer = get_db_writer()
+    if db_writer is None:
+        raise ValueError("DB writer is not initialized")
+    db_writer.push_window_metrics(window)
+    return -1
+
+
+def insert_sample(sample: Sample) -> int:
+    db_writer = get_db_writer()
+    if db_writer is None:
+        raise ValueError("DB writer is not initialized")
+    db_writer.push_sample(sample)
+    return -1
+
+
 # Fetch Operations
 
 
@@ -79,10 +120,144 @@ def fetch_metrics_by_experiment(conn, experiment_id: int) -> List[Metric]:
     return metrics
 
 
+def fetch_group_metrics_by_experiment(conn, experiment_id: int) -> List[GroupMetric]:
+    sql = """
+    SELECT id, experiment_id, group_by, group_value, metric_name, metric_value, timestamp
+      FROM GroupMetrics
+     WHERE experiment_id = ?
+     ORDER BY group_by, group_value, id
+    """
+    return [
+        GroupMetric(
+            id=row[0],
+            experiment_id=row[1],
+            group_by=row[2],
+            group_value=row[3],
+            metric_name=row[4],
+            metric_value=row[5],
+            timestamp=datetime.strptime(row[6], "%Y-%m-%d %H:%M:%S"),
+        )
+        for row in conn.execute(sql, (experiment_id,))
+    ]
+
+
+# Parameters stored by Analyzer.compute_metrics alongside the metrics
+IO_STAT_KEYS = ("avg_n_input", "std_n_input", "avg_n_output", "std_n_output")
+
+
+def _delete_computed_metrics(conn, experiment_id: int) -> None:
+    conn.execute("DELETE FROM Metrics WHERE experiment_id = ?", (experiment_id,))
+    conn.execute("DELETE FROM Histograms WHERE experiment_id = ?", (experiment_id,))
+    conn.execute("DELETE FROM GroupMetrics WHERE experiment_id = ?", (experiment_id,))
+    conn.execute(
+        f"DELETE FROM Parameters WHERE experiment_id = ? AND key IN ({', '.join('?' * len(IO_STAT_KEYS))})",
+        (experiment_id, *IO_STAT_KEYS),
+    )
+    conn.execute("DELETE FROM MetricFingerprints WHERE experiment_id = ?", (experiment_id,))
+
+
 def clear_metrics_by_experiment(conn, experiment_id: int) -> None:
-    sql = "DELETE FROM Metrics WHERE experiment_id = ?"
     with conn:
-        conn.execute(sql, (experiment_id,))
+        _delete_computed_metrics(conn, experiment_id)
+
+
+def fetch_measurement_fingerprints(conn) -> Dict[int, Tuple[int, int]]:
+    """Number of measurements and max measurement id per experiment."""
+    sql = "SELECT experiment_id, COUNT(*), MAX(id) FROM Measurements GROUP BY experiment_id"
+    return {row[0]: (row[1], row[2]) for row in conn.execute(sql)}
+
+
+def fetch_metric_fingerprints(conn) -> Dict[int, Tuple[int, int, str]]:
+    """Measurement fingerprint and analyzer version the stored metrics were computed from."""
+    sql = """
+    SELECT experiment_id, num_measurements, max_measurement_id, analyzer_version
+      FROM MetricFingerprints
+    """
+    return {row[0]: (row[1], row[2], row[3]) for row in conn.execute(sql)}
+
+
+def store_computed_metrics(
+    conn,
+    experiment_id: int,
+    metrics: Dict[str, float],
+    io_stats: Dict[str, float],
+    histograms: Dict[str, bytes],
+    fingerprint: Tuple[int, int, str],
+    group_metrics: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None,
+) -> None:
+    """
+    Replaces the computed metrics, io stats, histograms and per-group metrics
+    ({group_by: {group_value: metrics}}) of an experiment and records the
+    fingerprint they were computed from, in one transaction.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with conn:
+        _delete_computed_metrics(conn, experiment_id)
+        conn.executemany(
+            "INSERT INTO Metrics (experiment_id, metric_name, metric_value, timestamp) VALUES (?, ?, ?, ?)",
+            [(experiment_id, name, float(value), now) for name, value in metrics.items()],
+        )
+        conn.executemany(
+            "INSERT INTO Parameters (experiment_id, key, value) VALUES (?, ?, ?)",
+            [(experiment_id, key, str(value)) for key, value in io_stats.items()],
+        )
+        conn.executemany(
+            "INSERT INTO Histograms (experiment_id, metric_name, histogram_data, timestamp) VALUES (?, ?, ?, ?)",
+            [(experiment_id, name, data, now) for name, data in histograms.items()],
+        )
+        conn.executemany(
+            """
+            INSERT INTO GroupMetrics (
+                experiment_id, group_by, group_value, metric_name, metric_value, timestamp
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (experiment_id, group_by, value, name, float(metric_value), now)
+                for group_by, groups in (group_metrics or {}).items()
+                for value, metrics_of_group in groups.items()
+                for name, metric_value in metrics_of_group.items()
+            ],
+        )
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO MetricFingerprints (
+                experiment_id, num_measurements, max_measurement_id, analyzer_version, timestamp
+            ) VALUES (?, ?, ?, ?, ?)
+            """,
+            (experiment_id, *fingerprint, now),
+        )
+
+
+def fetch_histograms_by_experiment(conn, experiment_id: int) -> List[MetricHistogram]:
+    sql = """
+    SELECT id, experiment_id, metric_name, histogram_data, timestamp
+      FROM Histograms
+     WHERE experiment_id = ?
+    """
+    cur = conn.cursor()
+    cur.execute(sql, (experiment_id,))
+    return [
+        MetricHistogram(
+            id=row[0],
+            experiment_id=row[1],
+            metric_name=row[2],
+            histogram_data=bytes(row[3]),
+            timestamp=datetime.strptime(row[4], "%Y-%m-%d %H:%M:%S"),
+        )
+        for row in cur.fetchall()
+    ]
+
+
+def fetch_merged_histograms(conn, experiment_ids: Iterable[int]) -> Dict[str, LogHistogram]:
+    """
+    Merge the stored histograms of several experiments, per metric name.
+    No raw measurements are read.
+    """
+    by_metric: Dict[str, List[LogHistogram]] = {}
+    for experiment_id in experiment_ids:
+        for record in fetch_histograms_by_experiment(conn, experiment_id):
+            by_metric.setdefault(record.metric_name, []).append(record.to_histogram())
+    return {name: merge_histograms(hists) for name, hists in by_metric.items()}
         
 
 def fetch_parameters_by_experiment(conn, experiment_id: int) -> List[Parameter]:
@@ -93,24 +268,90 @@ def fetch_parameters_by_experiment(conn, experiment_id: int) -> List[Parameter]:
     return [Parameter(*row) for row in rows]
 
 
+MEASUREMENT_COLUMNS = (
+    "id, experiment_id, n_input, n_output, ttft, start_time, end_time, status, "
+    "intended_start_time, error_class, http_status, error_phase, "
+    "attempt, request_start_time, throttled_time, endpoint, workload_class, batch_size, "
+    "token_source, send_interval"
+)
+
+
+def _row_to_measurement(row) -> Measurement:
+    return Measurement(
+        id=row[0],
+        experiment_id=row[1],
+        n_input=row[2],
+        n_output=row[3],
+        ttft=row[4],
+        start_time=row[5],
+        end_time=row[6],
+        status=Status(row[7]),
+        intended_start_time=row[8],
+        error_class=ErrorClass(row[9]) if row[9] else None,
+        http_status=row[10],
+        error_phase=ErrorPhase(row[11]) if row[11] else None,
+        attempt=row[12],
+        request_start_time=row[13],
+        throttled_time=row[14],
+        endpoint=row[15],
+        workload_class=row[16],
+        batch_size=row[17],
+        token_source=TokenSource(row[18]) if row[18] else None,
+        send_interval=row[19],
+    )
+
+
 def fetch_measurements_by_experiment(conn, experiment_id: int) -> List[Measurement]:
-    sql = "SELECT * FROM Measurements WHERE experiment_id = ?"
+    sql = f"SELECT {MEASUREMENT_COLUMNS} FROM Measurements WHERE experiment_id = ?"
     cur = conn.cursor()
-    measurements = []
     cur.execute(sql, (experiment_id,))
-    rows = cur.fetchall()
-    for row in rows:
-        measurements.append(Measurement(
-            id=row[0],
-            experiment_id=row[1],
-            n_input=row[2],
-            n_output=row[3],
-            ttft=row[4],
-            start_time=row[5],
-            end_time=row[6],
-            status=Status(row[7]),
-        ))
-    return measurements
+    return [_row_to_measurement(row) for row in cur.fetchall()]
+
+
+def fetch_measurements_in_window(
+    conn,
+    experiment_id: int,
+    start_ts: float,
+    end_ts: float,
+) -> List[Measurement]:
+    """
+    Measurements that finished within (start_ts, end_ts], so that
+    consecutive windows see every measurement exactly once.
+    """
+    sql = f"""
+        SELECT {MEASUREMENT_COLUMNS} FROM Measurements
+         WHERE experiment_id = ?
+           AND end_time > ?
+           AND end_time <= ?
+    """
+    cur = conn.cursor()
+    cur.execute(sql, (experiment_id, start_ts, end_ts))
+    return [_row_to_measurement(row) for row in cur.fetchall()]
+
+
+def fetch_measurement_frame(
+    conn,
+    experiment_id: int,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None,
+    chunk_size: int = 100_000,
+) -> MeasurementFrame:
+    """
+    Columnar version of fetch_measurements_by_experiment, filled from cursor
+    batches. With `start_ts`/`end_ts`, only measurements that finished within
+    (start_ts, end_ts] are returned, as in fetch_measurements_in_window.
+    """
+    sql = f"SELECT {MEASUREMENT_COLUMNS} FROM Measurements WHERE experiment_id = ?"
+    params = [experiment_id]
+    if start_ts is not None:
+        sql += " AND end_time > ?"
+        params.append(start_ts)
+    if end_ts is not None:
+        sql += " AND end_time <= ?"
+        params.append(end_ts)
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    return MeasurementFrame.from_cursor(cur, chunk_size)
 
 
 def fetch_experiment_by_id(conn, experiment_id: int) -> Optional[Experiment]:
@@ -126,3 +367,92 @@ def fetch_experiment_by_id(conn, experiment_id: int) -> Optional[Experiment]:
             description=row[3]
         )
     return None
+
+
+WINDOW_METRICS_COLUMNS = (
+    "id, experiment_id, window_index, window_start, window_end, "
+    "num_requests, failed_requests, "
+    "ttft, ttft_95, ttft_95_corrected, latency, latency_95, latency_95_corrected, "
+    "tpot, throughput, throughput_input_tokens, throughput_output_tokens, rps, "
+    "avg_n_input, avg_n_output, timestamp"
+)
+
+
+def fetch_window_metrics(
+    conn,
+    experiment_id: int,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None,
+) -> List[WindowMetrics]:
+    """Windows of an experiment starting within [start_ts, end_ts), ordered by time."""
+    sql = f"SELECT {WINDOW_METRICS_COLUMNS} FROM WindowMetrics WHERE experiment_id = ?"
+    args = [experiment_id]
+    if start_ts is not None:
+        sql += " AND window_start >= ?"
+        args.append(start_ts)
+    if end_ts is not None:
+        sql += " AND window_start < ?"
+        args.append(end_ts)
+    sql += " ORDER BY window_start"
+    cur = conn.cursor()
+    cur.execute(sql, args)
+    return [
+        WindowMetrics(*row[:-1], timestamp=datetime.strptime(row[-1], "%Y-%m-%d %H:%M:%S"))
+        for row in cur.fetchall()
+    ]
+
+
+def fetch_samples(
+    conn,
+    experiment_id: int,
+    source: Optional[str] = None,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None,
+) -> List[Sample]:
+    """Samples of an experiment taken within [start_ts, end_ts), ordered by time."""
+    sql = "SELECT id, experiment_id, timestamp, source, name, value FROM Samples WHERE experiment_id = ?"
+    args = [experiment_id]
+    if source is not None:
+        sql += " AND source = ?"
+        args.append(source)
+    if start_ts is not None:
+        sql += " AND timestamp >= ?"
+        args.append(start_ts)
+    if end_ts is not None:
+        sql += " AND timestamp < ?"
+        args.append(end_ts)
+    sql += " ORDER BY timestamp, id"
+    return [Sample(*row) for row in conn.execute(sql, args)]
+
+
+def summarize_window_metrics(conn, experiment_id: int) -> Optional[Dict[str, float]]:
+    """
+    Aggregates over all windows of an experiment, computed in SQLite.
+    Returns None if the experiment has no windows.
+    """
+    sql = """
+        SELECT COUNT(*),
+               MIN(window_start), MAX(window_end),
+               SUM(num_requests), SUM(failed_requests),
+               MIN(ttft), AVG(ttft), MAX(ttft),
+               MIN(ttft_95), AVG(ttft_95), MAX(ttft_95),
+               MIN(latency), AVG(latency), MAX(latency),
+               MIN(latency_95), AVG(latency_95), MAX(latency_95),
+               MIN(rps), AVG(rps), MAX(rps),
+               MIN(throughput), AVG(throughput), MAX(throughput)
+          FROM WindowMetrics
+         WHERE experiment_id = ?
+    """
+    row = conn.execute(sql, (experiment_id,)).fetchone()
+    if not row or not row[0]:
+        return None
+    summary = {
+        "num_windows": row[0],
+        "first_window_start": row[1],
+        "last_window_end": row[2],
+        "num_requests": row[3],
+        "failed_requests": row[4],
+    }
+    for i, name in enumerate(["ttft", "ttft_95", "latency", "latency_95", "rps", "throughput"]):
+        summary[f"min_{name}"], summary[f"avg_{name}"], summary[f"max_{name}"] = row[5 + 3 * i:8 + 3 * i]
+    return summary
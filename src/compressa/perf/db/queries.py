@@ -0,0 +1,272 @@
+import sqlite3
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from compressa.perf.data.histogram import LogHistogram
+from compressa.perf.data.models import Status
+
+# Per-request values that can be aggregated, as SQL expressions over Measurements
+VALUE_EXPRESSIONS = {
+    "ttft": "ttft",
+    "latency": "end_time - start_time",
+    "tpot": "CASE WHEN n_output > 0 THEN (end_time - start_time) / n_output END",
+}
+
+HISTOGRAM_AGGREGATE = "log_histogram"
+_HISTOGRAM_BUFFER = 65536
+
+
+class _HistogramAggregate:
+    """SQLite aggregate that returns a serialized LogHistogram of its input."""
+
+    def __init__(self):
+        self.hist = LogHistogram()
+        self.buffer = []
+
+    def step(self, value):
+        if value is not None:
+            self.buffer.append(value)
+            if len(self.buffer) >= _HISTOGRAM_BUFFER:
+                self.hist.record_many(self.buffer)
+                self.buffer = []
+
+    def finalize(self):
+        if self.buffer:
+            self.hist.record_many(self.buffer)
+        return self.hist.to_bytes()
+
+
+def register_functions(conn: sqlite3.Connection):
+    """Registers the `log_histogram(value)` aggregate on the connection."""
+    conn.create_aggregate(HISTOGRAM_AGGREGATE, 1, _HistogramAggregate)
+
+
+def _value_expression(value: str) -> str:
+    if value not in VALUE_EXPRESSIONS:
+        raise ValueError(f"Unknown value '{value}', expected one of {list(VALUE_EXPRESSIONS)}")
+    return VALUE_EXPRESSIONS[value]
+
+
+def _experiment_filter(experiment_ids: Optional[Sequence[int]], column: str = "experiment_id"):
+    if experiment_ids is None:
+        return "1 = 1", []
+    return f"{column} IN ({', '.join('?' * len(experiment_ids))})", list(experiment_ids)
+
+
+def measurement_summary(
+    conn: sqlite3.Connection,
+    experiment_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    """
+    One row per experiment with request counts, token totals, mean and
+    extreme TTFT/latency of successful requests, and RPS/throughput over
+    the span of successful requests. Indexed by experiment_id. Retried
+    attempts are not counted as requests.
+    """
+    where, params = _experiment_filter(experiment_ids)
+    sql = f"""
+        WITH m AS (
+            SELECT experiment_id, n_input, n_output, ttft, start_time, end_time,
+                   end_time - start_time AS latency, status = ? AS ok,
+                   status = ? AS retried
+              FROM Measurements
+             WHERE {where}
+        )
+        SELECT experiment_id,
+               SUM(NOT retried) AS num_requests,
+               SUM(NOT ok AND NOT retried) AS failed_requests,
+               MIN(start_time) AS first_start,
+               MAX(end_time) AS last_end,
+               AVG(CASE WHEN ok THEN ttft END) AS avg_ttft,
+               MAX(CASE WHEN ok THEN ttft END) AS max_ttft,
+               AVG(CASE WHEN ok THEN latency END) AS avg_latency,
+               MIN(CASE WHEN ok THEN latency END) AS min_latency,
+               MAX(CASE WHEN ok THEN latency END) AS max_latency,
+               TOTAL(CASE WHEN ok THEN n_input END) AS input_tokens,
+               TOTAL(CASE WHEN ok THEN n_output END) AS output_tokens,
+               MAX(CASE WHEN ok THEN end_time END)
+                 - MIN(CASE WHEN ok THEN start_time END) AS success_span
+          FROM m
+         GROUP BY experiment_id
+         ORDER BY experiment_id
+    """
+    df = pd.read_sql_query(sql, conn, params=[Status.SUCCESS.value, Status.RETRIED.value] + params)
+    span = df.pop("success_span")
+    successes = df["num_requests"] - df["failed_requests"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["rps"] = np.where(span > 0, successes / span, 0.0)
+        df["throughput"] = np.where(span > 0, (df["input_tokens"] + df["output_tokens"]) / span, 0.0)
+    return df.set_index("experiment_id")
+
+
+def time_buckets(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    bucket_seconds: float = 60.0,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Per-bucket aggregates of the measurements that finished in each
+    `bucket_seconds` interval: counts, mean/max TTFT and latency, token
+    totals, RPS and throughput.
+    """
+    where = "experiment_id = ?"
+    params: list = [experiment_id]
+    if start_ts is not None:
+        where += " AND end_time > ?"
+        params.append(start_ts)
+    if end_ts is not None:
+        where += " AND end_time <= ?"
+        params.append(end_ts)
+    sql = f"""
+        WITH m AS (
+            SELECT n_input, n_output, ttft, end_time,
+                   end_time - start_time AS latency, status = ? AS ok,
+                   status = ? AS retried
+              FROM Measurements
+             WHERE {where}
+        )
+        SELECT CAST(end_time / ? AS INTEGER) * ? AS bucket_start,
+               SUM(NOT retried) AS num_requests,
+               SUM(NOT ok AND NOT retried) AS failed_requests,
+               AVG(CASE WHEN ok THEN ttft END) AS avg_ttft,
+               MAX(CASE WHEN ok THEN ttft END) AS max_ttft,
+               AVG(CASE WHEN ok THEN latency END) AS avg_latency,
+               MAX(CASE WHEN ok THEN latency END) AS max_latency,
+               TOTAL(CASE WHEN ok THEN n_input END) AS input_tokens,
+               TOTAL(CASE WHEN ok THEN n_output END) AS output_tokens
+          FROM m
+    """
+    params = [Status.SUCCESS.value, Status.RETRIED.value] + params + [bucket_seconds, bucket_seconds]
+    sql += " GROUP BY 1 ORDER BY 1"
+    df = pd.read_sql_query(sql, conn, params=params)
+    successes = df["num_requests"] - df["failed_requests"]
+    df["rps"] = successes / bucket_seconds
+    df["throughput"] = (df["input_tokens"] + df["output_tokens"]) / bucket_seconds
+    return df
+
+
+def approximate_percentiles(
+    conn: sqlite3.Connection,
+    value: str,
+    quantiles: Sequence[float],
+    experiment_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    """
+    Percentiles (quantiles in [0, 100]) of a per-request value of successful
+    requests, one row per experiment. Values are streamed into a
+    `log_histogram` aggregate inside SQLite, so no rows reach Python.
+    """
+    register_functions(conn)
+    where, params = _experiment_filter(experiment_ids)
+    sql = f"""
+        SELECT experiment_id, {HISTOGRAM_AGGREGATE}({_value_expression(value)})
+          FROM Measurements
+         WHERE status = ? AND {where}
+         GROUP BY experiment_id
+         ORDER BY experiment_id
+    """
+    rows = []
+    for experiment_id, data in conn.execute(sql, [Status.SUCCESS.value] + params):
+        hist = LogHistogram.from_bytes(data)
+        rows.append([experiment_id, hist.count] + hist.quantiles([q / 100 for q in quantiles]))
+    columns = ["experiment_id", "count"] + [f"p{q:g}" for q in quantiles]
+    return pd.DataFrame(rows, columns=columns).set_index("experiment_id")
+
+
+def exact_percentiles(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    value: str,
+    quantiles: Sequence[float],
+) -> Dict[float, float]:
+    """
+    Exact percentiles (linear interpolation, as numpy.percentile) of a
+    per-request value of successful requests. Only the order statistics
+    needed are returned from SQLite, using ROW_NUMBER() over the sorted values.
+    """
+    expression = _value_expression(value)
+    base = f"""
+        FROM Measurements
+       WHERE experiment_id = ? AND status = ? AND ({expression}) IS NOT NULL
+    """
+    params = [experiment_id, Status.SUCCESS.value]
+    n = conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+    if n == 0:
+        return {q: 0.0 for q in quantiles}
+
+    positions = {q: q / 100 * (n - 1) for q in quantiles}
+    ranks = sorted({int(p) + 1 for p in positions.values()} | {min(int(p) + 2, n) for p in positions.values()})
+    sql = f"""
+        SELECT rn, v FROM (
+            SELECT {expression} AS v, ROW_NUMBER() OVER (ORDER BY {expression}) AS rn {base}
+        ) WHERE rn IN ({', '.join('?' * len(ranks))})
+    """
+    values = dict(conn.execute(sql, params + ranks).fetchall())
+    result = {}
+    for q, position in positions.items():
+        lower = int(position)
+        low = values[lower + 1]
+        high = values[min(lower + 2, n)]
+        result[q] = low + (high - low) * (position - lower)
+    return result
+
+
+def metrics_table(
+    conn: sqlite3.Connection,
+    experiment_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    """Stored metrics pivoted to one row per experiment and one column per metric."""
+    where, params = _experiment_filter(experiment_ids)
+    df = pd.read_sql_query(
+        f"SELECT experiment_id, metric_name, metric_value FROM Metrics WHERE {where} ORDER BY id",
+        conn,
+        params=params,
+    )
+    # The latest value wins if a metric was stored more than once
+    return df.pivot_table(
+        index="experiment_id",
+        columns="metric_name",
+        values="metric_value",
+        aggfunc="last",
+        sort=False,
+    )
+
+
+def parameters_table(
+    conn: sqlite3.Connection,
+    experiment_ids: Optional[Sequence[int]] = None,
+) -> Dict[int, Dict[str, str]]:
+    """Parameters of all given experiments with a single query: id -> {key: value}."""
+    where, params = _experiment_filter(experiment_ids)
+    result: Dict[int, Dict[str, str]] = {}
+    for experiment_id, key, value in conn.execute(
+        f"SELECT experiment_id, key, value FROM Parameters WHERE {where} ORDER BY id",
+        params,
+    ):
+        result.setdefault(experiment_id, {})[key] = value
+    return result
+
+
+def window_summary_table(
+    conn: sqlite3.Connection,
+    experiment_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    """Number of windows and TTFT/RPS ranges over WindowMetrics per experiment."""
+    where, params = _experiment_filter(experiment_ids)
+    return pd.read_sql_query(
+        f"""
+        SELECT experiment_id,
+               COUNT(*) AS num_windows,
+               MIN(ttft) AS min_ttft, MAX(ttft) AS max_ttft,
+               MIN(rps) AS min_rps, MAX(rps) AS max_rps
+          FROM WindowMetrics
+         WHERE {where}
+         GROUP BY experiment_id
+        """,
+        conn,
+        params=params,
+    ).set_index("experiment_id")
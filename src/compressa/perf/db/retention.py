@@ -0,0 +1,325 @@
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from compressa.perf.data.histogram import LogHistogram
+from compressa.perf.data.models import MeasurementRollup, Status
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_ROLLUP_INTERVAL_SEC = 60.0
+# Raw rows are rolled up in slices of this many seconds to bound memory use
+ROLLUP_SLICE_SEC = 3600.0
+
+ROLLUP_COLUMNS = (
+    "id, experiment_id, bucket_start, bucket_seconds, num_requests, failed_requests, "
+    "sum_ttft, sum_latency, max_ttft, max_latency, sum_n_input, sum_n_output, "
+    "ttft_histogram, latency_histogram"
+)
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Keeps raw measurements for `raw_retention_hours`; older rows are
+    aggregated into per-`rollup_interval_sec` rollups and deleted.
+    """
+    raw_retention_hours: float
+    rollup_interval_sec: float = DEFAULT_ROLLUP_INTERVAL_SEC
+
+    def cutoff(self, now: Optional[float] = None) -> float:
+        """Latest bucket boundary that is older than the retention period."""
+        now = time.time() if now is None else now
+        cutoff = now - self.raw_retention_hours * 3600
+        return np.floor(cutoff / self.rollup_interval_sec) * self.rollup_interval_sec
+
+
+@dataclass
+class RetentionResult:
+    experiment_id: int
+    pruned_rows: int = 0
+    rollups_written: int = 0
+
+
+def _row_to_rollup(row) -> MeasurementRollup:
+    return MeasurementRollup(*row)
+
+
+def _merge_rollup(existing: MeasurementRollup, new: MeasurementRollup) -> MeasurementRollup:
+    """Merges a rollup of late-arriving rows into an already stored bucket."""
+    ttft = LogHistogram.from_bytes(existing.ttft_histogram)
+    ttft.merge(LogHistogram.from_bytes(new.ttft_histogram))
+    latency = LogHistogram.from_bytes(existing.latency_histogram)
+    latency.merge(LogHistogram.from_bytes(new.latency_histogram))
+    return MeasurementRollup(
+        id=existing.id,
+        experiment_id=existing.experiment_id,
+        bucket_start=existing.bucket_start,
+        bucket_seconds=existing.bucket_seconds,
+        num_requests=existing.num_requests + new.num_requests,
+        failed_requests=existing.failed_requests + new.failed_requests,
+        sum_ttft=existing.sum_ttft + new.sum_ttft,
+        sum_latency=existing.sum_latency + new.sum_latency,
+        max_ttft=max(existing.max_ttft, new.max_ttft),
+        max_latency=max(existing.max_latency, new.max_latency),
+        sum_n_input=existing.sum_n_input + new.sum_n_input,
+        sum_n_output=existing.sum_n_output + new.sum_n_output,
+        ttft_histogram=ttft.to_bytes(),
+        latency_histogram=latency.to_bytes(),
+    )
+
+
+def compute_rollups(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    start_ts: float,
+    end_ts: float,
+    bucket_seconds: float = DEFAULT_ROLLUP_INTERVAL_SEC,
+) -> List[MeasurementRollup]:
+    """
+    Aggregates the raw measurements that finished in [start_ts, end_ts) into
+    one rollup per `bucket_seconds` bucket. Counts and sums come from a
+    GROUP BY query; only TTFT and latency of successful rows are read back
+    to build the per-bucket histograms.
+    """
+    sql = """
+        SELECT CAST(end_time / ? AS INTEGER) AS bucket,
+               SUM(status != ?),
+               SUM(status = ?),
+               TOTAL(CASE WHEN status = ? THEN ttft END),
+               TOTAL(CASE WHEN status = ? THEN end_time - start_time END),
+               COALESCE(MAX(CASE WHEN status = ? THEN ttft END), 0),
+               COALESCE(MAX(CASE WHEN status = ? THEN end_time - start_time END), 0),
+               TOTAL(CASE WHEN status = ? THEN n_input END),
+               TOTAL(CASE WHEN status = ? THEN n_output END)
+          FROM Measurements
+         WHERE experiment_id = ? AND end_time >= ? AND end_time < ?
+         GROUP BY bucket
+         ORDER BY bucket
+    """
+    success = Status.SUCCESS.value
+    aggregates = conn.execute(
+        sql,
+        (
+            bucket_seconds, Status.RETRIED.value, Status.FAILED.value, *([success] * 6),
+            experiment_id, start_ts, end_ts,
+        ),
+    ).fetchall()
+    if not aggregates:
+        return []
+
+    values = np.array(
+        conn.execute(
+            """
+            SELECT CAST(end_time / ? AS INTEGER), ttft, end_time - start_time
+              FROM Measurements
+             WHERE experiment_id = ? AND status = ? AND end_time >= ? AND end_time < ?
+            """,
+            (bucket_seconds, experiment_id, success, start_ts, end_ts),
+        ).fetchall(),
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    values = values[np.argsort(values[:, 0], kind="stable")]
+    buckets = values[:, 0].astype(np.int64)
+
+    rollups = []
+    for bucket, count, failed, sum_ttft, sum_latency, max_ttft, max_latency, sum_in, sum_out in aggregates:
+        lo, hi = np.searchsorted(buckets, [bucket, bucket + 1])
+        rollups.append(MeasurementRollup(
+            id=None,
+            experiment_id=experiment_id,
+            bucket_start=bucket * bucket_seconds,
+            bucket_seconds=bucket_seconds,
+            num_requests=count,
+            failed_requests=failed,
+            sum_ttft=sum_ttft,
+            sum_latency=sum_latency,
+            max_ttft=max_ttft,
+            max_latency=max_latency,
+            sum_n_input=int(sum_in),
+            sum_n_output=int(sum_out),
+            ttft_histogram=LogHistogram.from_values(values[lo:hi, 1]).to_bytes(),
+            latency_histogram=LogHistogram.from_values(values[lo:hi, 2]).to_bytes(),
+        ))
+    return rollups
+
+
+def _store_rollups(conn: sqlite3.Connection, rollups: List[MeasurementRollup]):
+    if not rollups:
+        return
+    experiment_id = rollups[0].experiment_id
+    existing = {
+        row[2]: _row_to_rollup(row)
+        for row in conn.execute(
+            f"""
+            SELECT {ROLLUP_COLUMNS} FROM MeasurementRollups
+             WHERE experiment_id = ? AND bucket_start >= ? AND bucket_start <= ?
+            """,
+            (experiment_id, rollups[0].bucket_start, rollups[-1].bucket_start),
+        )
+    }
+    rows = []
+    for rollup in rollups:
+        if rollup.bucket_start in existing:
+            rollup = _merge_rollup(existing[rollup.bucket_start], rollup)
+        rows.append((
+            rollup.experiment_id, rollup.bucket_start, rollup.bucket_seconds,
+            rollup.num_requests, rollup.failed_requests,
+            rollup.sum_ttft, rollup.sum_latency, rollup.max_ttft, rollup.max_latency,
+            rollup.sum_n_input, rollup.sum_n_output,
+            rollup.ttft_histogram, rollup.latency_histogram,
+        ))
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO MeasurementRollups (
+            experiment_id, bucket_start, bucket_seconds, num_requests, failed_requests,
+            sum_ttft, sum_latency, max_ttft, max_latency, sum_n_input, sum_n_output,
+            ttft_histogram, latency_histogram
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+
+
+def rollup_and_prune(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    cutoff_ts: float,
+    bucket_seconds: float = DEFAULT_ROLLUP_INTERVAL_SEC,
+) -> RetentionResult:
+    """
+    Rolls up and deletes every raw measurement of the experiment that finished
+    before `cutoff_ts`. Each slice is rolled up and deleted in one transaction,
+    so an interrupted run never loses or double counts rows.
+    """
+    result = RetentionResult(experiment_id=experiment_id)
+    oldest = conn.execute(
+        "SELECT MIN(end_time) FROM Measurements WHERE experiment_id = ? AND end_time < ?",
+        (experiment_id, cutoff_ts),
+    ).fetchone()[0]
+    if oldest is None:
+        return result
+
+    slice_start = np.floor(oldest / bucket_seconds) * bucket_seconds
+    slice_len = max(bucket_seconds, np.floor(ROLLUP_SLICE_SEC / bucket_seconds) * bucket_seconds)
+    while slice_start < cutoff_ts:
+        slice_end = min(slice_start + slice_len, cutoff_ts)
+        with conn:
+            rollups = compute_rollups(conn, experiment_id, slice_start, slice_end, bucket_seconds)
+            _store_rollups(conn, rollups)
+            cur = conn.execute(
+                "DELETE FROM Measurements WHERE experiment_id = ? AND end_time >= ? AND end_time < ?",
+                (experiment_id, slice_start, slice_end),
+            )
+        result.pruned_rows += cur.rowcount
+        result.rollups_written += len(rollups)
+        slice_start = slice_end
+    return result
+
+
+def apply_retention(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    policy: RetentionPolicy,
+    now: Optional[float] = None,
+) -> RetentionResult:
+    result = rollup_and_prune(
+        conn,
+        experiment_id,
+        policy.cutoff(now),
+        policy.rollup_interval_sec,
+    )
+    if result.pruned_rows:
+        logger.info(
+            f"Experiment {experiment_id}: rolled up {result.pruned_rows} measurements "
+            f"into {result.rollups_written} rollups"
+        )
+        release_free_pages(conn)
+    return result
+
+
+def release_free_pages(conn: sqlite3.Connection):
+    """Returns free pages to the OS if the database uses incremental auto-vacuum."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # execute() would step the pragma once, freeing a single page;
+        # executescript() runs it to completion
+        conn.executescript("PRAGMA incremental_vacuum")
+
+
+def vacuum_database(conn: sqlite3.Connection):
+    """
+    Rewrites the database file, switching it to incremental auto-vacuum so
+    that later prunes release space without a full VACUUM.
+    """
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def continuous_experiment_ids(conn: sqlite3.Connection) -> List[int]:
+    rows = conn.execute(
+        "SELECT experiment_id FROM Parameters WHERE key = 'run_mode' AND value = 'continuous' "
+        "ORDER BY experiment_id"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def rolled_up_experiment_ids(conn: sqlite3.Connection) -> List[int]:
+    """Experiments some of whose raw measurements were replaced by rollups."""
+    rows = conn.execute(
+        "SELECT DISTINCT experiment_id FROM MeasurementRollups ORDER BY experiment_id"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def fetch_rollups(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None,
+) -> List[MeasurementRollup]:
+    sql = f"SELECT {ROLLUP_COLUMNS} FROM MeasurementRollups WHERE experiment_id = ?"
+    params: list = [experiment_id]
+    if start_ts is not None:
+        sql += " AND bucket_start >= ?"
+        params.append(start_ts)
+    if end_ts is not None:
+        sql += " AND bucket_start < ?"
+        params.append(end_ts)
+    sql += " ORDER BY bucket_start"
+    return [_row_to_rollup(row) for row in conn.execute(sql, params)]
+
+
+def summarize_rollups(conn: sqlite3.Connection, experiment_id: int) -> Optional[Dict]:
+    """
+    Totals and merged TTFT/latency histograms over all rollups of an experiment,
+    or None if it has never been compacted.
+    """
+    rollups = fetch_rollups(conn, experiment_id)
+    if not rollups:
+        return None
+    ttft = LogHistogram()
+    latency = LogHistogram()
+    for rollup in rollups:
+        ttft.merge(LogHistogram.from_bytes(rollup.ttft_histogram))
+        latency.merge(LogHistogram.from_bytes(rollup.latency_histogram))
+    return {
+        "num_rollups": len(rollups),
+        "first_bucket_start": rollups[0].bucket_start,
+        "last_bucket_end": rollups[-1].bucket_start + rollups[-1].bucket_seconds,
+        "num_requests": sum(r.num_requests for r in rollups),
+        "failed_requests": sum(r.failed_requests for r in rollups),
+        "sum_n_input": sum(r.sum_n_input for r in rollups),
+        "sum_n_output": sum(r.sum_n_output for r in rollups),
+        "ttft": ttft,
+        "latency": latency,
+    }
+
+
+def database_size(db_path: str) -> int:
+    return os.path.getsize(db_path) if os.path.exists(db_path) else 0
@@ -0,0 +1,421 @@
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from compressa.perf.data.frame import (
+    ERROR_CLASS_CODES,
+    ERROR_CLASSES,
+    ERROR_PHASE_CODES,
+    ERROR_PHASES,
+    STATUS_CODES,
+    STATUSES,
+    TOKEN_SOURCE_CODES,
+    TOKEN_SOURCES,
+    MeasurementFrame,
+)
+from compressa.perf.data.models import Measurement
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_MAGIC = b"CPSEG001"
+SEGMENT_SUFFIX = ".cps"
+OPEN_SUFFIX = ".cps.open"
+INGESTED_SUFFIX = ".cps.ingested"
+# Sidecar of a segment with the strings behind its label codes
+LABELS_SUFFIX = ".labels.json"
+
+# One fixed-width record per measurement. The dtype is stored in every segment
+# header, so segments written with fewer fields can still be read.
+SEGMENT_DTYPE = np.dtype([
+    ("experiment_id", "<i8"),
+    ("n_input", "<i8"),
+    ("n_output", "<i8"),
+    ("ttft", "<f8"),
+    ("start_time", "<f8"),
+    ("end_time", "<f8"),
+    ("intended_start_time", "<f8"),
+    ("status", "<i1"),
+    ("error_class", "<u1"),
+    ("http_status", "<i2"),
+    ("error_phase", "<u1"),
+    ("attempt", "<u2"),
+    ("request_start_time", "<f8"),
+    ("throttled_time", "<f8"),
+    # Codes into the segment's labels, 0 for none
+    ("endpoint", "<u2"),
+    ("workload_class", "<u2"),
+    # 0 for chat completions
+    ("batch_size", "<u4"),
+    ("token_source", "<u1"),
+    ("send_interval", "<f8"),
+])
+
+# String fields stored as label codes
+LABEL_FIELDS = ("endpoint", "workload_class")
+
+# Default values of fields missing from older segments (others default to 0)
+SEGMENT_DEFAULTS = {
+    "intended_start_time": np.nan,
+    "attempt": 1,
+    "request_start_time": np.nan,
+    "send_interval": np.nan,
+}
+
+
+def _encode_header(dtype: np.dtype) -> bytes:
+    descr = json.dumps([[name, dtype.fields[name][0].str] for name in dtype.names]).encode()
+    return SEGMENT_MAGIC + struct.pack("<I", len(descr)) + descr
+
+
+def _read_header(f) -> np.dtype:
+    magic = f.read(len(SEGMENT_MAGIC))
+    if magic != SEGMENT_MAGIC:
+        raise ValueError(f"Not a measurement segment: {getattr(f, 'name', f)}")
+    (size,) = struct.unpack("<I", f.read(4))
+    descr = f.read(size)
+    if len(descr) != size:
+        raise ValueError(f"Truncated segment header: {getattr(f, 'name', f)}")
+    return np.dtype([tuple(field) for field in json.loads(descr)])
+
+
+def _segment_base(path: str) -> str:
+    for suffix in (OPEN_SUFFIX, SEGMENT_SUFFIX, INGESTED_SUFFIX):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def read_labels(path: str) -> List[Optional[str]]:
+    """Strings of the label codes of a segment, indexed by code."""
+    try:
+        with open(_segment_base(path) + LABELS_SUFFIX) as f:
+            return [None] + json.load(f)
+    except FileNotFoundError:
+        return [None]
+
+
+def _decode_labels(codes: np.ndarray, labels: List[Optional[str]]) -> np.ndarray:
+    values = np.array(labels, dtype=object)
+    if codes.size and codes.max() >= values.size:
+        # Codes of labels whose sidecar was not written before a crash
+        values = np.concatenate([values, np.full(codes.max() + 1 - values.size, None, dtype=object)])
+    return values[codes]
+
+
+class SegmentWriter:
+    """
+    Appends measurements to fixed-width binary segment files. A record is
+    copied into a preallocated NumPy buffer; the buffer is written out when
+    full or every `flush_interval_sec`, and fsynced every `fsync_interval_sec`.
+    A crash loses at most the unflushed buffer, and a partially written
+    record at the end of a segment is ignored on read. String fields such as
+    the endpoint are stored as codes into one list of labels; a sidecar file next to each segment
+    maps them back and is rewritten before records with a new code.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        buffer_records: int = 4096,
+        segment_records: int = 1_000_000,
+        flush_interval_sec: float = 1.0,
+        fsync_interval_sec: float = 5.0,
+    ):
+        self.directory = directory
+        self.buffer = np.zeros(buffer_records, dtype=SEGMENT_DTYPE)
+        self.segment_records = segment_records
+        self.flush_interval_sec = flush_interval_sec
+        self.fsync_interval_sec = fsync_interval_sec
+        self.lock = threading.Lock()
+        self.n_buffered = 0
+        self.n_in_segment = 0
+        self.segment_index = 0
+        self.file = None
+        self.path: Optional[str] = None
+        self.last_flush = time.monotonic()
+        self.last_fsync = self.last_flush
+        self.labels: List[Optional[str]] = [None]
+        self.label_codes = {None: 0}
+        self.n_labels_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self):
+        self.segment_index += 1
+        name = f"segment-{os.getpid()}-{int(time.time() * 1000)}-{self.segment_index:06d}"
+        self.path = os.path.join(self.directory, name)
+        self.file = open(self.path + OPEN_SUFFIX, "wb")
+        self.file.write(_encode_header(SEGMENT_DTYPE))
+        self.n_in_segment = 0
+        self.n_labels_written = 1
+
+    def _label_code(self, value: Optional[str]) -> int:
+        code = self.label_codes.get(value)
+        if code is None:
+            code = self.label_codes[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+    def _write_labels(self):
+        path = self.path + LABELS_SUFFIX
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.labels[1:], f)
+        os.replace(path + ".tmp", path)
+        self.n_labels_written = len(self.labels)
+
+    def _close_segment(self):
+        if self.file is None:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.path + OPEN_SUFFIX, self.path + SEGMENT_SUFFIX)
+        self.file = None
+
+    def _flush(self, fsync: bool = False):
+        if self.n_buffered:
+            if self.file is None:
+                self._open_segment()
+            if len(self.labels) > self.n_labels_written:
+                self._write_labels()
+            self.file.write(self.buffer[:self.n_buffered].tobytes())
+            self.n_in_segment += self.n_buffered
+            self.n_buffered = 0
+        now = time.monotonic()
+        self.last_flush = now
+        if self.file is not None:
+            self.file.flush()
+            if fsync or now - self.last_fsync >= self.fsync_interval_sec:
+                os.fsync(self.file.fileno())
+                self.last_fsync = now
+            if self.n_in_segment >= self.segment_records:
+                self._close_segment()
+
+    def append(self, measurement: Measurement):
+        intended = measurement.intended_start_time
+        request_start = measurement.request_start_time
+        record = (
+            measurement.experiment_id,
+            measurement.n_input,
+            measurement.n_output,
+            measurement.ttft,
+            measurement.start_time,
+            measurement.end_time,
+            np.nan if intended is None else intended,
+            STATUS_CODES[measurement.status],
+            ERROR_CLASS_CODES[measurement.error_class],
+            measurement.http_status or 0,
+            ERROR_PHASE_CODES[measurement.error_phase],
+            measurement.attempt,
+            np.nan if request_start is None else request_start,
+            measurement.throttled_time,
+        )
+        with self.lock:
+            self.buffer[self.n_buffered] = (
+                *record,
+                self._label_code(measurement.endpoint),
+                self._label_code(measurement.workload_class),
+                measurement.batch_size or 0,
+                TOKEN_SOURCE_CODES[measurement.token_source],
+                np.nan if measurement.send_interval is None else measurement.send_interval,
+            )
+            self.n_buffered += 1
+            if (
+                self.n_buffered == self.buffer.size
+                or time.monotonic() - self.last_flush >= self.flush_interval_sec
+            ):
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush(fsync=True)
+
+    def rotate(self):
+        """Flushes and closes the current segment so that it can be ingested."""
+        with self.lock:
+            self._flush(fsync=True)
+            self._close_segment()
+
+    def close(self):
+        self.rotate()
+
+
+def read_segment(path: str) -> np.ndarray:
+    """
+    Memory-maps the complete records of a segment as a structured array in
+    the current SEGMENT_DTYPE layout. A truncated trailing record is ignored.
+    """
+    with open(path, "rb") as f:
+        try:
+            dtype = _read_header(f)
+        except (ValueError, struct.error):
+            logger.warning(f"Skipping segment with a corrupt header: {path}")
+            return np.zeros(0, dtype=SEGMENT_DTYPE)
+        offset = f.tell()
+    n_records = (os.path.getsize(path) - offset) // dtype.itemsize
+    if n_records == 0:
+        return np.zeros(0, dtype=SEGMENT_DTYPE)
+    records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n_records,))
+    if dtype == SEGMENT_DTYPE:
+        return records
+
+    converted = np.zeros(n_records, dtype=SEGMENT_DTYPE)
+    for name in SEGMENT_DTYPE.names:
+        if name in dtype.names:
+            converted[name] = records[name]
+        else:
+            converted[name] = SEGMENT_DEFAULTS.get(name, 0)
+    return converted
+
+
+def list_segments(
+    directory: str,
+    include_open: bool = False,
+    include_ingested: bool = False,
+) -> List[str]:
+    """
+    Segments not yet ingested, oldest first. Open segments are only listed
+    with `include_open`, e.g. to recover the log of a crashed run, and
+    ingested ones with `include_ingested`, e.g. to analyze the whole log.
+    """
+    if not os.path.isdir(directory):
+        return []
+    suffixes = (SEGMENT_SUFFIX,)
+    if include_open:
+        suffixes += (OPEN_SUFFIX,)
+    if include_ingested:
+        suffixes += (INGESTED_SUFFIX,)
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(suffixes)
+    )
+
+
+def iter_segment_records(
+    directory: str,
+    experiment_id: Optional[int] = None,
+    include_open: bool = True,
+    include_ingested: bool = False,
+) -> Iterator[Tuple[np.ndarray, List[Optional[str]]]]:
+    """Records and labels of every segment with records of `experiment_id`."""
+    for path in list_segments(directory, include_open=include_open, include_ingested=include_ingested):
+        records = read_segment(path)
+        if experiment_id is not None:
+            records = records[records["experiment_id"] == experiment_id]
+        if records.size:
+            yield records, read_labels(path)
+
+
+def records_to_frame(records: np.ndarray, labels: Optional[List[Optional[str]]] = None) -> MeasurementFrame:
+    columns = {name: records[name] for name in SEGMENT_DTYPE.names}
+    for name in LABEL_FIELDS:
+        columns[name] = _decode_labels(records[name], labels or [None])
+    return MeasurementFrame(id=np.full(records.size, -1, dtype=np.int64), **columns)
+
+
+def read_measurement_frame(
+    directory: str,
+    experiment_id: Optional[int] = None,
+    include_ingested: bool = False,
+) -> MeasurementFrame:
+    """
+    All measurements in the segments of `directory`, without touching SQLite.
+    With `include_ingested`, also those already copied into the database.
+    """
+    return MeasurementFrame.concat([
+        records_to_frame(records, labels)
+        for records, labels in iter_segment_records(directory, experiment_id, include_ingested=include_ingested)
+    ])
+
+
+def read_measurements(
+    directory: str,
+    experiment_id: Optional[int] = None,
+    include_ingested: bool = False,
+) -> List[Measurement]:
+    return read_measurement_frame(directory, experiment_id, include_ingested).to_measurements()
+
+
+def ingest_segments(
+    conn: sqlite3.Connection,
+    directory: str,
+    include_open: bool = False,
+    chunk_size: int = 100_000,
+) -> int:
+    """
+    Bulk-inserts segment records into the Measurements table with one
+    transaction per segment, then marks the segment as ingested. The
+    segment's name is recorded in IngestedSegments in the same transaction,
+    so a segment whose rename was lost in a crash is not inserted twice.
+    Returns the number of inserted measurements.
+    """
+    sql = """
+    INSERT INTO Measurements (
+      experiment_id, n_input, n_output, ttft, start_time, end_time, status,
+      intended_start_time, error_class, http_status, error_phase,
+      attempt, request_start_time, throttled_time, endpoint, workload_class, batch_size,
+      token_source, send_interval
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    status_values = np.array([status.value for status in STATUSES], dtype=object)
+    error_class_values = np.array([c.value if c else None for c in ERROR_CLASSES], dtype=object)
+    error_phase_values = np.array([p.value if p else None for p in ERROR_PHASES], dtype=object)
+    token_source_values = np.array([t.value if t else None for t in TOKEN_SOURCES], dtype=object)
+    total = 0
+    for path in list_segments(directory, include_open=include_open):
+        name = os.path.basename(_segment_base(path))
+        if conn.execute("SELECT 1 FROM IngestedSegments WHERE name = ?", (name,)).fetchone():
+            logger.info(f"Segment {name} was already ingested")
+            os.replace(path, _segment_base(path) + INGESTED_SUFFIX)
+            continue
+        records = read_segment(path)
+        labels = read_labels(path)
+        with conn:
+            conn.execute(
+                "INSERT INTO IngestedSegments (name, num_measurements) VALUES (?, ?)",
+                (name, int(records.size)),
+            )
+            for start in range(0, records.size, chunk_size):
+                chunk = records[start:start + chunk_size]
+                intended = chunk["intended_start_time"].astype(object)
+                intended[np.isnan(chunk["intended_start_time"])] = None
+                request_start = chunk["request_start_time"].astype(object)
+                request_start[np.isnan(chunk["request_start_time"])] = None
+                http_status = chunk["http_status"].astype(object)
+                http_status[chunk["http_status"] == 0] = None
+                batch_size = chunk["batch_size"].astype(object)
+                batch_size[chunk["batch_size"] == 0] = None
+                send_interval = chunk["send_interval"].astype(object)
+                send_interval[np.isnan(chunk["send_interval"])] = None
+                conn.executemany(sql, zip(
+                    chunk["experiment_id"].tolist(),
+                    chunk["n_input"].tolist(),
+                    chunk["n_output"].tolist(),
+                    chunk["ttft"].tolist(),
+                    chunk["start_time"].tolist(),
+                    chunk["end_time"].tolist(),
+                    status_values[chunk["status"]].tolist(),
+                    intended.tolist(),
+                    error_class_values[chunk["error_class"]].tolist(),
+                    http_status.tolist(),
+                    error_phase_values[chunk["error_phase"]].tolist(),
+                    chunk["attempt"].tolist(),
+                    request_start.tolist(),
+                    chunk["throttled_time"].tolist(),
+                    _decode_labels(chunk["endpoint"], labels).tolist(),
+                    _decode_labels(chunk["workload_class"], labels).tolist(),
+                    batch_size.tolist(),
+                    token_source_values[chunk["token_source"]].tolist(),
+                    send_interval.tolist(),
+                ))
+        total += records.size
+        del records
+        os.replace(path, _segment_base(path) + INGESTED_SUFFIX)
+    return total
@@ -2,7 +2,49 @@ from compressa.perf.db.writer import DBWriterThread
 
 _db_writer_singleton: DBWriterThread = None
 
+TABLE_NAMES = (
+    "Experiments",
+    "Parameters",
+    "Metrics",
+    "Measurements",
+    "Histograms",
+    "WindowMetrics",
+    "MeasurementRollups",
+    "MetricFingerprints",
+    "GroupMetrics",
+    "Samples",
+    "IngestedSegments",
+)
+
+# Columns added to existing tables after their initial schema.
+# New databases get them through the same migration, so the column
+# order is identical for old and new files.
+EXTRA_COLUMNS = {
+    "Measurements": (
+        ("intended_start_time", "REAL"),
+        ("error_class", "TEXT"),
+        ("http_status", "INTEGER"),
+        ("error_phase", "TEXT"),
+        ("attempt", "INTEGER NOT NULL DEFAULT 1"),
+        ("request_start_time", "REAL"),
+        ("throttled_time", "REAL NOT NULL DEFAULT 0"),
+        ("endpoint", "TEXT"),
+        ("workload_class", "TEXT"),
+        ("batch_size", "INTEGER"),
+        ("token_source", "TEXT"),
+        ("send_interval", "REAL"),
+    ),
+}
+
+# Indexes added after the initial schema, created by migrate_tables
+EXTRA_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_measurements_experiment_end ON Measurements (experiment_id, end_time)",
+)
+
 def create_tables(conn):
+    # Only takes effect for a new database; lets retention return freed pages
+    # with a cheap incremental vacuum instead of rewriting the whole file
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
     with conn:
         conn.execute("""
             CREATE TABLE IF NOT EXISTS Experiments (
@@ -47,8 +89,134 @@ def create_tables(conn):
                 FOREIGN KEY (experiment_id) REFERENCES Experiments(id)
             );
         """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS Histograms (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment_id INTEGER NOT NULL,
+                metric_name TEXT NOT NULL,
+                histogram_data BLOB NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (experiment_id) REFERENCES Experiments(id)
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS WindowMetrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment_id INTEGER NOT NULL,
+                window_index INTEGER NOT NULL,
+                window_start REAL NOT NULL,
+                window_end REAL NOT NULL,
+                num_requests INTEGER NOT NULL,
+                failed_requests INTEGER NOT NULL,
+                ttft REAL NOT NULL,
+                ttft_95 REAL NOT NULL,
+                ttft_95_corrected REAL NOT NULL,
+                latency REAL NOT NULL,
+                latency_95 REAL NOT NULL,
+                latency_95_corrected REAL NOT NULL,
+                tpot REAL NOT NULL,
+                throughput REAL NOT NULL,
+                throughput_input_tokens REAL NOT NULL,
+                throughput_output_tokens REAL NOT NULL,
+                rps REAL NOT NULL,
+                avg_n_input REAL NOT NULL,
+                avg_n_output REAL NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (experiment_id) REFERENCES Experiments(id)
+            );
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_window_metrics_experiment_start
+                ON WindowMetrics (experiment_id, window_start);
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS MeasurementRollups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment_id INTEGER NOT NULL,
+                bucket_start REAL NOT NULL,
+                bucket_seconds REAL NOT NULL,
+                num_requests INTEGER NOT NULL,
+                failed_requests INTEGER NOT NULL,
+                sum_ttft REAL NOT NULL,
+                sum_latency REAL NOT NULL,
+                max_ttft REAL NOT NULL,
+                max_latency REAL NOT NULL,
+                sum_n_input INTEGER NOT NULL,
+                sum_n_output INTEGER NOT NULL,
+                ttft_histogram BLOB NOT NULL,
+                latency_histogram BLOB NOT NULL,
+                FOREIGN KEY (experiment_id) REFERENCES Experiments(id),
+                UNIQUE (experiment_id, bucket_start)
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS MetricFingerprints (
+                experiment_id INTEGER PRIMARY KEY,
+                num_measurements INTEGER NOT NULL,
+                max_measurement_id INTEGER NOT NULL,
+                analyzer_version TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (experiment_id) REFERENCES Experiments(id)
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS GroupMetrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment_id INTEGER NOT NULL,
+                group_by TEXT NOT NULL,
+                group_value TEXT NOT NULL,
+                metric_name TEXT NOT NULL,
+                metric_value REAL NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (experiment_id) REFERENCES Experiments(id)
+            );
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_group_metrics_experiment
+                ON GroupMetrics (experiment_id, group_by);
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS Samples (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment_id INTEGER NOT NULL,
+                timestamp REAL NOT NULL,
+                source TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value REAL NOT NULL,
+                FOREIGN KEY (experiment_id) REFERENCES Experiments(id)
+            );
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_samples_experiment_timestamp
+                ON Samples (experiment_id, timestamp);
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS IngestedSegments (
+                name TEXT PRIMARY KEY,
+                num_measurements INTEGER NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+    migrate_tables(conn)
     print("Tables created successfully.")
 
+
+def migrate_tables(conn):
+    """
+    Adds the columns from EXTRA_COLUMNS and the indexes from EXTRA_INDEXES
+    that are missing in an existing database.
+    """
+    with conn:
+        for table, columns in EXTRA_COLUMNS.items():
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for name, decl in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+        for statement in EXTRA_INDEXES:
+            conn.execute(statement)
+
 def start_db_writer(db_path: str):
     """
     Initializes the global DBWriterThread if it's not already started.
@@ -6,14 +6,30 @@ from typing import Any, Optional
 from compressa.perf.db.db_inserts import (
     direct_insert_measurement,
     direct_insert_metric,
+    direct_insert_group_metric,
     direct_insert_parameter,
+    direct_insert_histogram,
+    direct_insert_window_metrics,
+    direct_insert_sample,
+)
+from compressa.perf.data.models import (
+    Measurement,
+    Metric,
+    GroupMetric,
+    Parameter,
+    MetricHistogram,
+    WindowMetrics,
+    Sample,
 )
-from compressa.perf.data.models import Measurement, Metric, Parameter
 
 class WriteItemType:
     MEASUREMENT = "measurement"
     METRIC = "metric"
+    GROUP_METRIC = "group_metric"
     PARAMETER = "parameter"
+    HISTOGRAM = "histogram"
+    WINDOW_METRICS = "window_metrics"
+    SAMPLE = "sample"
 
 @dataclass
 class DBWriteItem:
@@ -71,8 +87,16 @@ class DBWriterThread:
             direct_insert_measurement(conn, item.item_data)
         elif item.item_type == WriteItemType.METRIC:
             direct_insert_metric(conn, item.item_data)
+        elif item.item_type == WriteItemType.GROUP_METRIC:
+            direct_insert_group_metric(conn, item.item_data)
         elif item.item_type == WriteItemType.PARAMETER:
             direct_insert_parameter(conn, item.item_data)
+        elif item.item_type == WriteItemType.HISTOGRAM:
+            direct_insert_histogram(conn, item.item_data)
+        elif item.item_type == WriteItemType.WINDOW_METRICS:
+            direct_insert_window_metrics(conn, item.item_data)
+        elif item.item_type == WriteItemType.SAMPLE:
+            direct_insert_sample(conn, item.item_data)
 
     def stop(self):
         self.running = False
@@ -87,9 +111,21 @@ class DBWriterThread:
     def push_metric(self, metric: Metric):
         self.queue.put(DBWriteItem(WriteItemType.METRIC, metric))
 
+    def push_group_metric(self, metric: GroupMetric):
+        self.queue.put(DBWriteItem(WriteItemType.GROUP_METRIC, metric))
+
     def push_parameter(self, parameter: Parameter):
         self.queue.put(DBWriteItem(WriteItemType.PARAMETER, parameter))
 
+    def push_histogram(self, histogram: MetricHistogram):
+        self.queue.put(DBWriteItem(WriteItemType.HISTOGRAM, histogram))
+
+    def push_window_metrics(self, window: WindowMetrics):
+        self.queue.put(DBWriteItem(WriteItemType.WINDOW_METRICS, window))
+
+    def push_sample(self, sample: Sample):
+        self.queue.put(DBWriteItem(WriteItemType.SAMPLE, sample))
+
     def wait_for_write(self, timeout: float = 10.0) -> bool:
         e = threading.Event()
 
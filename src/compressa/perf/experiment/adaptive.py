@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from compressa.perf.data.models import Measurement, Status
+from compressa.perf.experiment.comparison import (
+    bootstrap_mean,
+    bootstrap_quantile,
+)
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+ADAPTIVE_METRICS = ("ttft", "latency", "tpot")
+ADAPTIVE_STATS = ("mean", "p50", "p90", "p95", "p99")
+DEFAULT_PRECISION_TARGET = "ttft_p95=0.05"
+
+
+@dataclass
+class PrecisionTarget:
+    """
+    Required precision of one statistic: relative half-width of its
+    confidence interval, e.g. `ttft_p95=0.05` for +-5% around the p95 TTFT.
+    """
+    metric: str
+    stat: str
+    rel_half_width: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.metric}_{self.stat}"
+
+    @classmethod
+    def parse(cls, spec: str) -> "PrecisionTarget":
+        name, _, value = spec.partition("=")
+        metric, _, stat = name.strip().lower().rpartition("_")
+        if metric not in ADAPTIVE_METRICS or stat not in ADAPTIVE_STATS or not value:
+            raise ValueError(
+                f"Invalid precision target '{spec}'. Expected METRIC_STAT=VALUE with METRIC in "
+                f"{ADAPTIVE_METRICS} and STAT in {ADAPTIVE_STATS}, e.g. {DEFAULT_PRECISION_TARGET}"
+            )
+        return cls(metric=metric, stat=stat, rel_half_width=float(value))
+
+
+class AdaptiveStopping:
+    """
+    Decides when an experiment has collected enough measurements: every
+    `check_every` completed requests, bootstrap confidence intervals of the
+    target statistics are computed from the successful measurements so far,
+    and the run stops once every target precision is met.
+    """
+
+    def __init__(
+        self,
+        targets: List[PrecisionTarget],
+        min_tasks: int = 100,
+        check_every: int = 50,
+        confidence: float = 0.95,
+        n_boot: int = 1000,
+        seed: int = 42,
+    ):
+        if not targets:
+            raise ValueError("At least one precision target is required")
+        self.targets = targets
+        self.min_tasks = min_tasks
+        self.check_every = max(1, check_every)
+        self.confidence = confidence
+        self.n_boot = n_boot
+        self.rng = np.random.default_rng(seed)
+        self.achieved: Dict[str, float] = {}
+        self.converged = False
+        self.num_completed = 0
+
+    def _values(self, measurements: List[Measurement], metric: str) -> np.ndarray:
+        if metric == "ttft":
+            return np.array([m.ttft for m in measurements], dtype=np.float64)
+        latency = np.array([m.end_time - m.start_time for m in measurements], dtype=np.float64)
+        if metric == "latency":
+            return latency
+        n_output = np.array([m.n_output for m in measurements], dtype=np.float64)
+        return latency[n_output > 0] / n_output[n_output > 0]
+
+    def relative_half_width(self, values: np.ndarray, stat: str) -> float:
+        if values.size < 2:
+            return float("inf")
+        if stat == "mean":
+            point, replicates = bootstrap_mean(values, self.n_boot, self.rng)
+        else:
+            point, replicates = bootstrap_quantile(values, int(stat[1:]) / 100, self.n_boot, self.rng)
+        alpha = (1 - self.confidence) / 2
+        low, high = np.quantile(replicates, [alpha, 1 - alpha])
+        if point == 0:
+            return float("inf")
+        return float((high - low) / 2 / abs(point))
+
+    def precision(self, measurements: List[Measurement]) -> Dict[str, float]:
+        successes = [m for m in measurements if m.status == Status.SUCCESS]
+        return {
+            target.name: self.relative_half_width(self._values(successes, target.metric), target.stat)
+            for target in self.targets
+        }
+
+    def should_stop(self, measurements: List[Measurement]) -> bool:
+        """Called after each completed request with all measurements so far."""
+        self.num_completed = len(measurements)
+        if self.num_completed < self.min_tasks or self.num_completed % self.check_every:
+            return False
+        self.achieved = self.precision(measurements)
+        self.converged = all(
+            self.achieved[target.name] <= target.rel_half_width for target in self.targets
+        )
+        logger.info(
+            f"Adaptive check after {self.num_completed} requests: "
+            + ", ".join(f"{name}={value:.4f}" for name, value in self.achieved.items())
+        )
+        return self.converged
+
+    def finalize(self, measurements: List[Measurement]):
+        """Recomputes precision on the final set of measurements."""
+        self.num_completed = len(measurements)
+        self.achieved = self.precision(measurements)
+        self.converged = all(
+            self.achieved[target.name] <= target.rel_half_width for target in self.targets
+        )
+
+    def parameters(self, max_num_tasks: int) -> Dict[str, str]:
+        """
+        Parameters of the stopped run; `num_tasks` is the number of requests
+        completed and `max_num_tasks` the cap the run could have gone up to.
+        """
+        params = {
+            "num_tasks": str(self.num_completed),
+            "max_num_tasks": str(max_num_tasks),
+            "adaptive_targets": ",".join(f"{t.name}={t.rel_half_width}" for t in self.targets),
+            "adaptive_converged": str(self.converged).lower(),
+            "adaptive_confidence": str(self.confidence),
+        }
+        for name, value in self.achieved.items():
+            params[f"precision_{name}"] = f"{value:.6f}"
+        return params
+
+
+def build_adaptive_stopping(
+    precision_targets: Optional[List[str]] = None,
+    min_tasks: int = 100,
+    check_every: int = 50,
+    seed: int = 42,
+) -> AdaptiveStopping:
+    targets = [PrecisionTarget.parse(spec) for spec in (precision_targets or [DEFAULT_PRECISION_TARGET])]
+    return AdaptiveStopping(targets, min_tasks=min_tasks, check_every=check_every, seed=seed)
@@ -1,172 +1,342 @@
 import sqlite3
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
-import statistics
+import numpy as np
 from compressa.perf.db.operations import (
-    fetch_measurements_by_experiment,
+    fetch_measurement_frame,
     fetch_metrics_by_experiment,
+    insert_group_metric,
     insert_metric,
-    insert_parameter
+    insert_parameter,
+    insert_histogram,
 )
 from compressa.perf.data.models import (
+    GroupMetric,
     Measurement,
     Metric,
+    MetricHistogram,
     MetricName,
     Parameter,
-    Status,
+    TokenSource,
 )
+from compressa.perf.data.histogram import LogHistogram
+from compressa.perf.data.frame import ERROR_CLASSES, TOKEN_SOURCE_CODES, MeasurementFrame, as_frame
+from compressa.perf.db.segments import read_measurement_frame
 from compressa.utils import get_logger
 
 logger = get_logger(__name__)
 
+Measurements = Union[List[Measurement], MeasurementFrame]
+
+# Bump whenever a metric definition changes, so that stored metrics are recomputed
+ANALYZER_VERSION = "7"
+
+# Measurement columns metrics are also broken down by
+GROUP_COLUMNS = ("endpoint", "workload_class")
+
 class Analyzer:
+    """
+    Computes experiment metrics. Every `compute_*` method accepts either a
+    list of `Measurement` or a `MeasurementFrame`; lists are converted once
+    and all computations run on the frame columns.
+    """
+
     def __init__(self, conn: sqlite3.Connection):
         self.conn = conn
 
-    def compute_average_ttft(self, measurements: List[Measurement]) -> float:
+    def compute_average_ttft(self, measurements: Measurements) -> float:
         """Average time to first token for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for TTFT.")
             return 0.0
-        
-        total_ttft = sum(m.ttft for m in measurements)
-        return total_ttft / len(measurements)
+        return float(successes.ttft.mean())
 
-    def compute_q95_ttft(self, measurements: List[Measurement]) -> float:
+    def compute_q95_ttft(self, measurements: Measurements) -> float:
         """95th percentile time to first token for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for 95th percentile TTFT.")
             return 0.0
-        ttfts = sorted(m.ttft for m in measurements)
-        n = len(ttfts)
-        index = 0.95 * (n - 1)
-        lower = int(index)
-        upper = lower + 1
-        if upper >= n:
-            return ttfts[lower]
-        return ttfts[lower] + (ttfts[upper] - ttfts[lower]) * (index - lower)
+        return float(np.percentile(successes.ttft, 95))
+
+    def _top_5_mean(self, values: np.ndarray) -> float:
+        """Mean of the slowest 5% (from index int(0.95 * n) of the sorted values)."""
+        n = values.size
+        cutoff_index = int(0.95 * n)  # start of the top 5% slice
+        if cutoff_index >= n:
+            return 0.0
+        return float(np.partition(values, cutoff_index)[cutoff_index:].mean())
 
-    def compute_top_5_ttft(self, measurements: List[Measurement]) -> float:
+    def compute_top_5_ttft(self, measurements: Measurements) -> float:
         """
         Average TTFT of the slowest 5% of successful requests.
         If fewer than 20 successful measurements exist, the top 5%
         may be 1 request or none if the slice is empty—handle that edge.
         """
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for top 5% TTFT.")
             return 0.0
-        
-        ttfts = sorted(m.ttft for m in measurements)
-        n = len(ttfts)
-        cutoff_index = int(0.95 * n)  # start of the top 5% slice
-        if cutoff_index >= n:
-            # Edge case: if n=1, .95*(n-1) might be 0. 
-            # but usually you'd see at least 1 item anyway
-            return 0.0
-        
-        top_5_ttfts = ttfts[cutoff_index:]
-        return sum(top_5_ttfts) / len(top_5_ttfts)
+        return self._top_5_mean(successes.ttft)
 
-    def compute_average_latency(self, measurements: List[Measurement]) -> float:
+    def compute_average_latency(self, measurements: Measurements) -> float:
         """Average latency for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for average latency.")
             return 0.0
-        total_latency = sum((m.end_time - m.start_time) for m in measurements)
-        return total_latency / len(measurements)
+        return float(successes.latency.mean())
 
-    def compute_q95_latency(self, measurements: List[Measurement]) -> float:
+    def compute_q95_latency(self, measurements: Measurements) -> float:
         """95th percentile latency for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for 95th percentile latency.")
             return 0.0
-        latencies = sorted((m.end_time - m.start_time) for m in measurements)
-        n = len(latencies)
-        index = 0.95 * (n - 1)
-        lower = int(index)
-        upper = lower + 1
-        if upper >= n:
-            return latencies[lower]
-        return latencies[lower] + (latencies[upper] - latencies[lower]) * (index - lower)
+        return float(np.percentile(successes.latency, 95))
 
-    def compute_top_5_latency(self, measurements: List[Measurement]) -> float:
+    def compute_top_5_latency(self, measurements: Measurements) -> float:
         """
         Average latency of the slowest 5% of successful requests.
         """
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for top 5% latency.")
             return 0.0
-        latencies = sorted((m.end_time - m.start_time) for m in measurements)
-        n = len(latencies)
-        cutoff_index = int(0.95 * n)
-        if cutoff_index >= n:
+        return self._top_5_mean(successes.latency)
+
+    def compute_corrected_samples(
+        self,
+        measurements: Measurements,
+        use_ttft: bool = False,
+    ) -> np.ndarray:
+        """
+        Latency (or TTFT) samples corrected for coordinated omission.
+
+        Each successful request is measured from its intended start time.
+        In closed-loop runs, when a runner was blocked past the intended
+        start, the requests it should have sent meanwhile (one per send
+        interval of that runner) are added as if they had waited for it to
+        free up. Open-loop runs (stress, replay) send every queued request
+        anyway, so their wait is only counted once, in the gap.
+        Measurements without intended start times are left as is.
+        """
+        successes = as_frame(measurements).successes()
+        if not len(successes):
+            return np.zeros(0)
+        start = successes.start_time
+        end = successes.end_time
+        intended = np.where(np.isnan(successes.intended_start_time), start, successes.intended_start_time)
+        if use_ttft:
+            base = successes.ttft
+        else:
+            base = end - start
+
+        gap = np.maximum(start - intended, 0.0)
+        interval = successes.send_interval
+        closed_loop = interval > 0  # False for NaN
+        if not np.any(closed_loop):
+            return base + gap
+
+        # Omitted sends at intended + k * interval for k >= 1 while before the actual start
+        n_omitted = np.zeros(len(successes), dtype=np.int64)
+        n_omitted[closed_loop] = np.maximum(
+            np.ceil(gap[closed_loop] / interval[closed_loop]).astype(np.int64) - 1, 0
+        )
+        owners = np.repeat(np.arange(len(successes)), n_omitted)
+        k = np.arange(owners.size) - np.repeat(np.cumsum(n_omitted) - n_omitted, n_omitted) + 1
+        omitted = base[owners] + gap[owners] - k * interval[owners]
+        return np.concatenate([base + gap, omitted])
+
+    def compute_q95_ttft_corrected(self, measurements: Measurements) -> float:
+        """95th percentile TTFT corrected for coordinated omission."""
+        samples = self.compute_corrected_samples(measurements, use_ttft=True)
+        if samples.size == 0:
+            logger.warning("No successful measurements found for corrected 95th percentile TTFT.")
             return 0.0
-        top_5_latencies = latencies[cutoff_index:]
-        return sum(top_5_latencies) / len(top_5_latencies)
+        return float(np.percentile(samples, 95))
 
-    def compute_average_time_per_output_token(self, measurements: List[Measurement]) -> float:
+    def compute_q95_latency_corrected(self, measurements: Measurements) -> float:
+        """95th percentile latency corrected for coordinated omission."""
+        samples = self.compute_corrected_samples(measurements)
+        if samples.size == 0:
+            logger.warning("No successful measurements found for corrected 95th percentile latency.")
+            return 0.0
+        return float(np.percentile(samples, 95))
+
+    def compute_omitted_requests(self, measurements: Measurements) -> int:
+        """Number of requests that should have been sent while runners were blocked."""
+        successes = as_frame(measurements).successes()
+        return int(self.compute_corrected_samples(successes).size - len(successes))
+
+    def compute_concurrency(self, measurements: Measurements) -> np.ndarray:
+        """
+        Number of requests in flight (including itself) when each successful
+        request started. Failed requests count as in flight too.
+        """
+        frame = as_frame(measurements)
+        starts = np.sort(frame.start_time)
+        ends = np.sort(frame.end_time)
+        successes = frame.start_time[frame.success]
+        return (
+            np.searchsorted(starts, successes, side="right")
+            - np.searchsorted(ends, successes, side="right")
+        )
+
+    def compute_rate_fits(self, measurements: Measurements) -> List[Dict[str, float]]:
+        """
+        Least squares fits per concurrency bucket (powers of two) of
+          TTFT = prefill_overhead + n_input * prefill_time_per_token
+          LATENCY - TTFT = decode_overhead + n_output * decode_time_per_token
+        Buckets without variation in token counts get NaN slopes.
+        """
+        frame = as_frame(measurements)
+        successes = frame.successes()
+        if not len(successes):
+            return []
+        concurrency = np.maximum(self.compute_concurrency(frame), 1)
+        buckets = np.floor(np.log2(concurrency)).astype(np.int64)
+        ttft = successes.ttft
+        decode = successes.latency - successes.ttft
+        n_input = successes.n_input.astype(np.float64)
+        n_output = successes.n_output.astype(np.float64)
+
+        def fit(x, y):
+            count = np.bincount(buckets, minlength=buckets.max() + 1).astype(np.float64)
+            sx = np.bincount(buckets, x)
+            sy = np.bincount(buckets, y)
+            sxx = np.bincount(buckets, x * x)
+            sxy = np.bincount(buckets, x * y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                var = sxx - sx * sx / count
+                slope = np.where(var > 1e-9 * np.maximum(sxx, 1.0), (sxy - sx * sy / count) / var, np.nan)
+                intercept = (sy - np.nan_to_num(slope) * sx) / count
+            return count, slope, intercept
+
+        count, prefill_slope, prefill_intercept = fit(n_input, ttft)
+        _, decode_slope, decode_intercept = fit(n_output, decode)
+        return [
+            {
+                "concurrency": float(2 ** b),
+                "count": float(count[b]),
+                "prefill_overhead": float(prefill_intercept[b]),
+                "prefill_time_per_token": float(prefill_slope[b]),
+                "decode_overhead": float(decode_intercept[b]),
+                "decode_time_per_token": float(decode_slope[b]),
+            }
+            for b in np.nonzero(count)[0]
+        ]
+
+    def compute_prefill_decode_rates(self, measurements: Measurements) -> Dict[str, float]:
+        """
+        Prefill and decode rates (request-weighted over concurrency buckets),
+        fixed overhead and residual queueing delay from compute_rate_fits.
+        """
+        result = {
+            MetricName.PREFILL_RATE.value: 0.0,
+            MetricName.DECODE_RATE.value: 0.0,
+            MetricName.FIXED_OVERHEAD.value: 0.0,
+            MetricName.QUEUEING_DELAY.value: 0.0,
+        }
+        frame = as_frame(measurements)
+        fits = self.compute_rate_fits(frame)
+        if not fits:
+            logger.warning("No successful measurements found for prefill/decode rates.")
+            return result
+
+        def weighted_rate(key):
+            valid = [f for f in fits if np.isfinite(f[key]) and f[key] > 0]
+            if not valid:
+                return 0.0
+            per_token = sum(f[key] * f["count"] for f in valid) / sum(f["count"] for f in valid)
+            return 1.0 / per_token
+
+        result[MetricName.PREFILL_RATE.value] = weighted_rate("prefill_time_per_token")
+        result[MetricName.DECODE_RATE.value] = weighted_rate("decode_time_per_token")
+
+        # Unloaded prefill model: the lowest concurrency bucket
+        lowest = fits[0]
+        slope = lowest["prefill_time_per_token"]
+        slope = slope if np.isfinite(slope) else 0.0
+        result[MetricName.FIXED_OVERHEAD.value] = lowest["prefill_overhead"]
+        successes = frame.successes()
+        residuals = successes.ttft - (lowest["prefill_overhead"] + slope * successes.n_input)
+        result[MetricName.QUEUEING_DELAY.value] = float(np.mean(residuals))
+        return result
+
+    def compute_rate_fit_metrics(self, measurements: Measurements) -> Dict[str, Dict[str, float]]:
+        """
+        Prefill and decode rates and fixed overhead of each concurrency bucket
+        of compute_rate_fits, keyed by the bucket's lowest concurrency.
+        Rates whose fit has no slope are left out, and buckets without any.
+        """
+        result = {}
+        for fit in self.compute_rate_fits(measurements):
+            metrics = {}
+            for name, key in (
+                (MetricName.PREFILL_RATE, "prefill_time_per_token"),
+                (MetricName.DECODE_RATE, "decode_time_per_token"),
+            ):
+                if np.isfinite(fit[key]) and fit[key] > 0:
+                    metrics[name.value] = 1.0 / fit[key]
+            if metrics:
+                metrics[MetricName.FIXED_OVERHEAD.value] = fit["prefill_overhead"]
+                result[f"{fit['concurrency']:g}"] = metrics
+        return result
+
+    def compute_average_time_per_output_token(self, measurements: Measurements) -> float:
         """Average total latency per output token for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for time per output token.")
             return 0.0
-        total_latency = sum((m.end_time - m.start_time) for m in measurements)
-        total_output_tokens = sum(m.n_output for m in measurements)
+        total_latency = float(successes.latency.sum())
+        total_output_tokens = int(successes.n_output.sum())
         return total_latency / total_output_tokens if total_output_tokens > 0 else 0.0
 
-    def compute_throughput(self, measurements: List[Measurement]) -> float:
+    def _success_duration(self, successes: MeasurementFrame) -> float:
+        """Time from the earliest start_time to the latest end_time."""
+        return float(successes.end_time.max() - successes.start_time.min())
+
+    def compute_throughput(self, measurements: Measurements) -> float:
         """
         Tokens (input + output) per second across all successful requests,
         measured from the earliest start_time to the latest end_time.
         """
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for throughput.")
             return 0.0
-        total_input_tokens = sum(m.n_input for m in measurements)
-        total_output_tokens = sum(m.n_output for m in measurements)
-        total_tokens = total_input_tokens + total_output_tokens
-        experiment_start_time = min(m.start_time for m in measurements)
-        experiment_end_time = max(m.end_time for m in measurements)
-        total_time = experiment_end_time - experiment_start_time
+        total_tokens = int(successes.n_input.sum()) + int(successes.n_output.sum())
+        total_time = self._success_duration(successes)
         return total_tokens / total_time if total_time > 0 else 0.0
 
-    def compute_throughput_input_tokens(self, measurements: List[Measurement]) -> float:
+    def compute_throughput_input_tokens(self, measurements: Measurements) -> float:
         """Input tokens per second for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for throughput input tokens.")
             return 0.0
-        total_input_tokens = sum(m.n_input for m in measurements)
-        experiment_start_time = min(m.start_time for m in measurements)
-        experiment_end_time = max(m.end_time for m in measurements)
-        total_time = experiment_end_time - experiment_start_time
-        return total_input_tokens / total_time if total_time > 0 else 0.0
+        total_time = self._success_duration(successes)
+        return int(successes.n_input.sum()) / total_time if total_time > 0 else 0.0
 
-    def compute_throughput_output_tokens(self, measurements: List[Measurement]) -> float:
+    def compute_throughput_output_tokens(self, measurements: Measurements) -> float:
         """Output tokens per second for successful requests."""
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for throughput output tokens.")
             return 0.0
-        total_output_tokens = sum(m.n_output for m in measurements)
-        experiment_start_time = min(m.start_time for m in measurements)
-        experiment_end_time = max(m.end_time for m in measurements)
-        total_time = experiment_end_time - experiment_start_time
-        return total_output_tokens / total_time if total_time > 0 else 0.0
+        total_time = self._success_duration(successes)
+        return int(successes.n_output.sum()) / total_time if total_time > 0 else 0.0
 
-    def compute_input_output_stats(self, measurements: List[Measurement]) -> Dict[str, float]:
+    def compute_input_output_stats(self, measurements: Measurements) -> Dict[str, float]:
         """
-        Basic stats on the number of input/output tokens for successful requests.
+        Basic stats on the number of input/output tokens for successful requests,
+        and the share of them counted on the client, if any.
         """
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for input/output stats.")
             return {
                 "avg_n_input": 0.0,
@@ -174,70 +344,83 @@ class Analyzer:
                 "avg_n_output": 0.0,
                 "std_n_output": 0.0
             }
-        n_inputs = [m.n_input for m in measurements]
-        n_outputs = [m.n_output for m in measurements]
-        
-        return {
-            "avg_n_input": statistics.mean(n_inputs),
-            "std_n_input": statistics.stdev(n_inputs) if len(n_inputs) > 1 else 0.0,
-            "avg_n_output": statistics.mean(n_outputs),
-            "std_n_output": statistics.stdev(n_outputs) if len(n_outputs) > 1 else 0.0
+        n_inputs = successes.n_input.astype(np.float64)
+        n_outputs = successes.n_output.astype(np.float64)
+
+        stats = {
+            "avg_n_input": float(n_inputs.mean()),
+            "std_n_input": float(n_inputs.std(ddof=1)) if n_inputs.size > 1 else 0.0,
+            "avg_n_output": float(n_outputs.mean()),
+            "std_n_output": float(n_outputs.std(ddof=1)) if n_outputs.size > 1 else 0.0
         }
+        client_counted = successes.token_source == TOKEN_SOURCE_CODES[TokenSource.CLIENT]
+        if np.any(client_counted):
+            stats["client_counted_share"] = float(np.mean(client_counted))
+        return stats
 
-    def compute_rps(self, measurements: List[Measurement]) -> float:
+    def count_uncounted_requests(self, measurements: Measurements) -> int:
+        """
+        Successful requests without token counts: the server returned no usage
+        and tokens were not counted on the client.
+        """
+        successes = as_frame(measurements).successes()
+        uncounted = (
+            (successes.token_source == TOKEN_SOURCE_CODES[None])
+            & (successes.n_input == 0)
+            & (successes.n_output == 0)
+        )
+        return int(np.count_nonzero(uncounted))
+
+    def compute_rps(self, measurements: Measurements) -> float:
         """
         Requests per second (RPS) for successful requests:
         number of successful requests / (max(end_time) - min(start_time)).
         """
-        measurements = [m for m in measurements if m.status == Status.SUCCESS]
-        if not measurements:
+        successes = as_frame(measurements).successes()
+        if not len(successes):
             logger.warning("No successful measurements found for RPS.")
             return 0.0
-        experiment_start_time = min(m.start_time for m in measurements)
-        experiment_end_time = max(m.end_time for m in measurements)
-        total_time = experiment_end_time - experiment_start_time
-        return len(measurements) / total_time if total_time > 0 else 0.0
+        total_time = self._success_duration(successes)
+        return len(successes) / total_time if total_time > 0 else 0.0
 
-    def compute_longer_than_60_latency(self, measurements: List[Measurement]) -> int:
+    def _count_longer_than(self, measurements: Measurements, seconds: float) -> int:
+        successes = as_frame(measurements).successes()
+        return int(np.count_nonzero(successes.latency > seconds))
+
+    def compute_longer_than_60_latency(self, measurements: Measurements) -> int:
         """
         Count how many successful requests took more than 60 seconds.
         """
-        successes = [m for m in measurements if m.status == Status.SUCCESS]
-        if not successes:
-            return 0
-        return sum(1 for m in successes if (m.end_time - m.start_time) > 60)
+        return self._count_longer_than(measurements, 60)
 
-    def compute_longer_than_120_latency(self, measurements: List[Measurement]) -> int:
+    def compute_longer_than_120_latency(self, measurements: Measurements) -> int:
         """
         Count how many successful requests took more than 120 seconds.
         """
-        successes = [m for m in measurements if m.status == Status.SUCCESS]
-        return sum(1 for m in successes if (m.end_time - m.start_time) > 120)
+        return self._count_longer_than(measurements, 120)
 
-    def compute_longer_than_180_latency(self, measurements: List[Measurement]) -> int:
+    def compute_longer_than_180_latency(self, measurements: Measurements) -> int:
         """
         Count how many successful requests took more than 180 seconds.
         """
-        successes = [m for m in measurements if m.status == Status.SUCCESS]
-        return sum(1 for m in successes if (m.end_time - m.start_time) > 180)
+        return self._count_longer_than(measurements, 180)
 
-    def compute_failed_requests(self, measurements: List[Measurement]) -> int:
+    def compute_failed_requests(self, measurements: Measurements) -> int:
         """
         Count total failed requests (status == FAILURE).
         """
-        return sum(1 for m in measurements if m.status == Status.FAILED)
+        return int(np.count_nonzero(as_frame(measurements).failed))
 
-    def compute_failed_requests_per_hour(self, measurements: List[Measurement]) -> float:
+    def compute_failed_requests_per_hour(self, measurements: Measurements) -> float:
         """
         Number of failed requests per hour = (total failed / total experiment time in hours).
         """
-        if not measurements:
+        frame = as_frame(measurements)
+        if not len(frame):
             return 0.0
 
-        failed_count = sum(1 for m in measurements if m.status == Status.FAILED)
-        experiment_start_time = min(m.start_time for m in measurements)
-        experiment_end_time = max(m.end_time for m in measurements)
-        total_time_seconds = experiment_end_time - experiment_start_time
+        failed_count = int(np.count_nonzero(frame.failed))
+        total_time_seconds = float(frame.end_time.max() - frame.start_time.min())
 
         if total_time_seconds <= 0:
             return 0.0
@@ -246,14 +429,172 @@ class Analyzer:
         return failed_count / total_time_hours
 
 
-    def compute_metrics(self, experiment_id: int):
-        measurements = fetch_measurements_by_experiment(self.conn, experiment_id)
-        if not measurements:
+    def compute_time_to_failure(self, measurements: Measurements) -> np.ndarray:
+        """
+        Seconds from sending each failed request until it failed. Older
+        versions stored this duration instead of the failure timestamp as the
+        end time, which is recognised by an end time before the start time.
+        """
+        failures = as_frame(measurements)
+        failures = failures[failures.failed]
+        return np.where(
+            failures.end_time < failures.start_time,
+            failures.end_time,
+            failures.end_time - failures.start_time,
+        )
+
+    def compute_failure_breakdown(self, measurements: Measurements) -> Dict[str, float]:
+        """
+        Failed requests per error class, as a count (FAILED_<CLASS>) and as a
+        share of all requests (FAILED_<CLASS>_RATE), for the classes that
+        occurred, plus the mean and 95th percentile time to failure. Retried
+        attempts are not requests and are left out of the rates.
+        """
+        frame = as_frame(measurements)
+        time_to_failure = self.compute_time_to_failure(frame)
+        result = {
+            MetricName.TIME_TO_FAILURE.value: float(time_to_failure.mean()) if time_to_failure.size else 0.0,
+            MetricName.TIME_TO_FAILURE_95.value: (
+                float(np.percentile(time_to_failure, 95)) if time_to_failure.size else 0.0
+            ),
+        }
+        n_requests = len(frame) - int(np.count_nonzero(frame.retried))
+        if not n_requests:
+            return result
+        counts = np.bincount(frame.error_class[frame.failed], minlength=len(ERROR_CLASSES))
+        for code, error_class in enumerate(ERROR_CLASSES):
+            if error_class is None or not counts[code]:
+                continue
+            result[f"FAILED_{error_class.name}"] = int(counts[code])
+            result[f"FAILED_{error_class.name}_RATE"] = counts[code] / n_requests
+        return result
+
+    def compute_retry_stats(self, measurements: Measurements) -> Dict[str, float]:
+        """
+        Retried attempts, total time waited before retries and the latency of
+        successful requests measured from their first attempt. Empty if no
+        attempt was retried, since the latency is then the plain one.
+        """
+        frame = as_frame(measurements)
+        retries = int(np.count_nonzero(frame.retried))
+        if not retries:
+            return {}
+        final = frame.requests()
+        successes = final.successes()
+        latencies = successes.latency_with_retries
+        return {
+            MetricName.RETRIES.value: retries,
+            MetricName.THROTTLED_TIME.value: float(final.throttled_time.sum()),
+            MetricName.LATENCY_WITH_RETRIES.value: float(latencies.mean()) if latencies.size else 0.0,
+            MetricName.LATENCY_WITH_RETRIES_95.value: (
+                float(np.percentile(latencies, 95)) if latencies.size else 0.0
+            ),
+        }
+
+    def compute_batch_metrics(self, measurements: Measurements) -> Dict[str, float]:
+        """
+        Metrics of embeddings and rerank requests, which return all results at
+        once: latency per batch, documents and input tokens per second, and
+        the failure and retry metrics shared with chat completions.
+        """
+        frame = as_frame(measurements)
+        successes = frame.successes()
+        duration = self._success_duration(successes) if len(successes) else 0.0
+        latencies = successes.latency
+        docs = int(successes.batch_size.sum())
+        return {
+            MetricName.LATENCY.value: self.compute_average_latency(frame),
+            MetricName.LATENCY_95.value: self.compute_q95_latency(frame),
+            MetricName.LATENCY_95_CORRECTED.value: self.compute_q95_latency_corrected(frame),
+            MetricName.LATENCY_PER_DOC.value: (
+                float(np.mean(latencies / np.maximum(successes.batch_size, 1))) if len(successes) else 0.0
+            ),
+            MetricName.DOCS_PER_SECOND.value: docs / duration if duration > 0 else 0.0,
+            MetricName.THROUGHPUT_INPUT_TOKENS.value: self.compute_throughput_input_tokens(frame),
+            MetricName.RPS.value: self.compute_rps(frame),
+            MetricName.FAILED_REQUESTS.value: self.compute_failed_requests(frame),
+            MetricName.FAILED_REQUESTS_PER_HOUR.value: self.compute_failed_requests_per_hour(frame),
+            MetricName.OMITTED_REQUESTS.value: self.compute_omitted_requests(frame),
+            **self.compute_failure_breakdown(frame),
+            **self.compute_retry_stats(frame),
+        }
+
+    def compute_histograms(self, measurements: Measurements) -> Dict[str, LogHistogram]:
+        """
+        Log-bucketed histograms of TTFT, latency and per-request time per
+        output token for successful requests, and of the time to failure of
+        failed ones. Percentiles, CDFs and merges across experiments can later
+        be computed from these alone.
+        """
+        frame = as_frame(measurements)
+        histograms = {}
+        successes = frame.successes()
+        if len(successes):
+            latencies = successes.latency
+            has_output = successes.n_output > 0
+            tpots = latencies[has_output] / successes.n_output[has_output]
+            histograms.update({
+                MetricName.TTFT.value: LogHistogram.from_values(successes.ttft),
+                MetricName.LATENCY.value: LogHistogram.from_values(latencies),
+                MetricName.TPOT.value: LogHistogram.from_values(tpots),
+            })
+        time_to_failure = self.compute_time_to_failure(frame)
+        if time_to_failure.size:
+            histograms[MetricName.TIME_TO_FAILURE.value] = LogHistogram.from_values(time_to_failure)
+        return histograms
+
+    def compute_group_metrics(
+        self,
+        measurements: Measurements,
+    ) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Metrics of each group of measurements sharing a value of one of
+        `GROUP_COLUMNS`, e.g. of each endpoint: {column: {value: metrics}}.
+        A column is only broken down if it has at least two distinct values.
+        Runs spanning several concurrency buckets also get the rates of each
+        bucket under "concurrency".
+        """
+        frame = as_frame(measurements)
+        result = {}
+        for column in GROUP_COLUMNS:
+            values = getattr(frame, column)
+            distinct = sorted({v for v in values.tolist() if v is not None})
+            if len(distinct) < 2:
+                continue
+            groups = {}
+            for value in distinct:
+                metrics, _ = self.compute_metrics_for_measurements(frame[values == value])
+                if metrics:
+                    groups[value] = metrics
+            result[column] = groups
+        rate_fits = self.compute_rate_fit_metrics(frame)
+        if len(rate_fits) >= 2:
+            result["concurrency"] = rate_fits
+        return result
+
+    def compute_metrics(self, experiment_id: int, measurement_log: Optional[str] = None):
+        """
+        Computes and stores the metrics of an experiment. Measurements are read
+        from the segment files in `measurement_log` if given, ingested or not,
+        else from SQLite.
+        """
+        if measurement_log is not None:
+            measurements = read_measurement_frame(measurement_log, experiment_id, include_ingested=True)
+        else:
+            measurements = fetch_measurement_frame(self.conn, experiment_id)
+        if not len(measurements):
             raise ValueError(f"No measurements found for experiment_id {experiment_id}")
 
         metrics_dict, io_stats = self.compute_metrics_for_measurements(measurements)
         if not metrics_dict:
             raise ValueError(f"No successful measurements found for experiment_id {experiment_id}")
+        uncounted = self.count_uncounted_requests(measurements)
+        if uncounted:
+            logger.warning(
+                f"{uncounted} successful requests of experiment {experiment_id} have no token counts "
+                f"(no usage in the response), so token throughput is understated; "
+                f"run with --count-tokens to count them on the client"
+            )
 
         from datetime import datetime
         now = datetime.now()
@@ -278,11 +619,37 @@ class Analyzer:
             insert_parameter(param)
             # self.conn.commit()
 
+        for base_name, hist in self.compute_histograms(measurements).items():
+            insert_histogram(
+                MetricHistogram(
+                    id=None,
+                    experiment_id=experiment_id,
+                    metric_name=base_name,
+                    histogram_data=hist.to_bytes(),
+                    timestamp=now,
+                )
+            )
+
+        for group_by, groups in self.compute_group_metrics(measurements).items():
+            for group_value, group_metrics in groups.items():
+                for base_name, val in group_metrics.items():
+                    insert_group_metric(
+                        GroupMetric(
+                            id=None,
+                            experiment_id=experiment_id,
+                            group_by=group_by,
+                            group_value=group_value,
+                            metric_name=base_name,
+                            metric_value=val,
+                            timestamp=now,
+                        )
+                    )
+
         return metrics_dict, io_stats
 
     def compute_metrics_for_measurements(
         self,
-        measurements: List[Measurement]
+        measurements: Measurements,
     ) -> Tuple[Dict[str, float], Dict[str, float]]:
         """
         Compute the standard set of metrics on a given subset of measurements.
@@ -292,8 +659,14 @@ class Analyzer:
             io_stats: { "avg_n_input" -> val, "std_n_input" -> val, ... }
         If no measurements exist or all are invalid, returns two empty dicts.
         """
-        if not measurements:
+        measurements = as_frame(measurements)
+        if not len(measurements):
             return {}, {}
+        if np.any(measurements.batch_size > 0):
+            return (
+                self.compute_batch_metrics(measurements),
+                self.compute_input_output_stats(measurements),
+            )
 
         average_ttft = self.compute_average_ttft(measurements)
         q95_ttft = self.compute_q95_ttft(measurements)
@@ -303,6 +676,10 @@ class Analyzer:
         q95_latency = self.compute_q95_latency(measurements)
         top_5_latency = self.compute_top_5_latency(measurements)
 
+        q95_ttft_corrected = self.compute_q95_ttft_corrected(measurements)
+        q95_latency_corrected = self.compute_q95_latency_corrected(measurements)
+        omitted_requests = self.compute_omitted_requests(measurements)
+
         average_time_per_output_token = self.compute_average_time_per_output_token(measurements)
         throughput = self.compute_throughput(measurements)
         throughput_input_tokens = self.compute_throughput_input_tokens(measurements)
@@ -315,14 +692,20 @@ class Analyzer:
         failed_requests = self.compute_failed_requests(measurements)
         failed_requests_per_hour = self.compute_failed_requests_per_hour(measurements)
 
+        rates = self.compute_prefill_decode_rates(measurements)
+        failures = self.compute_failure_breakdown(measurements)
+        retries = self.compute_retry_stats(measurements)
+
         io_stats = self.compute_input_output_stats(measurements)
 
         metrics_dict = {
             MetricName.TTFT.value: average_ttft,
             MetricName.TTFT_95.value: q95_ttft,
+            MetricName.TTFT_95_CORRECTED.value: q95_ttft_corrected,
             MetricName.TOP_5_TTFT.value: top_5_ttft,
             MetricName.LATENCY.value: average_latency,
             MetricName.LATENCY_95.value: q95_latency,
+            MetricName.LATENCY_95_CORRECTED.value: q95_latency_corrected,
             MetricName.TOP_5_LATENCY.value: top_5_latency,
             MetricName.TPOT.value: average_time_per_output_token,
             MetricName.THROUGHPUT.value: throughput,
@@ -334,6 +717,10 @@ class Analyzer:
             MetricName.LONGER_THAN_180_LATENCY.value: longer_than_180_latency,
             MetricName.FAILED_REQUESTS.value: failed_requests,
             MetricName.FAILED_REQUESTS_PER_HOUR.value: failed_requests_per_hour,
+            MetricName.OMITTED_REQUESTS.value: omitted_requests,
+            **rates,
+            **failures,
+            **retries,
         }
 
         return metrics_dict, io_stats
\ No newline at end of file
@@ -0,0 +1,231 @@
+import random
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from tqdm import tqdm
+
+from compressa.perf.data.models import Measurement, Parameter, Status
+from compressa.perf.db.operations import insert_measurement, insert_parameter
+from compressa.perf.experiment.deadlines import RequestDeadlines
+from compressa.perf.experiment.inference import classify_error, error_phase
+from compressa.perf.experiment.retry import RetryPolicy
+from compressa.perf.experiment.routing import EndpointRouter
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class BatchInferenceRunner(ABC):
+    """
+    Sends batches of documents to a non-streaming endpoint and measures each
+    request. The whole response arrives at once, so TTFT equals the latency;
+    the input tokens are taken from the usage reported by the server and the
+    number of documents is stored as the batch size.
+    """
+
+    # Name of the API and path of its endpoint, set by each subclass
+    api: str
+    path: str
+
+    def __init__(
+        self,
+        api_key: str,
+        openai_url: str,
+        model_name: str,
+        retry_policy: Optional[RetryPolicy] = None,
+        deadlines: Optional[RequestDeadlines] = None,
+        router: Optional[EndpointRouter] = None,
+        max_connections: int = 200,
+    ):
+        self.model_name = model_name
+        self.router = router or EndpointRouter([openai_url])
+        self.retry_policy = retry_policy
+        self.deadlines = deadlines or RequestDeadlines()
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections // 2,
+            ),
+            timeout=self.deadlines.http_timeout(),
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+
+    @abstractmethod
+    def payload(self, documents: List[str], query: Optional[str]) -> dict:
+        """JSON body of a request for `documents`."""
+
+    def run_request(
+        self,
+        experiment_id: int,
+        documents: List[str],
+        query: Optional[str] = None,
+        intended_start_time: Optional[float] = None,
+    ) -> List[Measurement]:
+        """
+        Sends one batch, retrying it according to `retry_policy`.
+        Returns the measurements of all attempts, the final one last.
+        """
+        def send(intended: Optional[float]) -> Tuple[Measurement, Optional[Exception]]:
+            return self._run_inference(experiment_id, documents, query, intended)
+
+        if self.retry_policy is None:
+            return [send(intended_start_time)[0]]
+        return self.retry_policy.run(send, intended_start_time)
+
+    def _run_inference(
+        self,
+        experiment_id: int,
+        documents: List[str],
+        query: Optional[str],
+        intended_start_time: Optional[float],
+    ) -> Tuple[Measurement, Optional[Exception]]:
+        """The measurement of one attempt and the error it failed with, if any."""
+        start_time = time.time()
+        if intended_start_time is None:
+            intended_start_time = start_time
+        endpoint = self.router.acquire()
+        url = self.router.urls[endpoint]
+        try:
+            response = self.http_client.post(
+                url.rstrip("/") + self.path,
+                json=self.payload(documents, query),
+            )
+            response.raise_for_status()
+            usage = response.json().get("usage") or {}
+            end_time = time.time()
+            return Measurement(
+                id=None,
+                experiment_id=experiment_id,
+                n_input=usage.get("prompt_tokens") or usage.get("total_tokens") or 0,
+                n_output=0,
+                ttft=end_time - start_time,
+                start_time=start_time,
+                end_time=end_time,
+                status=Status.SUCCESS,
+                intended_start_time=intended_start_time,
+                endpoint=url,
+                batch_size=len(documents),
+            ), None
+        except Exception as e:
+            end_time = time.time()
+            error_class, http_status = classify_error(e)
+            phase = error_phase(e, first_token_received=False)
+            logger.error(
+                f"{self.api} request to {url} failed ({error_class.value}, {phase.value}): {e}. "
+                f"time to failure: {end_time - start_time}s"
+            )
+            return Measurement.failed(
+                experiment_id=experiment_id,
+                n_input=-1,
+                n_output=-1,
+                ttft=0.0,
+                start_time=start_time,
+                end_time=end_time,
+                intended_start_time=intended_start_time,
+                error_class=error_class,
+                http_status=http_status,
+                error_phase=phase,
+                endpoint=url,
+                batch_size=len(documents),
+            ), e
+        finally:
+            self.router.release(endpoint)
+
+
+class EmbeddingsRunner(BatchInferenceRunner):
+    """OpenAI-compatible `/embeddings` requests."""
+
+    api = "embeddings"
+    path = "/embeddings"
+
+    def payload(self, documents: List[str], query: Optional[str]) -> dict:
+        return {"model": self.model_name, "input": documents}
+
+
+class RerankRunner(BatchInferenceRunner):
+    """`/rerank` requests scoring a batch of documents against a query (vLLM, Jina and Cohere style)."""
+
+    api = "rerank"
+    path = "/rerank"
+
+    def payload(self, documents: List[str], query: Optional[str]) -> dict:
+        return {"model": self.model_name, "query": query or "", "documents": documents}
+
+
+BATCH_RUNNERS = {runner.api: runner for runner in (EmbeddingsRunner, RerankRunner)}
+
+
+class BatchExperimentRunner:
+    """
+    Sends `num_tasks` batches of `batch_size` documents drawn from a pool,
+    with `num_runners` concurrent runners sharing one batch runner.
+    """
+
+    def __init__(self, runner: BatchInferenceRunner, num_runners: int = 10):
+        self.runner = runner
+        self.num_runners = num_runners
+
+    def run_experiment(
+        self,
+        experiment_id: int,
+        documents: List[str],
+        num_tasks: int = 100,
+        batch_size: int = 1,
+        query: Optional[str] = None,
+        seed: int = 42,
+        show_progress: bool = True,
+    ) -> List[Measurement]:
+        choise_generator = random.Random(seed)
+        batches = [
+            [choise_generator.choice(documents) for _ in range(batch_size)]
+            for _ in range(num_tasks)
+        ]
+        all_measurements = []
+        with ThreadPoolExecutor(max_workers=self.num_runners) as executor:
+            futures = [
+                executor.submit(self.runner.run_request, experiment_id, batch, query)
+                for batch in batches
+            ]
+            for future in tqdm(
+                as_completed(futures),
+                total=num_tasks,
+                desc=f"Running {self.runner.api} batches of {batch_size}",
+                disable=not show_progress,
+            ):
+                try:
+                    attempts = future.result()
+                except Exception as e:
+                    logger.error(f"Task failed: {e}")
+                    continue
+                all_measurements.extend(attempts)
+
+        for measurement in all_measurements:
+            insert_measurement(measurement)
+        return all_measurements
+
+    def store_experiment_parameters(
+        self,
+        experiment_id: int,
+        num_tasks: int,
+        batch_size: int,
+        extra: Optional[Dict[str, str]] = None,
+    ):
+        parameters = {
+            "api": self.runner.api,
+            "num_workers": str(self.num_runners),
+            "num_tasks": str(num_tasks),
+            "batch_size": str(batch_size),
+            "model_name": self.runner.model_name,
+            "openai_url": self.runner.router.urls[0],
+            **self.runner.deadlines.parameters(),
+        }
+        if self.runner.retry_policy is not None:
+            parameters.update(self.runner.retry_policy.parameters())
+        if len(self.runner.router.urls) > 1:
+            parameters.update(self.runner.router.parameters())
+        parameters.update(extra or {})
+        for key, value in parameters.items():
+            insert_parameter(Parameter(id=None, experiment_id=experiment_id, key=key, value=value))
@@ -0,0 +1,239 @@
+import sqlite3
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compressa.perf.data.models import MetricName, Status
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_N_BOOT = 2000
+DEFAULT_CONFIDENCE = 0.95
+COMPARE_QUANTILES = (0.5, 0.95, 0.99)
+
+# Above this many resampled values the bootstrap distribution of the mean
+# is taken from its normal limit instead of explicit resampling.
+MEAN_RESAMPLE_BUDGET = 20_000_000
+
+# Metrics where a higher value is a regression
+HIGHER_IS_WORSE = {
+    MetricName.TTFT.value,
+    MetricName.TPOT.value,
+    MetricName.LATENCY.value,
+}
+
+
+@dataclass
+class ExperimentSamples:
+    """Per-request samples of the successful requests of one experiment."""
+    experiment_id: int
+    ttft: np.ndarray
+    latency: np.ndarray
+    tpot: np.ndarray
+    tokens: np.ndarray
+    duration: float
+
+    @property
+    def size(self) -> int:
+        return self.latency.size
+
+
+@dataclass
+class ComparisonRow:
+    metric: str
+    stat: str
+    value_a: float
+    ci_a_low: float
+    ci_a_high: float
+    value_b: float
+    ci_b_low: float
+    ci_b_high: float
+    rel_diff: float
+    rel_diff_low: float
+    rel_diff_high: float
+    p_value: float
+    significant: bool
+    regression: bool
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def load_experiment_samples(
+    conn: sqlite3.Connection,
+    experiment_id: int,
+    chunk_size: int = 100_000,
+) -> ExperimentSamples:
+    """
+    Bulk-loads the measurement columns needed for comparison into NumPy arrays.
+    """
+    sql = """
+        SELECT ttft, start_time, end_time, n_input, n_output
+          FROM Measurements
+         WHERE experiment_id = ? AND status = ?
+    """
+    cur = conn.cursor()
+    cur.execute(sql, (experiment_id, Status.SUCCESS.value))
+    chunks = []
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.float64))
+    data = np.concatenate(chunks) if chunks else np.zeros((0, 5))
+
+    ttft, start, end, n_input, n_output = data.T
+    latency = end - start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tpot = latency[n_output > 0] / n_output[n_output > 0]
+    duration = float(end.max() - start.min()) if data.size else 0.0
+    return ExperimentSamples(
+        experiment_id=experiment_id,
+        ttft=ttft,
+        latency=latency,
+        tpot=tpot,
+        tokens=n_input + n_output,
+        duration=duration,
+    )
+
+
+def bootstrap_quantile(
+    values: np.ndarray,
+    q: float,
+    n_boot: int,
+    rng: np.random.Generator,
+) -> Tuple[float, np.ndarray]:
+    """
+    Point estimate and bootstrap replicates of the q-quantile.
+
+    The k-th order statistic of a resample of n values is
+    sorted[floor(n * U)] with U ~ Beta(k, n - k + 1), so replicates are
+    drawn exactly without materializing any resample.
+    """
+    x = np.sort(values)
+    n = x.size
+    k = min(max(int(np.ceil(q * n)), 1), n)
+    u = rng.beta(k, n - k + 1, size=n_boot)
+    replicates = x[np.minimum((u * n).astype(np.int64), n - 1)]
+    return float(x[k - 1]), replicates
+
+
+def bootstrap_mean(
+    values: np.ndarray,
+    n_boot: int,
+    rng: np.random.Generator,
+) -> Tuple[float, np.ndarray]:
+    """Point estimate and bootstrap replicates of the mean."""
+    n = values.size
+    mean = float(values.mean())
+    if n * n_boot > MEAN_RESAMPLE_BUDGET:
+        std_err = float(values.std(ddof=1)) / np.sqrt(n) if n > 1 else 0.0
+        return mean, mean + std_err * rng.standard_normal(n_boot)
+
+    replicates = np.empty(n_boot)
+    chunk = max(1, MEAN_RESAMPLE_BUDGET // (10 * n))
+    for i in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - i)
+        replicates[i:i + size] = values[rng.integers(0, n, size=(size, n))].mean(axis=1)
+    return mean, replicates
+
+
+def _interval(replicates: np.ndarray, confidence: float) -> Tuple[float, float]:
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(replicates, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def _compare(
+    metric: str,
+    stat: str,
+    estimate_a: Tuple[float, np.ndarray],
+    estimate_b: Tuple[float, np.ndarray],
+    confidence: float,
+) -> ComparisonRow:
+    value_a, rep_a = estimate_a
+    value_b, rep_b = estimate_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = (rep_b - rep_a) / rep_a
+        rel_diff = (value_b - value_a) / value_a if value_a else float("nan")
+    rel = rel[np.isfinite(rel)]
+    if rel.size:
+        rel_low, rel_high = _interval(rel, confidence)
+        p_value = float(min(1.0, 2 * min((rel <= 0).mean(), (rel >= 0).mean())))
+    else:
+        rel_low, rel_high, p_value = float("nan"), float("nan"), 1.0
+    significant = bool(rel.size and (rel_low > 0 or rel_high < 0))
+    worse = rel_diff > 0 if metric in HIGHER_IS_WORSE else rel_diff < 0
+    ci_a = _interval(rep_a, confidence)
+    ci_b = _interval(rep_b, confidence)
+    return ComparisonRow(
+        metric=metric,
+        stat=stat,
+        value_a=value_a,
+        ci_a_low=ci_a[0],
+        ci_a_high=ci_a[1],
+        value_b=value_b,
+        ci_b_low=ci_b[0],
+        ci_b_high=ci_b[1],
+        rel_diff=rel_diff,
+        rel_diff_low=rel_low,
+        rel_diff_high=rel_high,
+        p_value=p_value,
+        significant=significant,
+        regression=bool(significant and worse),
+    )
+
+
+def compare_samples(
+    a: ExperimentSamples,
+    b: ExperimentSamples,
+    n_boot: int = DEFAULT_N_BOOT,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: Optional[int] = 42,
+) -> List[ComparisonRow]:
+    """
+    Bootstrap confidence intervals of mean and p50/p95/p99 of TTFT, TPOT and
+    latency and of total throughput for two experiments, plus the relative
+    difference (B vs A) and its significance.
+    """
+    if a.size == 0 or b.size == 0:
+        raise ValueError("Both experiments need successful measurements to compare")
+    rng = np.random.default_rng(seed)
+    rows = []
+    for metric, values_a, values_b in (
+        (MetricName.TTFT.value, a.ttft, b.ttft),
+        (MetricName.TPOT.value, a.tpot, b.tpot),
+        (MetricName.LATENCY.value, a.latency, b.latency),
+    ):
+        if values_a.size == 0 or values_b.size == 0:
+            logger.warning(f"Not enough samples to compare {metric}")
+            continue
+        rows.append(_compare(
+            metric, "mean",
+            bootstrap_mean(values_a, n_boot, rng),
+            bootstrap_mean(values_b, n_boot, rng),
+            confidence,
+        ))
+        for q in COMPARE_QUANTILES:
+            rows.append(_compare(
+                metric, f"p{int(q * 100)}",
+                bootstrap_quantile(values_a, q, n_boot, rng),
+                bootstrap_quantile(values_b, q, n_boot, rng),
+                confidence,
+            ))
+
+    # Throughput = resampled total tokens over the (fixed) experiment duration
+    if a.duration > 0 and b.duration > 0:
+        mean_a, rep_a = bootstrap_mean(a.tokens, n_boot, rng)
+        mean_b, rep_b = bootstrap_mean(b.tokens, n_boot, rng)
+        scale_a = a.size / a.duration
+        scale_b = b.size / b.duration
+        rows.append(_compare(
+            MetricName.THROUGHPUT.value, "total",
+            (mean_a * scale_a, rep_a * scale_a),
+            (mean_b * scale_b, rep_b * scale_b),
+            confidence,
+        ))
+    return rows
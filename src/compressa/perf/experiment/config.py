@@ -2,12 +2,16 @@ import yaml
 from typing import (
     List,
     Dict,
+    Union,
 )
 from dataclasses import dataclass
 
+from compressa.perf.experiment.workloads import WorkloadClass
+
 @dataclass
 class ExperimentConfig:
-    openai_url: str
+    # One URL, or several to spread the requests over
+    openai_url: Union[str, List[str]]
     api_key: str
     model_name: str
     experiment_name: str
@@ -23,6 +27,33 @@ class ExperimentConfig:
     report_file: str = None
     report_mode: str = "pdf"
     seed: int = 42
+    adaptive: bool = False
+    precision_targets: List[str] = None
+    min_tasks: int = 100
+    check_every: int = 50
+    max_attempts: int = 1
+    retry_backoff_sec: float = 0.5
+    retry_max_backoff_sec: float = 30.0
+    retry_budget: float = None
+    connect_timeout: float = None
+    ttft_timeout: float = None
+    idle_timeout: float = None
+    request_timeout: float = None
+    routing: str = "round_robin"
+    endpoint_weights: List[float] = None
+    # Client-side token counting for servers that return no usage
+    count_tokens: bool = False
+    tokenizer: str = None
+    chars_per_token: float = None
+    # Mixed workload: requests are drawn from these classes instead of one prompt pool
+    workloads: List[WorkloadClass] = None
+
+    def __post_init__(self):
+        if self.workloads:
+            self.workloads = [
+                w if isinstance(w, WorkloadClass) else WorkloadClass(**w)
+                for w in self.workloads
+            ]
 
 def load_yaml_configs(file_path: str) -> List[ExperimentConfig]:
     with open(file_path, 'r') as file:
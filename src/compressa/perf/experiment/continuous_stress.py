@@ -5,29 +5,53 @@ import threading
 import random
 import sqlite3
 from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from compressa.perf.experiment.inference import InferenceRunner
 from compressa.perf.experiment.analysis import Analyzer
+from compressa.perf.experiment.deadlines import RequestDeadlines
+from compressa.perf.experiment.retry import RetryPolicy
+from compressa.perf.experiment.routing import EndpointRouter
+from compressa.perf.experiment.tokens import TokenCounter
 from compressa.perf.data.models import (
     Measurement,
-    Metric,
     Parameter,
-    Status,
     MetricName,
+    WindowMetrics,
 )
-from compressa.perf.db.operations import insert_measurement, insert_parameter, insert_metric
+from compressa.perf.db.operations import (
+    insert_measurement,
+    insert_parameter,
+    insert_window_metrics,
+    fetch_measurement_frame,
+)
+from compressa.perf.db.retention import RetentionPolicy, apply_retention
+from compressa.perf.db.segments import SegmentWriter, ingest_segments
+from compressa.perf.monitoring.prometheus import RequestListener
 from compressa.utils import get_logger
 
 logger = get_logger(__name__)
 
+# Seconds to wait after a window ends before computing its metrics
+WINDOW_GRACE_SEC = 2.0
+# Requests waiting for a free worker, per worker; the scheduler pauses beyond
+# that, so the queue and the wait counted in corrected latencies stay bounded
+MAX_QUEUED_PER_RUNNER = 1
+
 
 class ContinuousStressTestRunner:
     """
     Runs inference requests continuously. Every 'report_freq_min' minutes,
     it computes metrics on the last window of measurements and stores them
-    in DB with a suffix like "ttft_window_1", etc. Also prints them in real-time.
+    in the WindowMetrics table. Also prints them in real-time.
+    With a `retention` policy, raw measurements older than its retention
+    period are rolled up and pruned after each window. With a
+    `measurement_log`, measurements are appended to segment files and bulk
+    ingested into SQLite before each window is computed. `listeners` receive
+    every request, e.g. to serve live metrics. Failed requests are retried
+    according to `retry_policy`, and requests past their `deadlines` aborted.
+    With a `router`, requests are spread over several endpoints.
     """
 
     def __init__(
@@ -42,6 +66,13 @@ class ContinuousStressTestRunner:
         max_tokens: int,
         report_freq_min: float,
         seed: int = 42,
+        retention: Optional[RetentionPolicy] = None,
+        measurement_log: Optional[SegmentWriter] = None,
+        listeners: Optional[List[RequestListener]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        deadlines: Optional[RequestDeadlines] = None,
+        router: Optional[EndpointRouter] = None,
+        token_counter: Optional[TokenCounter] = None,
     ):
         self.db_path = db_path
         self.api_key = api_key
@@ -53,6 +84,13 @@ class ContinuousStressTestRunner:
         self.num_runners = num_runners
         self.max_tokens = max_tokens
         self.report_freq_sec = report_freq_min * 60
+        self.retention = retention
+        self.measurement_log = measurement_log
+        self.listeners = listeners
+        self.retry_policy = retry_policy
+        self.deadlines = deadlines
+        self.router = router
+        self.token_counter = token_counter
         self.running = True
 
         self.experiment_start_ts = time.time()
@@ -67,10 +105,16 @@ class ContinuousStressTestRunner:
           2) A metrics thread computing windowed metrics every report_freq_sec
         """
         self.executor = ThreadPoolExecutor(max_workers=self.num_runners)
+        self.backlog = threading.BoundedSemaphore(self.num_runners * (1 + MAX_QUEUED_PER_RUNNER))
         self.inference_runner = InferenceRunner(
             api_key=self.api_key,
             openai_url=self.openai_url,
             model_name=self.model_name,
+            listeners=self.listeners,
+            retry_policy=self.retry_policy,
+            deadlines=self.deadlines,
+            router=self.router,
+            token_counter=self.token_counter,
         )
 
         self._store_continuous_params()
@@ -103,36 +147,56 @@ class ContinuousStressTestRunner:
         Continuously schedule inference tasks in the thread pool.
         """
         while self.running:
+            if not self.backlog.acquire(timeout=1.0):
+                continue
             prompt = self.choise_generator.choice(self.prompts)
-            self.executor.submit(self._do_inference_task, prompt)
+            # The request is intended to start when it is scheduled; any delay
+            # before a worker picks it up is coordinated omission
+            try:
+                future = self.executor.submit(self._do_inference_task, prompt, time.time())
+            except RuntimeError:
+                # The executor was shut down while waiting for a free slot
+                self.backlog.release()
+                break
+            future.add_done_callback(lambda _: self.backlog.release())
             # Short pause to avoid spamming the server too rapidly
             time.sleep(0.01)
 
-    def _do_inference_task(self, prompt: str):
+    def _do_inference_task(self, prompt: str, intended_start_time: float = None):
         """
-        Single inference call. Stores the resulting measurement to DB.
+        Single inference request. Stores the measurements of its attempts to DB.
         """
-        meas: Measurement = self.inference_runner.run_inference(
+        attempts: List[Measurement] = self.inference_runner.run_request(
             experiment_id=self.experiment_id,
             prompt=prompt,
             max_tokens=self.max_tokens,
+            intended_start_time=intended_start_time,
         )
-        insert_measurement(meas)
+        for meas in attempts:
+            if self.measurement_log is not None:
+                self.measurement_log.append(meas)
+            else:
+                insert_measurement(meas)
 
     def _metrics_loop(self):
         """
-        Every 'report_freq_sec', compute metrics for the time window
-        [start, end], store them in the DB (with a suffix), and log them.
+        Every 'report_freq_sec', compute metrics for the last window
+        (start, end], store them in the WindowMetrics table, and log them.
         """
-        
-
         while self.running:
-            time.sleep(self.report_freq_sec)
-
-            window_start = self.experiment_start_ts
-            window_end = self.experiment_start_ts + self.window_count * self.report_freq_sec
+            window_start = self.experiment_start_ts + (self.window_count - 1) * self.report_freq_sec
+            window_end = window_start + self.report_freq_sec
+            # Give the DB writer time to flush measurements finished near the window end
+            delay = window_end + WINDOW_GRACE_SEC - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            if not self.running:
+                break
 
             with sqlite3.connect(self.db_path) as conn:
+                if self.measurement_log is not None:
+                    self.measurement_log.rotate()
+                    ingest_segments(conn, self.measurement_log.directory)
                 analyzer = Analyzer(conn)
                 self._compute_and_store_window_metrics(
                     conn,
@@ -142,6 +206,8 @@ class ContinuousStressTestRunner:
                     self.window_count,
                 )
                 self.window_count += 1
+                if self.retention is not None:
+                    apply_retention(conn, self.experiment_id, self.retention)
 
     def _compute_and_store_window_metrics(
         self,
@@ -152,34 +218,12 @@ class ContinuousStressTestRunner:
         window_index: int,
     ):
         """
-        Fetch measurements in [start_ts, end_ts], compute standard metrics via Analyzer,
-        then store them with a suffix. Also logs them in real time.
-        """
-        cursor = conn.cursor()
-        sql = """
-            SELECT * FROM Measurements
-             WHERE experiment_id = ?
-               AND start_time >= ?
-               AND end_time <= ?
+        Fetch measurements finished in (start_ts, end_ts], compute standard metrics
+        via Analyzer, then store them as one WindowMetrics row. Also logs them in real time.
         """
-        cursor.execute(sql, (self.experiment_id, start_ts, end_ts))
-        rows = cursor.fetchall()
-        measurements = []
-        for row in rows:
-            measurements.append(
-                Measurement(
-                    id=row[0],
-                    experiment_id=row[1],
-                    n_input=row[2],
-                    n_output=row[3],
-                    ttft=row[4],
-                    start_time=row[5],
-                    end_time=row[6],
-                    status=Status(row[7]),
-                )
-            )
+        measurements = fetch_measurement_frame(conn, self.experiment_id, start_ts, end_ts)
 
-        if not measurements:
+        if not len(measurements):
             logger.info(f"No measurements found in window {window_index} ({int(start_ts)}-{int(end_ts)}).")
             return
 
@@ -188,34 +232,35 @@ class ContinuousStressTestRunner:
             logger.info(f"No valid metrics in window {window_index}. Possibly all failed.")
             return
 
-        now = datetime.now()
-
-        for base_name, value in metrics_dict.items():
-            metric_name = f"{base_name}_window_{window_index}"
-            metric = Metric(
-                id=None,
-                experiment_id=self.experiment_id,
-                metric_name=metric_name,
-                metric_value=value,
-                timestamp=now
-            )
-            insert_metric(metric)
-
-        for io_key, io_val in io_stats.items():
-            param_name = f"{io_key}_window_{window_index}"
-            param = Parameter(
-                id=None,
-                experiment_id=self.experiment_id,
-                key=param_name,
-                value=str(io_val)
-            )
-            insert_parameter(param)
+        window = WindowMetrics(
+            id=None,
+            experiment_id=self.experiment_id,
+            window_index=window_index,
+            window_start=start_ts,
+            window_end=end_ts,
+            num_requests=len(measurements.requests()),
+            failed_requests=int(metrics_dict[MetricName.FAILED_REQUESTS.value]),
+            ttft=metrics_dict[MetricName.TTFT.value],
+            ttft_95=metrics_dict[MetricName.TTFT_95.value],
+            ttft_95_corrected=metrics_dict[MetricName.TTFT_95_CORRECTED.value],
+            latency=metrics_dict[MetricName.LATENCY.value],
+            latency_95=metrics_dict[MetricName.LATENCY_95.value],
+            latency_95_corrected=metrics_dict[MetricName.LATENCY_95_CORRECTED.value],
+            tpot=metrics_dict[MetricName.TPOT.value],
+            throughput=metrics_dict[MetricName.THROUGHPUT.value],
+            throughput_input_tokens=metrics_dict[MetricName.THROUGHPUT_INPUT_TOKENS.value],
+            throughput_output_tokens=metrics_dict[MetricName.THROUGHPUT_OUTPUT_TOKENS.value],
+            rps=metrics_dict[MetricName.RPS.value],
+            avg_n_input=io_stats["avg_n_input"],
+            avg_n_output=io_stats["avg_n_output"],
+            timestamp=datetime.now(),
+        )
+        insert_window_metrics(window)
 
-        avg_ttft = metrics_dict.get(MetricName.TTFT.value, 0.0)
-        avg_lat = metrics_dict.get(MetricName.LATENCY.value, 0.0)
-        rps = metrics_dict.get(MetricName.RPS.value, 0.0)
-        fails = metrics_dict.get(MetricName.FAILED_REQUESTS.value, 0.0)
-        logger.info(f"[Window {window_index}] TTFT={avg_ttft:.3f}s, LAT={avg_lat:.3f}s, RPS={rps:.3f}, FAILS={fails}")
+        logger.info(
+            f"[Window {window_index}] TTFT={window.ttft:.3f}s, LAT={window.latency:.3f}s, "
+            f"RPS={window.rps:.3f}, FAILS={window.failed_requests}"
+        )
 
     def _store_continuous_params(self):
         """
@@ -229,6 +274,19 @@ class ContinuousStressTestRunner:
             ("model_name", self.model_name),
             ("openai_url", self.openai_url),
         ]
+        if self.retention is not None:
+            param_list += [
+                ("retention_hours", str(self.retention.raw_retention_hours)),
+                ("rollup_interval_sec", str(self.retention.rollup_interval_sec)),
+            ]
+        if self.retry_policy is not None:
+            param_list += list(self.retry_policy.parameters().items())
+        if self.deadlines is not None:
+            param_list += list(self.deadlines.parameters().items())
+        if self.router is not None and len(self.router.urls) > 1:
+            param_list += list(self.router.parameters().items())
+        if self.token_counter is not None:
+            param_list += list(self.token_counter.parameters().items())
         for k, v in param_list:
             p = Parameter(
                 id=None,
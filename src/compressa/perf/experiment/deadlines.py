@@ -0,0 +1,204 @@
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Timeout of every network operation when no deadline is configured
+DEFAULT_TIMEOUT_SEC = 600.0
+
+
+class DeadlineExceeded(Exception):
+    """A streamed request was aborted because one of its deadlines passed."""
+
+    def __init__(self, deadline: str, seconds: float):
+        super().__init__(f"{deadline} deadline of {seconds:g}s exceeded")
+        self.deadline = deadline
+        self.seconds = seconds
+
+
+@dataclass
+class RequestDeadlines:
+    """
+    Per-request deadlines in seconds; None disables one. `connect_sec`
+    bounds establishing the connection, `ttft_sec` the wait for the first
+    token, `idle_sec` the gap between streamed chunks and `total_sec` the
+    whole request.
+    """
+
+    connect_sec: Optional[float] = None
+    ttft_sec: Optional[float] = None
+    idle_sec: Optional[float] = None
+    total_sec: Optional[float] = None
+
+    @property
+    def watched(self) -> bool:
+        """True if a stream has to be watched to enforce the deadlines."""
+        return any(d is not None for d in (self.ttft_sec, self.idle_sec, self.total_sec))
+
+    def _timeout(self, read: float) -> httpx.Timeout:
+        return httpx.Timeout(
+            DEFAULT_TIMEOUT_SEC,
+            connect=self.connect_sec if self.connect_sec is not None else DEFAULT_TIMEOUT_SEC,
+            read=read,
+        )
+
+    def http_timeout(self) -> httpx.Timeout:
+        """
+        Socket timeouts of the HTTP client while a stream is read. A read may
+        wait for the first token or for the next chunk, so the read timeout
+        is the longest of the TTFT and idle deadlines, an unset one counting
+        as the default; otherwise an idle-only deadline would also cut the
+        wait for the first token. It is capped by the total deadline. The
+        watchdog enforces the shorter deadline of each phase.
+        """
+        read = max(self.ttft_sec or DEFAULT_TIMEOUT_SEC, self.idle_sec or DEFAULT_TIMEOUT_SEC)
+        if self.total_sec is not None:
+            read = min(read, self.total_sec)
+        return self._timeout(read)
+
+    def header_deadline(self) -> Optional[str]:
+        """The deadline that bounds the wait for the response headers: the shorter of TTFT and total."""
+        limits = [
+            (value, name)
+            for name, value in (("ttft", self.ttft_sec), ("total", self.total_sec))
+            if value is not None
+        ]
+        return min(limits)[1] if limits else None
+
+    def header_timeout(self) -> httpx.Timeout:
+        """
+        Socket timeouts of a request until its response headers arrive. The
+        watchdog can only abort a stream once it has a response, so a server
+        that never answers is cut by the read timeout instead.
+        """
+        deadline = self.header_deadline()
+        if deadline is None:
+            return self.http_timeout()
+        return self._timeout(self.limit(deadline))
+
+    def expired(self, now: float, start: float, last_chunk: Optional[float]) -> Optional[str]:
+        """Name of the deadline that has passed at monotonic time `now`, if any."""
+        if self.total_sec is not None and now - start > self.total_sec:
+            return "total"
+        if last_chunk is None:
+            if self.ttft_sec is not None and now - start > self.ttft_sec:
+                return "ttft"
+        elif self.idle_sec is not None and now - last_chunk > self.idle_sec:
+            return "idle"
+        return None
+
+    def limit(self, deadline: str) -> float:
+        return {"total": self.total_sec, "ttft": self.ttft_sec, "idle": self.idle_sec}[deadline]
+
+    def parameters(self) -> Dict[str, str]:
+        """Configured deadlines to store with the experiment parameters."""
+        return {
+            f"{name}_timeout_sec": str(value)
+            for name, value in (
+                ("connect", self.connect_sec),
+                ("ttft", self.ttft_sec),
+                ("idle", self.idle_sec),
+                ("total", self.total_sec),
+            )
+            if value is not None
+        }
+
+
+class StreamWatch:
+    """Progress of one streamed request, updated by the thread reading it."""
+
+    __slots__ = ("start", "last_chunk", "response", "expired")
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.last_chunk: Optional[float] = None
+        # The httpx response once the headers have arrived
+        self.response: Optional[httpx.Response] = None
+        self.expired: Optional[str] = None
+
+    def on_chunk(self):
+        self.last_chunk = time.monotonic()
+
+
+def set_read_timeout(response: httpx.Response, seconds: float):
+    """
+    Changes the read timeout of the rest of a streamed response, e.g. from
+    the header timeout to that of the stream. The transport reads it from the
+    request for every chunk.
+    """
+    timeout = response.request.extensions.get("timeout")
+    if timeout is not None:
+        timeout["read"] = seconds
+
+
+def _abort(response: httpx.Response):
+    """
+    Shuts down the socket of a response. Closing the response would not wake
+    a thread blocked reading it; a shutdown makes the read fail at once.
+    """
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is not None:
+        sock.shutdown(socket.SHUT_RDWR)
+
+
+class StreamWatchdog:
+    """
+    Enforces the TTFT, idle and total deadlines of streamed requests from a
+    daemon thread: a stream past one of them is aborted, which frees the
+    runner reading it. Until the response headers arrive there is no stream
+    to abort; the header timeout of the request bounds that wait. Checks run every tenth of the shortest deadline; the
+    thread exits when no stream is left to watch.
+    """
+
+    def __init__(self, deadlines: RequestDeadlines):
+        self.deadlines = deadlines
+        limits = [d for d in (deadlines.ttft_sec, deadlines.idle_sec, deadlines.total_sec) if d is not None]
+        self.interval = min(max(min(limits) / 10, 0.01), 1.0) if limits else 1.0
+        self.watches = set()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def watch(self) -> StreamWatch:
+        watch = StreamWatch()
+        with self.lock:
+            self.watches.add(watch)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return watch
+
+    def release(self, watch: StreamWatch):
+        with self.lock:
+            self.watches.discard(watch)
+
+    def check(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for watch in self.watches:
+                if watch.expired is not None or watch.response is None:
+                    continue
+                deadline = self.deadlines.expired(now, watch.start, watch.last_chunk)
+                if deadline is None:
+                    continue
+                watch.expired = deadline
+                try:
+                    _abort(watch.response)
+                except OSError as e:
+                    logger.debug(f"Failed to abort a stream past its {deadline} deadline: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+            with self.lock:
+                if not self.watches:
+                    self.thread = None
+                    return
@@ -2,17 +2,34 @@ import time
 import logging
 import openai
 import httpx
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional, Tuple
 
 from compressa.perf.data.models import (
+    ErrorClass,
+    ErrorPhase,
     Measurement,
     Parameter,
     Status,
+    TokenSource,
 )
 from compressa.perf.db.operations import (
     insert_measurement,
     insert_parameter,
 )
+from compressa.perf.db.segments import SegmentWriter
+from compressa.perf.experiment.adaptive import AdaptiveStopping
+from compressa.perf.experiment.deadlines import (
+    DeadlineExceeded,
+    RequestDeadlines,
+    StreamWatchdog,
+    set_read_timeout,
+)
+from compressa.perf.experiment.retry import RetryPolicy
+from compressa.perf.experiment.routing import EndpointRouter
+from compressa.perf.experiment.tokens import TokenCounter
+from compressa.perf.experiment.workloads import WorkloadClass, WorkloadMix
+from compressa.perf.monitoring.prometheus import RequestListener
 from compressa.utils import get_logger, stream_chat
 
 import sqlite3
@@ -26,30 +43,180 @@ from tqdm import tqdm
 logger = get_logger(__name__)
 EMPTY_CHUNK_THRESHOLD = 5
 
+
+class EmptyResponseError(Exception):
+    """The stream ended or stalled without a usable first token."""
+
+
+def classify_error(error: Exception) -> Tuple[ErrorClass, Optional[int]]:
+    """Error class of a failed request and the HTTP status, if the server answered."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+    if status_code is not None:
+        if status_code == 429:
+            return ErrorClass.RATE_LIMITED, status_code
+        if status_code >= 500:
+            return ErrorClass.SERVER_ERROR, status_code
+        if status_code >= 400:
+            return ErrorClass.CLIENT_ERROR, status_code
+        return ErrorClass.OTHER, status_code
+    if isinstance(error, EmptyResponseError):
+        return ErrorClass.EMPTY_RESPONSE, None
+    if isinstance(error, DeadlineExceeded):
+        return ErrorClass.TIMEOUT, None
+    # APITimeoutError is an APIConnectionError, TimeoutException a TransportError
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException)):
+        return ErrorClass.TIMEOUT, None
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return ErrorClass.CONNECTION, None
+    return ErrorClass.OTHER, None
+
+
+def error_phase(error: Exception, first_token_received: bool) -> ErrorPhase:
+    """
+    Failures before the connection was established are CONNECT; openai wraps
+    the underlying httpx error as the cause of its own exception.
+    """
+    if first_token_received:
+        return ErrorPhase.MID_STREAM
+    cause = error.__cause__ if isinstance(error, openai.APIConnectionError) else error
+    if isinstance(cause, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return ErrorPhase.CONNECT
+    return ErrorPhase.PRE_FIRST_TOKEN
+
+
 class InferenceRunner:
     def __init__(
         self,
         api_key: str,
         openai_url: str,
         model_name: str,
+        listeners: Optional[List[RequestListener]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        deadlines: Optional[RequestDeadlines] = None,
+        router: Optional[EndpointRouter] = None,
+        force_output_length: bool = False,
+        max_connections: int = 200,
+        token_counter: Optional[TokenCounter] = None,
     ):
+        """
+        Requests go to `openai_url`, or to the endpoints of `router` if given.
+        With `force_output_length`, the server is asked to generate exactly
+        `max_tokens` tokens (`min_tokens` and `ignore_eos`, as supported by
+        vLLM and SGLang). With `token_counter`, tokens of responses without
+        `usage` are counted on the client.
+        """
         self.model_name = model_name
+        self.router = router or EndpointRouter([openai_url])
+        self.force_output_length = force_output_length
+        self.token_counter = token_counter
+        self.listeners = listeners or []
+        self.retry_policy = retry_policy
+        self.deadlines = deadlines or RequestDeadlines()
+        self.watchdog = StreamWatchdog(self.deadlines) if self.deadlines.watched else None
         http_client = httpx.Client(
             limits=httpx.Limits(
-                max_connections=200,
-                max_keepalive_connections=100
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections // 2,
             ),
-            timeout=600.0
+            timeout=self.deadlines.http_timeout(),
         )
-        self.client = openai.OpenAI(api_key=api_key, base_url=openai_url, http_client=http_client)
+        # Retries are done by the retry policy, so that every attempt is measured
+        self.clients = [
+            openai.OpenAI(
+                api_key=api_key,
+                base_url=url,
+                http_client=http_client,
+                max_retries=0,
+            )
+            for url in self.router.urls
+        ]
 
     def run_inference(
         self,
         experiment_id: int,
         prompt: str,
         max_tokens: int,
-    ):
+        intended_start_time: Optional[float] = None,
+        workload: Optional[WorkloadClass] = None,
+    ) -> Measurement:
+        """Sends a single attempt, without retries."""
+        if not self.listeners:
+            return self._run_inference(
+                experiment_id, prompt, max_tokens, intended_start_time, workload=workload
+            )[0]
+
+        for listener in self.listeners:
+            listener.on_request_start()
+        inter_token_latencies = []
+        measurement, _ = self._run_inference(
+            experiment_id,
+            prompt,
+            max_tokens,
+            intended_start_time,
+            inter_token_latencies,
+            workload,
+        )
+        for listener in self.listeners:
+            listener.on_request_end(measurement, inter_token_latencies)
+        return measurement
+
+    def run_request(
+        self,
+        experiment_id: int,
+        prompt: str,
+        max_tokens: int,
+        intended_start_time: Optional[float] = None,
+        workload: Optional[WorkloadClass] = None,
+    ) -> List[Measurement]:
+        """
+        Sends a request, retrying it according to `retry_policy`.
+        Returns the measurements of all attempts, the final one last.
+        """
+        if self.retry_policy is None:
+            return [self.run_inference(experiment_id, prompt, max_tokens, intended_start_time, workload)]
+
+        # Listeners see an attempt once the policy has decided whether it is retried
+        inter_token_latencies = []
+
+        def send(intended: Optional[float]) -> Tuple[Measurement, Optional[Exception]]:
+            inter_token_latencies.clear()
+            for listener in self.listeners:
+                listener.on_request_start()
+            return self._run_inference(
+                experiment_id,
+                prompt,
+                max_tokens,
+                intended,
+                inter_token_latencies if self.listeners else None,
+                workload,
+            )
+
+        def on_attempt(measurement: Measurement):
+            for listener in self.listeners:
+                listener.on_request_end(measurement, inter_token_latencies)
+
+        return self.retry_policy.run(send, intended_start_time, on_attempt)
+
+    def _run_inference(
+        self,
+        experiment_id: int,
+        prompt: str,
+        max_tokens: int,
+        intended_start_time: Optional[float] = None,
+        inter_token_latencies: Optional[List[float]] = None,
+        workload: Optional[WorkloadClass] = None,
+    ) -> Tuple[Measurement, Optional[Exception]]:
+        """
+        The measurement of one attempt and the error it failed with, if any.
+        With a `workload` class, its sampling parameters are sent and the
+        measurement is tagged with its name.
+        """
+        workload_class = workload.name if workload is not None else None
         start_time = time.time()
+        if intended_start_time is None:
+            intended_start_time = start_time
 
         response = None
         first_token_time = -1
@@ -60,8 +227,11 @@ class InferenceRunner:
         error_message = None
         n_input = -1
         n_output = -1
+        last_chunk_time = None
+        endpoint = self.router.acquire()
+        watch = self.watchdog.watch() if self.watchdog is not None else None
         try:
-            response: openai.Stream = self.client.chat.completions.create(
+            response: openai.Stream = self.clients[endpoint].chat.completions.create(
                 model=self.model_name,
                 messages=[{"role": "user", "content": f"{prompt}"}],
                 max_tokens=max_tokens,
@@ -69,7 +239,17 @@ class InferenceRunner:
                 stream_options={
                     'include_usage': True,
                 },
+                **(workload.sampling() if workload is not None else {}),
+                **(
+                    {"extra_body": {"min_tokens": max_tokens, "ignore_eos": True}}
+                    if self.force_output_length else {}
+                ),
+                **({"timeout": self.deadlines.header_timeout()} if watch is not None else {}),
             )
+            if watch is not None:
+                watch.response = response.response
+                # From here the watchdog enforces the deadlines
+                set_read_timeout(response.response, self.deadlines.http_timeout().read)
 
             response_text = ""
             first_token_empty = False
@@ -83,32 +263,48 @@ class InferenceRunner:
                                 first_token_empty = True
                                 continue
                             else:
-                                raise Exception("First token is empty")
+                                raise EmptyResponseError("First token is empty")
                         first_token_time = time.time()
                         ttft = first_token_time - start_time
+                    if watch is not None:
+                        watch.on_chunk()
+                    if inter_token_latencies is not None:
+                        now = time.time()
+                        if last_chunk_time is not None:
+                            inter_token_latencies.append(now - last_chunk_time)
+                        last_chunk_time = now
                     n_chunks += 1
                     response_text += chunk.choices[0].delta.content
                 elif first_token_time == -1 and not chunk.choices[0].delta.content and not getattr(chunk.choices[0].delta, "reasoning_content", None):
                     if start_counter >= EMPTY_CHUNK_THRESHOLD:
                         status = Status.FAILED
-                        raise Exception(f"First token not found in response after {EMPTY_CHUNK_THRESHOLD} empty chunks with no content or reasoning")
+                        raise EmptyResponseError(f"First token not found in response after {EMPTY_CHUNK_THRESHOLD} empty chunks with no content or reasoning")
                     start_counter += 1
                     continue
             end_time = time.time()
             logger.debug(f"Prompt: {prompt}\nResponse text: {response_text}\n{'#' * 100}")
             if not chunk:
-                raise Exception("Chunk not found in response")
+                raise EmptyResponseError("Chunk not found in response")
                 
+            token_source = None
             if not getattr(chunk, "usage", None):
                 usage = None
                 if status == Status.SUCCESS:
-                    logger.warning(f"Usage not found in response when success")
-                    n_input = 0
-                    n_output = 0
+                    if self.token_counter is not None:
+                        n_input = self.token_counter.count_prompt(prompt)
+                        n_output = self.token_counter.count_output(response_text)
+                        token_source = TokenSource.CLIENT
+                    else:
+                        logger.warning(f"Usage not found in response when success, use --count-tokens to count tokens on the client")
+                        n_input = 0
+                        n_output = 0
             else:
                 usage = chunk.usage
                 n_input = usage.prompt_tokens
                 n_output = usage.completion_tokens
+                token_source = TokenSource.SERVER
+                if self.token_counter is not None:
+                    self.token_counter.observe_usage(response_text, n_output)
 
             assert status == Status.SUCCESS
            
@@ -121,20 +317,51 @@ class InferenceRunner:
                 start_time=start_time,
                 end_time=end_time,
                 status=Status.SUCCESS,
-            )
+                intended_start_time=intended_start_time,
+                endpoint=self.router.urls[endpoint],
+                workload_class=workload_class,
+                token_source=token_source,
+            ), None
 
         except Exception as e:
-            end_time = time.time() - start_time
-            logger.error(f"API request failed: {e}.\n ttft: {ttft}s, end_time: {end_time}s, n_chunks: {n_chunks} {response}")
+            end_time = time.time()
+            error = e
+            if watch is not None and watch.response is None and isinstance(e.__cause__, httpx.ReadTimeout):
+                # No headers within the header timeout
+                watch.expired = self.deadlines.header_deadline()
+            if watch is not None and watch.expired is not None:
+                # The watchdog aborted the stream, which surfaces as a connection error
+                error = DeadlineExceeded(watch.expired, self.deadlines.limit(watch.expired))
+                error.__cause__ = e
+            error_class, http_status = classify_error(error)
+            phase = error_phase(error, first_token_time != -1)
+            logger.error(
+                f"API request to {self.router.urls[endpoint]} failed ({error_class.value}, {phase.value}): {error}.\n"
+                f" ttft: {ttft}s, time to failure: {end_time - start_time}s, n_chunks: {n_chunks} {response}"
+            )
             status = Status.FAILED
             return Measurement.failed(
                 experiment_id=experiment_id,
                 n_input=n_input,
-                n_output=n_output,
+                # Tokens streamed before the failure, one per content chunk
+                n_output=n_chunks if n_chunks else n_output,
                 ttft=ttft,
                 start_time=start_time,
                 end_time=end_time,
-            )
+                intended_start_time=intended_start_time,
+                error_class=error_class,
+                http_status=http_status,
+                error_phase=phase,
+                endpoint=self.router.urls[endpoint],
+                workload_class=workload_class,
+            ), error
+
+        finally:
+            if watch is not None:
+                self.watchdog.release(watch)
+            if response is not None:
+                response.close()
+            self.router.release(endpoint)
 
 
 class ExperimentRunner:
@@ -144,11 +371,23 @@ class ExperimentRunner:
         openai_url: str,
         model_name: str,
         num_runners: int = 10,
+        listeners: Optional[List[RequestListener]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        deadlines: Optional[RequestDeadlines] = None,
+        router: Optional[EndpointRouter] = None,
+        token_counter: Optional[TokenCounter] = None,
     ):
         self.api_key = api_key
         self.openai_url = openai_url
         self.model_name = model_name
         self.num_runners = num_runners
+        self.listeners = listeners
+        self.retry_policy = retry_policy
+        self.deadlines = deadlines
+        # Shared by all runners, so each unique prompt is counted once
+        self.token_counter = token_counter
+        # Shared by all runners, so routing sees every request in flight
+        self.router = router or EndpointRouter([openai_url])
 
     def store_experiment_parameters(
         self,
@@ -188,9 +427,72 @@ class ExperimentRunner:
                 value=self.model_name,
             ),
         ]
+        if self.retry_policy is not None:
+            parameters += [
+                Parameter(id=None, experiment_id=experiment_id, key=key, value=value)
+                for key, value in self.retry_policy.parameters().items()
+            ]
+        if self.deadlines is not None:
+            parameters += [
+                Parameter(id=None, experiment_id=experiment_id, key=key, value=value)
+                for key, value in self.deadlines.parameters().items()
+            ]
+        if len(self.router.urls) > 1:
+            parameters += [
+                Parameter(id=None, experiment_id=experiment_id, key=key, value=value)
+                for key, value in self.router.parameters().items()
+            ]
+        if self.token_counter is not None:
+            parameters += [
+                Parameter(id=None, experiment_id=experiment_id, key=key, value=value)
+                for key, value in self.token_counter.parameters().items()
+            ]
         for param in parameters:
             insert_parameter(param)
 
+    def _run_scheduled_inference(
+        self,
+        schedule: threading.local,
+        runner: InferenceRunner,
+        experiment_id: int,
+        prompt: str,
+        max_tokens: int,
+        workload: Optional[WorkloadClass] = None,
+    ) -> List[Measurement]:
+        """
+        Runs one request on the calling worker thread and tracks when it was
+        intended to start: the previous start on this thread plus the expected
+        interval (running mean latency of the thread). A request that stalls
+        delays the next send; the delay is kept as the intended/actual start gap,
+        and the interval as the send interval of the attempts.
+        Returns the measurements of all attempts of the request.
+        """
+        now = time.time()
+        next_intended = getattr(schedule, "next_intended", None)
+        intended_start_time = min(next_intended, now) if next_intended is not None else now
+        send_interval = schedule.mean_latency if getattr(schedule, "n_success", 0) else None
+
+        attempts = runner.run_request(
+            experiment_id,
+            prompt,
+            max_tokens,
+            intended_start_time=intended_start_time,
+            workload=workload,
+        )
+        for attempt in attempts:
+            attempt.send_interval = send_interval
+        measurement = attempts[-1]
+
+        if measurement.status == Status.SUCCESS:
+            n = getattr(schedule, "n_success", 0) + 1
+            mean = getattr(schedule, "mean_latency", 0.0)
+            latency = measurement.end_time - measurement.start_time
+            schedule.n_success = n
+            schedule.mean_latency = mean + (latency - mean) / n
+        if getattr(schedule, "n_success", 0):
+            schedule.next_intended = measurement.start_time + schedule.mean_latency
+        return attempts
+
     def run_experiment(
         self,
         experiment_id: int,
@@ -198,42 +500,128 @@ class ExperimentRunner:
         num_tasks: int = 100,
         max_tokens: int = 1000,
         seed: int = 42,
+        adaptive: Optional[AdaptiveStopping] = None,
+        measurement_log: Optional[SegmentWriter] = None,
+        show_progress: bool = True,
+        workloads: Optional[WorkloadMix] = None,
     ):
+        """
+        Sends `num_tasks` requests with `num_runners` concurrent runners.
+        With `adaptive`, `num_tasks` is the cap: the run stops as soon as the
+        precision targets are met, letting the in-flight requests finish.
+        With `measurement_log`, measurements are appended to segment files as
+        they complete instead of being queued for the DB writer.
+        With `workloads`, each request is drawn from the mix with the prompt,
+        `max_tokens` and sampling parameters of its class instead.
+        """
         choise_generator = random.Random(seed)
         all_measurements = []
+        # Final attempt of each request
+        requests = []
+        processed = set()
+        # Per worker thread schedule: each thread is one closed-loop runner
+        schedule = threading.local()
         with ThreadPoolExecutor(max_workers=self.num_runners) as executor:
             runners = [
                 InferenceRunner(
                     self.api_key,
                     self.openai_url,
                     self.model_name,
+                    listeners=self.listeners,
+                    retry_policy=self.retry_policy,
+                    deadlines=self.deadlines,
+                    router=self.router,
+                    token_counter=self.token_counter,
                 )
                 for _ in range(self.num_runners)
             ]
-            futures = [
-                executor.submit(
-                    runners[i % self.num_runners].run_inference,
+            futures = []
+            for i in range(num_tasks):
+                if workloads is not None:
+                    workload, prompt = workloads.draw(choise_generator)
+                    request_max_tokens = workload.max_tokens
+                else:
+                    workload, prompt = None, choise_generator.choice(prompts)
+                    request_max_tokens = max_tokens
+                futures.append(executor.submit(
+                    self._run_scheduled_inference,
+                    schedule,
+                    runners[i % self.num_runners],
                     experiment_id,
-                    choise_generator.choice(prompts),
-                    max_tokens
-                )
-                for i in range(num_tasks)
-            ]
-            for future in tqdm(as_completed(futures), total=num_tasks, desc="Running experiments"):
+                    prompt,
+                    request_max_tokens,
+                    workload,
+                ))
+            for future in tqdm(
+                as_completed(futures),
+                total=num_tasks,
+                desc="Running experiments",
+                disable=not show_progress,
+            ):
+                processed.add(future)
                 try:
-                    result = future.result()
-                    all_measurements.append(result)
+                    attempts = future.result()
+                    requests.append(attempts[-1])
+                    for result in attempts:
+                        all_measurements.append(result)
+                        if measurement_log is not None:
+                            measurement_log.append(result)
                 except Exception as e:
                     logger.error(f"Task failed: {e}")
 
+                if adaptive is not None and adaptive.should_stop(requests):
+                    logger.info(
+                        f"Precision targets reached after {len(requests)} requests, stopping."
+                    )
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+        # Requests that were in flight when the adaptive run stopped
+        for future in futures:
+            if future in processed or future.cancelled():
+                continue
+            try:
+                attempts = future.result()
+                requests.append(attempts[-1])
+                for result in attempts:
+                    all_measurements.append(result)
+                    if measurement_log is not None:
+                        measurement_log.append(result)
+            except Exception as e:
+                logger.error(f"Task failed: {e}")
+
+        if adaptive is not None:
+            adaptive.finalize(requests)
         self.store_experiment_parameters(
             experiment_id,
-            num_tasks,
+            num_tasks if adaptive is None else adaptive.num_completed,
             max_tokens,
         )
 
-        for measurement in all_measurements:
-            insert_measurement(measurement)
+        if adaptive is not None:
+            for key, value in adaptive.parameters(num_tasks).items():
+                if key == "num_tasks":
+                    continue  # stored above
+                insert_parameter(
+                    Parameter(
+                        id=None,
+                        experiment_id=experiment_id,
+                        key=key,
+                        value=value,
+                    )
+                )
+        if workloads is not None:
+            for key, value in workloads.parameters().items():
+                insert_parameter(
+                    Parameter(id=None, experiment_id=experiment_id, key=key, value=value)
+                )
+
+        if measurement_log is None:
+            for measurement in all_measurements:
+                insert_measurement(measurement)
+        else:
+            measurement_log.close()
 
         logger.info(
             f"Number of failed measurements: {len([m for m in all_measurements if m.status == Status.FAILED])}"
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from compressa.perf.db.operations import (
+    fetch_measurement_fingerprints,
+    fetch_measurement_frame,
+    fetch_metric_fingerprints,
+    store_computed_metrics,
+)
+from compressa.perf.db.retention import rolled_up_experiment_ids
+from compressa.perf.experiment.analysis import ANALYZER_VERSION, Analyzer
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+# (experiment_id, metrics, io_stats, serialized histograms, fingerprint, group metrics)
+ComputedMetrics = Tuple[
+    int,
+    Dict[str, float],
+    Dict[str, float],
+    Dict[str, bytes],
+    Tuple[int, int, str],
+    Dict[str, Dict[str, Dict[str, float]]],
+]
+
+
+@dataclass
+class RecomputeResult:
+    computed: List[int] = field(default_factory=list)
+    skipped: List[int] = field(default_factory=list)
+    failed: Dict[int, str] = field(default_factory=dict)
+    # Stale experiments not recomputed because their older measurements were rolled up
+    partial: List[int] = field(default_factory=list)
+
+
+def _read_only_connection(db_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+
+
+def _compute_experiment(db_path: str, experiment_id: int) -> ComputedMetrics:
+    """
+    Computes the metrics of one experiment on a read-only connection. The
+    fingerprint is taken from the same rows the metrics were computed from.
+    """
+    conn = _read_only_connection(db_path)
+    try:
+        analyzer = Analyzer(conn)
+        frame = fetch_measurement_frame(conn, experiment_id)
+        if not len(frame):
+            raise ValueError(f"No measurements found for experiment_id {experiment_id}")
+        metrics, io_stats = analyzer.compute_metrics_for_measurements(frame)
+        if not metrics:
+            raise ValueError(f"No successful measurements found for experiment_id {experiment_id}")
+        histograms = {
+            name: hist.to_bytes()
+            for name, hist in analyzer.compute_histograms(frame).items()
+        }
+        group_metrics = analyzer.compute_group_metrics(frame)
+        fingerprint = (len(frame), int(frame.id.max()), ANALYZER_VERSION)
+    finally:
+        conn.close()
+    return (
+        experiment_id,
+        {name: float(value) for name, value in metrics.items()},
+        {key: float(value) for key, value in io_stats.items()},
+        histograms,
+        fingerprint,
+        {
+            group_by: {
+                value: {name: float(v) for name, v in metrics_of_group.items()}
+                for value, metrics_of_group in groups.items()
+            }
+            for group_by, groups in group_metrics.items()
+        },
+    )
+
+
+def stale_experiments(
+    conn: sqlite3.Connection,
+    experiment_ids: Optional[Sequence[int]] = None,
+    force: bool = False,
+) -> Tuple[List[int], List[int]]:
+    """
+    Splits experiments with measurements into (stale, up to date) by comparing
+    the row count and max id of their measurements and the analyzer version
+    with the fingerprint stored along with their metrics.
+    """
+    current = fetch_measurement_fingerprints(conn)
+    stored = fetch_metric_fingerprints(conn)
+    if experiment_ids is None:
+        experiment_ids = sorted(current)
+    stale, fresh = [], []
+    for experiment_id in experiment_ids:
+        if experiment_id not in current:
+            continue
+        if not force and stored.get(experiment_id) == (*current[experiment_id], ANALYZER_VERSION):
+            fresh.append(experiment_id)
+        else:
+            stale.append(experiment_id)
+    return stale, fresh
+
+
+def recompute_metrics(
+    db_path: str,
+    experiment_ids: Optional[Sequence[int]] = None,
+    force: bool = False,
+    max_workers: Optional[int] = None,
+) -> RecomputeResult:
+    """
+    Recomputes the stored metrics of experiments whose measurements changed
+    since their metrics were computed (all of them with `force`). Experiments
+    are computed in a process pool on read-only connections; this process is
+    the only writer and stores each result in its own transaction.
+    Experiments without measurements, e.g. fully rolled up ones, are skipped
+    and keep their metrics. So are experiments with rollups: their retained
+    measurements only cover the end of the run, and metrics computed from
+    them would replace the whole-run ones; they are listed as partial.
+    """
+    result = RecomputeResult()
+    with sqlite3.connect(db_path) as conn:
+        stale, result.skipped = stale_experiments(conn, experiment_ids, force)
+        rolled_up = set(rolled_up_experiment_ids(conn))
+        result.partial = [experiment_id for experiment_id in stale if experiment_id in rolled_up]
+        stale = [experiment_id for experiment_id in stale if experiment_id not in rolled_up]
+        for experiment_id in result.partial:
+            logger.warning(
+                f"Metrics of experiment {experiment_id} are not recomputed: "
+                f"its older measurements were rolled up, so only part of the run is left"
+            )
+        if not stale:
+            return result
+
+        def store(computed: ComputedMetrics):
+            experiment_id, metrics, io_stats, histograms, fingerprint, group_metrics = computed
+            store_computed_metrics(
+                conn, experiment_id, metrics, io_stats, histograms, fingerprint, group_metrics
+            )
+            result.computed.append(experiment_id)
+            logger.info(f"Metrics computed for experiment {experiment_id}")
+
+        def fail(experiment_id: int, error: Exception):
+            result.failed[experiment_id] = str(error)
+            logger.error(f"Error computing metrics for experiment {experiment_id}: {error}")
+
+        max_workers = min(max_workers or os.cpu_count() or 1, len(stale))
+        if max_workers == 1:
+            for experiment_id in stale:
+                try:
+                    store(_compute_experiment(db_path, experiment_id))
+                except Exception as e:
+                    fail(experiment_id, e)
+            return result
+
+        # Workers are spawned rather than forked: the parent may run the DB
+        # writer thread, and forking a process with threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {
+                executor.submit(_compute_experiment, db_path, experiment_id): experiment_id
+                for experiment_id in stale
+            }
+            for future in as_completed(futures):
+                try:
+                    store(future.result())
+                except Exception as e:
+                    fail(futures[future], e)
+    return result
@@ -0,0 +1,205 @@
+import itertools
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from compressa.perf.data.models import Measurement, Parameter
+from compressa.perf.db.operations import insert_measurement, insert_parameter
+from compressa.perf.db.segments import SegmentWriter
+from compressa.perf.experiment.inference import InferenceRunner
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+# GIL switch interval during a replay: a thread woken at its send time waits
+# at most this long for the threads busy streaming responses
+SWITCH_INTERVAL_SEC = 0.0005
+# Time between starting the threads and the first send, for all of them to
+# claim a request and go to sleep; otherwise their start delays the first sends
+START_DELAY_SEC = 0.1
+START_DELAY_PER_THREAD_SEC = 0.0001
+
+
+@dataclass
+class TraceRequest:
+    """
+    One request of a production trace: its offset in seconds from the start
+    of the trace, its prompt (or prompt length in characters, to generate
+    one) and its output length.
+    """
+
+    offset: float
+    max_tokens: int
+    prompt: Optional[str] = None
+    prompt_length: Optional[int] = None
+
+
+def _field(record: dict, names, line_number: int, default=None):
+    for name in names:
+        if record.get(name) is not None:
+            return record[name]
+    if default is not None:
+        return default
+    raise ValueError(f"Trace line {line_number} has none of the fields {names}")
+
+
+def load_trace(
+    path: str,
+    default_max_tokens: int = 1000,
+    start_sec: Optional[float] = None,
+    end_sec: Optional[float] = None,
+) -> List[TraceRequest]:
+    """
+    Reads a JSONL trace with one request per line: its arrival `timestamp`
+    (or `offset`) in seconds, its `prompt` or `prompt_length` and its
+    `output_length` (or `max_tokens`). Requests are sorted by arrival and
+    their offsets counted from the first one. With `start_sec` / `end_sec`,
+    only the requests in [start, end) of the trace are kept, with offsets
+    counted from `start_sec`.
+    """
+    requests = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            prompt = record.get("prompt")
+            requests.append(TraceRequest(
+                offset=float(_field(record, ("timestamp", "offset"), line_number)),
+                max_tokens=int(_field(record, ("output_length", "max_tokens"), line_number, default_max_tokens)),
+                prompt=prompt,
+                prompt_length=(
+                    None if prompt is not None
+                    else int(_field(record, ("prompt_length", "input_length"), line_number))
+                ),
+            ))
+    if not requests:
+        return []
+    requests.sort(key=lambda r: r.offset)
+    origin = requests[0].offset
+    for request in requests:
+        request.offset -= origin
+    start = start_sec or 0.0
+    return [
+        TraceRequest(r.offset - start, r.max_tokens, r.prompt, r.prompt_length)
+        for r in requests
+        if r.offset >= start and (end_sec is None or r.offset < end_sec)
+    ]
+
+
+class TraceReplayer:
+    """
+    Open-loop replay of a trace: every request is sent at its offset divided
+    by `speedup`, whether or not earlier requests have completed. Each of
+    `max_concurrency` threads claims the next request of the trace, sleeps
+    until its send time and sends it. The send time is the request's
+    intended start, so a request that finds every thread busy counts against
+    the server in the corrected metrics; the gap between each send time and
+    the actual send is kept as the dispatch lag.
+    """
+
+    def __init__(
+        self,
+        runner: InferenceRunner,
+        max_concurrency: int = 1000,
+        speedup: float = 1.0,
+    ):
+        if speedup <= 0:
+            raise ValueError("speedup must be positive")
+        self.runner = runner
+        self.max_concurrency = max_concurrency
+        self.speedup = speedup
+        # Seconds between each send time and the moment the request was sent
+        self.dispatch_lags = np.empty(0)
+
+    def replay(
+        self,
+        experiment_id: int,
+        requests: List[TraceRequest],
+        prompt_for: Callable[[TraceRequest], str],
+        measurement_log: Optional[SegmentWriter] = None,
+        show_progress: bool = True,
+    ) -> List[Measurement]:
+        """
+        Sends the trace and stores the measurements of every attempt.
+        `prompt_for` gives the prompt of a request; it is called before the
+        replay starts so that building prompts does not delay sends.
+        """
+        prompts = [prompt_for(request) for request in requests]
+        delays = [request.offset / self.speedup for request in requests]
+        lags = np.zeros(len(requests))
+        results: List[List[Measurement]] = [[] for _ in requests]
+        claim = itertools.count()
+        progress = tqdm(total=len(requests), desc="Replaying trace", disable=not show_progress)
+        n_threads = min(self.max_concurrency, len(requests))
+        start_delay = START_DELAY_SEC + START_DELAY_PER_THREAD_SEC * n_threads
+        wall_start = time.time() + start_delay
+        perf_start = time.perf_counter() + start_delay
+
+        def send_requests():
+            while True:
+                # next() on a count is atomic, so each request is claimed once
+                i = next(claim)
+                if i >= len(requests):
+                    return
+                remaining = perf_start + delays[i] - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+                lags[i] = time.perf_counter() - perf_start - delays[i]
+                try:
+                    results[i] = self.runner.run_request(
+                        experiment_id,
+                        prompts[i],
+                        requests[i].max_tokens,
+                        intended_start_time=wall_start + delays[i],
+                    )
+                except Exception as e:
+                    logger.error(f"Task failed: {e}")
+                if measurement_log is not None:
+                    for measurement in results[i]:
+                        measurement_log.append(measurement)
+                progress.update()
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(SWITCH_INTERVAL_SEC)
+        try:
+            threads = [threading.Thread(target=send_requests, daemon=True) for _ in range(n_threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+            progress.close()
+        self.dispatch_lags = lags
+
+        all_measurements = [m for attempts in results for m in attempts]
+        if measurement_log is None:
+            for measurement in all_measurements:
+                insert_measurement(measurement)
+        else:
+            measurement_log.close()
+        return all_measurements
+
+    def parameters(self) -> Dict[str, str]:
+        """Replay settings and how closely the schedule was followed."""
+        params = {
+            "run_mode": "replay",
+            "speedup": str(self.speedup),
+            "max_concurrency": str(self.max_concurrency),
+        }
+        if self.dispatch_lags.size:
+            params["dispatch_lag_p99_ms"] = f"{np.percentile(self.dispatch_lags, 99) * 1000:.3f}"
+            params["dispatch_lag_max_ms"] = f"{self.dispatch_lags.max() * 1000:.3f}"
+        return params
+
+    def store_parameters(self, experiment_id: int, extra: Optional[Dict[str, str]] = None):
+        for key, value in {**self.parameters(), **(extra or {})}.items():
+            insert_parameter(Parameter(id=None, experiment_id=experiment_id, key=key, value=value))
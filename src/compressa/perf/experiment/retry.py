@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from compressa.perf.data.models import ErrorClass, ErrorPhase, Measurement, Status
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_RETRY_ON = frozenset({
+    ErrorClass.RATE_LIMITED,
+    ErrorClass.SERVER_ERROR,
+    ErrorClass.TIMEOUT,
+    ErrorClass.CONNECTION,
+})
+
+# Sends one attempt: intended start time -> (measurement, error or None)
+Attempt = Callable[[Optional[float]], Tuple[Measurement, Optional[Exception]]]
+
+
+def parse_retry_after(error: Optional[Exception], now: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds to wait as requested by the server in the `retry-after-ms` or
+    `Retry-After` header of the error's response (delay in seconds or an
+    HTTP date). None if the error carries no such header.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = time.time() if now is None else now
+    return max(retry_at.timestamp() - now, 0.0)
+
+
+class TokenBucket:
+    """
+    Retry budget shared by all runners of an experiment: holds up to
+    `capacity` tokens and refills at `rate` tokens per second. Each retry
+    takes one token, so a failing server is not hit with unbounded retries.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retries failed attempts of a request up to `max_attempts` in total.
+    Before a retry the runner waits for the server's Retry-After if given
+    (with `honor_retry_after`), else for an exponential backoff with full
+    jitter: uniform(0, min(max_backoff_sec, initial_backoff_sec * multiplier ** (attempt - 1))).
+    Waits are capped at `max_backoff_sec`. Only failures of a class in
+    `retry_on` that happened before the first token are retried, and only
+    while the optional `budget` has tokens left.
+    """
+
+    max_attempts: int = 1
+    initial_backoff_sec: float = 0.5
+    max_backoff_sec: float = 30.0
+    multiplier: float = 2.0
+    honor_retry_after: bool = True
+    retry_on: FrozenSet[ErrorClass] = DEFAULT_RETRY_ON
+    budget: Optional[TokenBucket] = None
+    rng: random.Random = field(default_factory=random.Random, repr=False)
+
+    def should_retry(self, measurement: Measurement, attempt: int) -> bool:
+        return (
+            measurement.status == Status.FAILED
+            and attempt < self.max_attempts
+            and measurement.error_class in self.retry_on
+            and measurement.error_phase != ErrorPhase.MID_STREAM
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered wait after the failed attempt number `attempt`."""
+        ceiling = min(self.max_backoff_sec, self.initial_backoff_sec * self.multiplier ** (attempt - 1))
+        return self.rng.uniform(0.0, ceiling)
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        retry_after = parse_retry_after(error) if self.honor_retry_after else None
+        if retry_after is None:
+            return self.backoff(attempt)
+        return min(retry_after, self.max_backoff_sec)
+
+    def run(
+        self,
+        send: Attempt,
+        intended_start_time: Optional[float] = None,
+        on_attempt: Optional[Callable[[Measurement], None]] = None,
+    ) -> List[Measurement]:
+        """
+        Sends attempts until one succeeds or the request may not be retried.
+        Returns one measurement per attempt; all but the last are marked
+        RETRIED. Every measurement carries its attempt number, the start of
+        the first attempt and the time waited before retries so far.
+        `on_attempt` receives each measurement once its status is final.
+        """
+        measurements = []
+        request_start_time = None
+        throttled_time = 0.0
+        attempt = 1
+        while True:
+            measurement, error = send(intended_start_time)
+            if request_start_time is None:
+                request_start_time = measurement.start_time
+            measurement.attempt = attempt
+            measurement.request_start_time = request_start_time
+            measurement.throttled_time = throttled_time
+            measurements.append(measurement)
+
+            retry = self.should_retry(measurement, attempt)
+            if retry and self.budget is not None and not self.budget.try_acquire():
+                logger.debug("Retry budget exhausted, giving up on the request")
+                retry = False
+            if retry:
+                measurement.status = Status.RETRIED
+            if on_attempt is not None:
+                on_attempt(measurement)
+            if not retry:
+                return measurements
+
+            delay = self.delay(attempt, error)
+            time.sleep(delay)
+            throttled_time += delay
+            attempt += 1
+            # A retry is intended to start when it is sent
+            intended_start_time = None
+
+    def parameters(self) -> Dict[str, str]:
+        """Retry settings to store with the experiment parameters."""
+        params = {
+            "retry_max_attempts": str(self.max_attempts),
+            "retry_initial_backoff_sec": str(self.initial_backoff_sec),
+            "retry_max_backoff_sec": str(self.max_backoff_sec),
+            "retry_honor_retry_after": str(self.honor_retry_after),
+        }
+        if self.budget is not None:
+            params["retry_budget_per_sec"] = str(self.budget.rate)
+        return params
+
+
+def build_retry_policy(
+    max_attempts: int = 1,
+    initial_backoff_sec: float = 0.5,
+    max_backoff_sec: float = 30.0,
+    budget_per_sec: Optional[float] = None,
+) -> Optional[RetryPolicy]:
+    """A retry policy from the CLI options, or None if requests are not retried."""
+    if max_attempts <= 1:
+        return None
+    return RetryPolicy(
+        max_attempts=max_attempts,
+        initial_backoff_sec=initial_backoff_sec,
+        max_backoff_sec=max_backoff_sec,
+        budget=TokenBucket(budget_per_sec) if budget_per_sec else None,
+    )
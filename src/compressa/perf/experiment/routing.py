@@ -0,0 +1,96 @@
+import itertools
+import threading
+from typing import Dict, List, Optional, Sequence
+
+ROUTING_STRATEGIES = ("round_robin", "least_in_flight", "weighted")
+
+
+class EndpointRouter:
+    """
+    Picks the endpoint of every request sent in an experiment. One router is
+    shared by all runners, so it also tracks the requests in flight per
+    endpoint. The base class sends requests to the endpoints in turn.
+    """
+
+    name = "round_robin"
+
+    def __init__(self, urls: Sequence[str]):
+        if not urls:
+            raise ValueError("At least one endpoint URL is required")
+        self.urls = list(urls)
+        self.in_flight = [0] * len(self.urls)
+        self.lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def _choose(self) -> int:
+        return next(self._turn) % len(self.urls)
+
+    def acquire(self) -> int:
+        """Index of the endpoint for the next request, counted as in flight until released."""
+        with self.lock:
+            index = self._choose()
+            self.in_flight[index] += 1
+        return index
+
+    def release(self, index: int):
+        with self.lock:
+            self.in_flight[index] -= 1
+
+    def parameters(self) -> Dict[str, str]:
+        return {"endpoints": ",".join(self.urls), "routing": self.name}
+
+
+class LeastInFlightRouter(EndpointRouter):
+    """Sends each request to the endpoint with the fewest requests in flight, ties in turn."""
+
+    name = "least_in_flight"
+
+    def _choose(self) -> int:
+        n = len(self.urls)
+        start = next(self._turn) % n
+        return min(((start + i) % n for i in range(n)), key=self.in_flight.__getitem__)
+
+
+class WeightedRouter(EndpointRouter):
+    """
+    Smooth weighted round robin: each endpoint gets a share of the requests
+    proportional to its weight, interleaved rather than in bursts.
+    """
+
+    name = "weighted"
+
+    def __init__(self, urls: Sequence[str], weights: Sequence[float]):
+        super().__init__(urls)
+        if len(weights) != len(self.urls):
+            raise ValueError(f"Expected {len(self.urls)} endpoint weights, got {len(weights)}")
+        if any(w <= 0 for w in weights):
+            raise ValueError("Endpoint weights must be positive")
+        self.weights = [float(w) for w in weights]
+        self.total_weight = sum(self.weights)
+        self.current = [0.0] * len(self.urls)
+
+    def _choose(self) -> int:
+        for i, weight in enumerate(self.weights):
+            self.current[i] += weight
+        best = max(range(len(self.urls)), key=self.current.__getitem__)
+        self.current[best] -= self.total_weight
+        return best
+
+    def parameters(self) -> Dict[str, str]:
+        return {**super().parameters(), "endpoint_weights": ",".join(f"{w:g}" for w in self.weights)}
+
+
+def build_router(
+    urls: Sequence[str],
+    routing: str = "round_robin",
+    weights: Optional[List[float]] = None,
+) -> EndpointRouter:
+    if routing not in ROUTING_STRATEGIES:
+        raise ValueError(f"Unknown routing '{routing}', expected one of {ROUTING_STRATEGIES}")
+    if routing == "weighted":
+        return WeightedRouter(urls, weights or [1.0] * len(urls))
+    if weights:
+        raise ValueError("Endpoint weights are only used with weighted routing")
+    if routing == "least_in_flight":
+        return LeastInFlightRouter(urls)
+    return EndpointRouter(urls)
@@ -0,0 +1,146 @@
+import functools
+import threading
+from typing import Dict, Optional
+
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHARS_PER_TOKEN = 4.0
+# Unique prompts whose counts are kept; benchmarks cycle through far fewer
+PROMPT_CACHE_SIZE = 100_000
+# Output tokens reported by the server before the calibrated ratio replaces the initial one
+MIN_CALIBRATION_TOKENS = 1000
+
+
+def load_tokenizer(name: str):
+    """
+    A Hugging Face tokenizer from the local cache or a local directory; it is
+    never downloaded, so a run does not wait on the network.
+    """
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise ImportError("Counting tokens with a tokenizer needs transformers: pip install transformers")
+    return AutoTokenizer.from_pretrained(name, local_files_only=True)
+
+
+class CharsPerTokenEstimator:
+    """
+    Estimates token counts from text length. Starts from `chars_per_token`;
+    with `calibrate`, the ratio is then learned from the responses whose
+    usage the server did report, e.g. other endpoints of a routed run.
+    """
+
+    def __init__(self, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN, calibrate: bool = True):
+        if chars_per_token <= 0:
+            raise ValueError("chars_per_token must be positive")
+        self.initial_chars_per_token = chars_per_token
+        self.calibrate_enabled = calibrate
+        self.chars = 0
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    @property
+    def chars_per_token(self) -> float:
+        with self.lock:
+            if self.tokens >= MIN_CALIBRATION_TOKENS:
+                return self.chars / self.tokens
+        return self.initial_chars_per_token
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return max(1, round(len(text) / self.chars_per_token))
+
+    def calibrate(self, text: str, tokens: int):
+        if not self.calibrate_enabled or not text or tokens <= 0:
+            return
+        with self.lock:
+            self.chars += len(text)
+            self.tokens += tokens
+
+
+class TokenCounter:
+    """
+    Counts tokens on the client for servers that do not return `usage`, with
+    a local Hugging Face tokenizer if given and a chars-per-token estimate
+    otherwise. Outputs are counted from the streamed text. Tokenized prompts
+    are cached, so each unique prompt is encoded once; with a chat template
+    they are counted the way the server sees them.
+    """
+
+    def __init__(
+        self,
+        tokenizer=None,
+        tokenizer_name: Optional[str] = None,
+        estimator: Optional[CharsPerTokenEstimator] = None,
+        cache_size: int = PROMPT_CACHE_SIZE,
+    ):
+        self.tokenizer = tokenizer
+        self.tokenizer_name = tokenizer_name
+        self.estimator = estimator or CharsPerTokenEstimator()
+        self._tokenize_prompt = functools.lru_cache(maxsize=cache_size)(self._tokenize_prompt)
+
+    def _encode_length(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _tokenize_prompt(self, prompt: str) -> int:
+        if getattr(self.tokenizer, "chat_template", None):
+            try:
+                return len(self.tokenizer.apply_chat_template(
+                    [{"role": "user", "content": prompt}],
+                    tokenize=True,
+                    add_generation_prompt=True,
+                ))
+            except Exception:
+                pass
+        return self._encode_length(prompt)
+
+    def count_prompt(self, prompt: str) -> int:
+        if self.tokenizer is None:
+            # Not cached: the estimate changes as it is calibrated
+            return self.estimator.count(prompt)
+        return self._tokenize_prompt(prompt)
+
+    def count_output(self, text: str) -> int:
+        if self.tokenizer is None:
+            return self.estimator.count(text)
+        return self._encode_length(text) if text else 0
+
+    def observe_usage(self, text: str, completion_tokens: int):
+        """Calibrates the estimate on an output whose token count the server reported."""
+        if self.tokenizer is None:
+            self.estimator.calibrate(text, completion_tokens)
+
+    def parameters(self) -> Dict[str, str]:
+        if self.tokenizer is not None:
+            return {"token_counter": "tokenizer", "tokenizer": self.tokenizer_name or type(self.tokenizer).__name__}
+        return {"token_counter": "chars", "chars_per_token": f"{self.estimator.chars_per_token:.3f}"}
+
+
+def build_token_counter(
+    count_tokens: bool = False,
+    tokenizer_name: Optional[str] = None,
+    chars_per_token: Optional[float] = None,
+) -> Optional[TokenCounter]:
+    """
+    A token counter from the CLI options, or None if tokens are not counted
+    on the client. A tokenizer or a ratio implies counting. A fixed ratio is
+    not recalibrated, and a tokenizer that cannot be loaded falls back to the
+    estimate.
+    """
+    if not (count_tokens or tokenizer_name or chars_per_token):
+        return None
+    tokenizer = None
+    if tokenizer_name:
+        try:
+            tokenizer = load_tokenizer(tokenizer_name)
+        except Exception as e:
+            logger.warning(f"Tokenizer {tokenizer_name} not available, estimating tokens from text length: {e}")
+            tokenizer_name = None
+    estimator = CharsPerTokenEstimator(
+        chars_per_token or DEFAULT_CHARS_PER_TOKEN,
+        calibrate=chars_per_token is None,
+    )
+    return TokenCounter(tokenizer, tokenizer_name, estimator)
@@ -0,0 +1,83 @@
+import json
+import math
+import random
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LENGTH_DISTRIBUTIONS = ("fixed", "normal", "lognormal")
+
+
+@dataclass
+class WorkloadClass:
+    """
+    One class of requests in a mixed workload, e.g. short chat or long
+    document summarization. Prompts are read from `prompts_file` or
+    generated; their length in characters follows `length_distribution`
+    with mean `prompt_length` and standard deviation `prompt_length_std`.
+    `weight` is the relative share of the requests drawn from the class.
+    """
+
+    name: str
+    weight: float = 1.0
+    prompts_file: Optional[str] = None
+    num_prompts: int = 100
+    prompt_length: int = 100
+    prompt_length_std: float = 0.0
+    length_distribution: str = "fixed"
+    max_tokens: int = 1000
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+
+    def __post_init__(self):
+        if self.weight <= 0:
+            raise ValueError(f"Workload class '{self.name}' must have a positive weight")
+        if self.prompt_length < 1:
+            raise ValueError(f"Workload class '{self.name}' must have a positive prompt_length")
+        if self.length_distribution not in LENGTH_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown length_distribution '{self.length_distribution}' of workload class "
+                f"'{self.name}', expected one of {LENGTH_DISTRIBUTIONS}"
+            )
+
+    def prompt_lengths(self, n: int, rng: random.Random) -> List[int]:
+        """`n` prompt lengths drawn from the length distribution, at least 1."""
+        if self.length_distribution == "fixed" or not self.prompt_length_std:
+            return [self.prompt_length] * n
+        if self.length_distribution == "normal":
+            draws = (rng.gauss(self.prompt_length, self.prompt_length_std) for _ in range(n))
+        else:
+            # Parameters of the log-normal with the configured mean and deviation
+            sigma2 = math.log1p((self.prompt_length_std / self.prompt_length) ** 2)
+            mu = math.log(self.prompt_length) - sigma2 / 2
+            draws = (rng.lognormvariate(mu, math.sqrt(sigma2)) for _ in range(n))
+        return [max(1, round(length)) for length in draws]
+
+    def sampling(self) -> Dict[str, float]:
+        """Sampling parameters sent with the requests of the class."""
+        params = {"temperature": self.temperature, "top_p": self.top_p}
+        return {key: value for key, value in params.items() if value is not None}
+
+
+class WorkloadMix:
+    """Draws the class and prompt of each request, classes in proportion to their weights."""
+
+    def __init__(self, classes: Sequence[WorkloadClass], prompts: Dict[str, List[str]]):
+        if not classes:
+            raise ValueError("At least one workload class is required")
+        names = [c.name for c in classes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Workload class names must be unique: {names}")
+        for name in names:
+            if not prompts.get(name):
+                raise ValueError(f"No prompts for workload class '{name}'")
+        self.classes = list(classes)
+        self.prompts = prompts
+        self.weights = [c.weight for c in self.classes]
+
+    def draw(self, rng: random.Random) -> Tuple[WorkloadClass, str]:
+        workload = rng.choices(self.classes, weights=self.weights)[0]
+        return workload, rng.choice(self.prompts[workload.name])
+
+    def parameters(self) -> Dict[str, str]:
+        """Definition of the mix to store with the experiment parameters."""
+        return {"workloads": json.dumps([asdict(c) for c in self.classes])}
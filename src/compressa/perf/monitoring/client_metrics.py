@@ -0,0 +1,173 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from compressa.perf.data.models import Sample
+from compressa.perf.db.operations import insert_sample
+from compressa.utils import get_logger
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = get_logger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL_SEC = 1.0
+CLIENT_SOURCE = "client"
+# The lag probe sleeps this long and measures how late it wakes up
+DEFAULT_TICK_SEC = 0.01
+
+# A run is client-bound when at least BOUND_SAMPLE_SHARE of the samples
+# cross one of the thresholds. CPU is in percent of one core: with the GIL,
+# request threads of one process cannot use more than about one core. The
+# lag threshold applies to the mean lag of each interval; its p99 and max
+# also catch one-off hiccups of the host.
+CPU_BOUND_PERCENT = 90.0
+LAG_BOUND_MS = 5.0
+BOUND_SAMPLE_SHARE = 0.1
+
+CPU_PERCENT = "cpu_percent"
+RSS_BYTES = "rss_bytes"
+THREADS = "threads"
+OPEN_SOCKETS = "open_sockets"
+SCHEDULER_LAG_MEAN_MS = "scheduler_lag_mean_ms"
+SCHEDULER_LAG_P99_MS = "scheduler_lag_p99_ms"
+SCHEDULER_LAG_MAX_MS = "scheduler_lag_max_ms"
+
+
+def _rss_bytes() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return float(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return None
+        # Peak rather than current RSS: kilobytes on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return float(max_rss if sys.platform == "darwin" else max_rss * 1024)
+
+
+def _open_sockets() -> Optional[float]:
+    """Sockets open in the process, where /proc is available."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    sockets = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                sockets += 1
+        except OSError:
+            # Closed since listing
+            continue
+    return float(sockets)
+
+
+class ClientMonitor:
+    """
+    Samples the load generator itself every `interval_sec`: CPU use of the
+    process, RSS, Python threads, open sockets and scheduler lag, stored as
+    Samples with source `client`. The lag probe is a thread that sleeps for
+    `tick_sec` and records how late it wakes up; when request threads fight
+    for the GIL or the CPU, timestamps taken by them are late by as much.
+    """
+
+    def __init__(self, interval_sec: float = DEFAULT_SAMPLE_INTERVAL_SEC, tick_sec: float = DEFAULT_TICK_SEC):
+        if interval_sec <= 0:
+            raise ValueError("interval_sec must be positive")
+        self.interval_sec = interval_sec
+        self.tick_sec = tick_sec
+        self.lags: List[float] = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self._last_cpu = time.process_time()
+        self._last_wall = time.perf_counter()
+
+    def _probe(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            time.sleep(self.tick_sec)
+            lag = time.perf_counter() - start - self.tick_sec
+            with self.lock:
+                self.lags.append(lag)
+
+    def sample_once(self, experiment_id: int) -> List[Sample]:
+        """Client metrics since the previous sample."""
+        timestamp = time.time()
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        elapsed = wall - self._last_wall
+        values = {
+            CPU_PERCENT: 100.0 * (cpu - self._last_cpu) / elapsed if elapsed > 0 else 0.0,
+            RSS_BYTES: _rss_bytes(),
+            THREADS: float(threading.active_count()),
+            OPEN_SOCKETS: _open_sockets(),
+        }
+        self._last_cpu, self._last_wall = cpu, wall
+        with self.lock:
+            lags, self.lags = self.lags, []
+        if lags:
+            values[SCHEDULER_LAG_MEAN_MS] = float(np.mean(lags)) * 1000
+            values[SCHEDULER_LAG_P99_MS] = float(np.percentile(lags, 99)) * 1000
+            values[SCHEDULER_LAG_MAX_MS] = max(lags) * 1000
+        return [
+            Sample(None, experiment_id, timestamp, CLIENT_SOURCE, name, value)
+            for name, value in values.items()
+            if value is not None
+        ]
+
+    def _run(self, experiment_id: int):
+        while not self.stop_event.wait(self.interval_sec):
+            for sample in self.sample_once(experiment_id):
+                insert_sample(sample)
+
+    def start(self, experiment_id: int) -> "ClientMonitor":
+        self.stop_event.clear()
+        self._last_cpu = time.process_time()
+        self._last_wall = time.perf_counter()
+        self.threads = [
+            threading.Thread(target=self._probe, daemon=True),
+            threading.Thread(target=self._run, args=(experiment_id,), daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+def client_bound_reasons(
+    samples: Sequence[Sample],
+    cpu_percent: float = CPU_BOUND_PERCENT,
+    lag_ms: float = LAG_BOUND_MS,
+    share: float = BOUND_SAMPLE_SHARE,
+) -> List[str]:
+    """
+    Why a run was limited by the load generator rather than the server:
+    one reason per threshold crossed in at least `share` of the client
+    samples. Empty if the client kept up.
+    """
+    by_name: Dict[str, List[float]] = {}
+    for s in samples:
+        if s.source == CLIENT_SOURCE:
+            by_name.setdefault(s.name, []).append(s.value)
+    reasons = []
+    for name, threshold, label in (
+        (CPU_PERCENT, cpu_percent, f"CPU above {cpu_percent:g}%"),
+        (SCHEDULER_LAG_MEAN_MS, lag_ms, f"scheduler lag above {lag_ms:g} ms"),
+    ):
+        values = np.asarray(by_name.get(name, []))
+        if values.size and np.mean(values > threshold) >= share:
+            reasons.append(f"{label} in {np.mean(values > threshold):.0%} of samples")
+    return reasons
@@ -0,0 +1,180 @@
+import itertools
+import sys
+import threading
+import time
+from typing import Dict, Optional, Sequence, TextIO
+
+import numpy as np
+from tabulate import tabulate
+
+from compressa.perf.data.frame import ERROR_CLASS_CODES, ERROR_CLASSES, STATUS_CODES, SUCCESS_CODE
+from compressa.perf.data.models import Measurement, Status
+from compressa.perf.monitoring.prometheus import LiveMetrics, RequestListener
+
+DEFAULT_WINDOW_SEC = 10.0
+DEFAULT_REFRESH_SEC = 1.0
+
+_CLEAR_SCREEN = "\x1b[H\x1b[2J"
+
+
+class RecentRequests(RequestListener):
+    """
+    Fixed-size ring buffers of the most recent requests and inter-chunk
+    latencies. Writers claim a slot from an `itertools.count`, which is atomic
+    in CPython, so recording takes no lock. The end time is written last, and
+    readers only look at slots whose end time falls in the requested window.
+    """
+
+    def __init__(self, capacity: int = 65536, itl_capacity: int = 262144):
+        self.capacity = capacity
+        self.itl_capacity = itl_capacity
+        self.end_time = np.full(capacity, np.nan)
+        self.ttft = np.zeros(capacity)
+        self.latency = np.zeros(capacity)
+        self.n_input = np.zeros(capacity, dtype=np.int64)
+        self.n_output = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.uint8)
+        self.error_class = np.zeros(capacity, dtype=np.uint8)
+        self.itl_time = np.full(itl_capacity, np.nan)
+        self.itl = np.zeros(itl_capacity)
+        self._next = itertools.count()
+        self._next_itl = itertools.count()
+
+    def on_request_end(self, measurement: Measurement, inter_token_latencies: Sequence[float] = ()):
+        i = next(self._next) % self.capacity
+        self.ttft[i] = measurement.ttft
+        self.latency[i] = measurement.end_time - measurement.start_time
+        self.n_input[i] = max(measurement.n_input, 0)
+        self.n_output[i] = max(measurement.n_output, 0)
+        self.status[i] = STATUS_CODES[measurement.status]
+        self.error_class[i] = ERROR_CLASS_CODES[measurement.error_class]
+        self.end_time[i] = measurement.end_time
+        for itl in inter_token_latencies:
+            j = next(self._next_itl) % self.itl_capacity
+            self.itl[j] = itl
+            self.itl_time[j] = measurement.end_time
+
+    def window(self, window_sec: float, now: Optional[float] = None) -> Dict:
+        """Rolling statistics over the requests that finished in the last `window_sec`."""
+        now = time.time() if now is None else now
+        with np.errstate(invalid="ignore"):
+            recent = self.end_time >= now - window_sec
+            recent_itl = self.itl_time >= now - window_sec
+        status = self.status[recent]
+        ok = status == SUCCESS_CODE
+        error_counts = np.bincount(self.error_class[recent][~ok], minlength=len(ERROR_CLASSES))
+
+        def percentiles(values: np.ndarray):
+            if not values.size:
+                return 0.0, 0.0
+            p50, p95 = np.percentile(values, [50, 95])
+            return float(p50), float(p95)
+
+        return {
+            "window_sec": window_sec,
+            "requests": int(status.size),
+            "by_status": {
+                s.value: int(np.count_nonzero(status == code))
+                for s, code in STATUS_CODES.items()
+            },
+            "by_error_class": {
+                (error_class.value if error_class else "unclassified"): int(count)
+                for error_class, count in zip(ERROR_CLASSES, error_counts)
+                if count
+            },
+            "rps": np.count_nonzero(ok) / window_sec,
+            "input_tokens_per_sec": float(self.n_input[recent][ok].sum()) / window_sec,
+            "output_tokens_per_sec": float(self.n_output[recent][ok].sum()) / window_sec,
+            "ttft": percentiles(self.ttft[recent][ok]),
+            "latency": percentiles(self.latency[recent][ok]),
+            "itl": percentiles(self.itl[recent_itl]),
+        }
+
+
+class LiveDashboard:
+    """
+    Redraws a terminal view of a running experiment about every
+    `refresh_sec`: totals and in-flight requests from `metrics`, rolling
+    rates and percentiles from `recent`. Rendering only reads these in-memory
+    structures, never SQLite.
+    """
+
+    def __init__(
+        self,
+        metrics: LiveMetrics,
+        recent: RecentRequests,
+        title: str = "",
+        window_sec: float = DEFAULT_WINDOW_SEC,
+        refresh_sec: float = DEFAULT_REFRESH_SEC,
+        stream: TextIO = None,
+    ):
+        self.metrics = metrics
+        self.recent = recent
+        self.title = title
+        self.window_sec = window_sec
+        self.refresh_sec = refresh_sec
+        self.stream = stream or sys.stdout
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def render(self, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        totals = self.metrics.snapshot()
+        window = self.recent.window(self.window_sec, now)
+        elapsed = max(int(now - self.started), 0)
+
+        header = (
+            f"{self.title}  elapsed {elapsed // 3600:02d}:{elapsed % 3600 // 60:02d}:{elapsed % 60:02d}"
+            f"  rolling window {self.window_sec:g}s"
+        )
+        summary = [
+            ["In flight", str(totals["in_flight"])],
+            *[[f"Total {status}", str(count)] for status, count in totals["requests"].items()],
+            ["RPS", f"{window['rps']:.2f}"],
+            ["Input tokens/s", f"{window['input_tokens_per_sec']:.1f}"],
+            ["Output tokens/s", f"{window['output_tokens_per_sec']:.1f}"],
+        ]
+        for name, value in self.metrics.gauge_values().items():
+            summary.append([name.replace("_", " ").capitalize(), f"{value:g}"])
+
+        percentiles = [
+            [label, f"{window[key][0]:.4f}", f"{window[key][1]:.4f}"]
+            for label, key in (("TTFT, s", "ttft"), ("ITL, s", "itl"), ("Latency, s", "latency"))
+        ]
+        success = Status.SUCCESS.value
+        outcomes = {success: window["by_status"][success], **window["by_error_class"]}
+        errors = [
+            [outcome, count, f"{100 * count / window['requests']:.1f}%" if window["requests"] else "-"]
+            for outcome, count in outcomes.items()
+        ]
+        return "\n".join([
+            header,
+            tabulate(summary, tablefmt="fancy_grid", stralign="right", disable_numparse=True),
+            tabulate(
+                percentiles,
+                headers=["", "p50", "p95"],
+                tablefmt="fancy_grid",
+                stralign="right",
+                disable_numparse=True,
+            ),
+            tabulate(errors, headers=["Outcome", "Requests", "Share"], tablefmt="fancy_grid", stralign="right"),
+        ])
+
+    def _run(self):
+        while not self.stop_event.wait(self.refresh_sec):
+            self.stream.write(_CLEAR_SCREEN + self.render() + "\n")
+            self.stream.flush()
+
+    def start(self) -> "LiveDashboard":
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.stream.write(self.render() + "\n")
+        self.stream.flush()
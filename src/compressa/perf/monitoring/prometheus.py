@@ -0,0 +1,245 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from compressa.perf.data.models import ErrorClass, Measurement, Status
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+METRIC_PREFIX = "compressa"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+TEXT_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 25.0, 50.0, 100.0, 250.0, 600.0,
+)
+ITL_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1,
+    0.15, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+STATUSES = list(Status)
+_STATUS_INDEX = {status: i for i, status in enumerate(STATUSES)}
+ERROR_CLASSES = list(ErrorClass)
+_ERROR_CLASS_INDEX = {error_class: i for i, error_class in enumerate(ERROR_CLASSES)}
+
+
+class RequestListener:
+    """Receives request events from an InferenceRunner. Methods are no-ops by default."""
+
+    def on_request_start(self):
+        pass
+
+    def on_request_end(self, measurement: Measurement, inter_token_latencies: Sequence[float] = ()):
+        pass
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum")
+
+    def __init__(self, n_buckets: int):
+        # The last bucket counts values above every bound (+Inf)
+        self.buckets = [0] * (n_buckets + 1)
+        self.sum = 0.0
+
+
+class _Shard:
+    """Counters of one thread. Only the owning thread writes to its shard."""
+
+    __slots__ = ("started", "finished", "errors", "input_tokens", "output_tokens", "ttft", "latency", "itl")
+
+    def __init__(self):
+        self.started = 0
+        self.finished = [0] * len(STATUSES)
+        self.errors = [0] * len(ERROR_CLASSES)
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.ttft = _Histogram(len(LATENCY_BUCKETS))
+        self.latency = _Histogram(len(LATENCY_BUCKETS))
+        self.itl = _Histogram(len(ITL_BUCKETS))
+
+
+def _observe(hist: _Histogram, bounds: Sequence[float], value: float):
+    hist.buckets[bisect.bisect_left(bounds, value)] += 1
+    hist.sum += value
+
+
+class LiveMetrics(RequestListener):
+    """
+    In-process registry of client-side request metrics. Every worker thread
+    updates its own shard, so recording a request takes no lock; a scrape
+    sums the shards. A lock is only taken the first time a thread records.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Registers a gauge whose value is read on every scrape."""
+        self._gauges.append((name, help_text, read))
+
+    def on_request_start(self):
+        self._shard().started += 1
+
+    def on_request_end(self, measurement: Measurement, inter_token_latencies: Sequence[float] = ()):
+        shard = self._shard()
+        shard.finished[_STATUS_INDEX[measurement.status]] += 1
+        if measurement.status != Status.SUCCESS:
+            if measurement.error_class is not None:
+                shard.errors[_ERROR_CLASS_INDEX[measurement.error_class]] += 1
+            return
+        shard.input_tokens += max(measurement.n_input, 0)
+        shard.output_tokens += max(measurement.n_output, 0)
+        _observe(shard.ttft, LATENCY_BUCKETS, measurement.ttft)
+        _observe(shard.latency, LATENCY_BUCKETS, measurement.end_time - measurement.start_time)
+        for itl in inter_token_latencies:
+            _observe(shard.itl, ITL_BUCKETS, itl)
+
+    def gauge_values(self) -> Dict[str, float]:
+        values = {}
+        for name, _, read in self._gauges:
+            try:
+                values[name] = float(read())
+            except Exception as e:
+                logger.debug(f"Failed to read gauge {name}: {e}")
+                values[name] = float("nan")
+        return values
+
+    def snapshot(self) -> Dict:
+        """Totals over all shards."""
+        with self._lock:
+            shards = list(self._shards)
+        finished = [sum(s.finished[i] for s in shards) for i in range(len(STATUSES))]
+
+        def merge(name: str) -> Tuple[List[int], float]:
+            hists = [getattr(s, name) for s in shards]
+            n_buckets = len(ITL_BUCKETS if name == "itl" else LATENCY_BUCKETS) + 1
+            return (
+                [sum(h.buckets[i] for h in hists) for i in range(n_buckets)],
+                sum(h.sum for h in hists),
+            )
+
+        return {
+            "requests": {status.value: n for status, n in zip(STATUSES, finished)},
+            "errors": {
+                error_class.value: sum(s.errors[i] for s in shards)
+                for i, error_class in enumerate(ERROR_CLASSES)
+            },
+            "in_flight": max(sum(s.started for s in shards) - sum(finished), 0),
+            "input_tokens": sum(s.input_tokens for s in shards),
+            "output_tokens": sum(s.output_tokens for s in shards),
+            "ttft": merge("ttft"),
+            "latency": merge("latency"),
+            "itl": merge("itl"),
+        }
+
+    def render(self, openmetrics: bool = True) -> str:
+        """Exposition in the OpenMetrics or the Prometheus 0.0.4 text format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            full = f"{METRIC_PREFIX}_{name}"
+            typed = full + "_total" if kind == "counter" and not openmetrics else full
+            lines.append(f"# HELP {typed} {help_text}")
+            lines.append(f"# TYPE {typed} {kind}")
+            return full
+
+        name = family("requests", "counter", "Finished requests by status.")
+        for status, count in snapshot["requests"].items():
+            lines.append(f'{name}_total{{status="{status}"}} {count}')
+
+        name = family("request_errors", "counter", "Failed requests by error class.")
+        for error_class, count in snapshot["errors"].items():
+            lines.append(f'{name}_total{{error_class="{error_class}"}} {count}')
+
+        name = family("requests_in_flight", "gauge", "Requests sent and not yet finished.")
+        lines.append(f"{name} {snapshot['in_flight']}")
+
+        for kind in ("input", "output"):
+            name = family(f"{kind}_tokens", "counter", f"{kind.capitalize()} tokens of successful requests.")
+            lines.append(f"{name}_total {snapshot[f'{kind}_tokens']}")
+
+        for key, bounds, help_text in (
+            ("ttft", LATENCY_BUCKETS, "Time to first token of successful requests."),
+            ("latency", LATENCY_BUCKETS, "Latency of successful requests."),
+            ("itl", ITL_BUCKETS, "Time between streamed chunks of successful requests."),
+        ):
+            name = family(f"{key}_seconds", "histogram", help_text)
+            buckets, total = snapshot[key]
+            cumulative = 0
+            for bound, count in zip(list(bounds) + ["+Inf"], buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_count {cumulative}")
+            lines.append(f"{name}_sum {total}")
+
+        values = self.gauge_values()
+        for gauge_name, help_text, _ in self._gauges:
+            name = family(gauge_name, "gauge", help_text)
+            value = values[gauge_name]
+            lines.append(f"{name} {'NaN' if value != value else value}")
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves a LiveMetrics registry on http://<host>:<port>/metrics from a daemon thread."""
+
+    def __init__(self, metrics: LiveMetrics, port: int, host: str = "0.0.0.0"):
+        self.metrics = metrics
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = registry.render(openmetrics=openmetrics).encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type",
+                    OPENMETRICS_CONTENT_TYPE if openmetrics else TEXT_CONTENT_TYPE,
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Serving live metrics on http://localhost:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
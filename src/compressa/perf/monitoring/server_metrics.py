@@ -0,0 +1,266 @@
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from compressa.perf.data.frame import MeasurementFrame
+from compressa.perf.data.models import Sample
+from compressa.perf.db.operations import insert_sample
+from compressa.perf.monitoring.client_metrics import DEFAULT_SAMPLE_INTERVAL_SEC
+from compressa.utils import get_logger
+
+logger = get_logger(__name__)
+
+SERVER_SOURCE = "server"
+GPU_INFO_SOURCE = "gpu_info"
+
+# Scheduler and KV cache gauges of common inference servers, and how the
+# series of one metric with different labels (models, engines) are combined
+DEFAULT_SERVER_METRICS = {
+    # vLLM
+    "vllm:num_requests_running": "sum",
+    "vllm:num_requests_waiting": "sum",
+    "vllm:num_requests_swapped": "sum",
+    "vllm:gpu_cache_usage_perc": "mean",
+    "vllm:kv_cache_usage_perc": "mean",
+    "vllm:num_preemptions_total": "sum",
+    # Text Generation Inference
+    "tgi_queue_size": "sum",
+    "tgi_batch_current_size": "sum",
+    "tgi_batch_current_max_tokens": "sum",
+    # SGLang
+    "sglang:num_running_reqs": "sum",
+    "sglang:num_queue_reqs": "sum",
+    "sglang:token_usage": "mean",
+}
+
+
+def parse_prometheus_text(text: str) -> List[Tuple[str, float]]:
+    """
+    (name, value) of every sample in a Prometheus text exposition. Labels
+    and timestamps are dropped, as are comments and non-finite values.
+    """
+    samples = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "{" in line:
+            name, _, rest = line.partition("{")
+            # Label values may contain spaces, so the value follows the last brace
+            rest = rest[rest.rfind("}") + 1:]
+        else:
+            name, _, rest = line.partition(" ")
+        fields = rest.split()
+        if not fields:
+            continue
+        try:
+            value = float(fields[0])
+        except ValueError:
+            continue
+        if math.isfinite(value):
+            samples.append((name.strip(), value))
+    return samples
+
+
+def select_metrics(samples: Iterable[Tuple[str, float]], aggregations: Dict[str, str]) -> Dict[str, float]:
+    """Values of the metrics in `aggregations`, their series summed or averaged."""
+    values: Dict[str, List[float]] = {}
+    for name, value in samples:
+        if name in aggregations:
+            values.setdefault(name, []).append(value)
+    return {
+        name: float(np.mean(series)) if aggregations[name] == "mean" else float(sum(series))
+        for name, series in values.items()
+    }
+
+
+def flatten_numbers(data, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a JSON document, keyed by their dotted path, e.g. `gpus.0.utilization`."""
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        if isinstance(data, (int, float)) and not isinstance(data, bool) and math.isfinite(data):
+            return {prefix: float(data)}
+        return {}
+    flat = {}
+    for key, value in items:
+        flat.update(flatten_numbers(value, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+class ServerMetricsSampler:
+    """
+    Polls Prometheus `/metrics` endpoints of the inference servers and the
+    platform `gpu_info` endpoint every `interval_sec` while an experiment
+    runs, storing each value as a Sample. A failed scrape is logged once per
+    URL and skipped, so an unreachable endpoint never disturbs the run.
+    """
+
+    def __init__(
+        self,
+        metrics_urls: Sequence[str] = (),
+        gpu_info_url: Optional[str] = None,
+        interval_sec: float = DEFAULT_SAMPLE_INTERVAL_SEC,
+        metric_names: Optional[Sequence[str]] = None,
+        timeout_sec: Optional[float] = None,
+    ):
+        if interval_sec <= 0:
+            raise ValueError("interval_sec must be positive")
+        self.metrics_urls = list(metrics_urls)
+        self.gpu_info_url = gpu_info_url
+        self.interval_sec = interval_sec
+        self.aggregations = (
+            {name: DEFAULT_SERVER_METRICS.get(name, "sum") for name in metric_names}
+            if metric_names else dict(DEFAULT_SERVER_METRICS)
+        )
+        self.client = httpx.Client(timeout=timeout_sec or interval_sec)
+        self.failures: Dict[str, int] = {}
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def _source(self, url: str) -> str:
+        # With several servers, each keeps its own series
+        return SERVER_SOURCE if len(self.metrics_urls) == 1 else f"{SERVER_SOURCE}@{url}"
+
+    def _get(self, url: str) -> Optional[httpx.Response]:
+        try:
+            response = self.client.get(url)
+            response.raise_for_status()
+            return response
+        except Exception as e:
+            if url not in self.failures:
+                logger.warning(f"Sampling {url} failed, will keep trying: {e}")
+            self.failures[url] = self.failures.get(url, 0) + 1
+            return None
+
+    def sample_once(self, experiment_id: int) -> List[Sample]:
+        """Scrapes every endpoint once."""
+        samples = []
+        for url in self.metrics_urls:
+            timestamp = time.time()
+            response = self._get(url)
+            if response is None:
+                continue
+            values = select_metrics(parse_prometheus_text(response.text), self.aggregations)
+            samples.extend(
+                Sample(None, experiment_id, timestamp, self._source(url), name, value)
+                for name, value in values.items()
+            )
+        if self.gpu_info_url:
+            timestamp = time.time()
+            response = self._get(self.gpu_info_url)
+            if response is not None:
+                try:
+                    values = flatten_numbers(response.json())
+                except ValueError:
+                    values = {}
+                samples.extend(
+                    Sample(None, experiment_id, timestamp, GPU_INFO_SOURCE, name, value)
+                    for name, value in values.items()
+                )
+        return samples
+
+    def _run(self, experiment_id: int):
+        while True:
+            for sample in self.sample_once(experiment_id):
+                insert_sample(sample)
+            if self.stop_event.wait(self.interval_sec):
+                return
+
+    def start(self, experiment_id: int) -> "ServerMetricsSampler":
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(experiment_id,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.client.close()
+
+    def parameters(self) -> Dict[str, str]:
+        params = {"sample_interval_sec": str(self.interval_sec)}
+        if self.metrics_urls:
+            params["server_metrics_url"] = ",".join(self.metrics_urls)
+        if self.gpu_info_url:
+            params["gpu_info_url"] = self.gpu_info_url
+        return params
+
+
+def even_windows(frame: MeasurementFrame, num_windows: int) -> List[Tuple[float, float]]:
+    """`num_windows` equal windows spanning from the first request start to the last end."""
+    if not len(frame):
+        return []
+    start = float(frame.start_time.min())
+    end = float(frame.end_time.max())
+    edges = np.linspace(start, end, num_windows + 1)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def align_samples(
+    frame: MeasurementFrame,
+    samples: Sequence[Sample],
+    windows: Sequence[Tuple[float, float]],
+) -> pd.DataFrame:
+    """
+    One row per client window [start, end): requests whose first token (or
+    failure) came within the window, their mean and 95th percentile TTFT,
+    and each sampled series over the window, labelled `source/name` unless
+    the source is the server. Gauges are averaged; counters (names ending in
+    `_total`) give their increase over the window.
+    """
+    first_token = frame.start_time + np.where(frame.success, frame.ttft, frame.latency)
+    series: Dict[str, List[Tuple[float, float]]] = {}
+    for s in samples:
+        label = s.name if s.source == SERVER_SOURCE else f"{s.source}/{s.name}"
+        series.setdefault(label, []).append((s.timestamp, s.value))
+    series_arrays = {
+        label: np.array(points, dtype=np.float64).reshape(-1, 2)
+        for label, points in sorted(series.items())
+    }
+
+    rows = []
+    for start, end in windows:
+        in_window = (first_token >= start) & (first_token < end)
+        ttfts = frame.ttft[in_window & frame.success]
+        row = {
+            "window_start": start,
+            "window_end": end,
+            "requests": int(np.count_nonzero(in_window)),
+            "ttft": float(ttfts.mean()) if ttfts.size else np.nan,
+            "ttft_95": float(np.percentile(ttfts, 95)) if ttfts.size else np.nan,
+        }
+        for label, points in series_arrays.items():
+            values = points[(points[:, 0] >= start) & (points[:, 0] < end), 1]
+            if not values.size:
+                row[label] = np.nan
+            elif label.endswith("_total"):
+                row[label] = float(values[-1] - values[0])
+            else:
+                row[label] = float(values.mean())
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["window_start", "window_end", "requests", "ttft", "ttft_95", *series_arrays])
+
+
+def correlate(windows: pd.DataFrame, client_column: str = "ttft_95") -> Dict[str, float]:
+    """
+    Pearson correlation across windows between a client metric and each
+    sampled series; series that are constant or sampled in fewer than three
+    windows are left out.
+    """
+    correlations = {}
+    for label in windows.columns[5:]:
+        pairs = windows[[client_column, label]].dropna()
+        if len(pairs) < 3 or pairs[label].nunique() < 2 or pairs[client_column].nunique() < 2:
+            continue
+        correlations[label] = float(np.corrcoef(pairs[client_column], pairs[label])[0, 1])
+    return correlations
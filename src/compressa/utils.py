@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 from typing import (
     Generator,
@@ -40,6 +39,8 @@ def stream_chat(
     }
     data.update(kwargs)
     usage_data = {}
+    import requests
+
     try:
         response = requests.post(api_url, headers=headers, json=data, stream=True)
         response.raise_for_status()
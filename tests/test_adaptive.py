@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from compressa.perf.data.models import Measurement
+from compressa.perf.experiment.adaptive import AdaptiveStopping, PrecisionTarget
+
+
+class TestAdaptiveStopping(unittest.TestCase):
+    def test_parse_target(self):
+        target = PrecisionTarget.parse("ttft_p95=0.05")
+        self.assertEqual((target.metric, target.stat, target.rel_half_width), ("ttft", "p95", 0.05))
+        with self.assertRaises(ValueError):
+            PrecisionTarget.parse("ttft_p42")
+
+    def test_stops_once_precise(self):
+        rng = np.random.default_rng(5)
+        stopping = AdaptiveStopping(
+            [PrecisionTarget.parse("latency_mean=0.02")],
+            min_tasks=50,
+            check_every=50,
+        )
+        measurements = []
+        stopped_at = None
+        for i, latency in enumerate(rng.lognormal(0.0, 0.3, size=5000)):
+            measurements.append(Measurement(
+                id=None, experiment_id=1, n_input=10, n_output=10,
+                ttft=latency / 4, start_time=i, end_time=i + latency,
+            ))
+            if stopping.should_stop(measurements):
+                stopped_at = len(measurements)
+                break
+        self.assertIsNotNone(stopped_at)
+        self.assertLess(stopped_at, 1000)
+        self.assertTrue(stopping.converged)
+        self.assertLessEqual(stopping.achieved["latency_mean"], 0.02)
+
+        parameters = stopping.parameters(max_num_tasks=5000)
+        self.assertEqual(parameters["num_tasks"], str(stopped_at))
+        self.assertEqual(parameters["max_num_tasks"], "5000")
+        self.assertEqual(parameters["adaptive_converged"], "true")
+        self.assertIn("precision_latency_mean", parameters)
+
+
+if __name__ == "__main__":
+    unittest.main()
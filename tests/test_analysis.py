@@ -2,18 +2,28 @@ import unittest
 import sqlite3
 import time
 import datetime
+import statistics
+import numpy as np
 from compressa.perf.data.models import (
+    ErrorClass,
+    ErrorPhase,
     Experiment,
     Measurement,
     MetricName,
+    Status,
 )
+from compressa.perf.data.frame import MeasurementFrame
 from compressa.perf.db.setup import create_tables
 from compressa.perf.db.operations import (
     insert_measurement,
     fetch_metrics_by_experiment,
     fetch_measurements_by_experiment,
+    fetch_measurement_frame,
+)
+from compressa.perf.db.db_inserts import (
+    direct_insert_experiment as insert_experiment,
+    direct_insert_measurement,
 )
-from compressa.perf.db.db_inserts import direct_insert_experiment as insert_experiment
 from compressa.perf.experiment.analysis import Analyzer
 
 class TestAnalyzer(unittest.TestCase):
@@ -80,5 +90,214 @@ class TestAnalyzer(unittest.TestCase):
         self.assertAlmostEqual(metrics_dict[MetricName.TPOT.value], 0.08, places=4)
         self.assertAlmostEqual(metrics_dict[MetricName.THROUGHPUT.value], 48.0, places=2)
 
+class TestCoordinatedOmission(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = Analyzer(sqlite3.connect(":memory:"))
+        # One runner: 1 s requests back to back, then a 10 s stall
+        self.measurements = []
+        start = 0.0
+        for latency in [1.0] * 19 + [10.0] + [1.0] * 20:
+            self.measurements.append(Measurement(
+                id=None,
+                experiment_id=1,
+                n_input=10,
+                n_output=10,
+                ttft=latency / 2,
+                start_time=start,
+                end_time=start + latency,
+                intended_start_time=start,
+            ))
+            start += latency
+        # The request after the stall was intended one interval after the stalled one
+        stalled = self.measurements[19]
+        self.interval = sum(m.end_time - m.start_time for m in self.measurements) / len(self.measurements)
+        self.measurements[20].intended_start_time = stalled.start_time + self.interval
+        for m in self.measurements:
+            m.send_interval = self.interval
+
+    def test_corrected_percentiles(self):
+        samples = self.analyzer.compute_corrected_samples(self.measurements)
+        omitted = self.analyzer.compute_omitted_requests(self.measurements)
+        self.assertEqual(samples.size, len(self.measurements) + omitted)
+        # Sends at 2..8 intervals after the stalled start fall before the actual start
+        self.assertEqual(omitted, 7)
+        self.assertGreater(
+            self.analyzer.compute_q95_latency_corrected(self.measurements),
+            self.analyzer.compute_q95_latency(self.measurements),
+        )
+
+    def test_no_correction_without_intended_start(self):
+        for m in self.measurements:
+            m.intended_start_time = None
+        self.assertAlmostEqual(
+            self.analyzer.compute_q95_latency_corrected(self.measurements),
+            self.analyzer.compute_q95_latency(self.measurements),
+        )
+        self.assertEqual(self.analyzer.compute_omitted_requests(self.measurements), 0)
+
+    def test_open_loop_counts_gap_once(self):
+        # Without a send interval the requests were sent on a schedule, so the
+        # ones queued behind the stall were measured and none is omitted
+        for m in self.measurements:
+            m.send_interval = None
+        samples = self.analyzer.compute_corrected_samples(self.measurements)
+        self.assertEqual(self.analyzer.compute_omitted_requests(self.measurements), 0)
+        latencies = [m.end_time - m.start_time for m in self.measurements]
+        latencies[20] += self.measurements[20].start_time - self.measurements[20].intended_start_time
+        np.testing.assert_allclose(samples, latencies)
+
+    def test_interval_per_runner(self):
+        # A second runner, ten times slower, blocked for the same 8 s
+        slow = [
+            Measurement(
+                id=None, experiment_id=1, n_input=10, n_output=10, ttft=5.0,
+                start_time=100.0 + 20.0 * i, end_time=110.0 + 20.0 * i,
+                intended_start_time=100.0 + 20.0 * i - (8.0 if i == 1 else 0.0),
+                send_interval=10.0,
+            )
+            for i in range(3)
+        ]
+        # The fast runner alone is not affected by the slow one's interval
+        self.assertEqual(self.analyzer.compute_omitted_requests(self.measurements + slow), 7)
+
+
+class TestPrefillDecodeRates(unittest.TestCase):
+    def test_recovers_rates(self):
+        import random
+        rng = random.Random(0)
+        analyzer = Analyzer(sqlite3.connect(":memory:"))
+        measurements = []
+        # Sequential requests first (concurrency 1), then 4 at a time with 0.2 s queueing
+        t = 0.0
+        for i in range(200):
+            concurrent = i >= 100
+            n_input = rng.randint(100, 4000)
+            n_output = rng.randint(10, 500)
+            ttft = 0.05 + n_input / 2000 + (0.2 if concurrent else 0.0)
+            latency = ttft + 0.01 + n_output / 50
+            for _ in range(4 if concurrent else 1):
+                measurements.append(Measurement(
+                    id=None, experiment_id=1, n_input=n_input, n_output=n_output,
+                    ttft=ttft, start_time=t, end_time=t + latency,
+                ))
+            t += latency + 1.0
+
+        rates = analyzer.compute_prefill_decode_rates(measurements)
+        self.assertAlmostEqual(rates[MetricName.PREFILL_RATE.value], 2000, delta=1)
+        self.assertAlmostEqual(rates[MetricName.DECODE_RATE.value], 50, delta=0.1)
+        self.assertAlmostEqual(rates[MetricName.FIXED_OVERHEAD.value], 0.05, places=4)
+        # 400 of 500 requests waited 0.2 s
+        self.assertAlmostEqual(rates[MetricName.QUEUEING_DELAY.value], 0.16, places=4)
+        concurrency = [fit["concurrency"] for fit in analyzer.compute_rate_fits(measurements)]
+        self.assertEqual(concurrency, [1.0, 4.0])
+
+        # The fit of each bucket is stored with the group metrics
+        by_concurrency = analyzer.compute_group_metrics(measurements)["concurrency"]
+        self.assertEqual(list(by_concurrency), ["1", "4"])
+        self.assertAlmostEqual(by_concurrency["1"][MetricName.FIXED_OVERHEAD.value], 0.05, places=4)
+        self.assertAlmostEqual(by_concurrency["4"][MetricName.FIXED_OVERHEAD.value], 0.25, places=4)
+        self.assertAlmostEqual(by_concurrency["4"][MetricName.PREFILL_RATE.value], 2000, delta=1)
+
+
+class TestMeasurementFrame(unittest.TestCase):
+    def setUp(self):
+        import random
+        rng = random.Random(1)
+        self.measurements = []
+        for i in range(300):
+            start = i * 0.1
+            latency = rng.uniform(0.5, 3.0)
+            self.measurements.append(Measurement(
+                id=None,
+                experiment_id=1,
+                n_input=rng.randint(10, 1000),
+                n_output=rng.randint(0, 300),
+                ttft=rng.uniform(0.05, 0.5),
+                start_time=start,
+                end_time=start + latency,
+                status=Status.FAILED if i % 9 == 0 else Status.SUCCESS,
+                intended_start_time=None if i % 4 else start - rng.uniform(0, 2),
+                error_class=ErrorClass.RATE_LIMITED if i % 9 == 0 else None,
+                http_status=429 if i % 9 == 0 else None,
+                error_phase=ErrorPhase.PRE_FIRST_TOKEN if i % 9 == 0 else None,
+            ))
+        self.analyzer = Analyzer(sqlite3.connect(":memory:"))
+
+    def test_frame_and_list_give_same_metrics(self):
+        frame = MeasurementFrame.from_measurements(self.measurements)
+        self.assertEqual(frame.to_measurements(), self.measurements)
+        from_list, io_list = self.analyzer.compute_metrics_for_measurements(self.measurements)
+        from_frame, io_frame = self.analyzer.compute_metrics_for_measurements(frame)
+        self.assertEqual(from_list, from_frame)
+        self.assertEqual(io_list, io_frame)
+
+    def test_matches_row_wise_definitions(self):
+        successes = [m for m in self.measurements if m.status == Status.SUCCESS]
+        latencies = sorted(m.end_time - m.start_time for m in successes)
+        top = latencies[int(0.95 * len(latencies)):]
+        self.assertAlmostEqual(self.analyzer.compute_top_5_latency(self.measurements), sum(top) / len(top))
+        self.assertAlmostEqual(
+            self.analyzer.compute_q95_ttft(self.measurements),
+            float(np.percentile([m.ttft for m in successes], 95)),
+        )
+        stats = self.analyzer.compute_input_output_stats(self.measurements)
+        self.assertAlmostEqual(stats["std_n_output"], statistics.stdev([m.n_output for m in successes]))
+        self.assertEqual(self.analyzer.compute_failed_requests(self.measurements), 34)
+
+    def test_fetch_frame_from_db(self):
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        experiment_id = insert_experiment(conn, Experiment(
+            id=None, experiment_name="Frame", experiment_date=datetime.datetime.now(),
+        ))
+        for m in self.measurements:
+            m.experiment_id = experiment_id
+            direct_insert_measurement(conn, m)
+        frame = fetch_measurement_frame(conn, experiment_id, chunk_size=64)
+        self.assertEqual(frame.to_measurements(), fetch_measurements_by_experiment(conn, experiment_id))
+        self.assertEqual(int(frame.failed.sum()), 34)
+        window = fetch_measurement_frame(conn, experiment_id, start_ts=10.0, end_ts=20.0)
+        self.assertTrue(np.all((window.end_time > 10.0) & (window.end_time <= 20.0)))
+
+
+class TestFailureTaxonomy(unittest.TestCase):
+    def _measurement(self, i, error_class=None, time_to_failure=1.0):
+        start = 100.0 + i
+        return Measurement(
+            id=None,
+            experiment_id=1,
+            n_input=10,
+            n_output=10,
+            ttft=0.1,
+            start_time=start,
+            end_time=start + time_to_failure,
+            status=Status.SUCCESS if error_class is None else Status.FAILED,
+            error_class=error_class,
+        )
+
+    def test_failure_breakdown(self):
+        measurements = [self._measurement(i) for i in range(6)]
+        measurements += [self._measurement(10 + i, ErrorClass.RATE_LIMITED, 0.5) for i in range(3)]
+        measurements.append(self._measurement(20, ErrorClass.TIMEOUT, 30.0))
+        analyzer = Analyzer(sqlite3.connect(":memory:"))
+
+        breakdown = analyzer.compute_failure_breakdown(measurements)
+        self.assertEqual(breakdown["FAILED_RATE_LIMITED"], 3)
+        self.assertAlmostEqual(breakdown["FAILED_RATE_LIMITED_RATE"], 0.3)
+        self.assertEqual(breakdown["FAILED_TIMEOUT"], 1)
+        self.assertNotIn("FAILED_SERVER_ERROR", breakdown)
+        self.assertAlmostEqual(breakdown[MetricName.TIME_TO_FAILURE.value], 31.5 / 4)
+
+        histograms = analyzer.compute_histograms(measurements)
+        self.assertEqual(histograms[MetricName.TIME_TO_FAILURE.value].count, 4)
+
+    def test_legacy_failed_end_time(self):
+        # Older versions stored the time to failure as the end time
+        legacy = self._measurement(0, ErrorClass.OTHER)
+        legacy.end_time = 2.5
+        analyzer = Analyzer(sqlite3.connect(":memory:"))
+        self.assertEqual(analyzer.compute_time_to_failure([legacy]).tolist(), [2.5])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import sqlite3
+import datetime
+import tempfile
+
+from compressa.perf.data.models import Experiment, Measurement, Parameter, Status
+from compressa.perf.db.setup import create_tables
+from compressa.perf.db.db_inserts import (
+    direct_insert_experiment as insert_experiment,
+    direct_insert_measurement,
+    direct_insert_parameter,
+)
+from compressa.perf.db.operations import (
+    fetch_measurements_by_experiment,
+    fetch_parameters_by_experiment,
+)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from compressa.perf.db.arrow_io import export_experiments, import_experiments
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestArrowExportImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(":memory:")
+        create_tables(self.conn)
+        self.experiment_id = insert_experiment(self.conn, Experiment(
+            id=None,
+            experiment_name="Host A",
+            experiment_date=datetime.datetime.now(),
+            description="exported",
+        ))
+        direct_insert_parameter(self.conn, Parameter(
+            id=None, experiment_id=self.experiment_id, key="num_workers", value="8",
+        ))
+        for i in range(25):
+            direct_insert_measurement(self.conn, Measurement(
+                id=None,
+                experiment_id=self.experiment_id,
+                n_input=100 + i,
+                n_output=50,
+                ttft=0.05 * (i + 1),
+                start_time=1000.0 + i,
+                end_time=1002.0 + i,
+                status=Status.FAILED if i == 3 else Status.SUCCESS,
+                intended_start_time=None if i % 2 else 999.0 + i,
+            ))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _roundtrip(self, file_format):
+        counts = export_experiments(self.conn, self.tmp.name, file_format=file_format, chunk_size=10)
+        self.assertEqual(counts["Measurements"], 25)
+
+        target = sqlite3.connect(":memory:")
+        create_tables(target)
+        # An unrelated experiment already in the target shifts the ids
+        insert_experiment(target, Experiment(
+            id=None, experiment_name="Local", experiment_date=datetime.datetime.now(),
+        ))
+        id_map = import_experiments(target, self.tmp.name, chunk_size=7)
+        new_id = id_map[self.experiment_id]
+        self.assertNotEqual(new_id, self.experiment_id)
+
+        original = fetch_measurements_by_experiment(self.conn, self.experiment_id)
+        imported = fetch_measurements_by_experiment(target, new_id)
+        self.assertEqual(
+            [(m.ttft, m.status, m.intended_start_time) for m in imported],
+            [(m.ttft, m.status, m.intended_start_time) for m in original],
+        )
+        params = {p.key: p.value for p in fetch_parameters_by_experiment(target, new_id)}
+        self.assertEqual(params["num_workers"], "8")
+        self.assertIn("import_source", params)
+        sql = "SELECT experiment_date FROM Experiments WHERE id = ?"
+        self.assertEqual(
+            target.execute(sql, (new_id,)).fetchone(),
+            self.conn.execute(sql, (self.experiment_id,)).fetchone(),
+        )
+
+    def test_parquet_roundtrip(self):
+        self._roundtrip("parquet")
+
+    def test_arrow_roundtrip(self):
+        self._roundtrip("arrow")
+
+
+if __name__ == "__main__":
+    unittest.main()
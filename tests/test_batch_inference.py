@@ -0,0 +1,106 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from compressa.perf.data.models import ErrorClass, Measurement, MetricName, Status
+from compressa.perf.experiment.analysis import Analyzer
+from compressa.perf.experiment.batch_inference import (
+    BatchInferenceRunner,
+    EmbeddingsRunner,
+    RerankRunner,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body))
+        if body["model"] == "broken":
+            self.send_response(500)
+            self.end_headers()
+            return
+        documents = body.get("input") or body.get("documents")
+        payload = json.dumps({"usage": {"prompt_tokens": 3 * len(documents), "total_tokens": 3 * len(documents)}})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBatchRunners(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.requests = []
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/v1/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_embeddings(self):
+        runner = EmbeddingsRunner("key", self.url, "embedder")
+        [measurement] = runner.run_request(1, ["a", "b", "c", "d"])
+        self.assertEqual(measurement.status, Status.SUCCESS)
+        self.assertEqual(measurement.batch_size, 4)
+        self.assertEqual(measurement.n_input, 12)
+        self.assertEqual(measurement.n_output, 0)
+        self.assertAlmostEqual(measurement.ttft, measurement.end_time - measurement.start_time)
+        self.assertIn(("/v1/embeddings", {"model": "embedder", "input": ["a", "b", "c", "d"]}), self.server.requests)
+
+    def test_rerank(self):
+        runner = RerankRunner("key", self.url, "reranker")
+        [measurement] = runner.run_request(1, ["a", "b"], query="q")
+        self.assertEqual(measurement.status, Status.SUCCESS)
+        self.assertEqual(measurement.batch_size, 2)
+        self.assertIn(
+            ("/v1/rerank", {"model": "reranker", "query": "q", "documents": ["a", "b"]}),
+            self.server.requests,
+        )
+
+    def test_server_error(self):
+        runner = EmbeddingsRunner("key", self.url, "broken")
+        [measurement] = runner.run_request(1, ["a"])
+        self.assertEqual(measurement.status, Status.FAILED)
+        self.assertEqual(measurement.error_class, ErrorClass.SERVER_ERROR)
+        self.assertEqual(measurement.http_status, 500)
+        self.assertEqual(measurement.batch_size, 1)
+
+    def test_base_runner_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BatchInferenceRunner("key", self.url, "model")
+
+
+class TestBatchMetrics(unittest.TestCase):
+    def test_docs_per_second(self):
+        measurements = [
+            Measurement(
+                id=None,
+                experiment_id=1,
+                n_input=80,
+                n_output=0,
+                ttft=2.0,
+                start_time=float(i),
+                end_time=float(i) + 2.0,
+                status=Status.SUCCESS,
+                batch_size=8,
+            )
+            for i in range(9)
+        ]
+        metrics = Analyzer(None).compute_batch_metrics(measurements)
+        # 72 documents and 720 input tokens from t=0 to t=10
+        self.assertAlmostEqual(metrics[MetricName.DOCS_PER_SECOND.value], 7.2)
+        self.assertAlmostEqual(metrics[MetricName.THROUGHPUT_INPUT_TOKENS.value], 72.0)
+        self.assertAlmostEqual(metrics[MetricName.LATENCY_PER_DOC.value], 0.25)
+        self.assertAlmostEqual(metrics[MetricName.LATENCY.value], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
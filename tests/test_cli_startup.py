@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# Modules that only the commands sending requests or writing files need
+HEAVY_MODULES = ["openai", "pandas", "httpx", "requests", "reportlab", "tqdm", "yaml"]
+# Seconds to import the CLI; several times what it takes on a laptop, so
+# that only a heavy import at module level crosses it
+IMPORT_BUDGET_SEC = 0.8
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import compressa.perf.cli.__main__
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+class TestCliStartup(unittest.TestCase):
+    def _import_cli(self):
+        # The package may be importable only through the path pytest set up
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run([sys.executable, "-c", SCRIPT], env=env, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+    def test_no_heavy_imports(self):
+        modules = set(self._import_cli()["modules"])
+        self.assertEqual([name for name in HEAVY_MODULES if name in modules], [])
+
+    def test_import_budget(self):
+        # Best of three, as the first run also pays for cold caches
+        elapsed = min(self._import_cli()["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_BUDGET_SEC)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import socket
+import time
+import unittest
+
+from compressa.perf.data.models import Sample
+from compressa.perf.monitoring.client_metrics import (
+    CLIENT_SOURCE,
+    ClientMonitor,
+    client_bound_reasons,
+)
+
+
+def _client_samples(name, values):
+    return [Sample(None, 1, float(i), CLIENT_SOURCE, name, value) for i, value in enumerate(values)]
+
+
+class TestClientMonitor(unittest.TestCase):
+    def test_sample_once(self):
+        monitor = ClientMonitor(interval_sec=1.0, tick_sec=0.001)
+        monitor.start(1)
+        # Busy loop: the process uses about a full core meanwhile
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            pass
+        samples = {s.name: s for s in monitor.sample_once(1)}
+        monitor.stop()
+
+        self.assertTrue(all(s.source == CLIENT_SOURCE and s.experiment_id == 1 for s in samples.values()))
+        self.assertGreater(samples["cpu_percent"].value, 30.0)
+        self.assertGreater(samples["rss_bytes"].value, 0)
+        self.assertGreaterEqual(samples["threads"].value, 3)
+        self.assertGreaterEqual(samples["scheduler_lag_max_ms"].value, samples["scheduler_lag_mean_ms"].value)
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc")
+    def test_open_sockets(self):
+        monitor = ClientMonitor()
+        before = {s.name: s.value for s in monitor.sample_once(1)}["open_sockets"]
+        with socket.socket(), socket.socket():
+            during = {s.name: s.value for s in monitor.sample_once(1)}["open_sockets"]
+        self.assertEqual(during, before + 2)
+
+
+class TestClientBound(unittest.TestCase):
+    def test_thresholds(self):
+        self.assertEqual(client_bound_reasons(_client_samples("cpu_percent", [50.0] * 20)), [])
+        # A single spike is not enough
+        self.assertEqual(client_bound_reasons(_client_samples("cpu_percent", [50.0] * 19 + [99.0])), [])
+
+        reasons = client_bound_reasons(
+            _client_samples("cpu_percent", [50.0] * 15 + [99.0] * 5)
+            + _client_samples("scheduler_lag_mean_ms", [1.0] * 10 + [20.0] * 10)
+        )
+        self.assertEqual(reasons, [
+            "CPU above 90% in 25% of samples",
+            "scheduler lag above 5 ms in 50% of samples",
+        ])
+
+    def test_ignores_server_samples(self):
+        samples = [Sample(None, 1, 0.0, "server", "cpu_percent", 100.0)]
+        self.assertEqual(client_bound_reasons(samples), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
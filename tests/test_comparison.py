@@ -0,0 +1,68 @@
+import unittest
+import time
+
+import numpy as np
+
+from compressa.perf.experiment.comparison import (
+    ExperimentSamples,
+    bootstrap_quantile,
+    bootstrap_mean,
+    compare_samples,
+)
+
+
+def _samples(rng, n, scale=1.0, experiment_id=1):
+    latency = rng.lognormal(0.0, 0.5, size=n) * scale
+    n_output = rng.integers(50, 200, size=n).astype(np.float64)
+    return ExperimentSamples(
+        experiment_id=experiment_id,
+        ttft=latency * 0.2,
+        latency=latency,
+        tpot=latency / n_output,
+        tokens=n_output + 100,
+        duration=n / 10.0,
+    )
+
+
+class TestBootstrap(unittest.TestCase):
+    def test_quantile_replicates_match_naive_bootstrap(self):
+        rng = np.random.default_rng(1)
+        values = rng.exponential(size=500)
+        _, fast = bootstrap_quantile(values, 0.95, 4000, rng)
+        naive = np.array([
+            np.quantile(values[rng.integers(0, values.size, values.size)], 0.95, method="inverted_cdf")
+            for _ in range(4000)
+        ])
+        self.assertAlmostEqual(fast.mean(), naive.mean(), delta=0.05)
+        self.assertAlmostEqual(fast.std(), naive.std(), delta=0.05)
+
+    def test_mean_replicates(self):
+        rng = np.random.default_rng(2)
+        values = rng.normal(10.0, 2.0, size=1000)
+        mean, replicates = bootstrap_mean(values, 1000, rng)
+        self.assertAlmostEqual(mean, values.mean())
+        self.assertAlmostEqual(replicates.std(), 2.0 / np.sqrt(1000), delta=0.01)
+
+    def test_compare_detects_difference(self):
+        rng = np.random.default_rng(3)
+        a = _samples(rng, 5000)
+        same = compare_samples(a, _samples(rng, 5000, experiment_id=2))
+        slower = compare_samples(a, _samples(rng, 5000, scale=1.1, experiment_id=2))
+        latency_mean = [r for r in slower if r.metric == "LATENCY" and r.stat == "mean"][0]
+        self.assertTrue(latency_mean.significant)
+        self.assertTrue(latency_mean.regression)
+        self.assertAlmostEqual(latency_mean.rel_diff, 0.1, delta=0.04)
+        self.assertLessEqual(sum(r.significant for r in same), 2)
+
+    def test_million_rows_in_seconds(self):
+        rng = np.random.default_rng(4)
+        a = _samples(rng, 1_000_000)
+        b = _samples(rng, 1_000_000, experiment_id=2)
+        started = time.time()
+        rows = compare_samples(a, b)
+        self.assertLess(time.time() - started, 10.0)
+        self.assertEqual(len(rows), 13)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,12 @@
 import unittest
+import os
+import tempfile
 import time
 import sqlite3
 import datetime
 
+import numpy as np
+
 from compressa.perf.db import (
     DB_NAME,
 )
@@ -16,14 +20,48 @@ from compressa.perf.db.operations import (
     fetch_parameters_by_experiment,
     fetch_measurements_by_experiment,
 )
-from compressa.perf.db.db_inserts import direct_insert_experiment as insert_experiment
+from compressa.perf.db.db_inserts import (
+    direct_insert_experiment as insert_experiment,
+    direct_insert_window_metrics,
+    direct_insert_measurement,
+    direct_insert_metric,
+)
+from compressa.perf.db.segments import (
+    SegmentWriter,
+    ingest_segments,
+    list_segments,
+    read_measurements,
+)
+from compressa.perf.db.queries import (
+    approximate_percentiles,
+    exact_percentiles,
+    measurement_summary,
+    metrics_table,
+    time_buckets,
+)
+from compressa.perf.db.retention import (
+    RetentionPolicy,
+    apply_retention,
+    rollup_and_prune,
+    summarize_rollups,
+)
+from compressa.perf.db.operations import (
+    fetch_metric_fingerprints,
+    fetch_window_metrics,
+    summarize_window_metrics,
+)
+from compressa.perf.experiment.recompute import recompute_metrics
 from compressa.perf.data.models import (
+    ErrorClass,
+    ErrorPhase,
     Experiment,
     Metric,
     MetricName,
     Parameter,
     Measurement,
     Status,
+    TokenSource,
+    WindowMetrics,
 )
 
 
@@ -118,5 +156,418 @@ class TestStringMethods(unittest.TestCase):
             self.assertEqual(measurements[0].status, Status.SUCCESS.value)
 
 
+class TestWindowMetrics(unittest.TestCase):
+    def test_insert_fetch_and_summarize(self):
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        experiment_id = insert_experiment(conn, Experiment(
+            id=None,
+            experiment_name="Stress",
+            experiment_date=datetime.datetime.now(),
+        ))
+        for index in range(1, 6):
+            direct_insert_window_metrics(conn, WindowMetrics(
+                id=None,
+                experiment_id=experiment_id,
+                window_index=index,
+                window_start=1000.0 + 60 * (index - 1),
+                window_end=1000.0 + 60 * index,
+                num_requests=100,
+                failed_requests=index,
+                ttft=0.1 * index,
+                ttft_95=0.2 * index,
+                ttft_95_corrected=0.3 * index,
+                latency=1.0 * index,
+                latency_95=2.0 * index,
+                latency_95_corrected=3.0 * index,
+                tpot=0.01,
+                throughput=1000.0,
+                throughput_input_tokens=600.0,
+                throughput_output_tokens=400.0,
+                rps=10.0 + index,
+                avg_n_input=60.0,
+                avg_n_output=40.0,
+                timestamp=datetime.datetime.now(),
+            ))
+
+        windows = fetch_window_metrics(conn, experiment_id, start_ts=1060.0, end_ts=1180.0)
+        self.assertEqual([w.window_index for w in windows], [2, 3])
+        self.assertAlmostEqual(windows[0].ttft, 0.2)
+
+        summary = summarize_window_metrics(conn, experiment_id)
+        self.assertEqual(summary["num_windows"], 5)
+        self.assertEqual(summary["failed_requests"], 15)
+        self.assertAlmostEqual(summary["max_rps"], 15.0)
+        self.assertIsNone(summarize_window_metrics(conn, experiment_id + 1))
+
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        create_tables(self.conn)
+        self.experiment_id = insert_experiment(self.conn, Experiment(
+            id=None,
+            experiment_name="Soak",
+            experiment_date=datetime.datetime.now(),
+        ))
+        # One request every 5 seconds for 10 minutes, every 10th fails
+        for i in range(120):
+            start = 6000.0 + 5 * i
+            direct_insert_measurement(self.conn, Measurement(
+                id=None,
+                experiment_id=self.experiment_id,
+                n_input=10,
+                n_output=20,
+                ttft=0.1 + 0.001 * i,
+                start_time=start,
+                end_time=start + 1.0,
+                status=Status.FAILED if i % 10 == 0 else Status.SUCCESS,
+            ))
+
+    def _count_raw(self):
+        return self.conn.execute("SELECT COUNT(*) FROM Measurements").fetchone()[0]
+
+    def test_rollup_and_prune(self):
+        result = rollup_and_prune(self.conn, self.experiment_id, cutoff_ts=6300.0, bucket_seconds=60)
+        self.assertEqual(result.pruned_rows, 60)
+        self.assertEqual(result.rollups_written, 5)
+        self.assertEqual(self._count_raw(), 60)
+
+        summary = summarize_rollups(self.conn, self.experiment_id)
+        self.assertEqual(summary["num_requests"], 60)
+        self.assertEqual(summary["failed_requests"], 6)
+        self.assertEqual(summary["sum_n_output"], 54 * 20)
+        self.assertEqual(summary["latency"].count, 54)
+        self.assertAlmostEqual(summary["latency"].quantile(0.5), 1.0, delta=0.02)
+
+        # Running again with the same cutoff is a no-op
+        again = rollup_and_prune(self.conn, self.experiment_id, cutoff_ts=6300.0, bucket_seconds=60)
+        self.assertEqual(again.pruned_rows, 0)
+
+    def test_late_rows_merge_into_existing_bucket(self):
+        rollup_and_prune(self.conn, self.experiment_id, cutoff_ts=6300.0, bucket_seconds=60)
+        direct_insert_measurement(self.conn, Measurement(
+            id=None,
+            experiment_id=self.experiment_id,
+            n_input=10,
+            n_output=20,
+            ttft=0.1,
+            start_time=6009.0,
+            end_time=6010.0,
+            status=Status.SUCCESS,
+        ))
+        rollup_and_prune(self.conn, self.experiment_id, cutoff_ts=6300.0, bucket_seconds=60)
+        summary = summarize_rollups(self.conn, self.experiment_id)
+        self.assertEqual(summary["num_rollups"], 5)
+        self.assertEqual(summary["num_requests"], 61)
+
+    def test_policy_cutoff_is_bucket_aligned(self):
+        policy = RetentionPolicy(raw_retention_hours=0.05, rollup_interval_sec=60)
+        self.assertEqual(policy.cutoff(now=6000.0 + 180 + 600 + 30), 6600.0)
+        result = apply_retention(self.conn, self.experiment_id, policy, now=6810.0)
+        self.assertEqual(result.pruned_rows, 120)
+        self.assertIsNone(summarize_rollups(self.conn, self.experiment_id + 1))
+
+    def test_pruning_shrinks_the_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "soak.db")
+            conn = sqlite3.connect(path)
+            create_tables(conn)
+            # Every insert commits; do not wait for the disk in between
+            conn.execute("PRAGMA synchronous = OFF")
+            for i in range(5_000):
+                direct_insert_measurement(conn, Measurement(
+                    id=None, experiment_id=1, n_input=10, n_output=20, ttft=0.1,
+                    start_time=float(i), end_time=i + 1.0, status=Status.SUCCESS,
+                    endpoint="http://replica:8000/v1" * 4,
+                ))
+            size_before = os.path.getsize(path)
+            policy = RetentionPolicy(raw_retention_hours=0.0, rollup_interval_sec=60)
+            result = apply_retention(conn, 1, policy, now=30_000.0)
+            self.assertEqual(result.pruned_rows, 5_000)
+            self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+            conn.close()
+            self.assertLess(os.path.getsize(path), size_before / 4)
+
+
+class TestSegments(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _measurement(self, i):
+        return Measurement(
+            id=None,
+            experiment_id=1 + i % 2,
+            n_input=10 + i,
+            n_output=20,
+            ttft=0.1,
+            start_time=1000.0 + i,
+            end_time=1001.5 + i,
+            status=Status.FAILED if i % 7 == 0 else Status.SUCCESS,
+            intended_start_time=None if i % 3 == 0 else 999.0 + i,
+            error_class=ErrorClass.SERVER_ERROR if i % 7 == 0 else None,
+            http_status=502 if i % 7 == 0 else None,
+            error_phase=ErrorPhase.MID_STREAM if i % 7 == 0 else None,
+            attempt=2 if i % 5 == 0 else 1,
+            request_start_time=998.0 + i if i % 5 == 0 else None,
+            throttled_time=0.5 if i % 5 == 0 else 0.0,
+            endpoint=None if i % 4 == 0 else f"http://replica-{i % 3}:8000/v1",
+            workload_class=("chat", "summarization")[i % 2],
+            token_source=(None, TokenSource.SERVER, TokenSource.CLIENT)[i % 3],
+        )
+
+    def test_write_read_and_ingest(self):
+        writer = SegmentWriter(self.directory, buffer_records=16, segment_records=40)
+        expected = [self._measurement(i) for i in range(100)]
+        for measurement in expected:
+            writer.append(measurement)
+        writer.close()
+        self.assertEqual(len(list_segments(self.directory)), 3)
+
+        measurements = read_measurements(self.directory, experiment_id=2)
+        self.assertEqual(measurements, [m for m in expected if m.experiment_id == 2])
+
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        self.assertEqual(ingest_segments(conn, self.directory), 100)
+        self.assertEqual(list_segments(self.directory), [])
+        stored = fetch_measurements_by_experiment(conn, 1)
+        self.assertEqual(len(stored), 50)
+        self.assertEqual(stored[0].status, Status.FAILED)
+        self.assertEqual(stored[0].error_class, ErrorClass.SERVER_ERROR)
+        self.assertEqual(stored[0].http_status, 502)
+        self.assertEqual(stored[0].error_phase, ErrorPhase.MID_STREAM)
+        self.assertIsNone(stored[1].error_class)
+        self.assertIsNone(stored[0].intended_start_time)
+        self.assertEqual(stored[1].intended_start_time, 1001.0)
+        self.assertEqual(stored[0].attempt, 2)
+        self.assertEqual(stored[0].request_start_time, 998.0)
+        self.assertEqual(stored[0].throttled_time, 0.5)
+        self.assertIsNone(stored[1].request_start_time)
+        self.assertIsNone(stored[0].endpoint)
+        self.assertEqual(stored[1].endpoint, "http://replica-2:8000/v1")
+        self.assertEqual(
+            [m.endpoint for m in stored],
+            [m.endpoint for m in expected if m.experiment_id == 1],
+        )
+        self.assertEqual({m.workload_class for m in stored}, {"chat"})
+        self.assertEqual(
+            [m.token_source for m in stored],
+            [m.token_source for m in expected if m.experiment_id == 1],
+        )
+
+    def test_ingest_is_idempotent(self):
+        writer = SegmentWriter(self.directory, segment_records=40)
+        for i in range(100):
+            writer.append(self._measurement(i))
+        writer.close()
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        self.assertEqual(ingest_segments(conn, self.directory), 100)
+
+        # Ingested segments are still readable, e.g. by the analyzer
+        self.assertEqual(read_measurements(self.directory), [])
+        self.assertEqual(len(read_measurements(self.directory, include_ingested=True)), 100)
+
+        # Simulate a crash after the commit but before the rename
+        ingested = list_segments(self.directory, include_ingested=True)
+        os.replace(ingested[0], ingested[0].replace(".ingested", ""))
+        self.assertEqual(len(list_segments(self.directory)), 1)
+        self.assertEqual(ingest_segments(conn, self.directory), 0)
+        self.assertEqual(list_segments(self.directory), [])
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM Measurements").fetchone()[0], 100)
+
+    def test_truncated_tail_is_ignored(self):
+        writer = SegmentWriter(self.directory)
+        for i in range(10):
+            writer.append(self._measurement(i))
+        writer.flush()
+        # Simulate a crash in the middle of writing a record
+        path = writer.file.name
+        with open(path, "ab") as f:
+            f.write(b"\x01" * 20)
+
+        self.assertEqual(list_segments(self.directory), [])
+        self.assertEqual(len(list_segments(self.directory, include_open=True)), 1)
+        self.assertEqual(len(read_measurements(self.directory)), 10)
+
+
+class TestQueries(unittest.TestCase):
+    def setUp(self):
+        import random
+        rng = random.Random(3)
+        self.conn = sqlite3.connect(":memory:")
+        create_tables(self.conn)
+        self.experiment_ids = []
+        self.latencies = {}
+        for e in range(2):
+            experiment_id = insert_experiment(self.conn, Experiment(
+                id=None,
+                experiment_name=f"Query {e}",
+                experiment_date=datetime.datetime.now(),
+            ))
+            self.experiment_ids.append(experiment_id)
+            self.latencies[experiment_id] = []
+            for i in range(500):
+                start = 100.0 + i * 0.5
+                latency = rng.lognormvariate(0, 0.5) * (e + 1)
+                failed = i % 25 == 0
+                if not failed:
+                    self.latencies[experiment_id].append(latency)
+                direct_insert_measurement(self.conn, Measurement(
+                    id=None,
+                    experiment_id=experiment_id,
+                    n_input=100,
+                    n_output=50,
+                    ttft=latency / 4,
+                    start_time=start,
+                    end_time=start + latency,
+                    status=Status.FAILED if failed else Status.SUCCESS,
+                ))
+
+    def test_measurement_summary(self):
+        summary = measurement_summary(self.conn)
+        self.assertEqual(list(summary.index), self.experiment_ids)
+        first = summary.loc[self.experiment_ids[0]]
+        self.assertEqual(first["num_requests"], 500)
+        self.assertEqual(first["failed_requests"], 20)
+        self.assertAlmostEqual(first["avg_latency"], np.mean(self.latencies[self.experiment_ids[0]]))
+        self.assertEqual(first["output_tokens"], 480 * 50)
+
+    def test_retried_attempts_are_not_requests(self):
+        experiment_id = self.experiment_ids[0]
+        for i in range(10):
+            direct_insert_measurement(self.conn, Measurement(
+                id=None,
+                experiment_id=experiment_id,
+                n_input=100,
+                n_output=-1,
+                ttft=0,
+                start_time=100.0 + i,
+                end_time=100.5 + i,
+                status=Status.RETRIED,
+                error_class=ErrorClass.RATE_LIMITED,
+            ))
+        first = measurement_summary(self.conn).loc[experiment_id]
+        self.assertEqual(first["num_requests"], 500)
+        self.assertEqual(first["failed_requests"], 20)
+        self.assertEqual(time_buckets(self.conn, experiment_id)["num_requests"].sum(), 500)
+
+    def test_time_buckets(self):
+        buckets = time_buckets(self.conn, self.experiment_ids[0], bucket_seconds=60)
+        self.assertEqual(buckets["num_requests"].sum(), 500)
+        self.assertTrue(np.all(np.diff(buckets["bucket_start"]) == 60))
+
+    def test_percentiles(self):
+        for experiment_id in self.experiment_ids:
+            exact = exact_percentiles(self.conn, experiment_id, "latency", [50, 95, 99, 100])
+            expected = np.percentile(self.latencies[experiment_id], [50, 95, 99, 100])
+            for value, expected_value in zip(exact.values(), expected):
+                self.assertAlmostEqual(value, expected_value, places=9)
+
+        approx = approximate_percentiles(self.conn, "latency", [50, 99], self.experiment_ids)
+        self.assertEqual(list(approx["count"]), [480, 480])
+        for experiment_id in self.experiment_ids:
+            exact = np.quantile(self.latencies[experiment_id], 0.99, method="lower")
+            self.assertAlmostEqual(approx.loc[experiment_id, "p99"] / exact, 1.0, delta=0.02)
+
+    def test_metrics_table(self):
+        experiment_id = self.experiment_ids[1]
+        for name, value in (("TTFT", 1.0), ("RPS", 2.0), ("TTFT", 3.0)):
+            direct_insert_metric(self.conn, Metric(
+                id=None,
+                experiment_id=experiment_id,
+                metric_name=name,
+                metric_value=value,
+                timestamp=datetime.datetime.now(),
+            ))
+        table = metrics_table(self.conn)
+        self.assertEqual(list(table.columns), ["TTFT", "RPS"])
+        self.assertEqual(table.loc[experiment_id, "TTFT"], 3.0)
+
+
+class TestRecompute(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "recompute.db")
+        self.conn = sqlite3.connect(self.db)
+        create_tables(self.conn)
+        self.experiment_ids = []
+        for e in range(3):
+            experiment_id = insert_experiment(self.conn, Experiment(
+                id=None,
+                experiment_name=f"Recompute {e}",
+                experiment_date=datetime.datetime.now(),
+            ))
+            self.experiment_ids.append(experiment_id)
+            for i in range(50):
+                self._insert(experiment_id, 100.0 + i)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def _insert(self, experiment_id, start, latency=1.0):
+        direct_insert_measurement(self.conn, Measurement(
+            id=None,
+            experiment_id=experiment_id,
+            n_input=100,
+            n_output=50,
+            ttft=0.1,
+            start_time=start,
+            end_time=start + latency,
+            status=Status.SUCCESS,
+        ))
+
+    def _metric(self, experiment_id, name):
+        metrics = fetch_metrics_by_experiment(self.conn, experiment_id)
+        values = [m.metric_value for m in metrics if m.metric_name == name]
+        self.assertEqual(len(values), 1)
+        return values[0]
+
+    def test_skips_unchanged_experiments(self):
+        result = recompute_metrics(self.db, max_workers=1)
+        self.assertEqual(sorted(result.computed), self.experiment_ids)
+        self.assertAlmostEqual(self._metric(self.experiment_ids[0], MetricName.LATENCY.value), 1.0)
+
+        self._insert(self.experiment_ids[1], 200.0, latency=51.0)
+        result = recompute_metrics(self.db, max_workers=1)
+        self.assertEqual(result.computed, [self.experiment_ids[1]])
+        self.assertEqual(sorted(result.skipped), [self.experiment_ids[0], self.experiment_ids[2]])
+        self.assertAlmostEqual(self._metric(self.experiment_ids[1], MetricName.LATENCY.value), 101 / 51)
+
+        result = recompute_metrics(self.db, [self.experiment_ids[0]], force=True, max_workers=1)
+        self.assertEqual(result.computed, [self.experiment_ids[0]])
+        keys = [p.key for p in fetch_parameters_by_experiment(self.conn, self.experiment_ids[0])]
+        self.assertEqual(keys.count("avg_n_input"), 1)
+
+    def test_process_pool(self):
+        result = recompute_metrics(self.db, max_workers=2)
+        self.assertEqual(sorted(result.computed), self.experiment_ids)
+        self.assertFalse(result.failed)
+        for experiment_id in self.experiment_ids:
+            self.assertAlmostEqual(self._metric(experiment_id, MetricName.TTFT.value), 0.1)
+
+    def test_rolled_up_experiments_are_not_recomputed(self):
+        recompute_metrics(self.db, max_workers=1)
+        experiment_id = self.experiment_ids[0]
+        # Pruning the first half changes the fingerprint
+        rollup_and_prune(self.conn, experiment_id, cutoff_ts=126.0, bucket_seconds=60)
+        self.assertEqual(len(fetch_measurements_by_experiment(self.conn, experiment_id)), 25)
+
+        result = recompute_metrics(self.db, max_workers=1)
+        self.assertEqual(result.partial, [experiment_id])
+        self.assertEqual(result.computed, [])
+        result = recompute_metrics(self.db, force=True, max_workers=1)
+        self.assertEqual(result.partial, [experiment_id])
+        self.assertEqual(sorted(result.computed), self.experiment_ids[1:])
+        # The metrics of the whole run are kept
+        self.assertEqual(fetch_metric_fingerprints(self.conn)[experiment_id][0], 50)
+
+
 if __name__ == '__main__':
     unittest.main()
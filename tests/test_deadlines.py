@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from compressa.perf.data.models import ErrorClass, ErrorPhase, Status
+from compressa.perf.experiment.deadlines import DEFAULT_TIMEOUT_SEC, RequestDeadlines
+from compressa.perf.experiment.inference import InferenceRunner
+
+
+class _HangingStream(BaseHTTPRequestHandler):
+    """
+    Sends the headers after `header_delay` seconds and `first_chunks` chunks
+    `gap` seconds apart after `ttft` seconds, then stops sending or ends the stream.
+    """
+
+    protocol_version = "HTTP/1.1"
+    header_delay = 0.0
+    ttft = 0.0
+    first_chunks = 1
+    gap = 0.0
+    # End the stream after the first chunks instead of hanging
+    done = False
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.header_delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.ttft)
+        chunk = {
+            "id": "x",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "stub",
+            "choices": [{"index": 0, "delta": {"content": "token "}, "finish_reason": None}],
+        }
+        try:
+            for i in range(self.first_chunks):
+                if i:
+                    time.sleep(self.gap)
+                data = f"data: {json.dumps(chunk)}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+            if self.done:
+                data = b"data: [DONE]\n\n"
+                self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+                self.wfile.flush()
+                return
+            time.sleep(5)
+        except OSError:
+            pass
+
+
+class TestRequestDeadlines(unittest.TestCase):
+    def test_http_timeout(self):
+        timeout = RequestDeadlines().http_timeout()
+        self.assertEqual((timeout.connect, timeout.read), (DEFAULT_TIMEOUT_SEC, DEFAULT_TIMEOUT_SEC))
+        timeout = RequestDeadlines(connect_sec=2, ttft_sec=30, idle_sec=5).http_timeout()
+        self.assertEqual((timeout.connect, timeout.read), (2, 30))
+        self.assertEqual(RequestDeadlines(ttft_sec=30, total_sec=10).http_timeout().read, 10)
+        # An unset phase does not shorten the read timeout of the other one
+        self.assertEqual(RequestDeadlines(idle_sec=0.5).http_timeout().read, DEFAULT_TIMEOUT_SEC)
+        self.assertEqual(RequestDeadlines(ttft_sec=5).http_timeout().read, DEFAULT_TIMEOUT_SEC)
+
+    def test_header_timeout(self):
+        self.assertEqual(RequestDeadlines(ttft_sec=5).header_timeout().read, 5)
+        self.assertEqual(RequestDeadlines(ttft_sec=5, total_sec=3).header_deadline(), "total")
+        self.assertEqual(RequestDeadlines(ttft_sec=5, total_sec=3).header_timeout().read, 3)
+        # Idle deadlines start with the first chunk
+        self.assertIsNone(RequestDeadlines(idle_sec=0.5).header_deadline())
+        self.assertEqual(RequestDeadlines(idle_sec=0.5).header_timeout().read, DEFAULT_TIMEOUT_SEC)
+
+    def test_expired(self):
+        deadlines = RequestDeadlines(ttft_sec=2, idle_sec=1, total_sec=10)
+        self.assertIsNone(deadlines.expired(now=1.5, start=0, last_chunk=None))
+        self.assertEqual(deadlines.expired(now=2.5, start=0, last_chunk=None), "ttft")
+        self.assertIsNone(deadlines.expired(now=2.5, start=0, last_chunk=2.0))
+        self.assertEqual(deadlines.expired(now=3.5, start=0, last_chunk=2.0), "idle")
+        self.assertEqual(deadlines.expired(now=10.5, start=0, last_chunk=10.0), "total")
+        self.assertFalse(RequestDeadlines(connect_sec=1).watched)
+
+
+class TestHungStreams(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _HangingStream)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _run(self, deadlines):
+        runner = InferenceRunner("key", self.url, "stub", deadlines=deadlines)
+        started = time.time()
+        measurement = runner.run_inference(1, "prompt", 16)
+        return measurement, time.time() - started
+
+    def test_idle_stream_is_aborted(self):
+        measurement, elapsed = self._run(RequestDeadlines(idle_sec=0.3))
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(measurement.status, Status.FAILED)
+        self.assertEqual(measurement.error_class, ErrorClass.TIMEOUT)
+        self.assertEqual(measurement.error_phase, ErrorPhase.MID_STREAM)
+        self.assertEqual(measurement.n_output, 1)
+
+    def test_first_token_deadline(self):
+        _HangingStream.ttft = 5.0
+        try:
+            measurement, elapsed = self._run(RequestDeadlines(ttft_sec=0.3, idle_sec=10))
+        finally:
+            _HangingStream.ttft = 0.0
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(measurement.error_class, ErrorClass.TIMEOUT)
+        self.assertEqual(measurement.error_phase, ErrorPhase.PRE_FIRST_TOKEN)
+
+    def test_no_headers(self):
+        # A hung replica that accepts the request but never answers
+        _HangingStream.header_delay = 5.0
+        try:
+            for deadlines, expected in (
+                (RequestDeadlines(ttft_sec=0.5), "ttft"),
+                (RequestDeadlines(ttft_sec=10, total_sec=0.5), "total"),
+            ):
+                measurement, elapsed = self._run(deadlines)
+                self.assertLess(elapsed, 2.0, expected)
+                self.assertEqual(measurement.error_class, ErrorClass.TIMEOUT)
+                self.assertEqual(measurement.error_phase, ErrorPhase.PRE_FIRST_TOKEN)
+        finally:
+            _HangingStream.header_delay = 0.0
+
+    def test_idle_deadline_after_headers(self):
+        # Chunk gaps longer than the TTFT deadline but within the idle one
+        _HangingStream.first_chunks = 3
+        _HangingStream.gap = 0.6
+        _HangingStream.done = True
+        try:
+            measurement, _ = self._run(RequestDeadlines(ttft_sec=0.3, idle_sec=1.0))
+        finally:
+            _HangingStream.first_chunks = 1
+            _HangingStream.gap = 0.0
+            _HangingStream.done = False
+        self.assertEqual(measurement.status, Status.SUCCESS)
+
+    def test_idle_deadline_allows_slow_first_token(self):
+        _HangingStream.ttft = 1.5
+        _HangingStream.first_chunks = 3
+        _HangingStream.done = True
+        try:
+            measurement, _ = self._run(RequestDeadlines(idle_sec=0.5))
+        finally:
+            _HangingStream.ttft = 0.0
+            _HangingStream.first_chunks = 1
+            _HangingStream.done = False
+        self.assertEqual(measurement.status, Status.SUCCESS)
+        self.assertGreaterEqual(measurement.ttft, 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
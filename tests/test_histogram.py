@@ -0,0 +1,74 @@
+import unittest
+import sqlite3
+import datetime
+
+import numpy as np
+
+from compressa.perf.data.histogram import LogHistogram, merge_histograms
+from compressa.perf.data.models import Experiment, MetricHistogram
+from compressa.perf.db.setup import create_tables
+from compressa.perf.db.db_inserts import (
+    direct_insert_experiment as insert_experiment,
+    direct_insert_histogram,
+)
+from compressa.perf.db.operations import fetch_merged_histograms
+
+
+class TestLogHistogram(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values_a = rng.lognormal(mean=-1.0, sigma=0.8, size=20000)
+        self.values_b = rng.lognormal(mean=0.5, sigma=0.3, size=5000)
+
+    def test_quantiles_within_relative_accuracy(self):
+        hist = LogHistogram.from_values(self.values_a, relative_accuracy=0.01)
+        for q in (0.5, 0.9, 0.95, 0.99):
+            exact = np.quantile(self.values_a, q, method="lower")
+            self.assertAlmostEqual(hist.quantile(q) / exact, 1.0, delta=0.02)
+        self.assertEqual(hist.count, self.values_a.size)
+        self.assertAlmostEqual(hist.mean, self.values_a.mean(), places=6)
+
+    def test_merge_matches_combined(self):
+        merged = merge_histograms([
+            LogHistogram.from_values(self.values_a),
+            LogHistogram.from_values(self.values_b),
+        ])
+        combined = LogHistogram.from_values(np.concatenate([self.values_a, self.values_b]))
+        self.assertEqual(merged.count, combined.count)
+        self.assertEqual(merged.quantiles([0.5, 0.99]), combined.quantiles([0.5, 0.99]))
+
+    def test_serialization_roundtrip(self):
+        hist = LogHistogram.from_values(np.concatenate([[0.0], self.values_a]))
+        restored = LogHistogram.from_bytes(hist.to_bytes())
+        self.assertEqual(restored.count, hist.count)
+        self.assertEqual(restored.zero_count, 1)
+        self.assertEqual(restored.quantiles([0.0, 0.5, 1.0]), hist.quantiles([0.0, 0.5, 1.0]))
+        values, fractions = restored.cdf()
+        self.assertAlmostEqual(fractions[-1], 1.0)
+        self.assertTrue(np.all(np.diff(values) >= 0))
+
+    def test_merge_from_db(self):
+        conn = sqlite3.connect(":memory:")
+        create_tables(conn)
+        experiment_ids = []
+        for values in (self.values_a, self.values_b):
+            experiment_id = insert_experiment(conn, Experiment(
+                id=None,
+                experiment_name="Histogram Experiment",
+                experiment_date=datetime.datetime.now(),
+            ))
+            direct_insert_histogram(conn, MetricHistogram(
+                id=None,
+                experiment_id=experiment_id,
+                metric_name="LATENCY",
+                histogram_data=LogHistogram.from_values(values).to_bytes(),
+                timestamp=datetime.datetime.now(),
+            ))
+            experiment_ids.append(experiment_id)
+
+        merged = fetch_merged_histograms(conn, experiment_ids)["LATENCY"]
+        self.assertEqual(merged.count, self.values_a.size + self.values_b.size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,9 +4,18 @@ import datetime
 import os
 from dotenv import load_dotenv
 
-from compressa.perf.experiment.inference import InferenceRunner, ExperimentRunner
+import httpx
+import openai
+
+from compressa.perf.experiment.inference import (
+    EmptyResponseError,
+    ExperimentRunner,
+    InferenceRunner,
+    classify_error,
+    error_phase,
+)
 from compressa.perf.db import DB_NAME
-from compressa.perf.data.models import Experiment, Measurement
+from compressa.perf.data.models import ErrorClass, ErrorPhase, Experiment, Measurement
 from compressa.perf.db.operations import fetch_measurements_by_experiment, insert_measurement
 from compressa.perf.db.db_inserts import direct_insert_experiment as insert_experiment
 from compressa.perf.db.setup import create_tables
@@ -88,5 +97,48 @@ class TestData(unittest.TestCase):
                 print(measurement)
 
 
+class TestErrorClassification(unittest.TestCase):
+    def setUp(self):
+        self.request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+
+    def _status_error(self, cls, status_code):
+        response = httpx.Response(status_code, request=self.request)
+        return cls("error", response=response, body=None)
+
+    def test_http_errors(self):
+        self.assertEqual(
+            classify_error(self._status_error(openai.RateLimitError, 429)),
+            (ErrorClass.RATE_LIMITED, 429),
+        )
+        self.assertEqual(
+            classify_error(self._status_error(openai.InternalServerError, 503)),
+            (ErrorClass.SERVER_ERROR, 503),
+        )
+        self.assertEqual(
+            classify_error(self._status_error(openai.BadRequestError, 400)),
+            (ErrorClass.CLIENT_ERROR, 400),
+        )
+
+    def test_transport_errors(self):
+        timeout = openai.APITimeoutError(request=self.request)
+        self.assertEqual(classify_error(timeout), (ErrorClass.TIMEOUT, None))
+        self.assertEqual(classify_error(httpx.ReadTimeout("read")), (ErrorClass.TIMEOUT, None))
+        self.assertEqual(
+            classify_error(httpx.RemoteProtocolError("peer closed connection")),
+            (ErrorClass.CONNECTION, None),
+        )
+        self.assertEqual(classify_error(EmptyResponseError("empty")), (ErrorClass.EMPTY_RESPONSE, None))
+        self.assertEqual(classify_error(ValueError("?")), (ErrorClass.OTHER, None))
+
+    def test_phase(self):
+        refused = openai.APIConnectionError(request=self.request)
+        refused.__cause__ = httpx.ConnectError("refused")
+        self.assertEqual(error_phase(refused, first_token_received=False), ErrorPhase.CONNECT)
+        throttled = self._status_error(openai.RateLimitError, 429)
+        self.assertEqual(error_phase(throttled, first_token_received=False), ErrorPhase.PRE_FIRST_TOKEN)
+        reset = httpx.ReadError("reset")
+        self.assertEqual(error_phase(reset, first_token_received=True), ErrorPhase.MID_STREAM)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,124 @@
+import io
+import threading
+import unittest
+import urllib.request
+
+from compressa.perf.data.models import Measurement, Status
+from compressa.perf.monitoring.dashboard import LiveDashboard, RecentRequests
+from compressa.perf.monitoring.prometheus import LiveMetrics, MetricsServer
+
+
+def _measurement(status=Status.SUCCESS, latency=1.0, end_time=None):
+    end_time = 100.0 + latency if end_time is None else end_time
+    return Measurement(
+        id=None,
+        experiment_id=1,
+        n_input=10,
+        n_output=20,
+        ttft=0.2,
+        start_time=end_time - latency,
+        end_time=end_time,
+        status=status,
+    )
+
+
+class TestLiveMetrics(unittest.TestCase):
+    def test_threads_are_summed(self):
+        metrics = LiveMetrics()
+
+        def work(n):
+            for _ in range(n):
+                metrics.on_request_start()
+                metrics.on_request_end(_measurement(), [0.01, 0.02])
+            metrics.on_request_start()
+            metrics.on_request_end(_measurement(Status.FAILED))
+
+        threads = [threading.Thread(target=work, args=(100,)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        metrics.on_request_start()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["requests"], {"success": 400, "failed": 4, "retried": 0})
+        self.assertEqual(snapshot["in_flight"], 1)
+        self.assertEqual(snapshot["output_tokens"], 400 * 20)
+        self.assertEqual(sum(snapshot["itl"][0]), 800)
+        self.assertAlmostEqual(snapshot["latency"][1], 400.0)
+
+    def test_render(self):
+        metrics = LiveMetrics()
+        metrics.add_gauge("db_writer_queue_depth", "Queued items.", lambda: 3)
+        metrics.on_request_start()
+        metrics.on_request_end(_measurement(latency=0.3))
+        text = metrics.render()
+        self.assertIn("# TYPE compressa_requests counter", text)
+        self.assertIn('compressa_requests_total{status="success"} 1', text)
+        self.assertIn('compressa_latency_seconds_bucket{le="0.25"} 0', text)
+        self.assertIn('compressa_latency_seconds_bucket{le="0.5"} 1', text)
+        self.assertIn('compressa_latency_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn("compressa_db_writer_queue_depth 3.0", text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+        text = metrics.render(openmetrics=False)
+        self.assertIn("# TYPE compressa_requests_total counter", text)
+        self.assertNotIn("# EOF", text)
+
+    def test_server(self):
+        metrics = LiveMetrics()
+        metrics.on_request_start()
+        server = MetricsServer(metrics, port=0, host="127.0.0.1").start()
+        try:
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{server.port}/metrics",
+                headers={"Accept": "application/openmetrics-text"},
+            )
+            with urllib.request.urlopen(request) as response:
+                self.assertIn("openmetrics-text", response.headers["Content-Type"])
+                self.assertIn("compressa_requests_in_flight 1", response.read().decode())
+        finally:
+            server.stop()
+
+
+class TestLiveDashboard(unittest.TestCase):
+    def test_rolling_window(self):
+        recent = RecentRequests(capacity=8, itl_capacity=16)
+        # Old requests, partly overwritten by the ring
+        for i in range(6):
+            recent.on_request_end(_measurement(latency=10.0, end_time=900.0 + i))
+        for i in range(5):
+            recent.on_request_end(_measurement(latency=1.0 + i, end_time=995.0 + i), [0.05, 0.05])
+        recent.on_request_end(_measurement(Status.FAILED, end_time=999.0))
+
+        window = recent.window(10.0, now=1000.0)
+        self.assertEqual(window["requests"], 6)
+        self.assertEqual(window["by_status"], {"success": 5, "failed": 1, "retried": 0})
+        self.assertAlmostEqual(window["rps"], 0.5)
+        self.assertAlmostEqual(window["output_tokens_per_sec"], 10.0)
+        self.assertAlmostEqual(window["latency"][0], 3.0)
+        self.assertAlmostEqual(window["itl"][1], 0.05)
+
+    def test_render(self):
+        metrics = LiveMetrics()
+        metrics.add_gauge("db_writer_queue_depth", "Queued items.", lambda: 7)
+        recent = RecentRequests()
+        for listener in (metrics, recent):
+            listener.on_request_start()
+            listener.on_request_end(_measurement(end_time=1000.0), [0.02])
+        metrics.on_request_start()
+
+        stream = io.StringIO()
+        dashboard = LiveDashboard(metrics, recent, title="test", refresh_sec=0.01, stream=stream)
+        text = dashboard.render(now=1001.0)
+        self.assertIn("In flight", text)
+        self.assertIn("Db writer queue depth", text)
+        self.assertIn("0.0200", text)
+
+        dashboard.start()
+        dashboard.stop()
+        self.assertIn("Total success", stream.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
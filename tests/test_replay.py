@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from compressa.perf.data.models import Measurement, Status
+from compressa.perf.db.segments import SegmentWriter, read_measurements
+from compressa.perf.experiment.replay import TraceReplayer, TraceRequest, load_trace
+
+
+class _SleepingRunner:
+    """Stands in for InferenceRunner: every request takes `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def run_request(self, experiment_id, prompt, max_tokens, intended_start_time=None):
+        start = time.time()
+        time.sleep(self.latency)
+        return [Measurement(
+            id=None,
+            experiment_id=experiment_id,
+            n_input=len(prompt),
+            n_output=max_tokens,
+            ttft=0.01,
+            start_time=start,
+            end_time=time.time(),
+            status=Status.SUCCESS,
+            intended_start_time=intended_start_time,
+        )]
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, records):
+        path = os.path.join(self.tmp.name, "trace.jsonl")
+        with open(path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        return path
+
+    def test_load(self):
+        path = self._write([
+            {"timestamp": 1000.5, "prompt_length": 200, "output_length": 64},
+            {"timestamp": 1000.0, "prompt": "hello"},
+            {"timestamp": 1003.0, "input_length": 50, "max_tokens": 16},
+        ])
+        trace = load_trace(path, default_max_tokens=128)
+        self.assertEqual([r.offset for r in trace], [0.0, 0.5, 3.0])
+        self.assertEqual([r.max_tokens for r in trace], [128, 64, 16])
+        self.assertEqual(trace[0].prompt, "hello")
+        self.assertEqual([r.prompt_length for r in trace], [None, 200, 50])
+
+        window = load_trace(path, start_sec=0.25, end_sec=3.0)
+        self.assertEqual([r.offset for r in window], [0.25])
+
+    def test_missing_fields(self):
+        with self.assertRaises(ValueError):
+            load_trace(self._write([{"timestamp": 1.0, "output_length": 8}]))
+
+
+class TestTraceReplayer(unittest.TestCase):
+    def test_open_loop_schedule(self):
+        rate = 500
+        trace = [TraceRequest(offset=i / rate, max_tokens=8, prompt="x") for i in range(rate)]
+        replayer = TraceReplayer(_SleepingRunner(latency=0.2), max_concurrency=300, speedup=2.0)
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.time()
+            replayer.replay(1, trace, lambda r: r.prompt, SegmentWriter(directory), show_progress=False)
+            elapsed = time.time() - started
+            measurements = read_measurements(directory)
+
+        self.assertEqual(len(measurements), rate)
+        # One second of trace replayed in half a second, then the last requests complete
+        self.assertLess(elapsed, 1.5)
+        intended = np.sort([m.intended_start_time for m in measurements])
+        np.testing.assert_allclose(np.diff(intended), 1 / rate / 2.0, atol=1e-6)
+        # Sends are not held back by the 0.2s requests in flight
+        self.assertLess(np.median(replayer.dispatch_lags), 0.002)
+        self.assertIn("dispatch_lag_p99_ms", replayer.parameters())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import random
+import unittest
+from email.utils import formatdate
+
+import httpx
+
+from compressa.perf.data.frame import MeasurementFrame
+from compressa.perf.data.models import ErrorClass, ErrorPhase, Measurement, MetricName, Status
+from compressa.perf.experiment.analysis import Analyzer
+from compressa.perf.experiment.retry import (
+    RetryPolicy,
+    TokenBucket,
+    build_retry_policy,
+    parse_retry_after,
+)
+
+
+def _error(headers):
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return httpx.HTTPStatusError("throttled", request=request, response=response)
+
+
+def _attempt(status, start_time=0.0, error_class=None, phase=None):
+    return Measurement(
+        id=None,
+        experiment_id=1,
+        n_input=10,
+        n_output=20 if status == Status.SUCCESS else -1,
+        ttft=0.1,
+        start_time=start_time,
+        end_time=start_time + 1.0,
+        status=status,
+        error_class=error_class,
+        error_phase=phase,
+    )
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_seconds_and_milliseconds(self):
+        self.assertEqual(parse_retry_after(_error({"Retry-After": "2"})), 2.0)
+        self.assertEqual(parse_retry_after(_error({"retry-after-ms": "250"})), 0.25)
+        self.assertIsNone(parse_retry_after(_error({})))
+        self.assertIsNone(parse_retry_after(ValueError("no response")))
+
+    def test_http_date(self):
+        now = 1_700_000_000.0
+        header = formatdate(now + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(_error({"Retry-After": header}), now=now), 30.0)
+        # A date in the past means retry now
+        self.assertEqual(parse_retry_after(_error({"Retry-After": header}), now=now + 60), 0.0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def _run(self, policy, outcomes):
+        sent = []
+
+        def send(intended):
+            sent.append(intended)
+            status, error_class, phase, error = outcomes[len(sent) - 1]
+            return _attempt(status, 10.0 * len(sent), error_class, phase), error
+
+        return policy.run(send, intended_start_time=5.0), sent
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(initial_backoff_sec=1.0, max_backoff_sec=4.0, rng=random.Random(0))
+        for attempt, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (10, 4.0)):
+            delays = [policy.backoff(attempt) for _ in range(200)]
+            self.assertTrue(all(0.0 <= d <= ceiling for d in delays))
+            self.assertGreater(max(delays), ceiling / 2)
+
+    def test_retries_until_success(self):
+        policy = RetryPolicy(max_attempts=3, max_backoff_sec=0.5)
+        throttled = (Status.FAILED, ErrorClass.RATE_LIMITED, ErrorPhase.PRE_FIRST_TOKEN, _error({"Retry-After": "0.01"}))
+        success = (Status.SUCCESS, None, None, None)
+        attempts, sent = self._run(policy, [throttled, throttled, success])
+
+        self.assertEqual([m.status for m in attempts], [Status.RETRIED, Status.RETRIED, Status.SUCCESS])
+        self.assertEqual([m.attempt for m in attempts], [1, 2, 3])
+        self.assertEqual({m.request_start_time for m in attempts}, {10.0})
+        self.assertEqual([m.throttled_time for m in attempts], [0.0, 0.01, 0.02])
+        # Only the first attempt keeps the scheduled start
+        self.assertEqual(sent, [5.0, None, None])
+
+    def test_gives_up(self):
+        throttled = (Status.FAILED, ErrorClass.RATE_LIMITED, ErrorPhase.PRE_FIRST_TOKEN, _error({"Retry-After": "0"}))
+        attempts, _ = self._run(RetryPolicy(max_attempts=2), [throttled, throttled])
+        self.assertEqual([m.status for m in attempts], [Status.RETRIED, Status.FAILED])
+
+        # Not retryable: client errors and failures after the first token
+        client_error = (Status.FAILED, ErrorClass.CLIENT_ERROR, ErrorPhase.PRE_FIRST_TOKEN, None)
+        mid_stream = (Status.FAILED, ErrorClass.TIMEOUT, ErrorPhase.MID_STREAM, None)
+        for outcome in (client_error, mid_stream):
+            attempts, _ = self._run(RetryPolicy(max_attempts=3), [outcome])
+            self.assertEqual([m.status for m in attempts], [Status.FAILED])
+
+    def test_budget(self):
+        bucket = TokenBucket(rate=0.001, capacity=1)
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        throttled = (Status.FAILED, ErrorClass.RATE_LIMITED, ErrorPhase.PRE_FIRST_TOKEN, _error({"Retry-After": "0"}))
+        attempts, _ = self._run(RetryPolicy(max_attempts=5, budget=bucket), [throttled])
+        self.assertEqual([m.status for m in attempts], [Status.FAILED])
+
+    def test_build(self):
+        self.assertIsNone(build_retry_policy(max_attempts=1))
+        policy = build_retry_policy(max_attempts=3, budget_per_sec=2.0)
+        self.assertEqual(policy.max_attempts, 3)
+        self.assertEqual(policy.parameters()["retry_budget_per_sec"], "2.0")
+
+
+class TestRetryMetrics(unittest.TestCase):
+    def test_retries_are_not_requests(self):
+        measurements = []
+        for i in range(10):
+            start = 10.0 * i
+            if i % 2:
+                retried = _attempt(Status.RETRIED, start, ErrorClass.RATE_LIMITED, ErrorPhase.PRE_FIRST_TOKEN)
+                retried.request_start_time = start
+                measurements.append(retried)
+                final = _attempt(Status.SUCCESS, start + 2.0)
+                final.attempt = 2
+                final.request_start_time = start
+                final.throttled_time = 1.0
+            else:
+                final = _attempt(Status.SUCCESS, start)
+            measurements.append(final)
+        measurements[-1].status = Status.FAILED
+        measurements[-1].error_class = ErrorClass.RATE_LIMITED
+
+        frame = MeasurementFrame.from_measurements(measurements)
+        self.assertEqual(len(frame.requests()), 10)
+        self.assertEqual(frame.to_measurements()[2].attempt, 2)
+
+        metrics, _ = Analyzer(None).compute_metrics_for_measurements(frame)
+        self.assertEqual(metrics[MetricName.RETRIES.value], 5)
+        self.assertEqual(metrics[MetricName.THROTTLED_TIME.value], 5.0)
+        self.assertEqual(metrics[MetricName.FAILED_REQUESTS.value], 1)
+        self.assertAlmostEqual(metrics["FAILED_RATE_LIMITED_RATE"], 0.1)
+        # 5 first-attempt successes of 1s and 4 retried ones of 3s from the first attempt
+        self.assertAlmostEqual(metrics[MetricName.LATENCY_WITH_RETRIES.value], (5 * 1.0 + 4 * 3.0) / 9)
+        self.assertAlmostEqual(metrics[MetricName.LATENCY.value], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import threading
+import unittest
+from collections import Counter
+
+from compressa.perf.data.frame import MeasurementFrame
+from compressa.perf.data.models import Measurement, MetricName, Status
+from compressa.perf.experiment.analysis import Analyzer
+from compressa.perf.experiment.routing import (
+    EndpointRouter,
+    LeastInFlightRouter,
+    WeightedRouter,
+    build_router,
+)
+
+URLS = ["http://a/v1", "http://b/v1", "http://c/v1"]
+
+
+class TestRouters(unittest.TestCase):
+    def test_round_robin(self):
+        router = EndpointRouter(URLS)
+        chosen = [router.acquire() for _ in range(6)]
+        self.assertEqual(chosen, [0, 1, 2, 0, 1, 2])
+        self.assertEqual(router.in_flight, [2, 2, 2])
+        router.release(1)
+        self.assertEqual(router.in_flight, [2, 1, 2])
+
+    def test_least_in_flight(self):
+        router = LeastInFlightRouter(URLS)
+        self.assertEqual(sorted(router.acquire() for _ in range(3)), [0, 1, 2])
+        router.release(2)
+        self.assertEqual(router.acquire(), 2)
+        router.release(0)
+        self.assertEqual(router.in_flight, [0, 1, 1])
+        self.assertEqual(router.acquire(), 0)
+
+    def test_weighted(self):
+        router = WeightedRouter(URLS, [5, 3, 2])
+        chosen = [router.acquire() for _ in range(100)]
+        self.assertEqual(Counter(chosen), {0: 50, 1: 30, 2: 20})
+        # Smooth: the heaviest endpoint never gets more than two requests in a row
+        self.assertNotIn([0, 0, 0], [chosen[i:i + 3] for i in range(98)])
+        self.assertEqual(router.parameters()["endpoint_weights"], "5,3,2")
+
+    def test_concurrent_acquire(self):
+        router = EndpointRouter(URLS)
+
+        def send():
+            for _ in range(1000):
+                router.release(router.acquire())
+
+        threads = [threading.Thread(target=send) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(router.in_flight, [0, 0, 0])
+
+    def test_build(self):
+        self.assertIsInstance(build_router(URLS, "least_in_flight"), LeastInFlightRouter)
+        self.assertEqual(build_router(URLS, "weighted").weights, [1.0, 1.0, 1.0])
+        with self.assertRaises(ValueError):
+            build_router(URLS, "random")
+        with self.assertRaises(ValueError):
+            build_router(URLS, "round_robin", [1.0, 2.0, 3.0])
+        with self.assertRaises(ValueError):
+            build_router(URLS, "weighted", [1.0])
+
+
+class TestGroupMetrics(unittest.TestCase):
+    def _measurement(self, i, endpoint, latency):
+        return Measurement(
+            id=None,
+            experiment_id=1,
+            n_input=10,
+            n_output=20,
+            ttft=0.1,
+            start_time=float(i),
+            end_time=float(i) + latency,
+            status=Status.SUCCESS,
+            endpoint=endpoint,
+        )
+
+    def test_metrics_by_endpoint(self):
+        measurements = [
+            self._measurement(i, URLS[i % 2], latency=1.0 if i % 2 == 0 else 3.0)
+            for i in range(20)
+        ]
+        analyzer = Analyzer(None)
+        groups = analyzer.compute_group_metrics(measurements)
+        self.assertEqual(list(groups), ["endpoint"])
+        by_endpoint = groups["endpoint"]
+        self.assertEqual(sorted(by_endpoint), URLS[:2])
+        self.assertAlmostEqual(by_endpoint[URLS[0]][MetricName.LATENCY.value], 1.0)
+        self.assertAlmostEqual(by_endpoint[URLS[1]][MetricName.LATENCY.value], 3.0)
+
+        # A single endpoint is not broken down
+        frame = MeasurementFrame.from_measurements(measurements)
+        self.assertEqual(analyzer.compute_group_metrics(frame[frame.endpoint == URLS[0]]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from compressa.perf.data.frame import MeasurementFrame
+from compressa.perf.data.models import Measurement, Sample, Status
+from compressa.perf.db.db_inserts import direct_insert_sample
+from compressa.perf.db.operations import fetch_samples
+from compressa.perf.db.setup import create_tables
+from compressa.perf.monitoring.server_metrics import (
+    ServerMetricsSampler,
+    align_samples,
+    correlate,
+    flatten_numbers,
+    parse_prometheus_text,
+    select_metrics,
+)
+
+METRICS_TEXT = """\
+# HELP vllm:num_requests_waiting Number of requests waiting to be processed.
+# TYPE vllm:num_requests_waiting gauge
+vllm:num_requests_waiting{model_name="a"} 3.0
+vllm:num_requests_waiting{model_name="b c"} 2.0
+vllm:gpu_cache_usage_perc{model_name="a"} 0.5
+vllm:gpu_cache_usage_perc{model_name="b c"} 0.7
+vllm:num_preemptions_total 12 1718000000000
+vllm:time_to_first_token_seconds_bucket{le="+Inf"} 40
+process_start_time_seconds NaN
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = METRICS_TEXT.encode()
+        elif self.path == "/v1/gpu_info":
+            body = json.dumps({"HARDWARE": "H100", "gpus": [{"utilization": 80, "memory_used": 40.5}]}).encode()
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestParsing(unittest.TestCase):
+    def test_prometheus_text(self):
+        samples = parse_prometheus_text(METRICS_TEXT)
+        self.assertIn(("vllm:num_requests_waiting", 2.0), samples)
+        self.assertIn(("vllm:num_preemptions_total", 12.0), samples)
+        self.assertNotIn("process_start_time_seconds", [name for name, _ in samples])
+
+    def test_select_metrics(self):
+        values = select_metrics(
+            parse_prometheus_text(METRICS_TEXT),
+            {"vllm:num_requests_waiting": "sum", "vllm:gpu_cache_usage_perc": "mean", "tgi_queue_size": "sum"},
+        )
+        self.assertEqual(values["vllm:num_requests_waiting"], 5.0)
+        self.assertAlmostEqual(values["vllm:gpu_cache_usage_perc"], 0.6)
+        self.assertNotIn("tgi_queue_size", values)
+
+    def test_flatten_numbers(self):
+        self.assertEqual(
+            flatten_numbers({"HARDWARE": "H100", "ok": True, "gpus": [{"utilization": 80}, {"utilization": 20}]}),
+            {"gpus.0.utilization": 80.0, "gpus.1.utilization": 20.0},
+        )
+
+
+class TestSampler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_sample_once(self):
+        sampler = ServerMetricsSampler(
+            metrics_urls=[f"{self.base_url}/metrics"],
+            gpu_info_url=f"{self.base_url}/v1/gpu_info",
+        )
+        samples = {(s.source, s.name): s.value for s in sampler.sample_once(7)}
+        sampler.stop()
+        self.assertEqual(samples[("server", "vllm:num_requests_waiting")], 5.0)
+        self.assertEqual(samples[("server", "vllm:num_preemptions_total")], 12.0)
+        self.assertEqual(samples[("gpu_info", "gpus.0.utilization")], 80.0)
+        self.assertNotIn(("server", "vllm:time_to_first_token_seconds_bucket"), samples)
+
+    def test_unreachable_endpoint(self):
+        sampler = ServerMetricsSampler(
+            metrics_urls=[f"{self.base_url}/metrics", f"{self.base_url}/missing"],
+            metric_names=["vllm:num_requests_waiting"],
+        )
+        samples = sampler.sample_once(7)
+        sampler.stop()
+        self.assertEqual([(s.source, s.name) for s in samples], [(f"server@{self.base_url}/metrics", "vllm:num_requests_waiting")])
+        self.assertEqual(sampler.failures, {f"{self.base_url}/missing": 1})
+
+
+class TestAlignment(unittest.TestCase):
+    def test_align_and_correlate(self):
+        # TTFT grows with the queue: window i has i requests waiting and TTFT 0.1 * (i + 1)
+        measurements = []
+        samples = []
+        for i in range(5):
+            for j in range(4):
+                start = 10.0 * i + j
+                ttft = 0.1 * (i + 1)
+                measurements.append(Measurement(
+                    id=None, experiment_id=1, n_input=10, n_output=10, ttft=ttft,
+                    start_time=start, end_time=start + 1.0, status=Status.SUCCESS,
+                ))
+            samples.append(Sample(None, 1, 10.0 * i + 1, "server", "vllm:num_requests_waiting", float(i)))
+            samples.append(Sample(None, 1, 10.0 * i + 5, "server", "vllm:num_requests_waiting", float(i)))
+            samples.append(Sample(None, 1, 10.0 * i + 1, "server", "vllm:num_preemptions_total", 3.0 * i))
+            samples.append(Sample(None, 1, 10.0 * i + 5, "server", "vllm:num_preemptions_total", 3.0 * i + 2))
+        windows = [(10.0 * i, 10.0 * (i + 1)) for i in range(5)]
+        aligned = align_samples(MeasurementFrame.from_measurements(measurements), samples, windows)
+
+        self.assertEqual(list(aligned["requests"]), [4] * 5)
+        np.testing.assert_allclose(aligned["ttft"], [0.1, 0.2, 0.3, 0.4, 0.5])
+        np.testing.assert_allclose(aligned["vllm:num_requests_waiting"], [0, 1, 2, 3, 4])
+        # Counters give their increase within the window
+        np.testing.assert_allclose(aligned["vllm:num_preemptions_total"], [2] * 5)
+
+        correlations = correlate(aligned, "ttft")
+        self.assertAlmostEqual(correlations["vllm:num_requests_waiting"], 1.0)
+        self.assertNotIn("vllm:num_preemptions_total", correlations)
+
+
+class TestSampleStorage(unittest.TestCase):
+    def test_insert_and_fetch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, "samples.db"))
+            create_tables(conn)
+            for timestamp, name in [(2.0, "b"), (1.0, "a"), (3.0, "a")]:
+                direct_insert_sample(conn, Sample(None, 1, timestamp, "server", name, timestamp * 10))
+            direct_insert_sample(conn, Sample(None, 1, 1.5, "gpu_info", "utilization", 50.0))
+            direct_insert_sample(conn, Sample(None, 2, 1.0, "server", "a", 0.0))
+
+            samples = fetch_samples(conn, 1, source="server")
+            self.assertEqual([(s.timestamp, s.name, s.value) for s in samples], [(1.0, "a", 10.0), (2.0, "b", 20.0), (3.0, "a", 30.0)])
+            self.assertEqual(len(fetch_samples(conn, 1, start_ts=1.5, end_ts=3.0)), 2)
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from compressa.perf.data.frame import MeasurementFrame
+from compressa.perf.data.models import Measurement, Status, TokenSource
+from compressa.perf.experiment.analysis import Analyzer
+from compressa.perf.experiment.inference import InferenceRunner
+from compressa.perf.experiment.tokens import (
+    CharsPerTokenEstimator,
+    TokenCounter,
+    build_token_counter,
+)
+
+PIECES = ["Hello", " there", ", general", " Kenobi"]
+
+
+class _WordTokenizer:
+    """One token per whitespace-separated word; counts its calls."""
+
+    def __init__(self, chat_template=None):
+        self.chat_template = chat_template
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=True):
+        self.calls += 1
+        return text.split()
+
+    def apply_chat_template(self, messages, tokenize=True, add_generation_prompt=False):
+        self.calls += 1
+        # Role and generation markers around the content
+        return ["<user>", *messages[0]["content"].split(), "<assistant>"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        chunks = [
+            {"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            for piece in PIECES
+        ]
+        if body["model"] == "with-usage":
+            chunks.append({"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 5, "total_tokens": 12}})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for chunk in chunks:
+            payload = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": body["model"], **chunk}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTokenCounter(unittest.TestCase):
+    def test_prompt_cache(self):
+        tokenizer = _WordTokenizer()
+        counter = TokenCounter(tokenizer)
+        self.assertEqual(counter.count_prompt("a b c"), 3)
+        self.assertEqual(counter.count_prompt("a b c"), 3)
+        self.assertEqual(tokenizer.calls, 1)
+        self.assertEqual(counter.count_output("d e"), 2)
+        self.assertEqual(counter.count_output(""), 0)
+
+    def test_chat_template(self):
+        counter = TokenCounter(_WordTokenizer(chat_template="{{ messages }}"))
+        self.assertEqual(counter.count_prompt("a b c"), 5)
+        # Outputs are not wrapped in the template
+        self.assertEqual(counter.count_output("a b c"), 3)
+
+    def test_calibration(self):
+        estimator = CharsPerTokenEstimator(chars_per_token=4.0)
+        self.assertEqual(estimator.count("x" * 40), 10)
+        self.assertEqual(estimator.count("x"), 1)
+        # Too few tokens to replace the initial ratio yet
+        estimator.calibrate("x" * 300, 100)
+        self.assertEqual(estimator.chars_per_token, 4.0)
+        estimator.calibrate("x" * 2700, 900)
+        self.assertAlmostEqual(estimator.chars_per_token, 3.0)
+        self.assertEqual(estimator.count("x" * 30), 10)
+
+        fixed = CharsPerTokenEstimator(chars_per_token=5.0, calibrate=False)
+        fixed.calibrate("x" * 3000, 1000)
+        self.assertEqual(fixed.chars_per_token, 5.0)
+
+    def test_build(self):
+        self.assertIsNone(build_token_counter())
+        counter = build_token_counter(chars_per_token=2.0)
+        self.assertEqual(counter.parameters(), {"token_counter": "chars", "chars_per_token": "2.000"})
+        # A tokenizer that cannot be loaded falls back to the estimate
+        counter = build_token_counter(tokenizer_name="/nonexistent/tokenizer")
+        self.assertIsNone(counter.tokenizer)
+        self.assertEqual(counter.count_output("x" * 8), 2)
+
+
+class TestClientCounting(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/v1/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_missing_usage(self):
+        runner = InferenceRunner("key", self.url, "no-usage")
+        measurement = runner.run_inference(1, "one two three", max_tokens=10)
+        self.assertEqual(measurement.status, Status.SUCCESS)
+        self.assertEqual((measurement.n_input, measurement.n_output), (0, 0))
+        self.assertIsNone(measurement.token_source)
+        self.assertEqual(Analyzer(None).count_uncounted_requests([measurement]), 1)
+
+        runner = InferenceRunner("key", self.url, "no-usage", token_counter=TokenCounter(_WordTokenizer()))
+        measurement = runner.run_inference(1, "one two three", max_tokens=10)
+        self.assertEqual((measurement.n_input, measurement.n_output), (3, 4))
+        self.assertEqual(measurement.token_source, TokenSource.CLIENT)
+        self.assertEqual(Analyzer(None).count_uncounted_requests([measurement]), 0)
+
+    def test_server_usage_calibrates(self):
+        counter = TokenCounter()
+        runner = InferenceRunner("key", self.url, "with-usage", token_counter=counter)
+        measurement = runner.run_inference(1, "one two three", max_tokens=10)
+        self.assertEqual((measurement.n_input, measurement.n_output), (7, 5))
+        self.assertEqual(measurement.token_source, TokenSource.SERVER)
+        self.assertEqual(counter.estimator.chars, len("".join(PIECES)))
+        self.assertEqual(counter.estimator.tokens, 5)
+
+
+class TestTokenSourceStats(unittest.TestCase):
+    def test_client_counted_share(self):
+        measurements = [
+            Measurement(
+                id=None, experiment_id=1, n_input=10, n_output=20, ttft=0.1,
+                start_time=float(i), end_time=float(i) + 1.0, status=Status.SUCCESS,
+                token_source=TokenSource.CLIENT if i < 3 else TokenSource.SERVER,
+            )
+            for i in range(4)
+        ]
+        frame = MeasurementFrame.from_measurements(measurements)
+        self.assertEqual(frame.to_measurements(), measurements)
+        stats = Analyzer(None).compute_input_output_stats(frame)
+        self.assertAlmostEqual(stats["client_counted_share"], 0.75)
+        self.assertNotIn("client_counted_share", Analyzer(None).compute_input_output_stats(frame[3:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import random
+import statistics
+import unittest
+from collections import Counter
+
+from compressa.perf.data.models import Measurement, MetricName, Status
+from compressa.perf.experiment.analysis import Analyzer
+from compressa.perf.experiment.config import ExperimentConfig
+from compressa.perf.experiment.workloads import WorkloadClass, WorkloadMix
+
+
+class TestWorkloadClass(unittest.TestCase):
+    def test_prompt_lengths(self):
+        rng = random.Random(0)
+        self.assertEqual(WorkloadClass("chat", prompt_length=50).prompt_lengths(3, rng), [50, 50, 50])
+        for distribution in ("normal", "lognormal"):
+            workload = WorkloadClass(
+                "docs", prompt_length=1000, prompt_length_std=300, length_distribution=distribution
+            )
+            lengths = workload.prompt_lengths(5000, rng)
+            self.assertAlmostEqual(statistics.mean(lengths), 1000, delta=30)
+            self.assertAlmostEqual(statistics.stdev(lengths), 300, delta=30)
+            self.assertGreaterEqual(min(lengths), 1)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            WorkloadClass("chat", weight=0)
+        with self.assertRaises(ValueError):
+            WorkloadClass("chat", length_distribution="pareto")
+        self.assertEqual(WorkloadClass("chat").sampling(), {})
+        self.assertEqual(WorkloadClass("chat", temperature=0.2).sampling(), {"temperature": 0.2})
+
+    def test_config(self):
+        config = ExperimentConfig(
+            openai_url="http://localhost/v1/",
+            api_key="key",
+            model_name="model",
+            experiment_name="mixed",
+            description="",
+            num_tasks=10,
+            num_runners=2,
+            workloads=[{"name": "chat", "weight": 3}, {"name": "code", "max_tokens": 1500}],
+        )
+        self.assertEqual([w.name for w in config.workloads], ["chat", "code"])
+        self.assertEqual(config.workloads[1].max_tokens, 1500)
+
+
+class TestWorkloadMix(unittest.TestCase):
+    def test_draw(self):
+        classes = [WorkloadClass("chat", weight=3), WorkloadClass("code", weight=1)]
+        mix = WorkloadMix(classes, {"chat": ["hi", "hello"], "code": ["def f():"]})
+        rng = random.Random(0)
+        draws = [mix.draw(rng) for _ in range(4000)]
+        counts = Counter(workload.name for workload, _ in draws)
+        self.assertAlmostEqual(counts["chat"] / len(draws), 0.75, delta=0.03)
+        self.assertTrue(all(p in mix.prompts[w.name] for w, p in draws))
+        self.assertIn('"name": "code"', mix.parameters()["workloads"])
+
+        with self.assertRaises(ValueError):
+            WorkloadMix(classes, {"chat": ["hi"]})
+
+    def test_metrics_by_class(self):
+        measurements = [
+            Measurement(
+                id=None,
+                experiment_id=1,
+                n_input=10,
+                n_output=20 if i % 4 else 200,
+                ttft=0.1,
+                start_time=float(i),
+                end_time=float(i) + (1.0 if i % 4 else 5.0),
+                status=Status.SUCCESS,
+                workload_class="chat" if i % 4 else "code",
+            )
+            for i in range(40)
+        ]
+        analyzer = Analyzer(None)
+        metrics, _ = analyzer.compute_metrics_for_measurements(measurements)
+        by_class = analyzer.compute_group_metrics(measurements)["workload_class"]
+        self.assertAlmostEqual(by_class["chat"][MetricName.LATENCY.value], 1.0)
+        self.assertAlmostEqual(by_class["code"][MetricName.LATENCY.value], 5.0)
+        # Blended over the mix
+        self.assertAlmostEqual(metrics[MetricName.LATENCY.value], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()